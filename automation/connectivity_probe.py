@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Sondes de connectivité du plan de validation
+Description: Exécution depuis ce poste des pings des fichiers configurations/validation/*.cfg (sondes ICMP concurrentes), en ponctuel ou périodique, latences historisées dans les sketches partagés
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from dotenv import load_dotenv
+import colorama
+from colorama import Fore, Style
+
+# Utilitaires partagés avec le dashboard (streamlit_app/utils)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'streamlit_app'))
+from utils.latency_sketch import get_latency_sketches
+from utils.probe_engine import get_probe_engine, load_validation_targets
+from utils.vpn_checker import locate_endpoints
+
+colorama.init()
+
+VALIDATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'configurations', 'validation')
+STATUS_COLORS = {'success': Fore.GREEN, 'degraded': Fore.YELLOW}
+
+
+def load_targets(paths):
+    """
+    Charger les sondes des fichiers de validation, sans doublon
+
+    Args:
+        paths (list): Fichiers de validation
+
+    Returns:
+        list: Cibles du moteur de sondes
+    """
+    targets = {}
+    for path in paths:
+        for target in load_validation_targets(path):
+            targets.setdefault((target['source'], target['destination']), target)
+    return list(targets.values())
+
+
+def print_results(results):
+    """Afficher les résultats des sondes"""
+    print(f"{'Source':<22} {'Destination':<28} {'Perte':>6} {'RTT moy.':>9} {'Gigue':>7}  État")
+    for result in results:
+        color = STATUS_COLORS.get(result['status'], Fore.RED)
+        source = result['source'] or 'local'
+        if not result['source_local']:
+            source = f"{result['requested_source']}*"
+        destination = result['destination']
+        if result.get('destination_site'):
+            destination += f" ({result['destination_site']})"
+        status = result['status']
+        if result.get('error'):
+            status += f" ({result['error']})"
+        avg = f"{result['avg_rtt_ms']:.1f}ms" if result.get('avg_rtt_ms') is not None else '-'
+        jitter = f"{result['jitter_ms']:.1f}ms" if result.get('jitter_ms') is not None else '-'
+        loss = f"{result['loss_pct']:.0f}%" if result.get('loss_pct') is not None else '-'
+        print(f"{source:<22} {destination:<28} {loss:>6} {avg:>9} {jitter:>7}  {color}{status}{Style.RESET_ALL}")
+
+
+def main():
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Pings du plan de validation exécutés depuis ce poste")
+    parser.add_argument('--file', action='append', dest='files',
+                        help="Fichier de validation (répétable, configurations/validation/*.cfg par défaut)")
+    parser.add_argument('--interval', type=float, help="Période en secondes (une seule passe par défaut)")
+    parser.add_argument('--method', choices=['auto', 'socket', 'ping'], help="Émission des sondes ICMP")
+    parser.add_argument('--json', action='store_true', help="Résultats en JSON sur stdout")
+    args = parser.parse_args()
+
+    if not args.json:
+        print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+        print(f"{Fore.CYAN}    SONDES DU PLAN DE VALIDATION{Style.RESET_ALL}")
+        print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.env'))
+    paths = args.files or sorted(glob.glob(os.path.join(VALIDATION_DIR, '*.cfg')))
+    try:
+        targets = load_targets(paths)
+    except OSError as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {str(e)}")
+        sys.exit(1)
+    if not targets:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Aucun ping dans {', '.join(paths) or VALIDATION_DIR}")
+        sys.exit(1)
+
+    engine = get_probe_engine()
+    engine.icmp_method = args.method or engine.icmp_method
+
+    try:
+        while True:
+            results = locate_endpoints(engine.run_sync(targets))
+            # Percentiles RTT / gigue par couple de sites (page Analytics, rapports)
+            get_latency_sketches().record_probe_results(results)
+            failed = [result for result in results if result['status'] not in ('success', 'degraded')]
+            if args.json:
+                json.dump(results, sys.stdout, indent=2)
+                print()
+            else:
+                print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} {len(targets)} sondes ({len(paths)} fichiers), "
+                      f"{len(results) - len(failed)} joignables")
+                print_results(results)
+                if any(not result['source_local'] for result in results):
+                    print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} * source non locale: sonde émise depuis ce "
+                          f"poste ({engine.default_source or 'route par défaut'}, PROBE_SOURCE)")
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Sondes interrompues")
+        sys.exit(1)
+
+    # Code de retour exploitable en supervision: 2 si une destination est injoignable
+    sys.exit(2 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
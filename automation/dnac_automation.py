@@ -4,10 +4,13 @@ Script d'automatisation Cisco DNA Center
 Description: Interaction avec l'API Cisco DNA Center pour la gestion réseau
 """
 
+import argparse
 import requests
 import json
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
 from datetime import datetime
 from dotenv import load_dotenv
 from requests.auth import HTTPBasicAuth
@@ -15,14 +18,58 @@ from requests.packages.urllib3.exceptions import InsecureRequestWarning
 import colorama
 from colorama import Fore, Back, Style
 
+# Utilitaires partagés avec le dashboard (streamlit_app/utils)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'streamlit_app'))
+from utils.alert_engine import alert_state_path, device_series, get_alert_engine
+from utils.command_runner import CommandRunner, load_command_set
+from utils.dnac_cassette import get_cassette
+from utils.dnac_federation import get_federation
+from utils.instrumentation import RequestInstrumentation, instrument_session, mount_retry_adapter
+from utils.parquet_export import (DATASETS, ParquetExporter, attribute_sites, get_parquet_exporter,
+                                  parquet_export_enabled)
+from utils.prefix_index import get_prefix_index
+from utils.record_export import FORMATS, format_unavailable, write_records
+from utils.rekey_analyzer import get_rekey_analyzer, sa_lifetimes
+from utils.timeseries_store import get_timeseries_store, health_snapshot_metrics
+from utils.vpn_checker import parse_ikev2_sa, parse_ipsec_sa
+
 # Supprimer les avertissements SSL pour les environnements de lab
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 colorama.init()
 
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.env')
+
+# Taille de page maximale acceptée par l'API network-device
+PAGE_SIZE = 500
+
+# Jeux de commandes de validation (sous-commande validate)
+VALIDATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'configurations', 'validation')
+VALIDATION_SETS = {
+    'vpn': os.path.join(VALIDATION_DIR, 'vpn-validation.cfg'),
+    'network': os.path.join(VALIDATION_DIR, 'network-validation.cfg')
+}
+
+# Commandes de la sous-commande rekey ("detailed" pour les durées de vie IKEv2)
+REKEY_COMMANDS = ['show crypto ikev2 sa detailed', 'show crypto ipsec sa']
+
+# Colonnes du tableau par défaut (mêmes champs que display_devices)
+DEVICE_TABLE_FIELDS = ['hostname', 'type', 'managementIpAddress', 'macAddress', 'reachabilityStatus', 'softwareVersion']
+
+class _NoColor:
+    """Remplace Fore / Style: chaque couleur est une chaîne vide"""
+    def __getattr__(self, name):
+        return ''
+
+def disable_colors():
+    """Désactiver les codes couleur ANSI (sortie redirigée, --no-color, NO_COLOR)"""
+    global Fore, Back, Style
+    Fore = Back = Style = _NoColor()
+
 class DNACAutomation:
     """Classe pour l'automatisation Cisco DNA Center"""
     
-    def __init__(self, base_url, username, password):
+    def __init__(self, base_url, username, password, instrumentation=None, max_retries=2, cassette=None,
+                 request_timeout=30):
         """
         Initialisation de la classe DNAC
         
@@ -30,13 +77,25 @@ class DNACAutomation:
             base_url (str): URL de base du DNA Center
             username (str): Nom d'utilisateur
             password (str): Mot de passe
+            instrumentation (RequestInstrumentation): Collecteur de mesures (un nouveau par défaut)
+            max_retries (int): Nouvelles tentatives sur 429/5xx pour les requêtes GET
+            cassette (Cassette): Enregistrement ou rejeu des réponses (voir utils.dnac_cassette)
+            request_timeout (float): Attente maximale de chaque requête (connexion et lecture, secondes)
         """
         self.base_url = base_url.rstrip('/')
         self.username = username
         self.password = password
         self.token = None
+        self.request_timeout = request_timeout
         self.session = requests.Session()
         self.session.verify = False  # Pour les environnements de lab uniquement
+        self.instrumentation = instrumentation or RequestInstrumentation()
+        self.cassette = cassette
+        if cassette:
+            cassette.mount(self.session, max_retries)
+        else:
+            mount_retry_adapter(self.session, max_retries)
+        instrument_session(self.session, self.instrumentation)
         
     def authenticate(self):
         """Authentification auprès du DNA Center"""
@@ -48,7 +107,8 @@ class DNACAutomation:
             response = self.session.post(
                 auth_url,
                 auth=HTTPBasicAuth(self.username, self.password),
-                headers={'Content-Type': 'application/json'}
+                headers={'Content-Type': 'application/json'},
+                timeout=self.request_timeout
             )
             
             if response.status_code == 200:
@@ -75,7 +135,7 @@ class DNACAutomation:
         url = f"{self.base_url}/dna/intent/api/v1/network-device"
         
         try:
-            response = self.session.get(url)
+            response = self.session.get(url, timeout=self.request_timeout)
             
             if response.status_code == 200:
                 devices = response.json()['response']
@@ -96,7 +156,7 @@ class DNACAutomation:
         url = f"{self.base_url}/dna/intent/api/v1/network-device/{device_id}"
         
         try:
-            response = self.session.get(url)
+            response = self.session.get(url, timeout=self.request_timeout)
             
             if response.status_code == 200:
                 device = response.json()['response']
@@ -116,7 +176,7 @@ class DNACAutomation:
         url = f"{self.base_url}/dna/intent/api/v1/network-health"
         
         try:
-            response = self.session.get(url)
+            response = self.session.get(url, timeout=self.request_timeout)
             
             if response.status_code == 200:
                 health = response.json()['response']
@@ -136,7 +196,7 @@ class DNACAutomation:
         url = f"{self.base_url}/dna/intent/api/v1/client-health"
         
         try:
-            response = self.session.get(url)
+            response = self.session.get(url, timeout=self.request_timeout)
             
             if response.status_code == 200:
                 health = response.json()['response']
@@ -149,23 +209,100 @@ class DNACAutomation:
             print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Erreur: {str(e)}")
             return None
     
+    def _get_response(self, url, params=None):
+        """Appel GET silencieux (utilisé en parallèle), None en cas d'erreur"""
+        try:
+            response = self.session.get(url, params=params, timeout=self.request_timeout)
+            if response.status_code == 200:
+                return response.json()['response']
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {url}: {response.status_code}")
+        except Exception as e:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {url}: {str(e)}")
+        return None
+    
+    def get_device_count(self):
+        """Nombre d'équipements de l'inventaire (None si indisponible)"""
+        count = self._get_response(f"{self.base_url}/dna/intent/api/v1/network-device/count")
+        return count if isinstance(count, int) else None
+    
+    def fetch_all_devices(self, workers=8, page_size=PAGE_SIZE):
+        """
+        Récupérer tout l'inventaire, pages téléchargées en parallèle
+        
+        Args:
+            workers (int): Nombre de requêtes simultanées
+            page_size (int): Équipements par page (500 maximum)
+        
+        Returns:
+            list: Équipements, None si la première page échoue
+        """
+        url = f"{self.base_url}/dna/intent/api/v1/network-device"
+        count = self.get_device_count()
+        print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} Récupération de l'inventaire"
+              f"{f' ({count} équipements)' if count is not None else ''}...")
+        
+        if count is None:
+            # Nombre inconnu: pagination séquentielle jusqu'à une page incomplète
+            devices, offset = [], 1
+            while True:
+                page = self._get_response(url, {'offset': offset, 'limit': page_size})
+                if page is None:
+                    return devices or None
+                devices.extend(page)
+                if len(page) < page_size:
+                    return devices
+                offset += page_size
+        
+        offsets = range(1, max(count, 1) + 1, page_size)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pages = list(executor.map(lambda offset: self._get_response(url, {'offset': offset, 'limit': page_size}), offsets))
+        if pages[0] is None:
+            return None
+        devices = [device for page in pages if page for device in page]
+        failed = sum(1 for page in pages if page is None)
+        if failed:
+            print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} {failed} page(s) non récupérée(s)")
+        print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} {len(devices)} équipements trouvés")
+        return devices
+    
+    def fetch_device_details(self, device_ids, workers=8):
+        """
+        Récupérer les détails de plusieurs équipements en parallèle
+        
+        Args:
+            device_ids (list): Identifiants DNA Center
+            workers (int): Nombre de requêtes simultanées
+        
+        Returns:
+            list: Détails des équipements trouvés (ordre des identifiants conservé)
+        """
+        url = f"{self.base_url}/dna/intent/api/v1/network-device"
+        print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} Récupération des détails de {len(device_ids)} équipements...")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            details = list(executor.map(lambda device_id: self._get_response(f"{url}/{device_id}"), device_ids))
+        return [device for device in details if device]
+    
     def display_devices(self, devices):
         """Afficher la liste des équipements de manière formatée"""
         if not devices:
             print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Aucun équipement trouvé")
             return
         
-        print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
-        print(f"{Fore.CYAN}LISTE DES ÉQUIPEMENTS RÉSEAU{Style.RESET_ALL}")
-        print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+        lines = [
+            f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}",
+            f"{Fore.CYAN}LISTE DES ÉQUIPEMENTS RÉSEAU{Style.RESET_ALL}",
+            f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}"
+        ]
         
+        # Sortie construite en mémoire puis écrite en une fois
         for i, device in enumerate(devices, 1):
-            print(f"\n{Fore.YELLOW}[{i}] {device.get('hostname', 'N/A')}{Style.RESET_ALL}")
-            print(f"   Type: {device.get('type', 'N/A')}")
-            print(f"   Adresse IP: {device.get('managementIpAddress', 'N/A')}")
-            print(f"   MAC: {device.get('macAddress', 'N/A')}")
-            print(f"   Statut: {device.get('reachabilityStatus', 'N/A')}")
-            print(f"   Version: {device.get('softwareVersion', 'N/A')}")
+            lines.append(f"\n{Fore.YELLOW}[{i}] {device.get('hostname', 'N/A')}{Style.RESET_ALL}")
+            lines.append(f"   Type: {device.get('type', 'N/A')}")
+            lines.append(f"   Adresse IP: {device.get('managementIpAddress', 'N/A')}")
+            lines.append(f"   MAC: {device.get('macAddress', 'N/A')}")
+            lines.append(f"   Statut: {device.get('reachabilityStatus', 'N/A')}")
+            lines.append(f"   Version: {device.get('softwareVersion', 'N/A')}")
+        print('\n'.join(lines))
     
     def save_results(self, data, filename):
         """Sauvegarder les résultats dans un fichier JSON"""
@@ -179,14 +316,14 @@ class DNACAutomation:
         
         print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} Résultats sauvegardés dans {full_filename}")
 
-def main():
-    """Fonction principale"""
+def run_full_report():
+    """Rapport complet: équipements, santé réseau et clients (comportement sans sous-commande)"""
     print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
     print(f"{Fore.CYAN}    AUTOMATISATION CISCO DNA CENTER{Style.RESET_ALL}")
     print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
     
     # Charger les variables d'environnement
-    load_dotenv('../config.env')
+    load_dotenv(CONFIG_PATH)
     
     # Configuration DNA Center (Cisco DevNet Sandbox)
     DNAC_URL = os.getenv('DNAC_URL', 'https://sandboxdnac2.cisco.com')
@@ -198,17 +335,24 @@ def main():
     print(f"   Utilisateur: {DNAC_USERNAME}")
     
     # Initialiser l'automatisation DNA Center
-    dnac = DNACAutomation(DNAC_URL, DNAC_USERNAME, DNAC_PASSWORD)
+    instrumentation = RequestInstrumentation(trace=os.getenv('DNAC_TRACE', 'false').lower() == 'true')
+    cassette = get_cassette()
+    if cassette:
+        print(f"   Cassette: {cassette.path} ({cassette.mode})")
+    dnac = DNACAutomation(DNAC_URL, DNAC_USERNAME, DNAC_PASSWORD, instrumentation=instrumentation, cassette=cassette,
+                          request_timeout=float(os.getenv('DNAC_REQUEST_TIMEOUT', '30')))
     
     # Authentification
     if not dnac.authenticate():
         print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Impossible de se connecter à DNA Center")
+        print_instrumentation_summary(instrumentation)
         sys.exit(1)
     
     try:
         # Récupérer et afficher les équipements
         devices = dnac.get_network_devices()
         if devices:
+            get_prefix_index(devices)
             dnac.display_devices(devices)
             dnac.save_results(devices, 'network_devices')
         
@@ -230,6 +374,32 @@ def main():
             print(json.dumps(client_health, indent=2))
             dnac.save_results(client_health, 'client_health')
         
+        # Historiser les scores de santé et l'accessibilité des équipements
+        # (graphiques du dashboard, disponibilité des rapports)
+        snapshot = health_snapshot_metrics(network_health, client_health)
+        snapshot.update(device_series(devices))
+        recorded = get_timeseries_store().record_snapshot(snapshot)
+        if recorded:
+            print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} {recorded} métriques historisées")
+        
+        # Instantané analytique (Parquet partitionné par date et site)
+        if parquet_export_enabled():
+            exporter = get_parquet_exporter()
+            counts = export_analytics(exporter, devices, network_health, client_health)
+            print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} Export Parquet dans {exporter.base_dir}: "
+                  + ', '.join(f"{dataset} {count}" for dataset, count in counts.items()))
+        
+        # Évaluer les règles d'alerte sur l'instantané (état repris de l'exécution
+        # précédente: les durées 'for' s'étendent sur plusieurs exécutions)
+        alert_engine = get_alert_engine()
+        alert_engine.load_state(alert_state_path())
+        events = alert_engine.ingest(snapshot)
+        alert_engine.save_state(alert_state_path())
+        for event in events:
+            if event['event'] == 'firing':
+                color = Fore.RED if event['alert']['severity'] == 'error' else Fore.YELLOW
+                print(f"{color}[ALERTE]{Style.RESET_ALL} {event['alert']['summary']}")
+        
         print(f"\n{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} Automatisation DNA Center terminée avec succès !")
         
     except KeyboardInterrupt:
@@ -237,6 +407,399 @@ def main():
     except Exception as e:
         print(f"\n{Fore.RED}[ERROR]{Style.RESET_ALL} Erreur inattendue: {str(e)}")
         sys.exit(1)
+    finally:
+        print_instrumentation_summary(instrumentation)
+        if instrumentation.trace and instrumentation.spans:
+            dnac.save_results(list(instrumentation.spans), 'api_trace')
+        if cassette and cassette.mode == 'record':
+            print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} Cassette enregistrée: {cassette.save()}")
+
+def print_instrumentation_summary(instrumentation):
+    """Afficher le temps passé par endpoint DNA Center"""
+    if not instrumentation.summary():
+        return
+    print(f"\n{Fore.CYAN}{'='*50}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}PROFIL DES APPELS API{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*50}{Style.RESET_ALL}")
+    print(instrumentation.format_summary())
+
+def flatten_client_health(client_health):
+    """Une ligne par site et catégorie de clients (scoreDetail aplati)"""
+    rows = []
+    for site in client_health or []:
+        for score in site.get('scoreDetail', []) or []:
+            rows.append({
+                'siteId': site.get('siteId'),
+                'category': score.get('scoreCategory', {}).get('value'),
+                'scoreValue': score.get('scoreValue'),
+                'clientCount': score.get('clientCount')
+            })
+    return rows
+
+def export_analytics(exporter, devices, network_health, client_health):
+    """
+    Ajouter un instantané équipements / santé au jeu Parquet
+    
+    Les équipements sont rattachés au site de leur adresse d'administration
+    (index de préfixes construit avec l'inventaire) avant le partitionnement.
+    
+    Returns:
+        dict: Jeu de données -> lignes écrites
+    """
+    if isinstance(network_health, dict):
+        network_health = [network_health]
+    devices = attribute_sites(devices, 'managementIpAddress')
+    snapshots = {
+        'devices': devices,
+        'network_health': network_health or [],
+        'client_health': flatten_client_health(client_health)
+    }
+    for dataset, records in snapshots.items():
+        exporter.export(dataset, records)
+    return {dataset: len(records) for dataset, records in snapshots.items()}
+
+def run_parquet_command(dnac, args):
+    """Sous-commande parquet: instantané vers le jeu analytique, ou compactage d'une journée"""
+    exporter = ParquetExporter(args.dir) if args.dir else get_parquet_exporter()
+    if args.compact:
+        for dataset in DATASETS:
+            try:
+                compacted = exporter.compact(dataset, args.compact)
+            except ValueError as e:
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {str(e)}")
+                return 1
+            print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} {dataset}: {compacted} partitions compactées")
+        return 0
+    devices = dnac.fetch_all_devices(workers=args.workers)
+    if devices is None:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Aucune donnée récupérée")
+        return 1
+    get_prefix_index(devices)
+    counts = export_analytics(exporter, devices, dnac.get_network_health(), dnac.get_client_health())
+    for dataset, count in counts.items():
+        print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} {dataset}: {count} lignes ajoutées dans {exporter.base_dir}")
+    return 0
+
+def select_devices(dnac, args):
+    """
+    Équipements visés par validate / rekey: identifiants, '-' (stdin), --all ou --match
+    
+    Returns:
+        tuple: (identifiants, {identifiant: hostname} des équipements de l'inventaire)
+    """
+    device_ids = list(args.ids)
+    if device_ids == ['-']:
+        device_ids = [line.strip() for line in sys.stdin if line.strip()]
+    devices = dnac.fetch_all_devices(workers=args.workers) if (args.all or args.match) else []
+    if args.match:
+        devices = [d for d in (devices or []) if args.match.lower() in (d.get('hostname') or '').lower()]
+    device_ids += [d['id'] for d in devices or [] if d.get('id')]
+    return device_ids, {d.get('id'): d.get('hostname') for d in devices or []}
+
+def run_validation(dnac, args, stdout):
+    """
+    Exécuter un jeu de commandes de validation sur le parc via le command runner
+    
+    Avec -f ndjson sur la sortie standard, chaque équipement est écrit dès que
+    ses résultats sont revenus; les autres formats sont écrits à la fin.
+    
+    Args:
+        dnac (DNACAutomation): Client authentifié
+        args (argparse.Namespace): Arguments de la sous-commande validate
+        stdout: Sortie standard d'origine (les données n'y sont écrites qu'en fin de lot)
+    
+    Returns:
+        list: Une ligne par équipement et commande (None si rien à exécuter)
+    """
+    commands = load_command_set(VALIDATION_SETS.get(args.set, args.set), args.section)
+    runner = CommandRunner(dnac, workers=args.workers, timeout=args.timeout)
+    commands, skipped = runner.filter_commands(commands)
+    for command in skipped:
+        print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Commande ignorée (non autorisée en lecture): {command}")
+    
+    device_ids, hostnames = select_devices(dnac, args)
+    if not device_ids or not commands:
+        print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Aucun équipement ou aucune commande à exécuter")
+        return None
+    
+    print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} {len(commands)} commandes sur {len(device_ids)} équipements...")
+    stream = args.format == 'ndjson' and args.output in (None, '-')
+    rows = []
+    for result in runner.run(device_ids, commands, name=f"validation-{os.path.basename(args.set)}"):
+        hostname = hostnames.get(result['deviceUuid']) or result['deviceUuid']
+        device_rows = [
+            {'hostname': hostname, 'deviceUuid': result['deviceUuid'], 'command': command,
+             'status': status, 'output': output}
+            for status in ('success', 'failure', 'blacklisted')
+            for command, output in result[status].items()
+        ]
+        device_rows += [
+            {'hostname': hostname, 'deviceUuid': result['deviceUuid'], 'command': None,
+             'status': 'error', 'output': error}
+            for error in result['errors']
+        ]
+        ok = len(result['success'])
+        if ok == len(device_rows):
+            print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} {hostname}: {ok}/{len(device_rows)} commandes réussies")
+        else:
+            print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} {hostname}: {ok}/{len(device_rows)} commandes réussies")
+        if stream:
+            with redirect_stdout(stdout):
+                write_records(device_rows, 'ndjson')
+        else:
+            rows.extend(device_rows)
+    print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} {runner.polls} sondages de tâches")
+    return [] if stream else rows
+
+def run_rekey(dnac, args):
+    """
+    Calendrier des rekeys IKEv2 / IPsec du parc et échelonnement des durées de vie
+    
+    Les SA sont relevées via le command runner ("show crypto ikev2 sa detailed",
+    "show crypto ipsec sa"); les rafales de rekeys synchronisés et les durées
+    de vie recommandées sont affichées sur stderr.
+    
+    Args:
+        dnac (DNACAutomation): Client authentifié
+        args (argparse.Namespace): Arguments de la sous-commande rekey
+    
+    Returns:
+        list: Une ligne par SA (prochain rekey, cluster, durée de vie recommandée)
+    """
+    device_ids, hostnames = select_devices(dnac, args)
+    if not device_ids:
+        print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Aucun équipement à analyser")
+        return None
+    
+    print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} Relevé des SA sur {len(device_ids)} équipements...")
+    runner = CommandRunner(dnac, workers=args.workers, timeout=args.timeout)
+    sa_details = {}
+    collected_at = datetime.now().timestamp()
+    for result in runner.run(device_ids, REKEY_COMMANDS, name="rekey-analysis"):
+        hostname = hostnames.get(result['deviceUuid']) or result['deviceUuid']
+        if len(result['success']) < len(REKEY_COMMANDS):
+            print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} {hostname}: SA non relevées")
+            continue
+        sa_details[hostname] = {
+            'ikev2': parse_ikev2_sa(result['success'][REKEY_COMMANDS[0]]),
+            'ipsec': parse_ipsec_sa(result['success'][REKEY_COMMANDS[1]])
+        }
+    
+    analyzer = get_rekey_analyzer()
+    analysis = analyzer.analyze(sa_lifetimes(sa_details, ipsec_lifetime=args.ipsec_lifetime),
+                                now=collected_at)
+    print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} {analysis['sas']} SA, {analysis['events']} rekeys "
+          f"sur {analyzer.horizon_seconds // 3600}h, pic {analysis['peak']} par {analyzer.bin_seconds}s")
+    for cluster in analysis['clusters'][:10]:
+        print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Rafale {datetime.fromtimestamp(cluster['start']):%H:%M}"
+              f"-{datetime.fromtimestamp(cluster['end']):%H:%M}: {cluster['events']} rekeys, "
+              f"{cluster['sas']} SA sur {cluster['routers']} routeurs")
+    if len(analysis['clusters']) > 10:
+        print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} ... {len(analysis['clusters']) - 10} autres rafales")
+    if analysis['recommendations']:
+        print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} {len(analysis['recommendations'])} durées de vie à échelonner: "
+              f"pic par cycle {analysis['peak_cycle']} -> {analysis['peak_staggered']}")
+    else:
+        print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} Aucune rafale de rekeys synchronisés")
+    
+    return [
+        dict(record, next_rekey=datetime.fromtimestamp(record['next_rekey']).isoformat(timespec='seconds'))
+        for record in analysis['records']
+    ]
+
+def run_command(args):
+    """
+    Exécuter une sous-commande d'export (inventory, health, clients, details, clusters, validate, rekey, parquet)
+    
+    Les messages de progression sont envoyés sur stderr: stdout ne contient que
+    les données, pour pouvoir être redirigé vers d'autres outils.
+    """
+    load_dotenv(CONFIG_PATH)
+    if args.command == 'clusters':
+        return run_clusters_command(args)
+    if args.command == 'parquet' and args.compact:
+        with redirect_stdout(sys.stderr):
+            return run_parquet_command(None, args)
+    
+    stdout = sys.stdout
+    with redirect_stdout(sys.stderr):
+        instrumentation = RequestInstrumentation(trace=os.getenv('DNAC_TRACE', 'false').lower() == 'true')
+        dnac = DNACAutomation(
+            os.getenv('DNAC_URL', 'https://sandboxdnac2.cisco.com'),
+            os.getenv('DNAC_USERNAME', 'devnetuser'),
+            os.getenv('DNAC_PASSWORD', 'Cisco123!'),
+            instrumentation=instrumentation,
+            cassette=get_cassette(),
+            request_timeout=float(os.getenv('DNAC_REQUEST_TIMEOUT', '30'))
+        )
+        if not dnac.authenticate():
+            return 1
+        if args.command == 'parquet':
+            return run_parquet_command(dnac, args)
+        
+        default_fields = None
+        if args.command == 'inventory':
+            records = dnac.fetch_all_devices(workers=args.workers, page_size=args.page_size)
+            if records:
+                records = attribute_sites(records, 'managementIpAddress', get_prefix_index(records))
+            default_fields = DEVICE_TABLE_FIELDS + ['site']
+        elif args.command == 'health':
+            records = dnac.get_network_health()
+        elif args.command == 'clients':
+            records = flatten_client_health(dnac.get_client_health())
+        elif args.command == 'validate':
+            records = run_validation(dnac, args, stdout)
+            default_fields = ['hostname', 'command', 'status']
+        elif args.command == 'rekey':
+            records = run_rekey(dnac, args)
+            default_fields = ['router', 'kind', 'peer', 'lifetime', 'remaining_sec', 'next_rekey',
+                              'cluster', 'recommended_lifetime']
+        else:
+            device_ids = list(args.ids)
+            if device_ids == ['-']:
+                device_ids = [line.strip() for line in sys.stdin if line.strip()]
+            elif args.all:
+                device_ids = [d['id'] for d in (dnac.fetch_all_devices(workers=args.workers) or []) if d.get('id')]
+            records = dnac.fetch_device_details(device_ids, workers=args.workers)
+            default_fields = DEVICE_TABLE_FIELDS
+        
+        if records is None:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Aucune donnée récupérée")
+            return 1
+        if isinstance(records, dict):
+            records = [records]
+        
+        fields = [f.strip() for f in args.fields.split(',') if f.strip()] if args.fields else None
+        if fields is None and args.format == 'table':
+            fields = default_fields
+        if args.profile:
+            print_instrumentation_summary(instrumentation)
+    
+    count = write_records(records, args.format, args.output, fields)
+    if args.output not in (None, '-'):
+        print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} {count} enregistrements écrits dans {args.output}", file=sys.stderr)
+    return 0
+
+def run_clusters_command(args):
+    """
+    Exporter la vue fusionnée des clusters DNA Center (DNAC_CLUSTERS)
+    
+    Les clusters sont collectés en parallèle; un cluster qui dépasse --timeout
+    est servi depuis son dernier instantané (aucun au premier lancement).
+    """
+    with redirect_stdout(sys.stderr):
+        federation = get_federation()
+        view = federation.refresh(timeout=args.timeout)
+        for cluster in view['clusters']:
+            if cluster['status'] == 'ok':
+                print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} {cluster['cluster']}: "
+                      f"{cluster['devices']} équipements en {cluster['duration_ms']:.0f} ms")
+            elif cluster['collecting']:
+                print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} {cluster['cluster']}: collecte en cours (délai dépassé)")
+            else:
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {cluster['cluster']}: {cluster['error']}")
+        
+        default_fields = None
+        if args.view == 'inventory':
+            records = view['devices']
+            default_fields = ['cluster'] + DEVICE_TABLE_FIELDS
+        elif args.view == 'health':
+            records = [dict(health, cluster=name) for name, health in view['network_health']['clusters'].items()]
+        else:
+            records = view['clusters']
+        
+        fields = [f.strip() for f in args.fields.split(',') if f.strip()] if args.fields else None
+        if fields is None and args.format == 'table':
+            fields = default_fields
+    
+    count = write_records(records, args.format, args.output, fields)
+    if args.output not in (None, '-'):
+        print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} {count} enregistrements écrits dans {args.output}", file=sys.stderr)
+    status = 0 if any(c['status'] == 'ok' for c in view['clusters']) else 1
+    if any(c['collecting'] for c in view['clusters']):
+        # Ne pas attendre à la sortie les collectes encore en cours (threads du pool)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+    return status
+
+def build_parser():
+    """Analyseur de la ligne de commande"""
+    parser = argparse.ArgumentParser(
+        description="Automatisation Cisco DNA Center (sans sous-commande: rapport complet historique)"
+    )
+    parser.add_argument('--no-color', action='store_true', help="Désactiver les couleurs (automatique si la sortie est redirigée)")
+    
+    # Options communes aux sous-commandes (placées après le nom de la sous-commande)
+    concurrency = argparse.ArgumentParser(add_help=False)
+    concurrency.add_argument('--workers', type=int, default=8, help="Requêtes API simultanées (défaut: 8)")
+    export = argparse.ArgumentParser(add_help=False, parents=[concurrency])
+    export.add_argument('--format', '-f', choices=FORMATS, default='table', help="Format de sortie (défaut: table)")
+    export.add_argument('--output', '-o', help="Fichier de sortie (stdout par défaut)")
+    export.add_argument('--fields', help="Champs à exporter, séparés par des virgules (chemins pointés acceptés)")
+    export.add_argument('--profile', action='store_true', help="Afficher le profil des appels API sur stderr")
+    
+    commands = parser.add_subparsers(dest='command')
+    inventory = commands.add_parser('inventory', parents=[export], help="Inventaire des équipements")
+    inventory.add_argument('--page-size', type=int, default=PAGE_SIZE, help="Équipements par requête (500 maximum)")
+    commands.add_parser('health', parents=[export], help="Santé du réseau")
+    commands.add_parser('clients', parents=[export], help="Santé des clients par site et catégorie")
+    details = commands.add_parser('details', parents=[export], help="Détails d'équipements")
+    details.add_argument('ids', nargs='*', help="Identifiants DNA Center ('-' pour lire stdin)")
+    details.add_argument('--all', action='store_true', help="Tous les équipements de l'inventaire")
+    validate = commands.add_parser('validate', parents=[export], help="Commandes de validation via le command runner")
+    validate.add_argument('ids', nargs='*', help="Identifiants DNA Center ('-' pour lire stdin)")
+    validate.add_argument('--all', action='store_true', help="Tous les équipements de l'inventaire")
+    validate.add_argument('--match', help="Équipements dont le hostname contient ce texte")
+    validate.add_argument('--set', default='vpn', help="Jeu de commandes: vpn, network ou chemin d'un fichier .cfg (défaut: vpn)")
+    validate.add_argument('--section', help="Sections du fichier dont le titre contient ce texte (ex: 'HQ ROUTER')")
+    validate.add_argument('--timeout', type=float, default=600, help="Attente maximale des résultats en secondes (défaut: 600)")
+    rekey = commands.add_parser('rekey', parents=[export], help="Rafales de rekeys IKEv2 / IPsec et échelonnement des durées de vie")
+    rekey.add_argument('ids', nargs='*', help="Identifiants DNA Center ('-' pour lire stdin)")
+    rekey.add_argument('--all', action='store_true', help="Tous les équipements de l'inventaire")
+    rekey.add_argument('--match', help="Équipements dont le hostname contient ce texte")
+    rekey.add_argument('--ipsec-lifetime', type=int, default=3600, help="Durée de vie IPsec configurée en secondes (défaut: 3600)")
+    rekey.add_argument('--timeout', type=float, default=600, help="Attente maximale des résultats en secondes (défaut: 600)")
+    parquet = commands.add_parser('parquet', parents=[concurrency], help="Instantané équipements / santé vers le jeu Parquet analytique")
+    parquet.add_argument('--dir', help="Répertoire du jeu de données (ANALYTICS_DIR par défaut)")
+    parquet.add_argument('--compact', metavar='AAAA-MM-JJ', help="Fusionner les fichiers des partitions de cette date")
+    clusters = commands.add_parser('clusters', parents=[export], help="Vue fusionnée des clusters (DNAC_CLUSTERS)")
+    clusters.add_argument('view', nargs='?', choices=('status', 'inventory', 'health'), default='status',
+                          help="État des clusters, inventaire fusionné ou santé par cluster (défaut: status)")
+    clusters.add_argument('--timeout', type=float, help="Attente maximale de la collecte (DNAC_FEDERATION_TIMEOUT par défaut)")
+    return parser
+
+def main(argv=None):
+    """Fonction principale"""
+    args = build_parser().parse_args(argv)
+    
+    interactive = sys.stdout.isatty() if args.command is None else sys.stderr.isatty()
+    if args.no_color or os.getenv('NO_COLOR') or not interactive:
+        disable_colors()
+    
+    if args.command is None:
+        run_full_report()
+        return
+    if args.command == 'details' and not args.ids and not args.all:
+        build_parser().error("details: indiquer des identifiants, '-' ou --all")
+    if args.command == 'validate' and not args.ids and not args.all and not args.match:
+        build_parser().error("validate: indiquer des identifiants, '-', --match ou --all")
+    if args.command == 'rekey' and not args.ids and not args.all and not args.match:
+        build_parser().error("rekey: indiquer des identifiants, '-', --match ou --all")
+    # Dépendance optionnelle vérifiée avant toute collecte
+    missing = format_unavailable('parquet' if args.command == 'parquet' else getattr(args, 'format', None))
+    if missing:
+        build_parser().error(f"{args.command}: {missing}")
+    
+    try:
+        sys.exit(run_command(args))
+    except BrokenPipeError:
+        # Lecteur fermé (ex: | head): ne pas afficher de trace
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(0)
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Interruption par l'utilisateur", file=sys.stderr)
+        sys.exit(130)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Exporteur de métriques VPN / DNA Center
+Description: Collecte périodique en arrière-plan et exposition OpenMetrics pour Prometheus
+"""
+
+import os
+import sys
+import time
+from dotenv import load_dotenv
+import colorama
+from colorama import Fore, Style
+
+# Utilitaires partagés avec le dashboard (streamlit_app/utils)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'streamlit_app'))
+from utils.alert_engine import device_series
+from utils.dnac_api import get_dnac_client
+from utils.metrics_exporter import (
+    MetricsRegistry, describe_default_metrics, start_metrics_server,
+    update_from_dnac, update_from_snmp, update_from_vpn
+)
+from utils.prefix_index import get_prefix_index
+from utils.snmp_collector import get_snmp_agents, get_snmp_collector
+from utils.timeseries_store import get_timeseries_store, health_snapshot_metrics
+from utils.vpn_checker import VPNChecker
+
+colorama.init()
+
+
+def collect(registry, checker, dnac_client, snmp_agents=None, store=None):
+    """
+    Collecter un instantané complet et mettre à jour le registre
+
+    Les scrapes lisent uniquement le registre: une collecte lente ou en
+    échec ne bloque jamais l'exposition du dernier instantané connu. Les
+    compteurs IPsec et l'accessibilité des équipements DNA Center sont aussi
+    historisés dans 'store' (graphiques du dashboard, disponibilité des
+    rapports).
+    """
+    started = time.time()
+
+    try:
+        summary = checker.get_vpn_summary()
+        sa_details = {
+            'hq_router': checker.get_sa_details(checker.hq_router_ip),
+            'branch_router': checker.get_sa_details(checker.branch_router_ip)
+        }
+        update_from_vpn(registry, summary, sa_details, ts=started)
+        if store is not None:
+            store.record_snapshot(health_snapshot_metrics(vpn_summary=summary), started)
+    except Exception as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Collecte VPN: {str(e)}")
+
+    if dnac_client:
+        try:
+            devices = dnac_client.get_network_devices()
+            if devices:
+                # Index de préfixes complété par l'inventaire (sondes des cycles suivants)
+                get_prefix_index(devices)
+                if store is not None:
+                    store.record_snapshot(device_series(devices), started)
+            update_from_dnac(
+                registry,
+                devices=devices,
+                network_health=dnac_client.get_network_health(),
+                client_health=dnac_client.get_client_health()
+            )
+        except Exception as e:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Collecte DNA Center: {str(e)}")
+
+    if snmp_agents:
+        try:
+            update_from_snmp(registry, get_snmp_collector().run_sync(snmp_agents))
+        except Exception as e:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Collecte SNMP: {str(e)}")
+
+    registry.mark_updated(started)
+    return time.time() - started
+
+
+def main():
+    """Fonction principale"""
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}    EXPORTEUR DE MÉTRIQUES VPN-DNAC{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.env'))
+
+    host = os.getenv('EXPORTER_HOST', '0.0.0.0')
+    port = int(os.getenv('EXPORTER_PORT', '9464'))
+    interval = float(os.getenv('EXPORTER_INTERVAL', '30'))
+
+    registry = MetricsRegistry()
+    describe_default_metrics(registry)
+    server = start_metrics_server(registry, host, port)
+    print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} Exposition sur http://{host}:{port}/metrics")
+
+    checker = VPNChecker()
+    store = get_timeseries_store()
+    snmp_agents = get_snmp_agents()
+    if snmp_agents:
+        print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} Compteurs SNMP de {len(snmp_agents)} agents")
+    dnac_client = get_dnac_client()
+    if not dnac_client:
+        print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} DNA Center indisponible: métriques VPN uniquement")
+
+    try:
+        while True:
+            duration = collect(registry, checker, dnac_client, snmp_agents, store)
+            print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} Instantané collecté en {duration:.2f}s "
+                  f"({registry.series_count} séries)")
+            time.sleep(max(0.0, interval - duration))
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Arrêt de l'exporteur")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Sondes de MTU de chemin
+Description: Recherche concurrente du MTU de chemin entre couples de sites par sondes ICMP avec bit DF, comparaison au MTU du tunnel et risque de fragmentation
+"""
+
+import argparse
+import json
+import os
+import sys
+from dotenv import load_dotenv
+import colorama
+from colorama import Fore, Style
+
+# Utilitaires partagés avec le dashboard (streamlit_app/utils)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'streamlit_app'))
+from utils.probe_engine import DEFAULT_TUNNEL_OVERHEAD, get_mtu_targets, get_probe_engine, parse_mtu_pairs
+
+colorama.init()
+
+STATUS_COLORS = {'ok': Fore.GREEN, 'fragmentation': Fore.YELLOW, 'unknown': Fore.BLUE}
+
+
+def print_results(results):
+    """Afficher les MTU mesurés et le risque de fragmentation"""
+    print(f"{'Couple':<28} {'MTU chemin':>10} {'Annoncé':>8} {'Requis':>7} {'Marge':>6} "
+          f"{'Sondes':>6} {'Tours':>5} {'Durée':>8}  État")
+    for result in results:
+        color = STATUS_COLORS.get(result['status'], Fore.RED)
+        status = result['status']
+        if result['status'] == 'fragmentation':
+            status += (f" (ip mtu {result['recommended_mtu']}, "
+                       f"ip tcp adjust-mss {result['recommended_mss']})")
+        elif result.get('error'):
+            status += f" ({result['error']})"
+        print(f"{result['name']:<28} {result['path_mtu'] or '-':>10} {result['reported_mtu'] or '-':>8} "
+              f"{result['required_mtu'] or '-':>7} {result['margin'] if result['margin'] is not None else '-':>6} "
+              f"{result['probes']:>6} {result['rounds']:>5} {result['duration_ms']:>6.0f}ms  "
+              f"{color}{status}{Style.RESET_ALL}")
+
+
+def main():
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Recherche du MTU de chemin entre sites (sondes DF)")
+    parser.add_argument('--pairs', help="Couples '[nom=]source>destination[@netns]' séparés par des virgules "
+                                        "(PROBE_MTU_PAIRS par défaut)")
+    parser.add_argument('--tunnel-mtu', type=int, help="MTU du tunnel (PROBE_TUNNEL_MTU)")
+    parser.add_argument('--overhead', type=int, help="Surcoût d'encapsulation, 0 pour un chemin dans le tunnel "
+                                                     "(PROBE_TUNNEL_OVERHEAD)")
+    parser.add_argument('--min', type=int, dest='mtu_min', help="Plus petit paquet sondé (PROBE_MTU_MIN)")
+    parser.add_argument('--max', type=int, dest='mtu_max', help="Plus grand paquet sondé (PROBE_MTU_MAX)")
+    parser.add_argument('--method', choices=['auto', 'socket', 'ping'], help="Émission des sondes ICMP")
+    parser.add_argument('--json', action='store_true', help="Résultats en JSON sur stdout")
+    args = parser.parse_args()
+
+    if not args.json:
+        print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+        print(f"{Fore.CYAN}    MTU DE CHEMIN ENTRE SITES{Style.RESET_ALL}")
+        print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.env'))
+    tunnel_mtu = args.tunnel_mtu or int(os.getenv('PROBE_TUNNEL_MTU', '1400'))
+    overhead = args.overhead if args.overhead is not None else \
+        int(os.getenv('PROBE_TUNNEL_OVERHEAD', str(DEFAULT_TUNNEL_OVERHEAD)))
+
+    try:
+        if args.pairs:
+            targets = parse_mtu_pairs(args.pairs, tunnel_mtu, overhead)
+        else:
+            targets = [dict(target, tunnel_mtu=tunnel_mtu, overhead=overhead) for target in get_mtu_targets()]
+    except ValueError as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {str(e)}")
+        sys.exit(1)
+    if not targets:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Aucun couple: renseigner PROBE_MTU_PAIRS ou --pairs")
+        sys.exit(1)
+
+    engine = get_probe_engine()
+    engine.mtu_min = args.mtu_min or engine.mtu_min
+    engine.mtu_max = args.mtu_max or engine.mtu_max
+    engine.icmp_method = args.method or engine.icmp_method
+
+    try:
+        results = engine.run_pmtu_sync(targets)
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Sondes interrompues")
+        sys.exit(1)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} {len(targets)} couples, MTU tunnel {tunnel_mtu} "
+              f"+ {overhead} octets d'encapsulation, recherche {engine.mtu_min}-{engine.mtu_max}")
+        print_results(results)
+
+    at_risk = [result for result in results if result['status'] == 'fragmentation']
+    if at_risk and not args.json:
+        print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} {len(at_risk)} couples avec risque de fragmentation")
+    # Code de retour exploitable en supervision: 2 si un chemin ne porte pas le MTU du tunnel
+    sys.exit(2 if at_risk else 0)
+
+
+if __name__ == "__main__":
+    main()
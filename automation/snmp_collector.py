@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Collecteur SNMP des interfaces tunnel
+Description: Interrogation périodique GETBULK des agents SNMP (IF-MIB/IP-MIB), débits historisés pour le dashboard, simulateur d'agents pour les essais
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from dotenv import load_dotenv
+import colorama
+from colorama import Fore, Style
+
+# Utilitaires partagés avec le dashboard (streamlit_app/utils)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'streamlit_app'))
+from utils.snmp_collector import (
+    CounterRates, get_snmp_agents, get_snmp_collector, interface_capacities, interface_rates,
+    parse_agents, record_interface_rates, start_simulators, wan_counters
+)
+from utils.anomaly_detector import AnomalyLog, get_anomaly_detector, get_anomaly_file, rate_series
+from utils.capacity_forecast import get_capacity_forecaster, refresh_capacity_forecast
+from utils.parquet_export import get_parquet_exporter, parquet_export_enabled, tunnel_metric_rows
+from utils.ring_buffer import get_live_cache
+from utils.timeseries_store import get_timeseries_store
+
+colorama.init()
+
+
+def print_tunnels(results):
+    """Afficher les interfaces tunnel collectées"""
+    print(f"{'Agent':<24} {'Interface':<12} {'Adresse':<16} {'État':<10} {'MTU':>6} "
+          f"{'Octets reçus':>16} {'Octets émis':>16}")
+    for result in results:
+        if result['status'] != 'ok':
+            print(f"{result['agent']:<24} {Fore.RED}{result['error']}{Style.RESET_ALL}")
+            continue
+        for row in result['interfaces']:
+            state = f"{row['status']}/{row['line_protocol']}"
+            print(f"{row['agent']:<24} {row['interface']:<12} {row['ip_address'] or '-':<16} {state:<10} "
+                  f"{row['mtu'] or '-':>6} {row['bytes_input'] or 0:>16} {row['bytes_output'] or 0:>16}")
+
+
+def print_anomalies(anomalies, limit=10):
+    """Afficher les anomalies détectées sur un lot"""
+    for anomaly in anomalies[:limit]:
+        label = 'CHUTE' if anomaly['kind'] == 'drop' else 'PIC'
+        print(f"{Fore.YELLOW}[{label}]{Style.RESET_ALL} {anomaly['series']}: {anomaly['value']:.0f} "
+              f"(attendu {anomaly['expected']:.0f}, z={anomaly['zscore']})")
+    if len(anomalies) > limit:
+        print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} {len(anomalies) - limit} autres anomalies")
+
+
+def poll_forever(collector, agents, interval):
+    """
+    Collecter toutes les 'interval' secondes, historiser les débits (cache
+    temps réel partagé avec le dashboard, et export Parquet si activé);
+    prévision de capacité rafraîchie à chaque heure
+    """
+    rates = CounterRates()
+    store = get_timeseries_store()
+    live_cache = get_live_cache()
+    exporter = get_parquet_exporter() if parquet_export_enabled() else None
+    detector = get_anomaly_detector()
+    anomaly_log = AnomalyLog(get_anomaly_file())
+    forecaster = get_capacity_forecaster()
+    forecast_hour = None
+    while True:
+        started = time.time()
+        results = collector.run_sync(agents)
+        keys, rx_bps, tx_bps, _ = interface_rates(results, rates)
+        capacities = interface_capacities([row for result in results for row in result['interfaces']], keys)
+        recorded = record_interface_rates(keys, rx_bps, tx_bps, started, live_cache=live_cache, store=store,
+                                          capacity_bps=capacities)
+        # Compteurs Internet (SNMP_WAN_INTERFACES) pour les graphiques de trafic du dashboard
+        store.record_snapshot(wan_counters(results), started)
+        if exporter is not None:
+            exporter.export('tunnel_metrics', tunnel_metric_rows(results, keys, rx_bps, tx_bps), started)
+        if keys:
+            anomalies = detector.update(*rate_series(keys, rx_bps, tx_bps), started)
+            anomaly_log.add(anomalies)
+            print_anomalies(anomalies)
+        stats = collector.stats
+        color = Fore.YELLOW if stats['errors'] else Fore.BLUE
+        print(f"{color}[INFO]{Style.RESET_ALL} {stats['agents'] - stats['errors']}/{stats['agents']} agents, "
+              f"{len(keys)} tunnels, {stats['oids']} OID en {stats['duration_s']:.2f}s "
+              f"({stats['oids_per_s']:.0f} OID/s, {stats['timeouts']} délais dépassés), "
+              f"{recorded} débits historisés")
+        if started // 3600 != forecast_hour:
+            forecast_hour = started // 3600
+            hours = refresh_capacity_forecast(forecaster, store)
+            if hours:
+                print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} Prévision de capacité: {hours} heures intégrées, "
+                      f"{len(forecaster)} séries")
+        time.sleep(max(0.0, interval - (time.time() - started)))
+
+
+async def run_simulators(count, base_port, interfaces, tunnels, community):
+    """Servir des agents simulés jusqu'à interruption"""
+    transports = await start_simulators(count, base_port=base_port, interfaces=interfaces,
+                                        tunnels=tunnels, community=community)
+    print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} {count} agents simulés sur 127.0.0.1:{base_port}-"
+          f"{base_port + count - 1} ({interfaces} interfaces dont {tunnels} tunnels)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for transport in transports:
+            transport.close()
+
+
+def main():
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Collecte SNMP des compteurs d'interfaces tunnel")
+    parser.add_argument('--agents', help="Agents hôte[:port[-port_final]] séparés par des virgules "
+                                         "(SNMP_AGENTS par défaut)")
+    parser.add_argument('--interval', type=float, help="Intervalle de collecte en secondes (SNMP_INTERVAL)")
+    parser.add_argument('--once', action='store_true', help="Une seule collecte, affichée en tableau")
+    parser.add_argument('--simulate', type=int, metavar='N', help="Servir N agents simulés au lieu de collecter")
+    parser.add_argument('--base-port', type=int, default=16100, help="Premier port des agents simulés")
+    parser.add_argument('--interfaces', type=int, default=8, help="Interfaces par agent simulé")
+    parser.add_argument('--tunnels', type=int, default=2, help="Interfaces tunnel par agent simulé")
+    args = parser.parse_args()
+
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}    COLLECTEUR SNMP TUNNELS VPN{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.env'))
+    community = os.getenv('SNMP_COMMUNITY', 'public')
+
+    try:
+        if args.simulate:
+            asyncio.run(run_simulators(args.simulate, args.base_port, args.interfaces, args.tunnels, community))
+            return
+
+        agents = parse_agents(args.agents) if args.agents else get_snmp_agents()
+        if not agents:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Aucun agent: renseigner SNMP_AGENTS ou --agents")
+            sys.exit(1)
+        collector = get_snmp_collector()
+        print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} {len(agents)} agents, {collector.concurrency} en parallèle")
+
+        if args.once:
+            results = collector.run_sync(agents)
+            print_tunnels(results)
+            stats = collector.stats
+            print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} {stats['oids']} OID en {stats['duration_s']:.2f}s "
+                  f"({stats['oids_per_s']:.0f} OID/s)")
+            return
+
+        poll_forever(collector, agents, args.interval or float(os.getenv('SNMP_INTERVAL', '10')))
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Arrêt du collecteur")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Récepteur syslog des événements tunnel
+Description: Mise à jour événementielle de l'état des tunnels (%CRYPTO, %IKEV2, %LINEPROTO-5-UPDOWN) à la place du sondage
+"""
+
+import asyncio
+import os
+import sys
+import time
+from dotenv import load_dotenv
+import colorama
+from colorama import Fore, Style
+
+# Utilitaires partagés avec le dashboard (streamlit_app/utils)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'streamlit_app'))
+from utils.alert_engine import get_alert_engine
+from utils.syslog_receiver import get_syslog_receiver
+from utils.timeseries_store import get_timeseries_store
+
+colorama.init()
+
+
+def print_alert_events(events):
+    """Afficher les alertes déclenchées ou résolues"""
+    for event in events:
+        alert = event['alert']
+        if event['event'] == 'firing':
+            color = Fore.RED if alert['severity'] == 'error' else Fore.YELLOW
+            print(f"{color}[ALERTE]{Style.RESET_ALL} {alert['summary']}")
+        elif event['event'] == 'resolved':
+            print(f"{Fore.GREEN}[RÉSOLU]{Style.RESET_ALL} {alert['summary']}")
+
+
+def make_listener(receiver, store, engine):
+    """
+    Écouteur appelé une fois par lot: affichage des changements d'état,
+    historisation et évaluation des alertes (changements uniquement)
+    """
+    def on_batch(changes, events):
+        if not changes:
+            return
+        for entry in changes:
+            color = Fore.GREEN if entry['state'] == 'up' else Fore.RED
+            print(f"{color}[{entry['state'].upper():>4}]{Style.RESET_ALL} {entry['device']} {entry['object']} "
+                  f"({entry['kind']}, {entry['last_mnemonic']})")
+        series = receiver.store.series(changes)
+        ts = max(entry['since'] for entry in changes)
+        store.record_snapshot(series, ts)
+        print_alert_events(engine.ingest(series, ts))
+    return on_batch
+
+
+async def tick_alerts(engine, receiver, interval=1.0, report_every=60):
+    """Réévaluer les durées des alertes et afficher le débit périodiquement"""
+    last_report = time.monotonic()
+    last_received = 0
+    while True:
+        await asyncio.sleep(interval)
+        print_alert_events(engine.tick(time.time()))
+        now = time.monotonic()
+        if now - last_report >= report_every:
+            stats = receiver.stats
+            rate = (stats['received'] - last_received) / (now - last_report)
+            print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} {rate:.0f} msg/s, {stats['events']} événements, "
+                  f"{len(receiver.store)} objets suivis, dernier lot {stats['last_batch']} messages "
+                  f"en {stats['last_flush_ms']:.1f} ms")
+            last_report, last_received = now, stats['received']
+
+
+async def run(receiver, host, udp_port, tcp_port):
+    engine = get_alert_engine()
+    receiver.add_listener(make_listener(receiver, get_timeseries_store(), engine))
+
+    def ready():
+        print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} Écoute syslog sur {host} "
+              f"(UDP {udp_port or '-'}, TCP {tcp_port or '-'})")
+
+    await asyncio.gather(receiver.serve(host, udp_port, tcp_port, ready=ready), tick_alerts(engine, receiver))
+
+
+def main():
+    """Fonction principale"""
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}    RÉCEPTEUR SYSLOG TUNNELS VPN{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.env'))
+
+    host = os.getenv('SYSLOG_HOST', '0.0.0.0')
+    udp_port = int(os.getenv('SYSLOG_UDP_PORT', '5514'))
+    tcp_port = int(os.getenv('SYSLOG_TCP_PORT', '5514'))
+
+    receiver = get_syslog_receiver()
+    print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} État des tunnels: {receiver.state_file}")
+
+    try:
+        asyncio.run(run(receiver, host, udp_port, tcp_port))
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Arrêt du récepteur")
+    except OSError as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Ouverture des ports syslog: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
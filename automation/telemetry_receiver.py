@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Récepteur de télémétrie model-driven
+Description: Réception des flux dial-out IOS-XE (TCP, encodage JSON) des compteurs tunnel et crypto, débits historisés pour le dashboard, client de rejeu à la place des routeurs
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from dotenv import load_dotenv
+import colorama
+from colorama import Fore, Style
+
+# Utilitaires partagés avec le dashboard (streamlit_app/utils)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'streamlit_app'))
+from utils.anomaly_detector import AnomalyLog, get_anomaly_detector, get_anomaly_file, rate_series
+from utils.capacity_forecast import get_capacity_forecaster, refresh_capacity_forecast
+from utils.parquet_export import get_parquet_exporter, parquet_export_enabled, tunnel_metric_rows
+from utils.ring_buffer import get_live_cache
+from utils.snmp_collector import interface_capacities, record_interface_rates
+from utils.telemetry_receiver import get_telemetry_receiver, load_replay_file, replay, synthetic_messages
+from utils.timeseries_store import get_timeseries_store
+
+colorama.init()
+
+
+def make_listener(store, latest, detector, anomaly_log, live_cache=None):
+    """
+    Écouteur appelé une fois par lot: historisation des débits tunnel (derniers
+    débits dans 'latest', cache temps réel partagé avec le dashboard) et
+    détection d'anomalies sur les tunnels du lot
+    """
+    def on_batch(interfaces, rates):
+        keys, rx_bps, tx_bps, timestamps = rates
+        if keys:
+            ts = float(timestamps.max())
+            record_interface_rates(keys, rx_bps, tx_bps, ts, live_cache=live_cache, store=store,
+                                   capacity_bps=interface_capacities(interfaces, keys))
+            latest.update(zip(keys, zip(rx_bps.tolist(), tx_bps.tolist())))
+            anomalies = detector.update(*rate_series(keys, rx_bps, tx_bps), ts)
+            anomaly_log.add(anomalies)
+            for anomaly in anomalies[:10]:
+                label = 'CHUTE' if anomaly['kind'] == 'drop' else 'PIC'
+                print(f"{Fore.YELLOW}[{label}]{Style.RESET_ALL} {anomaly['series']}: {anomaly['value']:.0f} "
+                      f"(attendu {anomaly['expected']:.0f}, z={anomaly['zscore']})")
+    return on_batch
+
+
+def export_tunnels(exporter, receiver, rates):
+    """Instantané des interfaces tunnel reçues vers le jeu Parquet analytique"""
+    nodes = receiver.state.snapshot()
+    results = [{'address': node['address'], 'interfaces': list(node['interfaces'].values())}
+               for node in nodes.values()]
+    keys = list(rates)
+    rows = tunnel_metric_rows(results, keys, [rates[key][0] for key in keys], [rates[key][1] for key in keys],
+                              source='telemetry')
+    if rows:
+        exporter.export('tunnel_metrics', rows)
+
+
+async def report(receiver, interval=60, exporter=None, rates=None, store=None, forecaster=None):
+    """
+    Afficher le débit de décodage périodiquement (et exporter les tunnels en
+    Parquet si activé); prévision de capacité rafraîchie à chaque heure, hors
+    de la boucle d'événements
+    """
+    last_report = time.monotonic()
+    last_frames = 0
+    forecast_hour = None
+    while True:
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        stats = receiver.stats
+        rate = (stats['frames'] - last_frames) / (now - last_report)
+        color = Fore.YELLOW if stats['pauses'] else Fore.BLUE
+        print(f"{color}[INFO]{Style.RESET_ALL} {rate:.0f} messages/s, {stats['connections']} connexions, "
+              f"{len(receiver.state.nodes)} routeurs, {stats['rejected']} rejetés, "
+              f"{stats['pauses']} suspensions de lecture, dernier lot {stats['last_batch']} messages "
+              f"en {stats['last_decode_ms']:.1f} ms")
+        last_report, last_frames = now, stats['frames']
+        if exporter is not None:
+            export_tunnels(exporter, receiver, rates)
+        if forecaster is not None and time.time() // 3600 != forecast_hour:
+            forecast_hour = time.time() // 3600
+            hours = await asyncio.to_thread(refresh_capacity_forecast, forecaster, store)
+            if hours:
+                print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} Prévision de capacité: {hours} heures intégrées, "
+                      f"{len(forecaster)} séries")
+
+
+async def run(receiver, host, port):
+    latest = {}
+    store = get_timeseries_store()
+    receiver.add_listener(make_listener(store, latest, get_anomaly_detector(), AnomalyLog(get_anomaly_file()),
+                                        get_live_cache()))
+    exporter = get_parquet_exporter() if parquet_export_enabled() else None
+
+    def ready():
+        print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} Écoute dial-out sur {host}:{port} (TCP, JSON)")
+
+    await asyncio.gather(
+        receiver.serve(host, port, ready=ready),
+        report(receiver, exporter=exporter, rates=latest, store=store, forecaster=get_capacity_forecaster())
+    )
+
+
+def run_replay(host, port, path, nodes, count, interval, rate, connections):
+    """Rejouer un enregistrement ou des flux synthétiques vers le récepteur"""
+    if path:
+        messages = load_replay_file(path)
+    else:
+        start = time.time()
+        messages = [message for i in range(nodes)
+                    for message in synthetic_messages(f"router-{i:04d}", count, interval, start=start)]
+        # Ordre chronologique: les intervalles de tous les routeurs s'entrelacent
+        messages.sort(key=lambda message: message['msg_timestamp'])
+    result = asyncio.run(replay(host, port, messages, rate=rate, connections=connections))
+    print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} {result['messages']} messages "
+          f"({result['bytes'] / 1e6:.1f} Mo) rejoués en {result['duration_s']:.2f}s "
+          f"({result['messages'] / max(result['duration_s'], 1e-9):.0f} messages/s)")
+
+
+def main():
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Réception de la télémétrie dial-out des tunnels")
+    parser.add_argument('--replay', nargs='?', const='', metavar='FICHIER',
+                        help="Rejouer un enregistrement JSON lines (ou des flux synthétiques sans fichier)")
+    parser.add_argument('--host', help="Adresse d'écoute, ou du récepteur en rejeu (TELEMETRY_HOST)")
+    parser.add_argument('--port', type=int, help="Port TCP (TELEMETRY_PORT)")
+    parser.add_argument('--nodes', type=int, default=2, help="Routeurs simulés en rejeu synthétique")
+    parser.add_argument('--count', type=int, default=10, help="Intervalles par routeur en rejeu synthétique")
+    parser.add_argument('--interval', type=float, default=5.0, help="Écart entre intervalles simulés (secondes)")
+    parser.add_argument('--rate', type=float, default=0.0, help="Messages par seconde en rejeu (0 = au plus vite)")
+    parser.add_argument('--connections', type=int, default=1, help="Connexions parallèles en rejeu")
+    args = parser.parse_args()
+
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}    RÉCEPTEUR TÉLÉMÉTRIE TUNNELS VPN{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.env'))
+    port = args.port or int(os.getenv('TELEMETRY_PORT', '57000'))
+
+    try:
+        if args.replay is not None:
+            run_replay(args.host or '127.0.0.1', port, args.replay, args.nodes, args.count,
+                       args.interval, args.rate, args.connections)
+            return
+
+        host = args.host or os.getenv('TELEMETRY_HOST', '0.0.0.0')
+        receiver = get_telemetry_receiver()
+        print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} État de télémétrie: {receiver.state_file}")
+        asyncio.run(run(receiver, host, port))
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Arrêt du récepteur")
+    except OSError as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Connexion dial-out: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/bin/bash
+
+# Script de laboratoire MTU de chemin
+# Description: Trois namespaces réseau reliés par des paires veth (HQ - WAN - Branch), lien WAN -> Branch à MTU réduit, pour essayer la recherche de MTU de chemin sans routeurs
+
+set -e
+
+# Couleurs pour l'affichage
+RED='\033[0;31m'
+GREEN='\033[0;32m'
+YELLOW='\033[1;33m'
+BLUE='\033[0;34m'
+NC='\033[0m' # No Color
+
+# Fonction d'affichage avec couleur
+print_status() {
+    echo -e "${BLUE}[INFO]${NC} $1"
+}
+
+print_success() {
+    echo -e "${GREEN}[SUCCESS]${NC} $1"
+}
+
+print_warning() {
+    echo -e "${YELLOW}[WARNING]${NC} $1"
+}
+
+print_error() {
+    echo -e "${RED}[ERROR]${NC} $1"
+}
+
+# MTU du lien contraint (ex: 1400 pour un chemin qui ne passe pas 1400 + 78 octets ESP)
+WAN_MTU=${WAN_MTU:-1400}
+NS_HQ=pmtu-hq
+NS_WAN=pmtu-wan
+NS_BRANCH=pmtu-branch
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+# Vérifier les droits (création de namespaces)
+check_root() {
+    if [ "$(id -u)" -ne 0 ]; then
+        print_error "Ce script doit être exécuté en root (ip netns)"
+        exit 1
+    fi
+}
+
+# Créer les namespaces et les liens veth
+lab_up() {
+    print_status "Création des namespaces $NS_HQ, $NS_WAN, $NS_BRANCH..."
+
+    for ns in $NS_HQ $NS_WAN $NS_BRANCH; do
+        ip netns add $ns
+        ip -n $ns link set lo up
+        # Sockets ICMP non privilégiées pour les sondes
+        ip netns exec $ns sysctl -qw net.ipv4.ping_group_range="0 2147483647"
+    done
+
+    # HQ <-> WAN: MTU 1500
+    ip link add hq0 netns $NS_HQ type veth peer name wan0 netns $NS_WAN
+    ip -n $NS_HQ addr add 10.255.1.1/30 dev hq0
+    ip -n $NS_WAN addr add 10.255.1.2/30 dev wan0
+
+    # WAN <-> Branch: MTU réduit
+    ip link add wan1 netns $NS_WAN mtu $WAN_MTU type veth peer name br0 netns $NS_BRANCH mtu $WAN_MTU
+    ip -n $NS_WAN addr add 10.255.2.1/30 dev wan1
+    ip -n $NS_BRANCH addr add 10.255.2.2/30 dev br0
+
+    ip -n $NS_HQ link set hq0 up
+    ip -n $NS_WAN link set wan0 up
+    ip -n $NS_WAN link set wan1 up
+    ip -n $NS_BRANCH link set br0 up
+
+    ip -n $NS_HQ route add default via 10.255.1.2
+    ip -n $NS_BRANCH route add default via 10.255.2.1
+    ip netns exec $NS_WAN sysctl -qw net.ipv4.ip_forward=1
+
+    print_success "Laboratoire prêt: 10.255.1.1 ($NS_HQ) -> 10.255.2.2 ($NS_BRANCH), lien WAN à MTU $WAN_MTU"
+}
+
+# Supprimer les namespaces (les paires veth disparaissent avec eux)
+lab_down() {
+    print_status "Suppression des namespaces..."
+    for ns in $NS_HQ $NS_WAN $NS_BRANCH; do
+        ip netns del $ns 2>/dev/null || true
+    done
+    print_success "Laboratoire supprimé"
+}
+
+# Sonder le chemin HQ -> Branch depuis le namespace HQ
+lab_test() {
+    print_status "Recherche du MTU de chemin HQ -> Branch..."
+    ip netns exec $NS_HQ python3 "$SCRIPT_DIR/../automation/pmtu_probe.py" \
+        --pairs "lab=10.255.1.1>10.255.2.2" "$@"
+}
+
+main() {
+    check_root
+    case "$1" in
+        up)
+            lab_up
+            ;;
+        down)
+            lab_down
+            ;;
+        test)
+            shift
+            lab_test "$@"
+            ;;
+        *)
+            echo "Usage: $0 {up|down|test [options pmtu_probe.py]}"
+            echo "  WAN_MTU=1400 $0 up   # MTU du lien WAN -> Branch"
+            exit 1
+            ;;
+    esac
+}
+
+main "$@"
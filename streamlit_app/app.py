@@ -12,9 +12,23 @@ from datetime import datetime, timedelta
 import json
 import os
 import sys
+from contextlib import nullcontext
 import requests
+import numpy as np
 from dotenv import load_dotenv
 
+from utils.alert_engine import device_series, get_alert_engine
+from utils.anomaly_detector import get_anomaly_detector, load_anomalies, series_matrix
+from utils.capacity_forecast import get_capacity_forecaster, refresh_capacity_forecast, tunnel_forecasts
+from utils.dnac_api import get_dnac_client
+from utils.figure_cache import cached_figure, data_version
+from utils.latency_sketch import get_latency_sketches
+from utils.rekey_analyzer import get_rekey_analyzer, sa_lifetimes
+from utils.render_profiler import RenderProfiler, instrument_streamlit, profile_section
+from utils.timeseries_store import get_timeseries_store
+from utils.topology import get_topology, refresh_topology
+from utils.vpn_checker import VPNChecker, describe_connectivity
+
 # Configuration de la page
 st.set_page_config(
     page_title="VPN-DNAC Dashboard",
@@ -102,24 +116,130 @@ def get_network_data():
         'traffic_data': generate_traffic_data()
     }
 
+# Stockage de l'historique des métriques (partagé entre les sessions)
+@st.cache_resource
+def get_store():
+    """Ouvrir le stockage de séries temporelles"""
+    return get_timeseries_store()
+
+def load_counter_history(metric, start, end=None, resolution='1h'):
+    """
+    Lire l'historique d'un compteur cumulatif et le convertir en volume par intervalle
+    
+    Returns:
+        tuple: (timestamps, volumes en MB) ou None si l'historique est insuffisant
+    """
+    end_ts = end.timestamp() if end else None
+    timestamps, counters = get_store().query(metric, start.timestamp(), end_ts, resolution=resolution, agg='max')
+    if len(timestamps) < 2:
+        return None
+    # Un compteur qui diminue correspond à une remise à zéro: on ignore l'intervalle
+    volumes = np.maximum(np.diff(counters), 0) / (1024 * 1024)
+    return [datetime.fromtimestamp(ts) for ts in timestamps[1:]], volumes
+
+def load_metric_history(metric, start, end=None, resolution='auto'):
+    """
+    Lire l'historique d'une métrique
+    
+    Returns:
+        tuple: (timestamps, valeurs) ou None si aucune donnée
+    """
+    end_ts = end.timestamp() if end else None
+    timestamps, values = get_store().query(metric, start.timestamp(), end_ts, resolution=resolution)
+    if not len(timestamps):
+        return None
+    return [datetime.fromtimestamp(ts) for ts in timestamps], values
+
+@st.cache_data(ttl=60)
+def detect_anomalies(start_ts, end_ts):
+    """
+    Anomalies des débits tunnel et des scores de santé historisés sur une période
+    
+    Toutes les séries sont évaluées ensemble (détecteur vectorisé), à la minute
+    sur deux jours au plus, à l'heure au-delà.
+    
+    Returns:
+        list: Anomalies (voir AnomalyDetector.scan), les plus récentes d'abord
+    """
+    store = get_store()
+    metrics = [
+        metric for metric in store.metrics()
+        if metric.endswith(('.rx_bps', '.tx_bps')) or metric.startswith(('network_health.', 'client_health.'))
+    ]
+    if not metrics:
+        return []
+    resolution = '1m' if end_ts - start_ts <= 2 * 86400 else '1h'
+    grid, matrix = series_matrix(store, metrics, start_ts, end_ts, resolution)
+    anomalies, _ = get_anomaly_detector().scan(metrics, grid, matrix)
+    return sorted(anomalies, key=lambda a: a['ts'], reverse=True)
+
+@st.cache_resource(max_entries=1)
+def load_forecaster(hour):
+    """
+    Modèle de capacité des tunnels, rechargé une fois par heure ('hour')
+    
+    L'état enregistré par les collecteurs est relu; seules les heures closes
+    qu'il n'a pas encore intégrées sont lues dans l'historique.
+    """
+    forecaster = get_capacity_forecaster()
+    refresh_capacity_forecast(forecaster, get_store())
+    return forecaster
+
+@st.cache_data(ttl=3600)
+def load_capacity_forecast(hour):
+    """
+    Prévision de capacité de tous les tunnels pour l'heure courante
+    
+    Returns:
+        list: Prévisions par tunnel (voir tunnel_forecasts)
+    """
+    return tunnel_forecasts(load_forecaster(hour))
+
+@st.cache_data(ttl=60)
+def load_rekey_analysis(minute):
+    """
+    Calendrier des rekeys IKEv2 / IPsec des routeurs VPN pour la minute courante
+    
+    Returns:
+        tuple: (analyse de RekeyAnalyzer.analyze, largeur d'un intervalle en secondes)
+    """
+    checker = VPNChecker()
+    sa_details = {
+        'HQ-Router': checker.get_sa_details(checker.hq_router_ip),
+        'Branch-Router': checker.get_sa_details(checker.branch_router_ip)
+    }
+    analyzer = get_rekey_analyzer()
+    return analyzer.analyze(sa_lifetimes(sa_details)), analyzer.bin_seconds
+
 def generate_traffic_data():
-    """Générer des données de trafic simulées"""
-    import numpy as np
+    """Construire les données de trafic (historique enregistré, simulation à défaut)"""
     hours = 24
-    timestamps = [datetime.now() - timedelta(hours=h) for h in range(hours, 0, -1)]
-    
-    # Simulation de trafic VPN
-    vpn_traffic = np.random.normal(100, 20, hours)
-    vpn_traffic = np.maximum(vpn_traffic, 0)  # Pas de valeurs négatives
-    
-    # Simulation de trafic Internet
-    internet_traffic = np.random.normal(150, 30, hours)
-    internet_traffic = np.maximum(internet_traffic, 0)
+    start = datetime.now() - timedelta(hours=hours + 1)
+    
+    vpn_history = load_counter_history('vpn.hq_router.bytes_encrypted', start)
+    internet_history = load_counter_history('interface.internet.bytes_out', start)
+    
+    if vpn_history:
+        timestamps, vpn_traffic = vpn_history
+    else:
+        timestamps = [datetime.now() - timedelta(hours=h) for h in range(hours, 0, -1)]
+        # Simulation de trafic VPN
+        vpn_traffic = np.random.normal(100, 20, hours)
+        vpn_traffic = np.maximum(vpn_traffic, 0)  # Pas de valeurs négatives
+    
+    internet_recorded = bool(internet_history) and len(internet_history[1]) == len(timestamps)
+    if internet_recorded:
+        internet_traffic = internet_history[1]
+    else:
+        # Simulation de trafic Internet
+        internet_traffic = np.random.normal(150, 30, len(timestamps))
+        internet_traffic = np.maximum(internet_traffic, 0)
     
     return {
         'timestamps': timestamps,
         'vpn_traffic': vpn_traffic,
-        'internet_traffic': internet_traffic
+        'internet_traffic': internet_traffic,
+        'simulated': not (vpn_history and internet_recorded)
     }
 
 # Fonction principale
@@ -140,17 +260,31 @@ def main():
         ["📊 Dashboard Principal", "🔐 Monitoring VPN", "🤖 DNA Center", "⚙️ Gestion Configs", "📈 Analytics"]
     )
     
+    # Profilage du rendu (opt-in)
+    profiling = st.sidebar.checkbox(
+        "⏱️ Profilage du rendu",
+        value=os.getenv('RENDER_PROFILING', 'false').lower() == 'true'
+    )
+    profiler = RenderProfiler(page)
+    if profiling:
+        instrument_streamlit(st)
+    
     # Affichage de la page sélectionnée
-    if page == "📊 Dashboard Principal":
-        show_dashboard(config)
-    elif page == "🔐 Monitoring VPN":
-        show_vpn_monitoring(config)
-    elif page == "🤖 DNA Center":
-        show_dnac_interface(config)
-    elif page == "⚙️ Gestion Configs":
-        show_config_manager(config)
-    elif page == "📈 Analytics":
-        show_analytics(config)
+    with profiler.run() if profiling else nullcontext():
+        if page == "📊 Dashboard Principal":
+            show_dashboard(config)
+        elif page == "🔐 Monitoring VPN":
+            show_vpn_monitoring(config)
+        elif page == "🤖 DNA Center":
+            show_dnac_interface(config)
+        elif page == "⚙️ Gestion Configs":
+            show_config_manager(config)
+        elif page == "📈 Analytics":
+            show_analytics(config)
+    
+    if profiling:
+        profiler.render_panel(st.sidebar)
+        profiler.log()
 
 def show_dashboard(config):
     """Afficher le dashboard principal"""
@@ -159,8 +293,9 @@ def show_dashboard(config):
     # Métriques principales
     col1, col2, col3, col4 = st.columns(4)
     
-    vpn_status = get_vpn_status()
-    network_data = get_network_data()
+    with profile_section("données", "fetch"):
+        vpn_status = get_vpn_status()
+        network_data = get_network_data()
     
     with col1:
         status_color = "🟢" if vpn_status['tunnel_up'] else "🔴"
@@ -201,49 +336,74 @@ def show_dashboard(config):
     
     traffic_data = network_data['traffic_data']
     
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=traffic_data['timestamps'],
-        y=traffic_data['vpn_traffic'],
-        mode='lines+markers',
-        name='Trafic VPN',
-        line=dict(color='#1f77b4', width=3)
-    ))
-    fig.add_trace(go.Scatter(
-        x=traffic_data['timestamps'],
-        y=traffic_data['internet_traffic'],
-        mode='lines+markers',
-        name='Trafic Internet',
-        line=dict(color='#ff7f0e', width=3)
-    ))
+    def build_traffic_figure():
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=traffic_data['timestamps'],
+            y=traffic_data['vpn_traffic'],
+            mode='lines+markers',
+            name='Trafic VPN',
+            line=dict(color='#1f77b4', width=3)
+        ))
+        fig.add_trace(go.Scatter(
+            x=traffic_data['timestamps'],
+            y=traffic_data['internet_traffic'],
+            mode='lines+markers',
+            name='Trafic Internet',
+            line=dict(color='#ff7f0e', width=3)
+        ))
+        
+        fig.update_layout(
+            title="Trafic Réseau (MB/h)",
+            xaxis_title="Heure",
+            yaxis_title="Trafic (MB)",
+            hovermode='x unified',
+            height=400
+        )
+        return fig
     
-    fig.update_layout(
-        title="Trafic Réseau (MB/h)",
-        xaxis_title="Heure",
-        yaxis_title="Trafic (MB)",
-        hovermode='x unified',
-        height=400
-    )
+    with profile_section("figure trafic", "figure"):
+        version = None if traffic_data['simulated'] else data_version(traffic_data)
+        fig = cached_figure('dashboard.trafic', version, build_traffic_figure)
     
     st.plotly_chart(fig, use_container_width=True)
     
     # Tableau des équipements
     st.subheader("🖥️ État des Équipements")
     
-    devices_df = pd.DataFrame(network_data['devices'])
-    devices_df['Status'] = devices_df['status'].apply(lambda x: f"🟢 {x}" if x == 'active' else f"🔴 {x}")
+    with profile_section("tableau équipements", "dataframe"):
+        devices_df = pd.DataFrame(network_data['devices'])
+        devices_df['Status'] = devices_df['status'].apply(lambda x: f"🟢 {x}" if x == 'active' else f"🔴 {x}")
     
     st.dataframe(
         devices_df[['name', 'type', 'ip', 'Status', 'uptime']],
         use_container_width=True,
         hide_index=True
     )
+    
+    # Alertes actives (règles évaluées sur les seules séries modifiées)
+    st.subheader("🚨 Alertes Actives")
+    
+    with profile_section("alertes"):
+        alert_engine = get_alert_engine()
+        snapshot = device_series(network_data['devices'])
+        snapshot['vpn.up'] = 1 if vpn_status['tunnel_up'] else 0
+        alert_engine.ingest(snapshot)
+        alert_groups = alert_engine.groups()
+    
+    if not alert_groups:
+        st.success("✅ Aucune alerte active")
+    for group in alert_groups:
+        flapping = " (instable)" if group['flapping'] else ""
+        since = datetime.fromtimestamp(group['since']).strftime('%H:%M:%S')
+        getattr(st, group['severity'])(f"{group['summary']}{flapping} - depuis {since}")
 
 def show_vpn_monitoring(config):
     """Afficher le monitoring VPN"""
     st.title("🔐 Monitoring VPN")
     
-    vpn_status = get_vpn_status()
+    with profile_section("données", "fetch"):
+        vpn_status = get_vpn_status()
     
     # État du tunnel
     col1, col2 = st.columns(2)
@@ -274,22 +434,164 @@ def show_vpn_monitoring(config):
     
     st.markdown("---")
     
+    show_capacity_forecast()
+    show_rekey_schedule()
+    
     # Test de connectivité
     st.subheader("🧪 Test de Connectivité")
     
     col1, col2, col3 = st.columns(3)
     
-    with col1:
-        if st.button("🔄 Test HQ → Branch", use_container_width=True):
-            st.success("✅ Ping réussi: 192.168.1.10 → 192.168.2.10 (5ms)")
+    tests = [
+        (col1, "🔄 Test HQ → Branch", "192.168.1.10", "192.168.2.10"),
+        (col2, "🔄 Test Branch → HQ", "192.168.2.10", "192.168.1.10"),
+        (col3, "🔄 Test Tunnel", "10.0.0.1", "10.0.0.2")
+    ]
+    for column, label, source_ip, destination_ip in tests:
+        with column:
+            if st.button(label, use_container_width=True):
+                level, message = describe_connectivity(
+                    VPNChecker().test_connectivity(source_ip, destination_ip)
+                )
+                getattr(st, level)(message)
+    
+    if st.button("📏 MTU de Chemin", use_container_width=True):
+        with st.spinner("Recherche du MTU de chemin (sondes DF)..."):
+            results = VPNChecker().check_path_mtu()
+        for result in results:
+            label = f"{result['name']}: MTU de chemin {result['path_mtu'] or 'N/A'}"
+            if result['status'] == 'ok':
+                st.success(f"✅ {label}, MTU tunnel {result['tunnel_mtu']} + {result['overhead']} octets "
+                           f"d'encapsulation (marge {result['margin']})")
+            elif result['status'] == 'fragmentation':
+                st.warning(f"⚠️ {label} < {result['required_mtu']} requis: risque de fragmentation. "
+                           f"Recommandé: ip mtu {result['recommended_mtu']}, "
+                           f"ip tcp adjust-mss {result['recommended_mss']}")
+            else:
+                st.error(f"❌ {label} ({result.get('error') or result['status']})")
+
+def show_capacity_forecast():
+    """Afficher la prévision de franchissement du seuil d'utilisation des tunnels"""
+    st.subheader("📐 Prévision de Capacité")
+    
+    now = datetime.now().timestamp()
+    with profile_section("prévision capacité", "fetch"):
+        forecasts = load_capacity_forecast(int(now // 3600))
+        forecaster = load_forecaster(int(now // 3600))
+    threshold_pct = forecaster.threshold * 100
+    rated = [entry for entry in forecasts if entry['utilization_pct'] is not None]
+    if not rated:
+        st.info("Historique des débits tunnel et capacités insuffisant (collecte SNMP ou télémétrie)")
+        return
     
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Tunnels suivis", len(rated))
     with col2:
-        if st.button("🔄 Test Branch → HQ", use_container_width=True):
-            st.success("✅ Ping réussi: 192.168.2.10 → 192.168.1.10 (4ms)")
+        st.metric(f"Au-delà de {threshold_pct:.0f}%", sum(entry['utilization_pct'] >= threshold_pct for entry in rated))
+    with col3:
+        st.metric("Seuil atteint sous 30 jours", sum(entry['days_left'] is not None and entry['days_left'] <= 30
+                                                     for entry in rated))
+    
+    forecast_df = pd.DataFrame([{
+        'Tunnel': entry['tunnel'],
+        'Sens': entry['direction'],
+        'Capacité (Mb/s)': entry['capacity_bps'] / 1e6,
+        'Pic prévu (Mb/s)': entry['peak_bps'] / 1e6,
+        'Utilisation (%)': entry['utilization_pct'],
+        'Tendance (kb/s/jour)': entry['trend_bps_per_day'] / 1e3,
+        f'Seuil {threshold_pct:.0f}%': datetime.fromtimestamp(entry['crossing_ts']).strftime('%Y-%m-%d')
+        if entry['crossing_ts'] else '—',
+        'Jours restants': entry['days_left']
+    } for entry in rated])
+    st.dataframe(forecast_df.round(2), use_container_width=True, hide_index=True)
+    
+    selected = st.selectbox("Tunnel", [entry['tunnel'] for entry in rated], key='capacity_tunnel')
+    entry = next(entry for entry in rated if entry['tunnel'] == selected)
+    metric = f"tunnel.{entry['tunnel']}.{entry['direction']}_bps"
+    history = get_store().query(metric, now - 14 * 86400, now, resolution='1h', agg='max')
+    future = np.arange(now // 3600 * 3600, now + 30 * 86400, 3600)
+    predicted = forecaster.predict([metric], future)[0]
+    
+    def build_capacity_figure():
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=[datetime.fromtimestamp(ts) for ts in history[0]], y=history[1] / 1e6,
+                                 mode='lines', name='Pic horaire (Mb/s)', line=dict(color='#1f77b4')))
+        fig.add_trace(go.Scatter(x=[datetime.fromtimestamp(ts) for ts in future], y=predicted / 1e6,
+                                 mode='lines', name='Prévision', line=dict(color='#ff7f0e', dash='dot')))
+        fig.add_hline(y=entry['capacity_bps'] * forecaster.threshold / 1e6, line_dash='dash', line_color='red',
+                      annotation_text=f"{threshold_pct:.0f}% de la capacité")
+        fig.update_layout(title=f"Capacité {entry['tunnel']} ({entry['direction']})", xaxis_title="Date",
+                          yaxis_title="Débit (Mb/s)", height=400)
+        return fig
+    
+    fig = cached_figure('vpn.capacite', data_version(history[0], history[1], predicted), build_capacity_figure,
+                        params={'metric': metric})
+    st.plotly_chart(fig, use_container_width=True)
+
+def show_rekey_schedule():
+    """Afficher les rekeys à venir, les rafales synchronisées et l'échelonnement recommandé"""
+    st.subheader("🔁 Rekeys à Venir")
     
+    with profile_section("calendrier rekeys", "fetch"):
+        analysis, bin_seconds = load_rekey_analysis(int(datetime.now().timestamp() // 60))
+    if not analysis['sas']:
+        st.info("Aucune SA avec durée de vie relevée")
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("SA suivies", analysis['sas'])
+    with col2:
+        st.metric("Rekeys prévus", analysis['events'])
     with col3:
-        if st.button("🔄 Test Tunnel", use_container_width=True):
-            st.success("✅ Tunnel actif: 10.0.0.1 ↔ 10.0.0.2")
+        st.metric(f"Pic par {bin_seconds}s", analysis['peak'])
+    with col4:
+        st.metric("Rafales", len(analysis['clusters']))
+    
+    def build_rekey_figure():
+        times = [datetime.fromtimestamp(ts) for ts in analysis['bins']]
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=times, y=analysis['counts'], name='Actuel', marker_color='#1f77b4'))
+        if analysis['recommendations']:
+            fig.add_trace(go.Scatter(x=times, y=analysis['staggered_counts'], mode='lines',
+                                     name='Après échelonnement', line=dict(color='#2ca02c')))
+        fig.update_layout(title="Rekeys IKEv2 / IPsec à venir", xaxis_title="Heure",
+                          yaxis_title=f"Rekeys par {bin_seconds}s", height=350)
+        return fig
+    
+    fig = cached_figure('vpn.rekeys', data_version(analysis['counts'], analysis['staggered_counts']),
+                        build_rekey_figure)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    if not analysis['clusters']:
+        st.success("✅ Aucune rafale de rekeys synchronisés")
+        return
+    st.warning(f"⚠️ {len(analysis['clusters'])} rafales de rekeys synchronisés: pic par cycle "
+               f"{analysis['peak_cycle']} → {analysis['peak_staggered']} après échelonnement")
+    clusters_df = pd.DataFrame([{
+        'Début': datetime.fromtimestamp(cluster['start']).strftime('%H:%M'),
+        'Fin': datetime.fromtimestamp(cluster['end']).strftime('%H:%M'),
+        'Rekeys': cluster['events'],
+        'Pic': cluster['peak'],
+        'SA': cluster['sas'],
+        'Routeurs': cluster['routers'],
+        'Types': ', '.join(cluster['kinds'])
+    } for cluster in analysis['clusters']])
+    st.dataframe(clusters_df, use_container_width=True, hide_index=True)
+    
+    if analysis['recommendations']:
+        st.markdown("**Durées de vie recommandées**")
+        recommendations_df = pd.DataFrame([{
+            'Routeur': entry['router'],
+            'Type': entry['kind'],
+            'Pair': entry['peer'],
+            'Interface': entry['interface'] or '—',
+            'Actuelle (s)': entry['current_lifetime'],
+            'Recommandée (s)': entry['recommended_lifetime'],
+            'Commande': entry['command']
+        } for entry in analysis['recommendations']])
+        st.dataframe(recommendations_df, use_container_width=True, hide_index=True)
 
 def show_dnac_interface(config):
     """Afficher l'interface DNA Center"""
@@ -302,7 +604,12 @@ def show_dnac_interface(config):
     
     with col1:
         if st.button("🔄 Actualiser", use_container_width=True):
-            st.success("✅ Données actualisées depuis DNA Center")
+            client = get_dnac_client()
+            if client:
+                refresh = refresh_topology(client)
+                st.success(f"✅ Données actualisées depuis DNA Center (topologie: {refresh['source'] or 'inchangée'})")
+            else:
+                st.warning("⚠️ DNA Center indisponible: topologie du lab affichée")
     
     with col2:
         if st.button("🔍 Scanner", use_container_width=True):
@@ -318,7 +625,8 @@ def show_dnac_interface(config):
         {'name': 'Branch-Switch', 'type': 'vIOS-L2', 'ip': '192.168.2.1', 'status': 'Reachable', 'version': '15.2(4)S'}
     ]
     
-    dnac_df = pd.DataFrame(dnac_devices)
+    with profile_section("tableau équipements", "dataframe"):
+        dnac_df = pd.DataFrame(dnac_devices)
     st.dataframe(dnac_df, use_container_width=True, hide_index=True)
     
     # Santé du réseau
@@ -335,6 +643,68 @@ def show_dnac_interface(config):
     for i, (metric, value) in enumerate(health_metrics.items()):
         with cols[i]:
             st.metric(metric, value)
+    
+    # Topologie
+    st.subheader("🗺️ Topologie")
+    show_topology(get_topology())
+
+def build_topology_figure(topology):
+    """Carte de la topologie à partir de la disposition précalculée"""
+    layout = topology.layout()
+    labels = [topology.nodes[n].get('label', n) for n in layout['ids']]
+    kinds = [str(topology.nodes[n].get('kind', 'device')) for n in layout['ids']]
+    # Au-delà de quelques centaines de nœuds: rendu WebGL et libellés au survol uniquement
+    large = len(labels) > 300
+    scatter = go.Scattergl if large else go.Scatter
+    
+    fig = go.Figure()
+    fig.add_trace(scatter(
+        x=layout['edge_x'], y=layout['edge_y'],
+        mode='lines', line=dict(color='#b0bec5', width=1),
+        hoverinfo='skip', showlegend=False
+    ))
+    fig.add_trace(scatter(
+        x=layout['x'], y=layout['y'],
+        mode='markers' if large else 'markers+text',
+        text=labels, textposition='top center',
+        customdata=kinds, hovertemplate='%{text}<br>%{customdata}<extra></extra>',
+        marker=dict(size=6 if large else 18, color=layout['depth'], colorscale='Blues', reversescale=True,
+                    line=dict(color='#0277bd', width=1)),
+        showlegend=False
+    ))
+    fig.update_layout(
+        title=f"Topologie ({len(labels)} équipements)",
+        xaxis=dict(visible=False), yaxis=dict(visible=False, scaleanchor='x'),
+        height=500, margin=dict(l=10, r=10, t=40, b=10)
+    )
+    return fig
+
+def show_topology(topology):
+    """Afficher la carte, les chemins et le rayon d'impact"""
+    with profile_section("figure topologie", "figure"):
+        fig = cached_figure('dnac.topologie', topology.version, lambda: build_topology_figure(topology))
+    st.plotly_chart(fig, use_container_width=True)
+    
+    node_ids = sorted(topology.nodes, key=lambda n: topology.nodes[n].get('label', n))
+    if len(node_ids) < 2:
+        return
+    label = lambda n: topology.nodes[n].get('label', n)
+    col1, col2 = st.columns(2)
+    with col1:
+        source = st.selectbox("Source", node_ids, format_func=label, key='topo_source')
+        target = st.selectbox("Destination", node_ids, index=len(node_ids) - 1, format_func=label, key='topo_target')
+        path = topology.shortest_path(source, target)
+        if path:
+            st.info(" → ".join(label(n) for n in path))
+        else:
+            st.warning("⚠️ Aucun chemin entre ces équipements")
+    with col2:
+        failed = st.selectbox("Panne simulée", node_ids, format_func=label, key='topo_failed')
+        impacted = topology.blast_radius(failed)
+        if impacted:
+            st.error(f"🔴 {len(impacted)} équipement(s) isolé(s): " + ", ".join(label(n) for n in impacted[:20]))
+        else:
+            st.success("✅ Aucun équipement isolé")
 
 def show_config_manager(config):
     """Afficher le gestionnaire de configurations"""
@@ -389,7 +759,8 @@ def show_config_manager(config):
         {'Date': '2024-01-14 16:45', 'Fichier': 'HQ-Switch.cfg', 'Action': 'Configuration VLAN', 'Utilisateur': 'admin'}
     ]
     
-    history_df = pd.DataFrame(history_data)
+    with profile_section("historique", "dataframe"):
+        history_df = pd.DataFrame(history_data)
     st.dataframe(history_df, use_container_width=True, hide_index=True)
 
 def show_analytics(config):
@@ -406,22 +777,33 @@ def show_analytics(config):
     # Graphiques d'analytics
     st.subheader("📊 Performance du Réseau")
     
-    # Simulation de données d'analytics
-    import numpy as np
-    
-    # Graphique de performance
-    days = 7
-    dates = [datetime.now().date() - timedelta(days=d) for d in range(days, 0, -1)]
-    
-    performance_data = np.random.normal(95, 5, days)
-    performance_data = np.clip(performance_data, 80, 100)
-    
-    fig_perf = px.line(
-        x=dates,
-        y=performance_data,
-        title="Performance du Réseau (%)",
-        labels={'x': 'Date', 'y': 'Performance (%)'}
-    )
+    # Graphique de performance (historique enregistré, simulation à défaut)
+    with profile_section("historique performance", "fetch"):
+        period_start = datetime.combine(start_date, datetime.min.time())
+        period_end = datetime.combine(end_date, datetime.max.time())
+        performance_history = load_metric_history('network_health.overallHealthScore', period_start, period_end)
+    
+    simulated = not performance_history
+    if performance_history:
+        dates, performance_data = performance_history
+    else:
+        days = 7
+        dates = [datetime.now().date() - timedelta(days=d) for d in range(days, 0, -1)]
+        
+        performance_data = np.random.normal(95, 5, days)
+        performance_data = np.clip(performance_data, 80, 100)
+    
+    with profile_section("figure performance", "figure"):
+        fig_perf = cached_figure(
+            'analytics.performance',
+            None if simulated else data_version(dates, performance_data),
+            lambda: px.line(
+                x=dates,
+                y=performance_data,
+                title="Performance du Réseau (%)",
+                labels={'x': 'Date', 'y': 'Performance (%)'}
+            )
+        )
     
     st.plotly_chart(fig_perf, use_container_width=True)
     
@@ -432,16 +814,42 @@ def show_analytics(config):
     vpn_traffic = np.random.normal(100, 20, 24)
     internet_traffic = np.random.normal(150, 30, 24)
     
-    fig_traffic = go.Figure()
-    fig_traffic.add_trace(go.Bar(x=traffic_hours, y=vpn_traffic, name='Trafic VPN', marker_color='#1f77b4'))
-    fig_traffic.add_trace(go.Bar(x=traffic_hours, y=internet_traffic, name='Trafic Internet', marker_color='#ff7f0e'))
+    # Moyenne par heure de la journée sur la période sélectionnée
+    recorded = set()
+    with profile_section("historique trafic", "fetch"):
+        for name, metric in (('vpn', 'vpn.hq_router.bytes_encrypted'), ('internet', 'interface.internet.bytes_out')):
+            history = load_counter_history(metric, period_start, period_end)
+            if not history:
+                continue
+            hours_of_day = np.array([ts.hour for ts in history[0]])
+            totals = np.bincount(hours_of_day, weights=history[1], minlength=24)
+            counts = np.bincount(hours_of_day, minlength=24)
+            hourly = np.divide(totals, counts, out=np.zeros(24), where=counts > 0)
+            recorded.add(name)
+            if name == 'vpn':
+                vpn_traffic = hourly
+            else:
+                internet_traffic = hourly
+    
+    def build_hourly_figure():
+        fig_traffic = go.Figure()
+        fig_traffic.add_trace(go.Bar(x=traffic_hours, y=vpn_traffic, name='Trafic VPN', marker_color='#1f77b4'))
+        fig_traffic.add_trace(go.Bar(x=traffic_hours, y=internet_traffic, name='Trafic Internet', marker_color='#ff7f0e'))
+        
+        fig_traffic.update_layout(
+            title="Distribution du Trafic par Heure",
+            xaxis_title="Heure",
+            yaxis_title="Trafic (MB)",
+            barmode='group'
+        )
+        return fig_traffic
     
-    fig_traffic.update_layout(
-        title="Distribution du Trafic par Heure",
-        xaxis_title="Heure",
-        yaxis_title="Trafic (MB)",
-        barmode='group'
-    )
+    with profile_section("figure trafic", "figure"):
+        fig_traffic = cached_figure(
+            'analytics.trafic_horaire',
+            data_version(vpn_traffic, internet_traffic) if recorded == {'vpn', 'internet'} else None,
+            build_hourly_figure
+        )
     
     st.plotly_chart(fig_traffic, use_container_width=True)
     
@@ -461,6 +869,61 @@ def show_analytics(config):
     
     with col4:
         st.metric("Erreurs", "0.1%", "-0.05%")
+    
+    # Percentiles de latence issus des sondes (sketches fusionnés sur la période)
+    with profile_section("sketches latence", "fetch"):
+        sketches = get_latency_sketches().query(start=period_start.timestamp(), end=period_end.timestamp())
+        rtt, jitter = sketches['rtt'].summary(), sketches['jitter'].summary()
+    if rtt['count']:
+        st.subheader("⏱️ Latence des Chemins Sondés")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("RTT p50", f"{rtt['p50']:.1f}ms")
+        
+        with col2:
+            st.metric("RTT p95", f"{rtt['p95']:.1f}ms")
+        
+        with col3:
+            st.metric("RTT p99", f"{rtt['p99']:.1f}ms")
+        
+        with col4:
+            st.metric("Gigue p95", f"{jitter['p95']:.1f}ms" if jitter['count'] else "N/A")
+        
+        st.caption(f"{rtt['count']} mesures sur {len(get_latency_sketches().paths())} chemins")
+    
+    # Anomalies: historique de la période et détections des collecteurs à l'ingestion
+    st.subheader("🚨 Anomalies Détectées")
+    
+    with profile_section("détection anomalies", "fetch"):
+        anomalies = detect_anomalies(period_start.timestamp(), min(period_end.timestamp(), datetime.now().timestamp()))
+        ingested = [a for a in load_anomalies() if period_start.timestamp() <= a['ts'] <= period_end.timestamp()]
+    
+    if not anomalies and not ingested:
+        st.success("✅ Aucune anomalie sur la période")
+    else:
+        with profile_section("tableau anomalies", "dataframe"):
+            anomalies_df = pd.DataFrame(ingested + anomalies).drop_duplicates(['series', 'ts'])
+            # Un épisode par série et par type: premier et dernier point, écart maximal
+            anomalies_df['abs_z'] = anomalies_df['zscore'].abs()
+            episodes = anomalies_df.groupby(['series', 'kind']).agg(
+                début=('ts', 'min'), fin=('ts', 'max'), points=('ts', 'size'),
+                valeur=('value', 'last'), attendu=('expected', 'last'), z_max=('abs_z', 'max')
+            ).reset_index().sort_values('fin', ascending=False)
+            for column in ('début', 'fin'):
+                episodes[column] = episodes[column].map(lambda ts: datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M'))
+            episodes['kind'] = episodes['kind'].map({'drop': '📉 chute', 'spike': '📈 pic'})
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Séries en anomalie", episodes['series'].nunique())
+        with col2:
+            st.metric("Chutes", int((episodes['kind'] == '📉 chute').sum()))
+        with col3:
+            st.metric("Pics", int((episodes['kind'] == '📈 pic').sum()))
+        
+        st.dataframe(episodes.round({'valeur': 1, 'attendu': 1, 'z_max': 1}), use_container_width=True, hide_index=True)
 
 if __name__ == "__main__":
     main()
@@ -9,6 +9,8 @@ import plotly.express as px
 from datetime import datetime, timedelta
 import numpy as np
 
+from utils.figure_cache import cached_figure
+
 def show_dashboard():
     """Afficher le dashboard principal"""
     st.title("📊 Dashboard Principal")
@@ -39,12 +41,17 @@ def show_dashboard():
     memory_usage = np.random.normal(60, 8, 24)
     network_usage = np.random.normal(35, 12, 24)
     
-    fig = px.line(
-        x=hours,
-        y=[cpu_usage, memory_usage, network_usage],
-        title="Utilisation des Ressources (%)",
-        labels={'x': 'Heure', 'y': 'Utilisation (%)'},
-        color_discrete_map={0: 'CPU', 1: 'Mémoire', 2: 'Réseau'}
+    # Données simulées, différentes à chaque rerun: figure construite sans cache
+    fig = cached_figure(
+        'dashboard.ressources',
+        None,
+        lambda: px.line(
+            x=hours,
+            y=[cpu_usage, memory_usage, network_usage],
+            title="Utilisation des Ressources (%)",
+            labels={'x': 'Heure', 'y': 'Utilisation (%)'},
+            color_discrete_map={0: 'CPU', 1: 'Mémoire', 2: 'Réseau'}
+        )
     )
     
     st.plotly_chart(fig, use_container_width=True)
@@ -7,10 +7,18 @@ import streamlit as st
 import pandas as pd
 import requests
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
+import time
 from dotenv import load_dotenv
 
+from utils.dnac_api import get_dnac_client
+from utils.dnac_federation import get_federation
+from utils.figure_cache import cached_figure, data_version
+from utils.prefix_index import get_prefix_index
+from utils.report_builder import REPORT_FORMATS, get_report_service
+from utils.timeseries_store import get_timeseries_store
+
 def get_dnac_credentials():
     """Récupérer les identifiants DNA Center"""
     config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
@@ -81,6 +89,113 @@ def simulate_dnac_data():
         }
     }
 
+# Scores de santé affichés (ceux présents dans la réponse)
+HEALTH_METRICS = [
+    ('healthScore', 'Score global'), ('connectivity', 'Connectivité'), ('performance', 'Performance'),
+    ('security', 'Sécurité'), ('availability', 'Disponibilité')
+]
+
+def first_record(response):
+    """Premier enregistrement d'une réponse santé (liste ou objet)"""
+    if isinstance(response, list):
+        return response[0] if response else None
+    return response if isinstance(response, dict) else None
+
+def health_score(record):
+    """Score de santé global d'un enregistrement (healthScore ou overallHealthScore)"""
+    record = record or {}
+    return record.get('healthScore', record.get('overallHealthScore'))
+
+@st.cache_data(ttl=60)
+def load_dnac_data():
+    """
+    Données DNA Center: vue fusionnée des clusters (DNAC_CLUSTERS), réponses
+    rejouées depuis une cassette (DNAC_CASSETTE_MODE=replay), simulation à défaut
+    
+    Returns:
+        dict: Même forme que simulate_dnac_data() (+ 'clusters' et santés par
+              cluster 'cluster_health' en mode fédéré)
+    """
+    data = simulate_dnac_data()
+    if os.getenv('DNAC_CLUSTERS', '').strip():
+        view = get_federation().refresh()
+        devices = view['devices']
+        network_health, client_health = view['network_health'], view['client_health']
+        data['clusters'] = view['clusters']
+        data['cluster_health'] = {
+            name: {'network': health, 'client': client_health['clusters'].get(name)}
+            for name, health in network_health['clusters'].items()
+        }
+    elif os.getenv('DNAC_CASSETTE_MODE', 'off').lower() != 'replay':
+        return data
+    else:
+        try:
+            client = get_dnac_client()
+            devices = client.get_network_devices() if client else None
+            network_health = first_record(client.get_network_health()) if client else None
+            client_health = first_record(client.get_client_health()) if client else None
+        except (OSError, ValueError) as e:
+            st.warning(f"⚠️ Cassette DNA Center illisible: {str(e)}")
+            return data
+    # Santé fusionnée (ou rejouée): remplace la simulation dès qu'un score est connu
+    if network_health and health_score(network_health) is not None:
+        network_health = dict(network_health, healthScore=health_score(network_health))
+        data['network_health'] = {
+            key: network_health[key] for key, _ in HEALTH_METRICS if network_health.get(key) is not None
+        }
+    if client_health and client_health.get('totalClients') is not None:
+        data['client_health'] = {key: value for key, value in client_health.items() if key != 'clusters'}
+    if devices:
+        # Index de préfixes du processus complété par l'inventaire (attribution des sondes)
+        get_prefix_index(devices)
+        data['devices'] = [
+            {
+                'cluster': d.get('cluster'),
+                'name': d.get('hostname'),
+                'type': d.get('platformId') or d.get('type'),
+                'ip': d.get('managementIpAddress'),
+                'status': d.get('reachabilityStatus'),
+                'version': d.get('softwareVersion'),
+                'uptime': d.get('upTime'),
+                'last_seen': d.get('lastUpdated')
+            }
+            for d in devices
+        ]
+    return data
+
+def show_report_status(key, running=False):
+    """État du rapport demandé et téléchargements"""
+    service = get_report_service()
+    status = service.status(key)
+    if status['state'] == 'running':
+        st.info("⏳ Génération du rapport en cours...")
+        return
+    if running:
+        # Rapport terminé pendant l'actualisation partielle: réafficher la page sans minuterie
+        st.rerun()
+    if status['state'] == 'error':
+        st.error(f"❌ Échec de la génération: {status['error']}")
+        return
+    if status['state'] != 'done':
+        st.warning("⚠️ Rapport expiré, le générer à nouveau")
+        return
+    manifest = status['manifest']
+    counts = ', '.join(f"{section}: {count}" for section, count in manifest['sections'].items())
+    st.success(f"✅ Rapport généré en {manifest['duration_s']:.2f}s ({counts})")
+    mimes = {'html': 'text/html', 'csv': 'text/csv', 'parquet': 'application/octet-stream'}
+    columns = st.columns(max(1, min(4, len(manifest['files']))))
+    stamp = datetime.fromtimestamp(manifest['created_at']).strftime('%Y%m%d_%H%M%S')
+    for index, name in enumerate(manifest['files']):
+        with columns[index % len(columns)]:
+            with service.open_file(key, name) as f:
+                st.download_button(
+                    f"📥 {name}",
+                    data=f,
+                    file_name=f"dnac_report_{stamp}_{name}",
+                    mime=mimes[name.rsplit('.', 1)[-1]],
+                    key=f"report_{key}_{name}"
+                )
+
 def show_dnac_interface():
     """Afficher l'interface DNA Center"""
     st.title("🤖 Interface DNA Center")
@@ -106,21 +221,66 @@ def show_dnac_interface():
             st.info("📋 5 équipements découverts")
     
     with col3:
-        if st.button("📊 Générer Rapport", use_container_width=True):
-            st.success("✅ Rapport généré")
-            st.download_button(
-                "📥 Télécharger Rapport",
-                data="Rapport DNA Center généré",
-                file_name=f"dnac_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                mime="text/plain"
-            )
+        report_button = st.button("📊 Générer Rapport", use_container_width=True)
+    
+    dnac_data = load_dnac_data()
+    
+    # Rapport: généré en arrière-plan, réutilisé pour des paramètres identiques
+    with st.expander("📊 Rapport", expanded=report_button or 'report_key' in st.session_state):
+        col1, col2 = st.columns(2)
+        with col1:
+            today = datetime.now().date()
+            period = st.date_input("Période", (today - timedelta(days=30), today), key='report_period')
+        with col2:
+            formats = st.multiselect("Formats", list(REPORT_FORMATS), default=['html'], key='report_formats')
+        
+        if report_button:
+            if len(period) != 2 or not formats:
+                st.warning("⚠️ Choisir une période complète et au moins un format")
+            else:
+                start = datetime.combine(period[0], datetime.min.time()).timestamp()
+                end = datetime.combine(period[1] + timedelta(days=1), datetime.min.time()).timestamp()
+                # Fin de période arrondie à 5 minutes: les demandes rapprochées partagent le même rapport
+                st.session_state['report_key'] = get_report_service().submit(
+                    dnac_data['devices'], start, min(end, time.time() // 300 * 300), formats
+                )
+        
+        if 'report_key' in st.session_state:
+            key = st.session_state['report_key']
+            if get_report_service().status(key)['state'] == 'running':
+                # Actualisation partielle toutes les 2s: la page n'est pas relancée pendant la génération
+                st.fragment(show_report_status, run_every=2)(key, running=True)
+            else:
+                show_report_status(key)
     
     st.markdown("---")
     
+    # Clusters fédérés (fraîcheur par cluster)
+    if dnac_data.get('clusters'):
+        st.subheader("🌍 Clusters DNA Center")
+        clusters_df = pd.DataFrame(dnac_data['clusters'])
+        cluster_health = dnac_data.get('cluster_health', {})
+        clusters_df['santé'] = clusters_df['cluster'].map(
+            lambda name: health_score((cluster_health.get(name) or {}).get('network'))
+        )
+        clusters_df['santé clients'] = clusters_df['cluster'].map(
+            lambda name: health_score((cluster_health.get(name) or {}).get('client'))
+        )
+        clusters_df['État'] = clusters_df.apply(
+            lambda c: f"🔴 {c['status']}" if c['status'] == 'error'
+            else ("⏳ collecte en cours" if c['stale'] and c['collecting']
+                  else ("🟠 périmé" if c['stale'] else f"🟢 {c['status']}")),
+            axis=1
+        )
+        st.dataframe(
+            clusters_df[['cluster', 'url', 'État', 'devices', 'santé', 'santé clients', 'age_s', 'duration_ms', 'error']],
+            use_container_width=True,
+            hide_index=True
+        )
+    
     # Équipements découverts
     st.subheader("📋 Équipements Découverts")
     
-    dnac_data = simulate_dnac_data()
     devices_df = pd.DataFrame(dnac_data['devices'])
     
     # Filtres
@@ -138,8 +298,11 @@ def show_dnac_interface():
         filtered_df = filtered_df[filtered_df['status'] == device_status]
     
     # Afficher le tableau
+    columns = ['name', 'type', 'ip', 'status', 'version', 'uptime', 'last_seen']
+    if filtered_df.get('cluster') is not None and filtered_df['cluster'].notna().any():
+        columns.insert(0, 'cluster')
     st.dataframe(
-        filtered_df[['name', 'type', 'ip', 'status', 'version', 'uptime', 'last_seen']],
+        filtered_df[columns],
         use_container_width=True,
         hide_index=True
     )
@@ -151,50 +314,63 @@ def show_dnac_interface():
     
     health_data = dnac_data['network_health']
     
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric("Connectivité", f"{health_data['connectivity']}%")
-    
-    with col2:
-        st.metric("Performance", f"{health_data['performance']}%")
-    
-    with col3:
-        st.metric("Sécurité", f"{health_data['security']}%")
-    
-    with col4:
-        st.metric("Disponibilité", f"{health_data['availability']}%")
+    shown = [(key, label) for key, label in HEALTH_METRICS if key in health_data]
+    for column, (key, label) in zip(st.columns(len(shown) or 1), shown):
+        with column:
+            st.metric(label, f"{health_data[key]}%")
+    client_health = dnac_data.get('client_health')
+    if client_health and client_health.get('healthScore') is not None:
+        st.caption(f"Clients: {client_health.get('healthyClients', 'N/A')}/{client_health['totalClients']} "
+                   f"sains (score {client_health['healthScore']}%)")
     
     # Graphique de santé
     st.subheader("📈 Évolution de la Santé")
     
     import plotly.graph_objects as go
     
-    # Simulation de données temporelles
     import numpy as np
-    dates = pd.date_range(start='2024-01-08', periods=7, freq='D')
-    
-    fig = go.Figure()
+    store = get_timeseries_store()
+    start = (datetime.now() - timedelta(days=7)).timestamp()
     
+    series = {}
+    simulated = False
     for metric, value in health_data.items():
-        # Simulation de variation autour de la valeur
-        values = np.random.normal(value, 2, 7)
-        values = np.clip(values, 90, 100)
+        timestamps, values = store.query(f"network_health.{metric}", start, resolution='1h')
+        if len(timestamps):
+            dates = [datetime.fromtimestamp(ts) for ts in timestamps]
+        else:
+            simulated = True
+            # Simulation de variation autour de la valeur
+            dates = pd.date_range(start='2024-01-08', periods=7, freq='D')
+            values = np.random.normal(value, 2, 7)
+            values = np.clip(values, 90, 100)
+        series[metric] = (dates, values)
+    
+    def build_health_figure():
+        fig = go.Figure()
+        for metric, (dates, values) in series.items():
+            fig.add_trace(go.Scatter(
+                x=dates,
+                y=values,
+                mode='lines+markers',
+                name=metric.capitalize(),
+                line=dict(width=3)
+            ))
         
-        fig.add_trace(go.Scatter(
-            x=dates,
-            y=values,
-            mode='lines+markers',
-            name=metric.capitalize(),
-            line=dict(width=3)
-        ))
-    
-    fig.update_layout(
-        title="Évolution de la Santé du Réseau",
-        xaxis_title="Date",
-        yaxis_title="Score (%)",
-        hovermode='x unified',
-        height=400
+        fig.update_layout(
+            title="Évolution de la Santé du Réseau",
+            xaxis_title="Date",
+            yaxis_title="Score (%)",
+            hovermode='x unified',
+            height=400
+        )
+        return fig
+    
+    fig = cached_figure(
+        'dnac.sante',
+        None if simulated else data_version(list(series), *(part for dates_values in series.values()
+                                                            for part in dates_values)),
+        build_health_figure
     )
     
     st.plotly_chart(fig, use_container_width=True)
@@ -9,6 +9,114 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import numpy as np
 
+from utils.figure_cache import cached_figure, data_version
+from utils.ring_buffer import get_live_cache
+from utils.timeseries_store import get_timeseries_store
+from utils.tunnel_state import load_tunnel_state
+from utils.vpn_checker import VPNChecker, describe_connectivity
+
+LIVE_WINDOWS = {'15 min': 900, '1 h': 3600, '6 h': 6 * 3600, '24 h': 24 * 3600}
+
+def show_live_traffic(live_cache):
+    """Afficher le trafic d'un tunnel depuis le cache mémoire (résolution native)"""
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        tunnel = st.selectbox("Tunnel", live_cache.tunnels)
+    with col2:
+        window = st.selectbox("Fenêtre", list(LIVE_WINDOWS), index=1)
+    
+    def build_live_figure():
+        fig = go.Figure()
+        for metric, label, color in (('rx_bps', 'Réception', '#1f77b4'), ('tx_bps', 'Émission', '#ff7f0e')):
+            if metric not in live_cache.metrics:
+                continue
+            timestamps, values = live_cache.window(metric, tunnel, seconds=LIVE_WINDOWS[window])
+            fig.add_trace(go.Scatter(
+                x=timestamps.astype('datetime64[s]'),
+                y=values / 1e6,
+                mode='lines',
+                name=f'{label} (Mbps)',
+                line=dict(color=color, width=2),
+                connectgaps=False
+            ))
+        
+        fig.update_layout(
+            title=f"Trafic {tunnel} ({live_cache.resolution}s)",
+            xaxis_title="Heure",
+            yaxis_title="Débit (Mbps)",
+            hovermode='x unified',
+            height=400
+        )
+        return fig
+    
+    # Le compteur d'écritures du cache suffit comme version: aucune lecture si rien n'a changé
+    fig = cached_figure(
+        'vpn.live', live_cache.version, build_live_figure,
+        params={'tunnel': tunnel, 'window': window}
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+
+def show_traffic_history():
+    """Afficher le trafic horaire depuis l'historique enregistré (simulation à défaut)"""
+    start = (datetime.now() - timedelta(hours=25)).timestamp()
+    timestamps, counters = get_timeseries_store().query(
+        'vpn.hq_router.bytes_encrypted', start, resolution='1h', agg='max'
+    )
+    simulated = len(timestamps) < 2
+    if not simulated:
+        hours = [datetime.fromtimestamp(ts) for ts in timestamps[1:]]
+        vpn_traffic = np.maximum(np.diff(counters), 0) / (1024 * 1024)
+    else:
+        hours = list(range(24))
+        vpn_traffic = np.random.normal(100, 20, 24)
+        vpn_traffic = np.maximum(vpn_traffic, 0)
+    
+    def build_history_figure():
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=hours,
+            y=vpn_traffic,
+            mode='lines+markers',
+            name='Trafic VPN (MB/h)',
+            line=dict(color='#1f77b4', width=3),
+            fill='tonexty'
+        ))
+        
+        fig.update_layout(
+            title="Trafic VPN par Heure",
+            xaxis_title="Heure",
+            yaxis_title="Trafic (MB)",
+            hovermode='x unified',
+            height=400
+        )
+        return fig
+    
+    fig = cached_figure('vpn.historique', None if simulated else data_version(hours, vpn_traffic),
+                        build_history_figure)
+    
+    st.plotly_chart(fig, use_container_width=True)
+
+def show_tunnel_events(tunnel_state):
+    """Afficher l'état des tunnels reçu par syslog"""
+    st.subheader("📡 Événements Tunnel (syslog)")
+    age = datetime.now().timestamp() - tunnel_state['updated_at']
+    st.caption(f"{tunnel_state['events']} événements reçus, mis à jour il y a {age:.0f}s")
+    
+    rows = []
+    for entry in sorted(tunnel_state['entries'], key=lambda entry: entry['key']):
+        rows.append({
+            'Équipement': entry['device'],
+            'Objet': entry['object'],
+            'Type': entry['kind'],
+            'État': {'up': '🟢 up', 'down': '🔴 down'}.get(entry['state'], '—'),
+            'Depuis': datetime.fromtimestamp(entry['since']).strftime('%Y-%m-%d %H:%M:%S') if entry['since'] else '—',
+            'Transitions': entry['transitions'],
+            'Événements': entry['events'],
+            'Dernier message': f"{entry['last_mnemonic']}: {entry['last_message']}"
+        })
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
 def show_vpn_monitoring():
     """Afficher le monitoring VPN détaillé"""
     st.title("🔐 Monitoring VPN IPsec")
@@ -30,6 +138,15 @@ def show_vpn_monitoring():
             'last_rekey': '2024-01-15 14:30:00'
         }
         
+        # État événementiel publié par le récepteur syslog (prioritaire s'il existe)
+        tunnel_state = load_tunnel_state()
+        interfaces = [
+            entry for entry in (tunnel_state or {}).get('entries', [])
+            if entry['kind'] == 'interface' and entry['state']
+        ]
+        if interfaces:
+            tunnel_status['active'] = all(entry['state'] == 'up' for entry in interfaces)
+        
         if tunnel_status['active']:
             st.success("🟢 Tunnel IPsec Actif")
         else:
@@ -49,52 +166,37 @@ def show_vpn_monitoring():
         st.metric("Sessions IKEv2", "1")
         st.metric("Sessions IPsec", "1")
     
+    if tunnel_state and tunnel_state.get('entries'):
+        show_tunnel_events(tunnel_state)
+    
     st.markdown("---")
     
     # Graphique de trafic VPN
     st.subheader("📈 Trafic VPN en Temps Réel")
     
-    # Simulation de données de trafic
-    hours = list(range(24))
-    vpn_traffic = np.random.normal(100, 20, 24)
-    vpn_traffic = np.maximum(vpn_traffic, 0)
-    
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=hours,
-        y=vpn_traffic,
-        mode='lines+markers',
-        name='Trafic VPN (MB/h)',
-        line=dict(color='#1f77b4', width=3),
-        fill='tonexty'
-    ))
-    
-    fig.update_layout(
-        title="Trafic VPN par Heure",
-        xaxis_title="Heure",
-        yaxis_title="Trafic (MB)",
-        hovermode='x unified',
-        height=400
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    live_cache = get_live_cache()
+    if live_cache.tunnels:
+        show_live_traffic(live_cache)
+    else:
+        show_traffic_history()
     
     # Tests de connectivité
     st.subheader("🧪 Tests de Connectivité")
     
     col1, col2, col3 = st.columns(3)
     
-    with col1:
-        if st.button("🔄 Test HQ → Branch", use_container_width=True):
-            st.success("✅ Ping réussi: 192.168.1.10 → 192.168.2.10 (5ms)")
-    
-    with col2:
-        if st.button("🔄 Test Branch → HQ", use_container_width=True):
-            st.success("✅ Ping réussi: 192.168.2.10 → 192.168.1.10 (4ms)")
-    
-    with col3:
-        if st.button("🔄 Test Tunnel", use_container_width=True):
-            st.success("✅ Tunnel actif: 10.0.0.1 ↔ 10.0.0.2")
+    tests = [
+        (col1, "🔄 Test HQ → Branch", "192.168.1.10", "192.168.2.10"),
+        (col2, "🔄 Test Branch → HQ", "192.168.2.10", "192.168.1.10"),
+        (col3, "🔄 Test Tunnel", "10.0.0.1", "10.0.0.2")
+    ]
+    for column, label, source_ip, destination_ip in tests:
+        with column:
+            if st.button(label, use_container_width=True):
+                level, message = describe_connectivity(
+                    VPNChecker().test_connectivity(source_ip, destination_ip)
+                )
+                getattr(st, level)(message)
     
     # Détails techniques
     st.subheader("🔧 Détails Techniques")
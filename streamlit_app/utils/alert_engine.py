@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+"""
+Moteur d'alertes
+Description: Règles déclaratives (seuil, durée, taux de variation) évaluées de façon incrémentale sur les instantanés de santé et de tunnels
+"""
+
+import heapq
+import json
+import operator
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+
+STATE_VERSION = 1
+RULE_TYPES = ('threshold', 'rate')
+SEVERITIES = ('error', 'warning', 'info')
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+# Règles par défaut: mêmes critères que les statuts affichés par le dashboard
+DEFAULT_RULES = [
+    {
+        'name': 'vpn_inactif',
+        'series': r'vpn\.up',
+        'op': '<', 'value': 1,
+        'severity': 'error',
+        'summary': "Tunnel VPN inactif"
+    },
+    {
+        'name': 'tunnel_inactif',
+        'series': r'tunnel\.(?P<tunnel>.+)\.up',
+        'op': '<', 'value': 1, 'for': 30,
+        'severity': 'error',
+        'summary': "Tunnel {tunnel} inactif"
+    },
+    {
+        'name': 'equipement_injoignable',
+        'series': r'device\.(?P<device>.+)\.up',
+        'op': '<', 'value': 1, 'for': 60, 'clear_for': 60,
+        'severity': 'error',
+        'summary': "Équipement {device} injoignable"
+    },
+    {
+        'name': 'sante_reseau_degradee',
+        'series': r'network_health\.overallHealthScore',
+        'op': '<', 'value': 75, 'for': 300, 'clear_for': 300,
+        'severity': 'warning',
+        'summary': "Santé réseau dégradée ({value:.0f}%)"
+    },
+    {
+        'name': 'sante_clients_degradee',
+        'series': r'client_health\.healthScore',
+        'op': '<', 'value': 75, 'for': 300, 'clear_for': 300,
+        'severity': 'warning',
+        'summary': "Santé des clients dégradée ({value:.0f}%)"
+    },
+    {
+        'name': 'chiffrement_fige',
+        'series': r'vpn\.(?P<router>[^.]+)\.packets_encrypted',
+        'type': 'rate', 'counter': True,
+        'op': '<=', 'value': 0, 'for': 300,
+        'severity': 'warning',
+        'summary': "Aucun paquet chiffré sur {router}"
+    }
+]
+
+
+class _Labels(dict):
+    """Étiquettes d'une alerte pour str.format_map (clé absente -> '?')"""
+
+    def __missing__(self, key):
+        return '?'
+
+
+def compile_rule(rule):
+    """
+    Valider une règle et précompiler son motif de série
+
+    Args:
+        rule (dict): Règle déclarative:
+            name (str): Identifiant
+            series (str): Expression régulière sur le nom complet de la série;
+                          les groupes nommés deviennent des étiquettes
+            type (str): 'threshold' (valeur) ou 'rate' (variation par 'per' secondes
+                        entre deux échantillons successifs)
+            op (str), value (float): Condition d'alerte (ex: '<', 75)
+            for (float): Durée pendant laquelle la condition doit tenir avant l'alerte
+            clear_for (float): Durée sans condition avant la résolution
+            severity (str): 'error', 'warning' ou 'info'
+            group_by (list): Étiquettes de regroupement (toutes les séries de la règle par défaut)
+            summary (str): Message ({étiquette}, {value})
+            counter (bool): Compteur (une baisse est une remise à zéro, ignorée)
+
+    Returns:
+        dict: Règle normalisée
+
+    Raises:
+        ValueError: Règle invalide
+    """
+    name = rule.get('name')
+    if not name:
+        raise ValueError("Règle sans nom")
+    compiled = {
+        'name': name,
+        'type': rule.get('type', 'threshold'),
+        'op': rule.get('op', '>'),
+        'severity': rule.get('severity', 'warning'),
+        'for': float(rule.get('for', 0)),
+        'clear_for': float(rule.get('clear_for', 0)),
+        'per': float(rule.get('per', 1)),
+        'counter': bool(rule.get('counter', False)),
+        'group_by': tuple(rule.get('group_by', ())),
+        'summary': rule.get('summary', name)
+    }
+    if compiled['type'] not in RULE_TYPES:
+        raise ValueError(f"Règle {name}: type invalide {compiled['type']}")
+    if compiled['op'] not in OPERATORS:
+        raise ValueError(f"Règle {name}: opérateur invalide {compiled['op']}")
+    if compiled['severity'] not in SEVERITIES:
+        raise ValueError(f"Règle {name}: sévérité invalide {compiled['severity']}")
+    try:
+        compiled['value'] = float(rule['value'])
+        compiled['pattern'] = re.compile(rule['series'])
+    except KeyError as e:
+        raise ValueError(f"Règle {name}: champ manquant {e}")
+    except re.error as e:
+        raise ValueError(f"Règle {name}: motif invalide ({e})")
+    compiled['test'] = OPERATORS[compiled['op']]
+    return compiled
+
+
+def load_rules(path):
+    """
+    Charger des règles depuis un fichier JSON (liste de règles)
+
+    Args:
+        path (str): Chemin du fichier
+
+    Returns:
+        list: Règles (non compilées)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise ValueError(f"{path}: une liste de règles est attendue")
+    return rules
+
+
+class AlertEngine:
+    """
+    Évaluation incrémentale de règles d'alerte
+
+    Chaque série n'est rapprochée des motifs de règles qu'à sa première
+    apparition. Un instantané ne réévalue ensuite que les couples
+    (règle, série) dont la valeur a changé (ou dont le taux vient de retomber
+    à zéro); les durées 'for' / 'clear_for' et la fin des oscillations sont
+    gérées par un échéancier, sans balayer les séries inchangées.
+
+    L'état (dernières valeurs, alertes en attente ou déclenchées) vit dans le
+    processus: un script ponctuel ne peut tenir une durée 'for' qu'en
+    rechargeant l'état de l'exécution précédente (load_state / save_state).
+    """
+
+    def __init__(self, rules=None, flap_window=300, flap_threshold=4):
+        """
+        Initialiser le moteur
+
+        Args:
+            rules (list): Règles déclaratives (DEFAULT_RULES par défaut)
+            flap_window (float): Fenêtre de détection des oscillations (secondes)
+            flap_threshold (int): Transitions dans la fenêtre au-delà desquelles
+                                  une alerte est marquée instable (notifications suspendues)
+        """
+        self.rules = [compile_rule(rule) for rule in (DEFAULT_RULES if rules is None else rules)]
+        self.flap_window = float(flap_window)
+        self.flap_threshold = int(flap_threshold)
+        # Série -> [ts, valeur, ts précédent, valeur précédente, taux non nul]
+        self._series = {}
+        # Série -> ((indice de règle, étiquettes, empreinte), ...)
+        self._bindings = {}
+        self._instances = {}
+        self._timers = []
+        self._timer_seq = 0
+        # (règle, valeurs de regroupement) -> empreintes actives
+        self._groups = {}
+        self._lock = threading.Lock()
+        self.evaluations = 0
+
+    # ------------------------------------------------------------------
+    # Rattachement des séries aux règles
+    # ------------------------------------------------------------------
+
+    def _bind(self, series):
+        bindings = []
+        for index, rule in enumerate(self.rules):
+            match = rule['pattern'].fullmatch(series)
+            if match:
+                labels = _Labels({k: v for k, v in match.groupdict().items() if v is not None})
+                bindings.append((index, labels, f"{rule['name']}|{series}"))
+        bindings = tuple(bindings)
+        self._bindings[series] = bindings
+        return bindings
+
+    def _schedule(self, due, fingerprint):
+        self._timer_seq += 1
+        heapq.heappush(self._timers, (due, self._timer_seq, fingerprint))
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    def ingest(self, values, ts=None):
+        """
+        Intégrer un instantané de métriques
+
+        Args:
+            values (dict): Série -> valeur (les séries absentes gardent leur dernière valeur)
+            ts (float): Horodatage epoch en secondes (maintenant par défaut)
+
+        Returns:
+            list: Notifications émises ({'event': 'firing'|'resolved'|'flapping', 'alert': {...}})
+        """
+        now = time.time() if ts is None else ts
+        events = []
+        with self._lock:
+            touched = []
+            for series, value in values.items():
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                state = self._series.get(series)
+                if state is None:
+                    bindings = self._bindings.get(series)
+                    if bindings is None:
+                        bindings = self._bind(series)
+                    self._series[series] = [now, value, None, None, False]
+                    if bindings:
+                        touched.append(series)
+                    continue
+                changed = value != state[1]
+                # Un taux reste nul tant que la valeur ne bouge pas: seul le
+                # premier échantillon inchangé modifie le résultat
+                if changed or state[4]:
+                    state[2], state[3] = state[0], state[1]
+                    state[4] = changed
+                    touched.append(series)
+                state[0], state[1] = now, value
+
+            for series in touched:
+                for binding in self._bindings[series]:
+                    self._evaluate(binding, series, now, events)
+            self._run_timers(now, events)
+        return events
+
+    def tick(self, now=None):
+        """
+        Traiter les échéances (durées 'for', 'clear_for', fin d'oscillation) sans nouvel instantané
+
+        Returns:
+            list: Notifications émises
+        """
+        events = []
+        with self._lock:
+            self._run_timers(time.time() if now is None else now, events)
+        return events
+
+    def _observed(self, rule, series):
+        ts, value, prev_ts, prev_value, _ = self._series[series]
+        if rule['type'] == 'threshold':
+            return value
+        if prev_ts is None or ts <= prev_ts:
+            return None
+        delta = value - prev_value
+        if delta < 0 and rule['counter']:
+            return None
+        return delta / (ts - prev_ts) * rule['per']
+
+    def _evaluate(self, binding, series, now, events):
+        index, labels, fingerprint = binding
+        rule = self.rules[index]
+        observed = self._observed(rule, series)
+        if observed is None:
+            return
+        self.evaluations += 1
+        condition = rule['test'](observed, rule['value'])
+        instance = self._instances.get(fingerprint)
+
+        if condition:
+            if instance is None:
+                instance = self._instances[fingerprint] = {
+                    'fingerprint': fingerprint, 'rule': index, 'series': series, 'labels': labels,
+                    'state': 'inactive', 'since': None, 'active_at': None, 'clear_since': None,
+                    'value': observed, 'transitions': deque(), 'flapping': False, 'notified': 'resolved'
+                }
+            instance['value'] = observed
+            instance['clear_since'] = None
+            if instance['state'] == 'inactive':
+                instance['state'] = 'pending'
+                instance['since'] = now
+                if rule['for'] > 0:
+                    self._schedule(now + rule['for'], fingerprint)
+                else:
+                    self._transition(instance, 'firing', now, events)
+            return
+
+        if instance is None or instance['state'] == 'inactive':
+            return
+        instance['value'] = observed
+        if instance['state'] == 'pending':
+            instance['state'] = 'inactive'
+        elif rule['clear_for'] > 0:
+            if instance['clear_since'] is None:
+                instance['clear_since'] = now
+                self._schedule(now + rule['clear_for'], fingerprint)
+        else:
+            self._transition(instance, 'resolved', now, events)
+
+    def _run_timers(self, now, events):
+        timers = self._timers
+        while timers and timers[0][0] <= now:
+            due, _, fingerprint = heapq.heappop(timers)
+            instance = self._instances.get(fingerprint)
+            if instance is None:
+                continue
+            rule = self.rules[instance['rule']]
+            state = instance['state']
+            if state == 'pending' and instance['since'] + rule['for'] <= due:
+                self._transition(instance, 'firing', due, events)
+            elif (state == 'firing' and instance['clear_since'] is not None
+                  and instance['clear_since'] + rule['clear_for'] <= due):
+                self._transition(instance, 'resolved', due, events)
+            elif instance['flapping'] and instance['transitions'][-1] + self.flap_window <= due:
+                # Stable depuis une fenêtre complète: notifier l'état final s'il a changé
+                instance['flapping'] = False
+                final = 'firing' if state == 'firing' else 'resolved'
+                if final != instance['notified']:
+                    instance['notified'] = final
+                    events.append({'event': final, 'alert': self._describe(instance)})
+                self._update_group(instance)
+
+    # ------------------------------------------------------------------
+    # Transitions, oscillations et regroupement
+    # ------------------------------------------------------------------
+
+    def _transition(self, instance, target, now, events):
+        rule = self.rules[instance['rule']]
+        if target == 'firing':
+            instance['state'] = 'firing'
+            instance['active_at'] = now
+        else:
+            instance['state'] = 'inactive'
+            instance['clear_since'] = None
+
+        transitions = instance['transitions']
+        transitions.append(now)
+        while transitions and transitions[0] < now - self.flap_window:
+            transitions.popleft()
+
+        if instance['flapping']:
+            # Prolonger la suspension jusqu'à une fenêtre complète sans transition
+            self._schedule(now + self.flap_window, instance['fingerprint'])
+        elif len(transitions) >= self.flap_threshold:
+            instance['flapping'] = True
+            self._schedule(now + self.flap_window, instance['fingerprint'])
+            events.append({'event': 'flapping', 'alert': self._describe(instance)})
+        elif target != instance['notified']:
+            instance['notified'] = target
+            events.append({'event': target, 'alert': self._describe(instance)})
+        self._update_group(instance, rule)
+
+    def _group_key(self, instance, rule):
+        return (rule['name'], tuple(instance['labels'].get(label) for label in rule['group_by']))
+
+    def _update_group(self, instance, rule=None):
+        rule = rule or self.rules[instance['rule']]
+        key = self._group_key(instance, rule)
+        members = self._groups.get(key)
+        if instance['state'] == 'firing' or instance['flapping']:
+            if members is None:
+                members = self._groups[key] = set()
+            members.add(instance['fingerprint'])
+        elif members is not None:
+            members.discard(instance['fingerprint'])
+            if not members:
+                del self._groups[key]
+
+    def _describe(self, instance):
+        rule = self.rules[instance['rule']]
+        labels = _Labels(instance['labels'])
+        labels['value'] = instance['value']
+        try:
+            summary = rule['summary'].format_map(labels)
+        except (ValueError, TypeError):
+            summary = rule['summary']
+        return {
+            'rule': rule['name'],
+            'series': instance['series'],
+            'labels': dict(instance['labels']),
+            'severity': rule['severity'],
+            'state': instance['state'],
+            'flapping': instance['flapping'],
+            'value': instance['value'],
+            'active_at': instance['active_at'],
+            'summary': summary
+        }
+
+    # ------------------------------------------------------------------
+    # Persistance
+    # ------------------------------------------------------------------
+
+    def save_state(self, path):
+        """
+        Écrire l'état du moteur (séries, alertes en cours) dans un fichier JSON
+
+        Args:
+            path (str): Fichier d'état (remplacé atomiquement)
+        """
+        with self._lock:
+            state = {
+                'version': STATE_VERSION,
+                'saved_at': time.time(),
+                'series': {series: list(values) for series, values in self._series.items()},
+                'instances': [
+                    dict(instance, rule=self.rules[instance['rule']]['name'], labels=dict(instance['labels']),
+                         transitions=list(instance['transitions']))
+                    for instance in self._instances.values()
+                ]
+            }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def load_state(self, path):
+        """
+        Reprendre l'état écrit par save_state (alertes des règles inconnues ignorées)
+
+        Les échéances 'for' / 'clear_for' / fin d'oscillation sont reprogrammées:
+        celles passées entre deux exécutions sont traitées au prochain ingest / tick.
+
+        Args:
+            path (str): Fichier d'état
+
+        Returns:
+            bool: True si un état a été chargé
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get('version') != STATE_VERSION:
+            return False
+        rule_index = {rule['name']: index for index, rule in enumerate(self.rules)}
+        with self._lock:
+            for series, values in state.get('series', {}).items():
+                self._series[series] = list(values)
+                if series not in self._bindings:
+                    self._bind(series)
+            for saved in state.get('instances', []):
+                index = rule_index.get(saved['rule'])
+                if index is None or saved['series'] not in self._series:
+                    continue
+                rule = self.rules[index]
+                instance = dict(saved, rule=index, labels=_Labels(saved['labels']),
+                                transitions=deque(saved['transitions']))
+                self._instances[instance['fingerprint']] = instance
+                if instance['state'] == 'pending':
+                    self._schedule(instance['since'] + rule['for'], instance['fingerprint'])
+                elif instance['state'] == 'firing' and instance['clear_since'] is not None:
+                    self._schedule(instance['clear_since'] + rule['clear_for'], instance['fingerprint'])
+                if instance['flapping'] and instance['transitions']:
+                    self._schedule(instance['transitions'][-1] + self.flap_window, instance['fingerprint'])
+                self._update_group(instance, rule)
+        return True
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def active_alerts(self):
+        """
+        Alertes actives (déclenchées ou instables), les plus graves d'abord
+
+        Returns:
+            list: Descriptions d'alertes
+        """
+        with self._lock:
+            alerts = [
+                self._describe(self._instances[fingerprint])
+                for members in self._groups.values() for fingerprint in members
+            ]
+        return sorted(alerts, key=lambda a: (SEVERITIES.index(a['severity']), a['active_at'] or 0, a['series']))
+
+    def groups(self, max_series=10):
+        """
+        Alertes actives regroupées par règle (et étiquettes group_by), dédoublonnées
+
+        Args:
+            max_series (int): Nombre maximal de séries listées par groupe
+
+        Returns:
+            list: Groupes {'rule', 'severity', 'summary', 'count', 'series', 'since', 'flapping'}
+        """
+        with self._lock:
+            groups = []
+            for (rule_name, _), members in self._groups.items():
+                instances = sorted((self._instances[f] for f in members), key=lambda i: i['series'])
+                first = self._describe(instances[0])
+                count = len(instances)
+                summary = first['summary'] if count == 1 else f"{first['summary']} (+{count - 1})"
+                groups.append({
+                    'rule': rule_name,
+                    'severity': first['severity'],
+                    'summary': summary,
+                    'count': count,
+                    'series': [i['series'] for i in instances[:max_series]],
+                    'since': min(i['active_at'] or 0 for i in instances),
+                    'flapping': any(i['flapping'] for i in instances)
+                })
+        return sorted(groups, key=lambda g: (SEVERITIES.index(g['severity']), -g['count'], g['since']))
+
+    def stats(self):
+        """Séries suivies, séries rattachées à une règle, alertes actives, évaluations effectuées"""
+        with self._lock:
+            return {
+                'series': len(self._series),
+                'bound_series': sum(1 for b in self._bindings.values() if b),
+                'active': sum(len(members) for members in self._groups.values()),
+                'evaluations': self.evaluations
+            }
+
+
+def device_series(devices):
+    """
+    Séries d'accessibilité des équipements ('device.<nom>.up')
+
+    Accepte l'inventaire DNA Center (hostname / reachabilityStatus) comme les
+    données simulées du dashboard (name / status).
+
+    Args:
+        devices (list): Équipements
+
+    Returns:
+        dict: Série -> 1 (joignable) ou 0
+    """
+    values = {}
+    for device in devices or []:
+        name = device.get('hostname') or device.get('name') or device.get('id')
+        if not name:
+            continue
+        status = device.get('reachabilityStatus') or device.get('status')
+        values[f"device.{name}.up"] = 1 if status in ('active', 'Reachable') else 0
+    return values
+
+
+def alert_state_path():
+    """Fichier d'état du moteur pour les scripts ponctuels (ALERT_STATE_FILE dans config.env)"""
+    root = os.path.join(os.path.dirname(__file__), '..', '..')
+    config_path = os.path.join(root, 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    path = os.getenv('ALERT_STATE_FILE', 'data/alert_state.json')
+    if not os.path.isabs(path):
+        path = os.path.join(root, path)
+    return os.path.normpath(path)
+
+
+_alert_engine = None
+_alert_engine_lock = threading.Lock()
+
+
+def get_alert_engine():
+    """
+    Obtenir le moteur d'alertes du processus (configuré via config.env)
+
+    ALERT_RULES_FILE: fichier JSON de règles (règles par défaut si vide)
+    ALERT_FLAP_WINDOW / ALERT_FLAP_THRESHOLD: détection des oscillations
+    """
+    global _alert_engine
+    with _alert_engine_lock:
+        if _alert_engine is None:
+            root = os.path.join(os.path.dirname(__file__), '..', '..')
+            config_path = os.path.join(root, 'config.env')
+            if os.path.exists(config_path):
+                load_dotenv(config_path)
+            rules = None
+            rules_file = os.getenv('ALERT_RULES_FILE', '')
+            if rules_file:
+                if not os.path.isabs(rules_file):
+                    rules_file = os.path.join(root, rules_file)
+                rules = load_rules(os.path.normpath(rules_file))
+            _alert_engine = AlertEngine(
+                rules,
+                flap_window=float(os.getenv('ALERT_FLAP_WINDOW', '300')),
+                flap_threshold=int(os.getenv('ALERT_FLAP_THRESHOLD', '4'))
+            )
+        return _alert_engine
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Détection d'anomalies sur les séries de trafic et de santé
+Description: Écarts EWMA / z-score et écarts à une référence saisonnière (heure de la journée) calculés pour toutes les séries à la fois avec NumPy, à chaque lot ingéré ou sur un historique
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from dotenv import load_dotenv
+
+
+class AnomalyDetector:
+    """
+    Détecteur vectorisé (une ligne d'état par série)
+
+    Pour chaque point: z = (x - moyenne EWMA) / écart-type EWMA, et zs, le
+    même écart mesuré sur la référence du créneau saisonnier (moyenne et
+    variance EWMA par série et par créneau horaire). Un point est anormal si
+    |z| dépasse le seuil et que la référence saisonnière, quand elle est
+    établie, ne l'explique pas (|zs| au-delà du seuil). Une valeur tombée à
+    zéro alors que la moyenne dépasse min_level est toujours signalée
+    ('drop'). Les calculs portent sur des tableaux de toutes les séries: le
+    coût ne dépend pas d'une boucle Python par série.
+    """
+
+    def __init__(self, alpha=0.1, threshold=4.0, warmup=10, season_seconds=86400, season_slots=24,
+                 seasonal_alpha=0.3, seasonal_warmup=2, relative_floor=0.05, min_level=1.0):
+        """
+        Initialiser le détecteur
+
+        Args:
+            alpha (float): Poids d'un nouveau point dans la moyenne / variance EWMA
+            threshold (float): Seuil |z| (et |zs|)
+            warmup (int): Points nécessaires avant de signaler une série
+            season_seconds (int): Période saisonnière (une journée par défaut)
+            season_slots (int): Créneaux par période (24: un par heure)
+            seasonal_alpha (float): Poids d'un nouveau point dans la référence de son créneau
+            seasonal_warmup (int): Passages par créneau avant d'utiliser la référence
+            relative_floor (float): Écart-type minimal relatif à la moyenne (séries quasi constantes)
+            min_level (float): Moyenne minimale pour signaler une chute à zéro
+        """
+        self.alpha = float(alpha)
+        self.threshold = float(threshold)
+        self.warmup = int(warmup)
+        self.season_seconds = float(season_seconds)
+        self.season_slots = int(season_slots)
+        self.seasonal_alpha = float(seasonal_alpha)
+        self.seasonal_warmup = int(seasonal_warmup)
+        self.relative_floor = float(relative_floor)
+        self.min_level = float(min_level)
+        self._index = {}
+        self._names = []
+        self._mean = np.zeros(0)
+        self._var = np.zeros(0)
+        self._count = np.zeros(0, dtype=np.int64)
+        self._season_mean = np.zeros((0, self.season_slots))
+        self._season_var = np.zeros((0, self.season_slots))
+        self._season_count = np.zeros((0, self.season_slots), dtype=np.int64)
+        # Période (ts // season_seconds) du dernier point intégré à chaque créneau
+        self._season_pass = np.zeros((0, self.season_slots), dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def _rows(self, keys):
+        index = self._index
+        for key in keys:
+            if key not in index:
+                index[key] = len(self._names)
+                self._names.append(key)
+        grow = len(self._names) - len(self._mean)
+        if grow > 0:
+            self._mean = np.concatenate([self._mean, np.zeros(grow)])
+            self._var = np.concatenate([self._var, np.zeros(grow)])
+            self._count = np.concatenate([self._count, np.zeros(grow, dtype=np.int64)])
+            shape = (grow, self.season_slots)
+            self._season_mean = np.concatenate([self._season_mean, np.zeros(shape)])
+            self._season_var = np.concatenate([self._season_var, np.zeros(shape)])
+            self._season_count = np.concatenate([self._season_count, np.zeros(shape, dtype=np.int64)])
+            self._season_pass = np.concatenate([self._season_pass, np.full(shape, -1, dtype=np.int64)])
+        return np.fromiter((index[key] for key in keys), dtype=np.intp, count=len(keys))
+
+    def _slot(self, ts):
+        return int((ts % self.season_seconds) // (self.season_seconds / self.season_slots))
+
+    def _season(self, ts):
+        return int(ts // self.season_seconds)
+
+    def _step(self, values, mean, var, count, season_mean, season_var, season_count, season_pass, season):
+        """
+        Évaluer puis intégrer un point par série (toutes les séries à la fois)
+
+        Les tableaux d'état (moyenne, variance, nombre de points; mêmes
+        grandeurs pour le créneau saisonnier du point) sont mis à jour en place.
+        Le nombre de passages d'un créneau n'augmente qu'au premier point d'une
+        nouvelle période (season), pas à chaque point du créneau.
+
+        Returns:
+            tuple: (anormal, z, zs, attendu) - tableaux alignés sur values
+        """
+        present = ~np.isnan(values)
+        absent = ~present
+        floor = (self.relative_floor * mean) ** 2 + 1e-12
+        z = (values - mean) / np.sqrt(np.maximum(var, floor))
+        z[absent | (count < self.warmup)] = np.nan
+
+        season_ready = season_count >= self.seasonal_warmup
+        season_floor = (self.relative_floor * season_mean) ** 2 + 1e-12
+        zs = (values - season_mean) / np.sqrt(np.maximum(season_var, season_floor))
+        zs[absent | ~season_ready] = np.nan
+
+        with np.errstate(invalid='ignore'):
+            deviates = (np.abs(z) > self.threshold) & ~(np.abs(zs) <= self.threshold)
+            dropped = (values <= 0) & (mean > self.min_level) & (count >= self.warmup)
+        anomalous = deviates | dropped
+        expected = np.where(season_ready, season_mean, mean)
+
+        # Intégration (moyenne et variance exponentielles), séries présentes seulement
+        x = np.where(present, values, mean)
+        alpha = np.where(count == 0, 1.0, self.alpha * present)
+        diff = x - mean
+        mean += alpha * diff
+        var *= 1 - alpha
+        var += (1 - alpha) * alpha * diff * diff
+        count += present
+
+        x = np.where(present, values, season_mean)
+        alpha = np.where(season_count == 0, 1.0 * present, self.seasonal_alpha * present)
+        diff = x - season_mean
+        season_mean += alpha * diff
+        season_var *= 1 - alpha
+        season_var += (1 - alpha) * alpha * diff * diff
+        new_pass = present & (season_pass != season)
+        season_count += new_pass
+        season_pass[new_pass] = season
+        return anomalous, z, zs, expected
+
+    def _describe(self, rows, ts, values, z, zs, expected, indices):
+        anomalies = []
+        for i in indices:
+            kind = 'drop' if values[i] <= 0 or (not np.isnan(z[i]) and z[i] < 0) else 'spike'
+            anomalies.append({
+                'series': self._names[rows[i]],
+                'ts': float(ts),
+                'value': float(values[i]),
+                'expected': float(expected[i]),
+                'zscore': None if np.isnan(z[i]) else round(float(z[i]), 2),
+                'seasonal_zscore': None if np.isnan(zs[i]) else round(float(zs[i]), 2),
+                'kind': kind
+            })
+        return anomalies
+
+    def update(self, keys, values, ts=None):
+        """
+        Évaluer un lot ingéré (un point par série, même instant)
+
+        Args:
+            keys (list): Noms des séries
+            values (array): Valeurs alignées sur keys (NaN: absente)
+            ts (float): Horodatage du lot (maintenant par défaut)
+
+        Returns:
+            list: Anomalies {'series', 'ts', 'value', 'expected', 'zscore', 'seasonal_zscore', 'kind'}
+        """
+        ts = ts if ts is not None else time.time()
+        values = np.asarray(values, dtype=np.float64)
+        with self._lock:
+            rows = self._rows(keys)
+            slot = self._slot(ts)
+            state = [self._mean[rows], self._var[rows], self._count[rows], self._season_mean[rows, slot],
+                     self._season_var[rows, slot], self._season_count[rows, slot], self._season_pass[rows, slot]]
+            anomalous, z, zs, expected = self._step(values, *state, self._season(ts))
+            (self._mean[rows], self._var[rows], self._count[rows], self._season_mean[rows, slot],
+             self._season_var[rows, slot], self._season_count[rows, slot], self._season_pass[rows, slot]) = state
+            return self._describe(rows, ts, values, z, zs, expected, np.flatnonzero(anomalous))
+
+    def scan(self, keys, timestamps, matrix):
+        """
+        Évaluer un historique aligné (séries x instants), dans l'ordre chronologique
+
+        Args:
+            keys (list): Noms des séries (lignes)
+            timestamps (array): Instants (colonnes)
+            matrix (array): Valeurs (NaN: absente)
+
+        Returns:
+            tuple: (anomalies, masque booléen séries x instants)
+        """
+        # Instants en lignes contiguës: chaque pas lit et écrit des tableaux contigus
+        columns = np.ascontiguousarray(np.asarray(matrix, dtype=np.float64).T)
+        mask = np.zeros(columns.shape, dtype=bool)
+        anomalies = []
+        with self._lock:
+            rows = self._rows(keys)
+            mean, var, count = self._mean[rows], self._var[rows], self._count[rows]
+            season_mean = np.ascontiguousarray(self._season_mean[rows].T)
+            season_var = np.ascontiguousarray(self._season_var[rows].T)
+            season_count = np.ascontiguousarray(self._season_count[rows].T)
+            season_pass = np.ascontiguousarray(self._season_pass[rows].T)
+            for column, ts in enumerate(timestamps):
+                slot = self._slot(ts)
+                values = columns[column]
+                anomalous, z, zs, expected = self._step(values, mean, var, count, season_mean[slot],
+                                                        season_var[slot], season_count[slot],
+                                                        season_pass[slot], self._season(ts))
+                mask[column] = anomalous
+                if anomalous.any():
+                    anomalies.extend(self._describe(rows, ts, values, z, zs, expected, np.flatnonzero(anomalous)))
+            self._mean[rows], self._var[rows], self._count[rows] = mean, var, count
+            self._season_mean[rows] = season_mean.T
+            self._season_var[rows] = season_var.T
+            self._season_count[rows] = season_count.T
+            self._season_pass[rows] = season_pass.T
+        return anomalies, mask.T
+
+
+def series_matrix(store, metrics, start, end, resolution='1m', agg='avg'):
+    """
+    Aligner des métriques historisées sur une grille commune
+
+    Args:
+        store (TimeSeriesStore): Historique
+        metrics (list): Métriques à lire
+        start (float): Début (epoch)
+        end (float): Fin (epoch)
+        resolution (str): '1m' ou '1h'
+        agg (str): Agrégat des rollups ('avg', 'max'...)
+
+    Returns:
+        tuple: (timestamps de la grille, matrice métriques x instants, NaN aux trous)
+    """
+    step = {'1m': 60, '1h': 3600}[resolution]
+    first = start // step * step
+    grid = np.arange(first, end, step, dtype=np.float64)
+    matrix = np.full((len(metrics), len(grid)), np.nan)
+    for row, metric in enumerate(metrics):
+        timestamps, values = store.query(metric, start, end, resolution=resolution, agg=agg)
+        if not len(timestamps):
+            continue
+        columns = ((timestamps - first) // step).astype(np.intp)
+        keep = (columns >= 0) & (columns < len(grid))
+        matrix[row, columns[keep]] = values[keep]
+    return grid, matrix
+
+
+class AnomalyLog:
+    """Dernières anomalies détectées à l'ingestion, partagées avec le dashboard par fichier"""
+
+    def __init__(self, path, max_entries=500, save_interval=5.0):
+        self.path = path
+        self.entries = deque(maxlen=max_entries)
+        self.save_interval = save_interval
+        self._saved_at = 0.0
+        self._dirty = False
+
+    def add(self, anomalies):
+        """Ajouter des anomalies (fichier réécrit au plus une fois par save_interval)"""
+        if anomalies:
+            self.entries.extend(anomalies)
+            self._dirty = True
+        self.save()
+
+    def save(self, force=False):
+        if not self.path or not self._dirty:
+            return False
+        now = time.monotonic()
+        if not force and now - self._saved_at < self.save_interval:
+            return False
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(self.entries), f)
+        os.replace(tmp_path, self.path)
+        self._saved_at = now
+        self._dirty = False
+        return True
+
+
+def rate_series(keys, rx_bps, tx_bps):
+    """Séries de débit tunnel ('tunnel.<clé>.rx_bps' / '.tx_bps') et valeurs alignées"""
+    names = [f"tunnel.{key}.rx_bps" for key in keys] + [f"tunnel.{key}.tx_bps" for key in keys]
+    return names, np.concatenate([np.asarray(rx_bps, dtype=np.float64), np.asarray(tx_bps, dtype=np.float64)])
+
+
+def load_anomalies(path=None):
+    """Anomalies enregistrées par les collecteurs (liste vide si aucune)"""
+    try:
+        with open(path or get_anomaly_file(), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def get_anomaly_file():
+    """Chemin du journal des anomalies (ANOMALY_FILE dans config.env)"""
+    root = os.path.join(os.path.dirname(__file__), '..', '..')
+    config_path = os.path.join(root, 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    path = os.getenv('ANOMALY_FILE', 'data/anomalies.json')
+    if not os.path.isabs(path):
+        path = os.path.join(root, path)
+    return os.path.normpath(path)
+
+
+def get_anomaly_detector():
+    """Créer un détecteur configuré via config.env (ANOMALY_*)"""
+    config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    return AnomalyDetector(
+        alpha=float(os.getenv('ANOMALY_ALPHA', '0.1')),
+        threshold=float(os.getenv('ANOMALY_THRESHOLD', '4')),
+        warmup=int(os.getenv('ANOMALY_WARMUP', '10')),
+        season_slots=int(os.getenv('ANOMALY_SEASON_SLOTS', '24'))
+    )
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Prévision de capacité des tunnels
+Description: Tendance linéaire et profil horaire ajustés sur l'historique des débits de tous les tunnels à la fois (moindres carrés pondérés, NumPy), date prévue de franchissement du seuil d'utilisation, état incrémental persistant
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.anomaly_detector import series_matrix
+
+DAY = 86400.0
+RATE_SUFFIXES = ('.rx_bps', '.tx_bps')
+CAPACITY_SUFFIX = '.capacity_bps'
+
+
+class CapacityForecaster:
+    """
+    Modèle débit = (a + b x jours) x facteur du créneau horaire, par série
+
+    L'ajustement repose sur des sommes pondérées par série et par créneau
+    (poids, t, y, t², t·y): tendance linéaire sur toutes les heures, puis
+    facteur de chaque créneau = débit observé / tendance sur ce créneau (les
+    heures de pointe croissent proportionnellement). Les sommes sont
+    additives: un rafraîchissement n'intègre que les heures nouvelles, après
+    avoir atténué les anciennes (demi-vie en jours). Toutes les séries sont
+    traitées ensemble par produits matriciels.
+    """
+
+    def __init__(self, threshold=0.8, season_seconds=86400, season_slots=24, halflife_days=30.0,
+                 history_days=28.0, horizon_days=365.0, min_points=24):
+        """
+        Initialiser le modèle
+
+        Args:
+            threshold (float): Utilisation signalée (fraction de la capacité)
+            season_seconds (int): Période saisonnière (une journée par défaut)
+            season_slots (int): Créneaux par période (24: un par heure)
+            halflife_days (float): Demi-vie du poids d'un point (jours)
+            history_days (float): Historique lu pour une nouvelle série (jours)
+            horizon_days (float): Franchissements prévus au-delà ignorés (jours)
+            min_points (int): Points horaires nécessaires avant de prévoir
+        """
+        self.threshold = float(threshold)
+        self.season_seconds = float(season_seconds)
+        self.season_slots = int(season_slots)
+        self.halflife_days = float(halflife_days)
+        self.history_days = float(history_days)
+        self.horizon_days = float(horizon_days)
+        self.min_points = int(min_points)
+        self.origin = None
+        self.reference = None
+        self._index = {}
+        self._names = []
+        self._sums = np.zeros((0, 5, self.season_slots))
+        self._points = np.zeros(0, dtype=np.int64)
+        self._capacity = np.zeros(0)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    @property
+    def names(self):
+        return list(self._names)
+
+    def _rows(self, keys):
+        index = self._index
+        for key in keys:
+            if key not in index:
+                index[key] = len(self._names)
+                self._names.append(key)
+        grow = len(self._names) - len(self._points)
+        if grow > 0:
+            self._sums = np.concatenate([self._sums, np.zeros((grow, 5, self.season_slots))])
+            self._points = np.concatenate([self._points, np.zeros(grow, dtype=np.int64)])
+            self._capacity = np.concatenate([self._capacity, np.full(grow, np.nan)])
+        return np.fromiter((index[key] for key in keys), dtype=np.intp, count=len(keys))
+
+    def _slots(self, timestamps):
+        return ((np.asarray(timestamps) % self.season_seconds)
+                // (self.season_seconds / self.season_slots)).astype(np.intp)
+
+    def _advance(self, reference):
+        """Atténuer toutes les sommes jusqu'au nouvel instant de référence"""
+        if self.origin is None:
+            self.origin = float(reference)
+        if self.reference is not None and reference > self.reference:
+            self._sums *= 0.5 ** ((reference - self.reference) / DAY / self.halflife_days)
+        self.reference = float(reference) if self.reference is None else max(self.reference, float(reference))
+
+    def _accumulate(self, rows, timestamps, matrix):
+        """Ajouter une grille séries x instants aux sommes (poids relatifs à la référence)"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if not len(rows) or not len(timestamps):
+            return
+        valid = ~np.isnan(matrix)
+        weights = valid * (0.5 ** ((self.reference - timestamps) / DAY / self.halflife_days))
+        values = np.where(valid, matrix, 0.0) * weights
+        t = (timestamps - self.origin) / DAY
+        onehot = np.zeros((len(timestamps), self.season_slots))
+        onehot[np.arange(len(timestamps)), self._slots(timestamps)] = 1.0
+        t_onehot = onehot * t[:, None]
+        sums = self._sums
+        sums[rows, 0] += weights @ onehot
+        sums[rows, 1] += weights @ t_onehot
+        sums[rows, 2] += values @ onehot
+        sums[rows, 3] += weights @ (t_onehot * t[:, None])
+        sums[rows, 4] += values @ t_onehot
+        self._points[rows] += valid.sum(axis=1)
+
+    def integrate(self, keys, timestamps, matrix, reference=None):
+        """
+        Intégrer des points alignés (séries x instants)
+
+        Args:
+            keys (list): Noms des séries (lignes)
+            timestamps (array): Instants (colonnes)
+            matrix (array): Débits (NaN: absent)
+            reference (float): Instant de référence des poids (dernier instant par défaut)
+        """
+        matrix = np.asarray(matrix, dtype=np.float64).reshape(len(keys), len(timestamps))
+        with self._lock:
+            rows = self._rows(keys)
+            if reference is None:
+                reference = float(np.max(timestamps)) if len(timestamps) else time.time()
+            self._advance(reference)
+            self._accumulate(rows, timestamps, matrix)
+
+    def set_capacity(self, keys, capacity_bps):
+        """Capacités (bits/s) des séries, NaN si inconnue"""
+        with self._lock:
+            self._capacity[self._rows(keys)] = np.asarray(capacity_bps, dtype=np.float64)
+
+    def _fit(self):
+        """Ordonnée, pente (par jour) et facteurs par créneau de toutes les séries"""
+        n, st, sy, stt, sty = (self._sums[:, i] for i in range(5))
+        total_n, total_t, total_y = n.sum(axis=1), st.sum(axis=1), sy.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_t = np.where(total_n > 1e-12, total_t / total_n, 0.0)
+            sxx = stt.sum(axis=1) - total_t * mean_t
+            sxy = sty.sum(axis=1) - total_y * mean_t
+            slope = np.where(sxx > 1e-9, sxy / sxx, 0.0)
+            intercept = np.where(total_n > 1e-12, (total_y - slope * total_t) / total_n, np.nan)
+            trend = intercept[:, None] * n + slope[:, None] * st
+            factors = np.where((n > 1e-12) & (trend > 0), sy / trend, np.nan)
+        return intercept, slope, factors
+
+    def predict(self, keys, timestamps):
+        """
+        Débits prévus par le modèle
+
+        Args:
+            keys (list): Séries connues
+            timestamps (array): Instants
+
+        Returns:
+            array: Séries x instants (NaN si le créneau n'a jamais été observé)
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        with self._lock:
+            rows = self._rows(keys)
+            if self.origin is None:
+                return np.full((len(rows), len(timestamps)), np.nan)
+            intercept, slope, factors = self._fit()
+            t = (timestamps - self.origin) / DAY
+            return (intercept[rows, None] + slope[rows, None] * t) * factors[rows][:, self._slots(timestamps)]
+
+    def forecast(self, now=None):
+        """
+        Prévision de toutes les séries
+
+        Le franchissement est le premier instant où un créneau prévu atteint
+        threshold x capacité (déjà atteint: prochain passage de ce créneau).
+
+        Args:
+            now (float): Instant de la prévision (maintenant par défaut)
+
+        Returns:
+            dict: Tableaux alignés sur names: 'trend_bps_per_day', 'peak_bps'
+                  (pic prévu sur la période en cours), 'capacity_bps',
+                  'utilization' (pic / capacité), 'crossing_ts' (inf si aucun
+                  dans l'horizon), 'points'
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            count = len(self._names)
+            capacity = self._capacity.copy()
+            points = self._points.copy()
+            if self.origin is None or not count:
+                empty = np.full(count, np.nan)
+                return {'trend_bps_per_day': empty, 'peak_bps': empty, 'capacity_bps': capacity,
+                        'utilization': empty, 'crossing_ts': np.full(count, np.inf), 'points': points}
+            intercept, slope, factors = self._fit()
+
+        t_now = (now - self.origin) / DAY
+        current = (intercept + slope * t_now)[:, None] * factors
+        ready = points >= self.min_points
+        with np.errstate(invalid='ignore', divide='ignore'):
+            peak = np.where(ready, np.nanmax(np.where(np.isnan(current), -np.inf, current), axis=1), np.nan)
+            limit = (self.threshold * capacity)[:, None]
+            # Instant (epoch) où le niveau de chaque créneau atteint la limite
+            rising = (slope[:, None] > 0) & (factors > 0)
+            reached = self.origin + (limit / factors - intercept[:, None]) / np.where(rising, slope[:, None], 1.0) * DAY
+            candidate = np.where(rising, np.maximum(reached, now), np.where(current >= limit, now, np.inf))
+            candidate[np.isnan(candidate) | ~ready[:, None]] = np.inf
+            # Prochain passage du créneau à partir de cet instant
+            finite = np.isfinite(candidate)
+            safe = np.where(finite, candidate, now)
+            width = self.season_seconds / self.season_slots
+            slot_start = (safe // self.season_seconds * self.season_seconds
+                          + np.arange(self.season_slots) * width)
+            slot_start = np.where(slot_start + width <= safe, slot_start + self.season_seconds, slot_start)
+            crossing = np.where(finite, np.maximum(slot_start, safe), np.inf).min(axis=1)
+            crossing[crossing > now + self.horizon_days * DAY] = np.inf
+            utilization = peak / capacity
+        return {'trend_bps_per_day': np.where(ready, slope, np.nan), 'peak_bps': peak, 'capacity_bps': capacity,
+                'utilization': utilization, 'crossing_ts': crossing, 'points': points}
+
+    def refresh(self, store, now=None, metrics=None):
+        """
+        Intégrer les heures complètes arrivées depuis le dernier rafraîchissement
+
+        Les séries déjà suivies ne relisent que les nouvelles heures; une
+        nouvelle série lit history_days d'historique. Les capacités sont
+        relues (dernier point '<tunnel>.capacity_bps').
+
+        Args:
+            store (TimeSeriesStore): Historique
+            now (float): Instant courant (maintenant par défaut)
+            metrics (list): Séries de débit (toutes les métriques '*.rx_bps' / '*.tx_bps' par défaut)
+
+        Returns:
+            int: Heures intégrées (0 si rien de nouveau)
+        """
+        now = now if now is not None else time.time()
+        if metrics is None:
+            metrics = [metric for metric in store.metrics() if metric.endswith(RATE_SUFFIXES)]
+        # Les rollups horaires sont horodatés au début de l'heure: seules les heures closes sont lues
+        end = now // 3600 * 3600
+        with self._lock:
+            known = [metric for metric in metrics if metric in self._index]
+            new = [metric for metric in metrics if metric not in self._index]
+            start = self.reference + 3600 if self.reference is not None else None
+        if start is not None and start >= end and not new:
+            return 0
+
+        integrated = 0
+        batches = []
+        if known and start is not None and start < end:
+            batches.append((known, start))
+        if new:
+            batches.append((new, end - self.history_days * DAY))
+        grids = [(keys,) + series_matrix(store, keys, first, end - 1, resolution='1h', agg='max')
+                 for keys, first in batches]
+        capacities = [
+            (store.latest(metric[:-len(RATE_SUFFIXES[0])] + CAPACITY_SUFFIX) or (None, np.nan))[1]
+            for metric in metrics
+        ]
+        with self._lock:
+            self._advance(end - 3600)
+            for keys, grid, matrix in grids:
+                self._accumulate(self._rows(keys), grid, matrix)
+                integrated = max(integrated, len(grid))
+            self._capacity[self._rows(metrics)] = capacities
+        return integrated
+
+    def save(self, path):
+        """Enregistrer l'état (remplacement atomique du fichier)"""
+        with self._lock:
+            if self.origin is None:
+                return False
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(tmp_path, names=np.array(self._names, dtype=str), sums=self._sums, points=self._points,
+                     capacity=self._capacity, times=np.array([self.origin, self.reference]))
+            os.replace(tmp_path, path)
+        return True
+
+    def load(self, path):
+        """Recharger un état enregistré (False si absent ou incompatible)"""
+        try:
+            with np.load(path) as saved:
+                names, sums = saved['names'].tolist(), saved['sums']
+                points, capacity, times = saved['points'], saved['capacity'], saved['times']
+        except (OSError, KeyError, ValueError):
+            return False
+        if sums.shape[1:] != (5, self.season_slots) or len(names) != len(sums):
+            return False
+        with self._lock:
+            self._names = names
+            self._index = {name: row for row, name in enumerate(names)}
+            self._sums, self._points, self._capacity = sums, points, capacity
+            self.origin, self.reference = float(times[0]), float(times[1])
+        return True
+
+
+def tunnel_forecasts(forecaster, now=None):
+    """
+    Prévision par tunnel (sens rx / tx le plus proche du seuil)
+
+    Args:
+        forecaster (CapacityForecaster): Modèle rafraîchi
+        now (float): Instant de la prévision (maintenant par défaut)
+
+    Returns:
+        list: {'tunnel', 'direction', 'capacity_bps', 'peak_bps', 'utilization_pct',
+               'trend_bps_per_day', 'crossing_ts' (None si aucun), 'days_left', 'points'},
+              les franchissements les plus proches d'abord
+    """
+    now = now if now is not None else time.time()
+    result = forecaster.forecast(now)
+    tunnels = {}
+    for row, name in enumerate(forecaster.names):
+        if not name.endswith(RATE_SUFFIXES):
+            continue
+        tunnel = name[len('tunnel.'):-len(RATE_SUFFIXES[0])] if name.startswith('tunnel.') \
+            else name[:-len(RATE_SUFFIXES[0])]
+        crossing = float(result['crossing_ts'][row])
+        utilization = float(result['utilization'][row])
+        entry = {
+            'tunnel': tunnel,
+            'direction': name[-len('rx_bps'):-len('_bps')],
+            'capacity_bps': None if np.isnan(result['capacity_bps'][row]) else float(result['capacity_bps'][row]),
+            'peak_bps': None if np.isnan(result['peak_bps'][row]) else float(result['peak_bps'][row]),
+            'utilization_pct': None if np.isnan(utilization) else round(utilization * 100, 1),
+            'trend_bps_per_day': None if np.isnan(result['trend_bps_per_day'][row])
+            else float(result['trend_bps_per_day'][row]),
+            'crossing_ts': crossing if np.isfinite(crossing) else None,
+            'days_left': round((crossing - now) / DAY, 1) if np.isfinite(crossing) else None,
+            'points': int(result['points'][row])
+        }
+        rank = (crossing, -(0.0 if np.isnan(utilization) else utilization))
+        if tunnel not in tunnels or rank < tunnels[tunnel][0]:
+            tunnels[tunnel] = (rank, entry)
+    return [entry for _, entry in sorted(tunnels.values(), key=lambda item: item[0])]
+
+
+def refresh_capacity_forecast(forecaster, store, path=None):
+    """
+    Rafraîchir le modèle et enregistrer son état s'il a intégré de nouvelles heures
+
+    Returns:
+        int: Heures intégrées
+    """
+    hours = forecaster.refresh(store)
+    if hours:
+        forecaster.save(path or get_capacity_forecast_file())
+    return hours
+
+
+def get_capacity_forecast_file():
+    """Chemin de l'état du modèle de capacité (FORECAST_FILE dans config.env)"""
+    root = os.path.join(os.path.dirname(__file__), '..', '..')
+    config_path = os.path.join(root, 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    path = os.getenv('FORECAST_FILE', 'data/capacity_forecast.npz')
+    if not os.path.isabs(path):
+        path = os.path.join(root, path)
+    return os.path.normpath(path)
+
+
+def get_capacity_forecaster():
+    """Créer le modèle de capacité configuré via config.env (FORECAST_*), état enregistré rechargé"""
+    config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    forecaster = CapacityForecaster(
+        threshold=float(os.getenv('FORECAST_THRESHOLD', '0.8')),
+        halflife_days=float(os.getenv('FORECAST_HALFLIFE_DAYS', '30')),
+        history_days=float(os.getenv('FORECAST_HISTORY_DAYS', '28')),
+        horizon_days=float(os.getenv('FORECAST_HORIZON_DAYS', '365'))
+    )
+    forecaster.load(get_capacity_forecast_file())
+    return forecaster
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Exécution de commandes CLI en masse
+Description: Jeux de commandes des fichiers de validation soumis au command runner DNA Center par lots, sondage adaptatif des tâches et restitution par équipement
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from utils.dnac_tasks import TaskTracker, task_file_id
+
+# Limites d'une requête read-request du command runner
+COMMANDS_PER_REQUEST = 5
+DEVICES_PER_REQUEST = 100
+
+# Mots-clés acceptés si l'API legit-reads n'est pas disponible
+DEFAULT_READ_KEYWORDS = ('show', 'ping', 'traceroute')
+
+_SECTION_RE = re.compile(r'^!\s*([A-ZÀ-Ü0-9][^a-z!]*[A-ZÀ-Ü0-9)])\s*$')
+
+
+def load_command_set(path, section=None):
+    """
+    Lire un jeu de commandes (configurations/validation/*.cfg)
+
+    Les lignes '!' sont des commentaires; les titres encadrés de '====='
+    délimitent des sections (ex: 'VALIDATION TUNNEL VPN - HQ ROUTER').
+
+    Args:
+        path (str): Fichier de validation
+        section (str): Ne garder que les sections dont le titre contient ce texte
+
+    Returns:
+        list: Commandes distinctes, dans l'ordre du fichier
+    """
+    commands = {}
+    current = ''
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped.startswith('!'):
+                match = _SECTION_RE.match(stripped)
+                if match:
+                    current = match.group(1)
+                continue
+            # Commentaire en fin de ligne (ex: "ping 10.0.0.1 source 10.0.0.2  ! Tunnel")
+            command = stripped.split(' !', 1)[0].strip()
+            if not command:
+                continue
+            if section and section.lower() not in current.lower():
+                continue
+            commands.setdefault(command, None)
+    return list(commands)
+
+
+def _chunks(items, size):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+class CommandRunner:
+    """
+    Exécution de commandes en lecture sur un parc via le command runner DNA Center
+
+    Les commandes sont découpées en requêtes de COMMANDS_PER_REQUEST commandes
+    sur DEVICES_PER_REQUEST équipements. Les tâches créées sont suivies par un
+    TaskTracker (sondage mutualisé à intervalle croissant); le fichier de
+    résultats d'une tâche est récupéré dès qu'elle se termine.
+    """
+
+    def __init__(self, client, workers=4, poll_initial=1.0, poll_max=15.0, poll_factor=1.5,
+                 timeout=600, command_timeout=0):
+        """
+        Initialiser l'exécuteur
+
+        Args:
+            client: Client DNA Center authentifié (attributs session et base_url)
+            workers (int): Requêtes API simultanées (soumission et sondage)
+            poll_initial (float): Premier intervalle de sondage (secondes)
+            poll_max (float): Intervalle de sondage maximal
+            poll_factor (float): Facteur d'allongement de l'intervalle sans progrès
+            timeout (float): Durée maximale d'attente des tâches
+            command_timeout (int): Délai par commande transmis au command runner (0 = défaut)
+        """
+        self.session = client.session
+        self.request_timeout = getattr(client, 'request_timeout', None)
+        self.base_url = client.base_url.rstrip('/')
+        self.workers = max(1, int(workers))
+        self.timeout = timeout
+        self.command_timeout = command_timeout
+        self.tracker = TaskTracker(client, poll_initial=poll_initial, poll_max=poll_max,
+                                   poll_factor=poll_factor, workers=self.workers, timeout=timeout)
+
+    @property
+    def polls(self):
+        """Appels API de sondage des tâches"""
+        return self.tracker.api_calls
+
+    def _url(self, path):
+        return f"{self.base_url}/dna/intent/api/v1/{path}"
+
+    def read_keywords(self):
+        """Mots-clés de commandes autorisés par le command runner (legit-reads)"""
+        try:
+            response = self.session.get(self._url('network-device-poller/cli/legit-reads'),
+                                        timeout=self.request_timeout)
+            if response.status_code == 200:
+                keywords = response.json().get('response')
+                if keywords:
+                    return tuple(keyword.lower() for keyword in keywords)
+        except (OSError, ValueError):
+            pass
+        return DEFAULT_READ_KEYWORDS
+
+    def filter_commands(self, commands):
+        """
+        Séparer les commandes acceptées par le command runner des autres
+
+        Returns:
+            tuple: (commandes exécutables, commandes ignorées)
+        """
+        keywords = self.read_keywords()
+        accepted, skipped = [], []
+        for command in commands:
+            (accepted if command.split()[0].lower() in keywords else skipped).append(command)
+        return accepted, skipped
+
+    def _submit(self, device_ids, commands, name):
+        body = {'name': name, 'commands': commands, 'deviceUuids': device_ids, 'timeout': self.command_timeout}
+        response = self.session.post(self._url('network-device-poller/cli/read-request'), json=body,
+                                     timeout=self.request_timeout)
+        if response.status_code not in (200, 202):
+            raise RuntimeError(f"read-request refusée ({response.status_code}): {response.text[:200]}")
+        return response.json()['response']['taskId']
+
+    def _file(self, file_id):
+        response = self.session.get(self._url(f'file/{file_id}'), timeout=self.request_timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"Fichier de résultats {file_id} indisponible ({response.status_code})")
+        return response.json()
+
+    def run(self, device_ids, commands, name='validation'):
+        """
+        Exécuter des commandes sur des équipements
+
+        Args:
+            device_ids (list): Identifiants (UUID) DNA Center
+            commands (list): Commandes en lecture (voir filter_commands)
+            name (str): Nom des requêtes
+
+        Yields:
+            dict: Résultat d'un équipement dès que toutes ses commandes sont revenues
+                  {'deviceUuid', 'success': {commande: sortie}, 'failure': {...},
+                   'blacklisted': {...}, 'errors': [...]}
+        """
+        device_ids = list(dict.fromkeys(device_ids))
+        if not device_ids or not commands:
+            return
+        requests_ = [
+            (devices, chunk)
+            for devices in _chunks(device_ids, DEVICES_PER_REQUEST)
+            for chunk in _chunks(list(commands), COMMANDS_PER_REQUEST)
+        ]
+        remaining = {device_id: len(_chunks(list(commands), COMMANDS_PER_REQUEST)) for device_id in device_ids}
+        results = {
+            device_id: {'deviceUuid': device_id, 'success': {}, 'failure': {}, 'blacklisted': {}, 'errors': []}
+            for device_id in device_ids
+        }
+
+        def complete(devices, output=None, error=None):
+            done = []
+            by_device = {}
+            for entry in output or []:
+                by_device[entry.get('deviceUuid')] = entry.get('commandResponses', {})
+            for device_id in devices:
+                result = results[device_id]
+                if error:
+                    result['errors'].append(error)
+                for status, key in (('SUCCESS', 'success'), ('FAILURE', 'failure'), ('BLACKLISTED', 'blacklisted')):
+                    result[key].update(by_device.get(device_id, {}).get(status, {}))
+                remaining[device_id] -= 1
+                if remaining[device_id] == 0:
+                    done.append(results.pop(device_id))
+            return done
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            submissions = executor.map(
+                lambda request: self._try(self._submit, request[0], request[1], name), requests_
+            )
+            tracked = {}
+            for (devices, _), (task_id, error) in zip(requests_, submissions):
+                if error:
+                    yield from complete(devices, error=error)
+                else:
+                    future = self.tracker.track(task_id, finished=_runner_task_finished)
+                    tracked[future] = devices
+
+            try:
+                for future in as_completed(tracked, timeout=self.timeout):
+                    devices = tracked.pop(future)
+                    try:
+                        file_id = task_file_id(future.result())
+                    except Exception as e:
+                        yield from complete(devices, error=str(e))
+                        continue
+                    output, error = self._try(self._file, file_id)
+                    yield from complete(devices, output, error)
+            except FutureTimeoutError:
+                for devices in tracked.values():
+                    yield from complete(devices, error="Délai d'attente dépassé")
+
+    @staticmethod
+    def _try(function, *args):
+        try:
+            return function(*args), None
+        except Exception as e:
+            return None, str(e)
+
+
+def _runner_task_finished(task):
+    """Tâche read-request terminée: erreur ou fichier de résultats disponible"""
+    return bool(task.get('isError') or task_file_id(task))
@@ -11,13 +11,17 @@ from dotenv import load_dotenv
 from requests.auth import HTTPBasicAuth
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 
+from utils.dnac_cassette import get_cassette
+from utils.instrumentation import RequestInstrumentation, instrument_session, mount_retry_adapter
+
 # Supprimer les avertissements SSL pour les environnements de lab
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
 class DNACClient:
     """Client pour l'API Cisco DNA Center"""
     
-    def __init__(self, base_url, username, password):
+    def __init__(self, base_url, username, password, instrumentation=None, max_retries=2, cassette=None,
+                 request_timeout=30):
         """
         Initialiser le client DNA Center
         
@@ -25,13 +29,25 @@ class DNACClient:
             base_url (str): URL de base du DNA Center
             username (str): Nom d'utilisateur
             password (str): Mot de passe
+            instrumentation (RequestInstrumentation): Collecteur de mesures (un nouveau par défaut)
+            max_retries (int): Nouvelles tentatives sur 429/5xx pour les requêtes GET
+            cassette (Cassette): Enregistrement ou rejeu des réponses (voir utils.dnac_cassette)
+            request_timeout (float): Attente maximale de chaque requête (connexion et lecture, secondes)
         """
         self.base_url = base_url.rstrip('/')
         self.username = username
         self.password = password
         self.token = None
+        self.request_timeout = request_timeout
         self.session = requests.Session()
         self.session.verify = False  # Pour les environnements de lab uniquement
+        self.instrumentation = instrumentation or RequestInstrumentation()
+        self.cassette = cassette
+        if cassette:
+            cassette.mount(self.session, max_retries)
+        else:
+            mount_retry_adapter(self.session, max_retries)
+        instrument_session(self.session, self.instrumentation)
     
     def authenticate(self):
         """Authentification auprès du DNA Center"""
@@ -41,7 +57,8 @@ class DNACClient:
             response = self.session.post(
                 auth_url,
                 auth=HTTPBasicAuth(self.username, self.password),
-                headers={'Content-Type': 'application/json'}
+                headers={'Content-Type': 'application/json'},
+                timeout=self.request_timeout
             )
             
             if response.status_code == 200:
@@ -63,7 +80,7 @@ class DNACClient:
         url = f"{self.base_url}/dna/intent/api/v1/network-device"
         
         try:
-            response = self.session.get(url)
+            response = self.session.get(url, timeout=self.request_timeout)
             
             if response.status_code == 200:
                 return response.json()['response']
@@ -79,7 +96,7 @@ class DNACClient:
         url = f"{self.base_url}/dna/intent/api/v1/network-health"
         
         try:
-            response = self.session.get(url)
+            response = self.session.get(url, timeout=self.request_timeout)
             
             if response.status_code == 200:
                 return response.json()['response']
@@ -95,7 +112,7 @@ class DNACClient:
         url = f"{self.base_url}/dna/intent/api/v1/client-health"
         
         try:
-            response = self.session.get(url)
+            response = self.session.get(url, timeout=self.request_timeout)
             
             if response.status_code == 200:
                 return response.json()['response']
@@ -106,6 +123,22 @@ class DNACClient:
             print(f"Erreur lors de la récupération de la santé des clients: {str(e)}")
             return None
 
+    def get_physical_topology(self):
+        """Récupérer la topologie physique (nœuds et liens)"""
+        url = f"{self.base_url}/dna/intent/api/v1/topology/physical-topology"
+        
+        try:
+            response = self.session.get(url, timeout=self.request_timeout)
+            
+            if response.status_code == 200:
+                return response.json()['response']
+            else:
+                return None
+                
+        except Exception as e:
+            print(f"Erreur lors de la récupération de la topologie: {str(e)}")
+            return None
+
 def get_dnac_client():
     """Créer et authentifier un client DNA Center"""
     config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
@@ -117,7 +150,8 @@ def get_dnac_client():
         username = os.getenv('DNAC_USERNAME', 'devnetuser')
         password = os.getenv('DNAC_PASSWORD', 'Cisco123!')
         
-        client = DNACClient(base_url, username, password)
+        client = DNACClient(base_url, username, password, cassette=get_cassette(),
+                            request_timeout=float(os.getenv('DNAC_REQUEST_TIMEOUT', '30')))
         
         if client.authenticate():
             return client
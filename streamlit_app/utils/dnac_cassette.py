@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Enregistrement / rejeu des réponses DNA Center
+Description: Cassettes compressées des échanges HTTP (secrets masqués), rejouées hors ligne avec le timing d'origine ou accéléré
+"""
+
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from dotenv import load_dotenv
+
+from utils.instrumentation import retry_policy
+
+CASSETTE_VERSION = 1
+MODES = ('off', 'record', 'replay')
+REDACTED = 'REDACTED'
+
+# En-têtes jamais écrits en clair dans une cassette
+SENSITIVE_HEADERS = frozenset(['authorization', 'proxy-authorization', 'x-auth-token', 'cookie', 'set-cookie'])
+# Clés JSON masquées dans les corps (jeton renvoyé par /auth/token, mots de passe)
+SENSITIVE_KEYS = frozenset(['Token', 'token', 'access_token', 'refresh_token', 'password', 'Password'])
+# En-têtes inutiles au rejeu (le corps est stocké décompressé)
+DROPPED_HEADERS = frozenset(['content-encoding', 'transfer-encoding', 'content-length', 'connection', 'keep-alive'])
+
+
+def _redact_headers(headers):
+    return {
+        name: (REDACTED if name.lower() in SENSITIVE_HEADERS else value)
+        for name, value in headers.items()
+        if name.lower() not in DROPPED_HEADERS
+    }
+
+
+def _redact_value(value):
+    if isinstance(value, dict):
+        return {k: (REDACTED if k in SENSITIVE_KEYS else _redact_value(v)) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact_value(v) for v in value]
+    return value
+
+
+def _redact_body(content):
+    """Masquer les clés sensibles d'un corps JSON (inchangé sinon)"""
+    if not content or not any(key.encode() in content for key in SENSITIVE_KEYS):
+        return content
+    try:
+        document = json.loads(content)
+    except ValueError:
+        return content
+    return json.dumps(_redact_value(document), separators=(',', ':')).encode()
+
+
+def _encode_body(content):
+    if not content:
+        return {}
+    try:
+        return {'body': content.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'body_b64': base64.b64encode(content).decode('ascii')}
+
+
+def _decode_body(interaction):
+    if 'body_b64' in interaction:
+        return base64.b64decode(interaction['body_b64'])
+    return interaction.get('body', '').encode('utf-8')
+
+
+def request_key(method, url, body=None):
+    """
+    Clé de correspondance d'une requête (indépendante de l'hôte et de l'ordre des paramètres)
+
+    Args:
+        method (str): Méthode HTTP
+        url (str): URL complète
+        body (bytes | str): Corps de la requête (pris en compte s'il est présent)
+
+    Returns:
+        str: Ex: 'GET /dna/intent/api/v1/network-device?limit=500'
+    """
+    parts = urlsplit(url)
+    key = f"{method.upper()} {parts.path}"
+    if parts.query:
+        key += '?' + urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    if body:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        key += ' #' + hashlib.sha1(body).hexdigest()[:12]
+    return key
+
+
+class Cassette:
+    """Suite ordonnée d'échanges HTTP enregistrés"""
+
+    def __init__(self, path, mode='replay', speed=1.0):
+        """
+        Initialiser la cassette
+
+        Args:
+            path (str): Fichier de cassette (JSON lignes compressé gzip)
+            mode (str): 'record' (appels réels enregistrés) ou 'replay' (aucun accès réseau)
+            speed (float): Facteur appliqué aux durées d'origine lors du rejeu
+                           (1.0 = timing réel, 0.5 = deux fois plus vite, 0 = immédiat)
+        """
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Mode de cassette invalide: {mode}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.interactions = []
+        self._started = None
+        self._cursors = {}
+        self._by_key = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if mode == 'replay':
+            self.load()
+        else:
+            atexit.register(self.save)
+
+    def load(self):
+        """Charger la cassette depuis le disque"""
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != CASSETTE_VERSION:
+                raise ValueError(f"Version de cassette non supportée: {header.get('version')}")
+            self.interactions = [json.loads(line) for line in f if line.strip()]
+        self._by_key = {}
+        for interaction in self.interactions:
+            self._by_key.setdefault(interaction['key'], []).append(interaction)
+        self._cursors = {}
+
+    def save(self):
+        """Écrire la cassette (appelé automatiquement à la fin du processus en mode record)"""
+        with self._lock:
+            if not self._dirty:
+                return self.path
+            interactions = list(self.interactions)
+            self._dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=9) as f:
+            f.write(json.dumps({'version': CASSETTE_VERSION, 'recorded_at': time.time(),
+                                'interactions': len(interactions)}) + '\n')
+            for interaction in interactions:
+                f.write(json.dumps(interaction, ensure_ascii=False, separators=(',', ':')) + '\n')
+        os.replace(tmp_path, self.path)
+        return self.path
+
+    def record(self, request, response, started):
+        """
+        Ajouter un échange (secrets masqués)
+
+        Args:
+            request (requests.PreparedRequest): Requête envoyée
+            response (requests.Response): Réponse reçue
+            started (float): Horodatage perf_counter de l'envoi
+        """
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        body = request.body.encode('utf-8') if isinstance(request.body, str) else request.body
+        interaction = {
+            'key': request_key(request.method, request.url, body),
+            'method': request.method,
+            'url': request.url,
+            'request_headers': _redact_headers(request.headers),
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': _redact_headers(response.headers),
+            'elapsed_ms': round(elapsed_ms, 3)
+        }
+        interaction.update(_encode_body(_redact_body(response.content)))
+        with self._lock:
+            if self._started is None:
+                self._started = started
+            interaction['offset_ms'] = round((started - self._started) * 1000, 3)
+            self.interactions.append(interaction)
+            self._dirty = True
+
+    def next_interaction(self, request):
+        """
+        Réponse enregistrée pour une requête
+
+        Les réponses d'une même clé sont servies dans l'ordre d'enregistrement,
+        la dernière étant répétée une fois la série épuisée (sondages successifs).
+
+        Args:
+            request (requests.PreparedRequest): Requête à rejouer
+
+        Returns:
+            dict: Échange enregistré, None si la requête est inconnue
+        """
+        key = request_key(request.method, request.url, request.body)
+        with self._lock:
+            candidates = self._by_key.get(key)
+            if not candidates:
+                return None
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            return candidates[min(cursor, len(candidates) - 1)]
+
+    def replay_delay(self, interaction):
+        """
+        Attente avant de servir un échange rejoué
+
+        Durée d'origine de l'échange, allongée si besoin pour ne pas répondre
+        avant son instant d'origine (offset_ms depuis le début du rejeu): les
+        écarts entre requêtes et le parallélisme enregistrés sont restitués.
+        Le tout est multiplié par speed.
+
+        Args:
+            interaction (dict): Échange enregistré
+
+        Returns:
+            float: Attente en secondes
+        """
+        elapsed = interaction.get('elapsed_ms', 0) / 1000 * self.speed
+        with self._lock:
+            now = time.perf_counter()
+            if self._started is None:
+                self._started = now
+            started = self._started
+        due = started + interaction.get('offset_ms', 0) / 1000 * self.speed + elapsed
+        return max(elapsed, due - now)
+
+    def mount(self, session, max_retries=2):
+        """
+        Brancher la cassette sur le transport d'une session
+
+        Args:
+            session (requests.Session): Session à configurer
+            max_retries (int): Nouvelles tentatives (mode record uniquement)
+
+        Returns:
+            requests.Session: La même session
+        """
+        if self.mode == 'record':
+            adapter = RecordingAdapter(self, max_retries=retry_policy(max_retries))
+        else:
+            adapter = ReplayAdapter(self)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport réel dont chaque réponse est copiée dans la cassette"""
+
+    def __init__(self, cassette, **kwargs):
+        self.cassette = cassette
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        if not kwargs.get('stream'):
+            self.cassette.record(request, response, started)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport hors ligne servant les réponses d'une cassette"""
+
+    def __init__(self, cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        interaction = self.cassette.next_interaction(request)
+        if interaction is None:
+            raise requests.ConnectionError(
+                f"Aucune réponse enregistrée pour {request.method} {request.url}", request=request
+            )
+        delay = self.cassette.replay_delay(interaction)
+        if delay > 0:
+            time.sleep(delay)
+
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response.reason = interaction.get('reason')
+        response.headers = CaseInsensitiveDict(interaction.get('headers', {}))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = _decode_body(interaction)
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(milliseconds=interaction.get('elapsed_ms', 0))
+        return response
+
+    def close(self):
+        pass
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette():
+    """
+    Cassette du processus configurée via config.env (une seule instance par
+    chemin et mode: en mode record, tous les clients écrivent dans la même
+    cassette, sauvegardée une fois à la fin du processus)
+
+    DNAC_CASSETTE_MODE: off | record | replay
+    DNAC_CASSETTE: chemin de la cassette
+    DNAC_REPLAY_SPEED: facteur de timing au rejeu
+
+    Returns:
+        Cassette: Cassette, None si le mode est 'off'
+    """
+    config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    mode = os.getenv('DNAC_CASSETTE_MODE', 'off').lower()
+    if mode not in MODES:
+        raise ValueError(f"DNAC_CASSETTE_MODE invalide: {mode}")
+    if mode == 'off':
+        return None
+    path = os.getenv('DNAC_CASSETTE', 'data/cassettes/dnac.jsonl.gz')
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(__file__), '..', '..', path)
+    key = (os.path.normpath(path), mode)
+    with _cassettes_lock:
+        cassette = _cassettes.get(key)
+        if cassette is None:
+            cassette = _cassettes[key] = Cassette(key[0], mode)
+        cassette.speed = float(os.getenv('DNAC_REPLAY_SPEED', '1.0'))
+        return cassette
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Fédération de clusters DNA Center
+Description: Collecte concurrente de plusieurs clusters (authentification et limite de débit propres), vue fusionnée avec suivi de fraîcheur
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+from utils.dnac_api import DNACClient
+from utils.dnac_cassette import get_cassette
+from utils.instrumentation import RequestInstrumentation
+
+
+class RateLimiter:
+    """Seau à jetons: au plus 'rate' requêtes par seconde, rafales de 'burst'"""
+
+    def __init__(self, rate, burst=None):
+        """
+        Initialiser le limiteur
+
+        Args:
+            rate (float): Requêtes par seconde (0 = illimité)
+            burst (int): Taille maximale d'une rafale (rate arrondi par défaut)
+        """
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, round(self.rate)))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Attendre qu'un jeton soit disponible"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+    def hook(self, context):
+        """Hook 'before' de RequestInstrumentation"""
+        self.acquire()
+
+
+class DNACFederation:
+    """
+    Collecte concurrente de plusieurs clusters DNA Center
+
+    Chaque cluster a son client (session, jeton, limiteur de débit et
+    instrumentation). refresh() attend les clusters au plus 'timeout'
+    secondes: un cluster lent continue sa collecte en arrière-plan et la vue
+    sert son dernier instantané, marqué périmé.
+    """
+
+    def __init__(self, clusters, max_age=300, timeout=15, cassette=None):
+        """
+        Initialiser la fédération
+
+        Args:
+            clusters (list): Clusters {'name', 'url', 'username', 'password', 'rate_limit',
+                             'request_timeout'}
+            max_age (float): Âge (secondes) au-delà duquel un instantané est périmé
+            timeout (float): Attente maximale d'un refresh() avant de servir la vue
+            cassette (Cassette): Enregistrement ou rejeu (un seul cluster uniquement:
+                                 les clés de cassette ne tiennent pas compte de l'hôte)
+        """
+        names = [cluster['name'] for cluster in clusters]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Noms de clusters en double: {', '.join(names)}")
+        self.clusters = {cluster['name']: dict(cluster) for cluster in clusters}
+        self.max_age = float(max_age)
+        self.timeout = float(timeout)
+        self.cassette = cassette if len(clusters) == 1 else None
+        self._clients = {}
+        self._snapshots = {}
+        self._status = {
+            name: {'status': 'pending', 'last_success': None, 'last_attempt': None,
+                   'duration_ms': None, 'error': None}
+            for name in self.clusters
+        }
+        self._in_flight = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(clusters)), thread_name_prefix='dnac-cluster')
+        self._lock = threading.Lock()
+
+    def _client(self, name):
+        client = self._clients.get(name)
+        if client is None:
+            cluster = self.clusters[name]
+            instrumentation = RequestInstrumentation()
+            instrumentation.add_hook(before=RateLimiter(cluster.get('rate_limit', 10)).hook)
+            client = DNACClient(cluster['url'], cluster['username'], cluster['password'],
+                                instrumentation=instrumentation, cassette=self.cassette,
+                                request_timeout=cluster.get('request_timeout', 30))
+            if not client.authenticate():
+                raise RuntimeError("Authentification refusée")
+            self._clients[name] = client
+        return client
+
+    def _collect(self, name):
+        """Collecter un cluster (exécuté dans le pool)"""
+        started = time.perf_counter()
+        with self._lock:
+            self._status[name]['last_attempt'] = time.time()
+        try:
+            client = self._client(name)
+            devices = client.get_network_devices()
+            if devices is None:
+                # Jeton expiré ou cluster indisponible: réauthentifier au prochain cycle
+                self._clients.pop(name, None)
+                raise RuntimeError("Inventaire indisponible")
+            snapshot = {
+                'devices': devices,
+                'network_health': client.get_network_health(),
+                'client_health': client.get_client_health(),
+                'collected_at': time.time()
+            }
+        except Exception as e:
+            with self._lock:
+                self._status[name].update({
+                    'status': 'error', 'error': str(e),
+                    'duration_ms': (time.perf_counter() - started) * 1000
+                })
+            return False
+        with self._lock:
+            self._snapshots[name] = snapshot
+            self._status[name].update({
+                'status': 'ok', 'error': None, 'last_success': snapshot['collected_at'],
+                'duration_ms': (time.perf_counter() - started) * 1000
+            })
+        return True
+
+    def refresh(self, timeout=None):
+        """
+        Lancer la collecte de tous les clusters et renvoyer la vue fusionnée
+
+        Un cluster dont la collecte précédente est encore en cours n'est pas relancé.
+
+        Args:
+            timeout (float): Attente maximale (self.timeout par défaut)
+
+        Returns:
+            dict: Vue fusionnée (voir view())
+        """
+        futures = []
+        with self._lock:
+            for name in self.clusters:
+                future = self._in_flight.get(name)
+                if future is None or future.done():
+                    future = self._in_flight[name] = self._executor.submit(self._collect, name)
+                futures.append(future)
+        wait(futures, timeout=self.timeout if timeout is None else timeout)
+        return self.view()
+
+    def cluster_status(self, now=None):
+        """
+        État de collecte par cluster
+
+        Returns:
+            list: {'cluster', 'url', 'status', 'devices', 'age_s', 'stale', 'collecting',
+                   'duration_ms', 'error'}
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = []
+            for name, cluster in self.clusters.items():
+                status = self._status[name]
+                snapshot = self._snapshots.get(name)
+                age = now - status['last_success'] if status['last_success'] else None
+                future = self._in_flight.get(name)
+                rows.append({
+                    'cluster': name,
+                    'url': cluster['url'],
+                    'status': status['status'],
+                    'devices': len(snapshot['devices']) if snapshot else 0,
+                    'age_s': None if age is None else round(age, 1),
+                    'stale': age is None or age > self.max_age,
+                    'collecting': future is not None and not future.done(),
+                    'duration_ms': None if status['duration_ms'] is None else round(status['duration_ms'], 1),
+                    'error': status['error']
+                })
+        return rows
+
+    def view(self, now=None):
+        """
+        Vue fusionnée des derniers instantanés
+
+        Les équipements reçoivent 'cluster' et un identifiant global 'uid'
+        ('<cluster>:<id>'); les santés sont conservées par cluster et agrégées
+        (score moyen pondéré par le nombre d'équipements, totaux de clients).
+
+        Returns:
+            dict: {'devices', 'network_health', 'client_health', 'clusters'}
+        """
+        clusters = self.cluster_status(now)
+        with self._lock:
+            snapshots = dict(self._snapshots)
+
+        devices = []
+        network_health = {'clusters': {}}
+        client_health = {'clusters': {}}
+        weighted, weight = 0.0, 0
+        totals = {}
+        for name, snapshot in snapshots.items():
+            for device in snapshot['devices']:
+                merged = dict(device)
+                merged['cluster'] = name
+                merged['uid'] = f"{name}:{device.get('id') or device.get('hostname')}"
+                devices.append(merged)
+
+            health = snapshot['network_health']
+            if isinstance(health, list):
+                health = health[0] if health else None
+            if isinstance(health, dict):
+                network_health['clusters'][name] = health
+                score = health.get('healthScore', health.get('overallHealthScore'))
+                if score is not None:
+                    count = len(snapshot['devices']) or 1
+                    weighted += float(score) * count
+                    weight += count
+
+            clients = snapshot['client_health']
+            if isinstance(clients, list):
+                clients = clients[0] if clients else None
+            if isinstance(clients, dict):
+                client_health['clusters'][name] = clients
+                for key in ('totalClients', 'healthyClients', 'unhealthyClients'):
+                    if key in clients:
+                        totals[key] = totals.get(key, 0) + clients[key]
+
+        if weight:
+            network_health['healthScore'] = round(weighted / weight, 1)
+        client_health.update(totals)
+        if totals.get('totalClients'):
+            client_health['healthScore'] = round(100.0 * totals.get('healthyClients', 0) / totals['totalClients'], 1)
+        return {
+            'devices': devices,
+            'network_health': network_health,
+            'client_health': client_health,
+            'clusters': clusters
+        }
+
+    def close(self):
+        """Arrêter le pool (les collectes en cours se terminent)"""
+        self._executor.shutdown(wait=False)
+
+
+def load_clusters(environ=None):
+    """
+    Clusters déclarés dans config.env
+
+    DNAC_CLUSTERS liste les noms (ex: emea,amer); chaque cluster lit
+    DNAC_<NOM>_URL, _USERNAME, _PASSWORD, _RATE_LIMIT et _REQUEST_TIMEOUT,
+    avec repli sur DNAC_URL / DNAC_USERNAME / DNAC_PASSWORD / DNAC_RATE_LIMIT /
+    DNAC_REQUEST_TIMEOUT. Sans
+    DNAC_CLUSTERS, un cluster unique 'default' est construit depuis DNAC_URL.
+
+    Args:
+        environ (dict): Variables de configuration (os.environ par défaut)
+
+    Returns:
+        list: Clusters {'name', 'url', 'username', 'password', 'rate_limit', 'request_timeout'}
+    """
+    environ = os.environ if environ is None else environ
+    names = [n.strip() for n in environ.get('DNAC_CLUSTERS', '').split(',') if n.strip()] or ['default']
+    clusters = []
+    for name in names:
+        prefix = f"DNAC_{name.upper()}_" if name != 'default' else 'DNAC_'
+
+        def setting(key, default):
+            return environ.get(prefix + key) or environ.get('DNAC_' + key) or default
+
+        clusters.append({
+            'name': name,
+            'url': setting('URL', 'https://sandboxdnac2.cisco.com'),
+            'username': setting('USERNAME', 'devnetuser'),
+            'password': setting('PASSWORD', 'Cisco123!'),
+            'rate_limit': float(setting('RATE_LIMIT', '10')),
+            'request_timeout': float(setting('REQUEST_TIMEOUT', '30'))
+        })
+    return clusters
+
+
+_federation = None
+_federation_lock = threading.Lock()
+
+
+def get_federation():
+    """Obtenir la fédération du processus (configurée via config.env)"""
+    global _federation
+    with _federation_lock:
+        if _federation is None:
+            config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+            if os.path.exists(config_path):
+                load_dotenv(config_path)
+            _federation = DNACFederation(
+                load_clusters(),
+                max_age=float(os.getenv('DNAC_STALE_SECONDS', '300')),
+                timeout=float(os.getenv('DNAC_FEDERATION_TIMEOUT', '15')),
+                cassette=get_cassette()
+            )
+        return _federation
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Suivi des tâches DNA Center
+Description: Sondage mutualisé des taskId (lots, intervalle croissant par tâche) exposé sous forme de futures et de callbacks
+"""
+
+import heapq
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Taille de page de l'API de liste des tâches
+LIST_PAGE_SIZE = 500
+# Marge sur startTime (horloges client / contrôleur non synchronisées)
+START_MARGIN_MS = 60000
+
+
+class TaskError(Exception):
+    """Tâche DNA Center terminée en erreur"""
+
+    def __init__(self, task):
+        self.task = task
+        super().__init__(task.get('failureReason') or task.get('progress') or 'Tâche en erreur')
+
+
+def task_finished(task):
+    """Critère de fin par défaut: erreur ou endTime renseigné"""
+    return bool(task.get('isError') or task.get('endTime'))
+
+
+def task_file_id(task):
+    """Identifiant du fichier de résultats (progress JSON du command runner), None sinon"""
+    progress = task.get('progress') or ''
+    if 'fileId' not in progress:
+        return None
+    try:
+        return json.loads(progress).get('fileId')
+    except ValueError:
+        return None
+
+
+class _Tracked:
+    __slots__ = ('task_id', 'future', 'finished', 'interval', 'due', 'deadline', 'started_ms')
+
+    def __init__(self, task_id, future, finished, interval, due, deadline, started_ms):
+        self.task_id = task_id
+        self.future = future
+        self.finished = finished
+        self.interval = interval
+        self.due = due
+        self.deadline = deadline
+        self.started_ms = started_ms
+
+
+class TaskTracker:
+    """
+    Suivi de nombreuses tâches DNA Center avec un seul fil de sondage
+
+    Chaque tâche a sa propre échéance, repoussée d'un facteur poll_factor à
+    chaque sondage infructueux. Les tâches échues sont interrogées ensemble:
+    individuellement (GET /task/{id}) tant qu'elles sont peu nombreuses, par
+    l'API de liste (GET /task?startTime=...) au-delà de list_threshold. Une
+    liste met alors à jour toutes les tâches suivies, échues ou non: le nombre
+    d'appels croît avec le nombre de pages, pas avec le nombre de tâches.
+    """
+
+    def __init__(self, client, poll_initial=1.0, poll_max=15.0, poll_factor=1.5,
+                 list_threshold=8, workers=4, timeout=600):
+        """
+        Initialiser le suivi
+
+        Args:
+            client: Client DNA Center authentifié (attributs session et base_url)
+            poll_initial (float): Délai avant le premier sondage d'une tâche (secondes)
+            poll_max (float): Intervalle maximal entre deux sondages d'une tâche
+            poll_factor (float): Facteur d'allongement de l'intervalle
+            list_threshold (int): Tâches échues à partir desquelles l'API de liste est utilisée
+            workers (int): Sondages individuels simultanés
+            timeout (float): Durée maximale de suivi d'une tâche (défaut de track())
+        """
+        self.session = client.session
+        self.request_timeout = getattr(client, 'request_timeout', None)
+        self.base_url = client.base_url.rstrip('/')
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.poll_factor = poll_factor
+        self.list_threshold = list_threshold
+        self.timeout = timeout
+        self.api_calls = 0
+        self.list_supported = True
+        self._tasks = {}
+        self._schedule = []
+        self._seq = itertools.count()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='dnac-task')
+        self._wakeup = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    def _url(self, path):
+        return f"{self.base_url}/dna/intent/api/v1/{path}"
+
+    # ------------------------------------------------------------------
+    # API publique
+    # ------------------------------------------------------------------
+
+    def track(self, task_id, callback=None, finished=task_finished, timeout=None):
+        """
+        Suivre une tâche
+
+        Args:
+            task_id (str): taskId renvoyé par DNA Center
+            callback (callable): callback(future) appelé à la fin de la tâche
+            finished (callable): finished(task) -> bool, critère de fin (task_finished par défaut)
+            timeout (float): Durée maximale de suivi (self.timeout par défaut)
+
+        Returns:
+            concurrent.futures.Future: Résultat = tâche finale (dict); TaskError si
+            la tâche échoue, TimeoutError si elle dépasse le délai
+        """
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+        now = time.monotonic()
+        tracked = _Tracked(task_id, future, finished, self.poll_initial, now + self.poll_initial,
+                           now + (self.timeout if timeout is None else timeout),
+                           int(time.time() * 1000) - START_MARGIN_MS)
+        with self._wakeup:
+            if self._closed:
+                raise RuntimeError("Suivi des tâches arrêté")
+            existing = self._tasks.get(task_id)
+            if existing is not None:
+                # Même tâche suivie deux fois: partager le résultat
+                existing.future.add_done_callback(lambda done: _copy_result(done, future))
+                return future
+            self._tasks[task_id] = tracked
+            heapq.heappush(self._schedule, (tracked.due, next(self._seq), task_id))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='dnac-task-poller', daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+        return future
+
+    def pending(self):
+        """Nombre de tâches en cours de suivi"""
+        with self._wakeup:
+            return len(self._tasks)
+
+    def close(self):
+        """Arrêter le sondage (les futures non terminées sont annulées)"""
+        with self._wakeup:
+            self._closed = True
+            tasks = list(self._tasks.values())
+            self._tasks.clear()
+            self._wakeup.notify()
+        for tracked in tasks:
+            tracked.future.cancel()
+        self._executor.shutdown(wait=False)
+
+    # ------------------------------------------------------------------
+    # Sondage
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._closed:
+                    now = time.monotonic()
+                    if self._schedule and self._schedule[0][0] <= now:
+                        break
+                    timeout = self._schedule[0][0] - now if self._schedule else None
+                    self._wakeup.wait(timeout)
+                if self._closed:
+                    return
+                # Regrouper avec les tâches qui échoient peu après (un seul lot)
+                horizon = now + self.poll_initial / 2
+                due = []
+                while self._schedule and self._schedule[0][0] <= horizon:
+                    _, _, task_id = heapq.heappop(self._schedule)
+                    tracked = self._tasks.get(task_id)
+                    if tracked is not None and tracked.due <= horizon:
+                        due.append(tracked)
+            if due:
+                self._poll(due)
+
+    def _poll(self, due):
+        results = {}
+        if self.list_supported and len(due) >= self.list_threshold:
+            with self._wakeup:
+                since = min((tracked.started_ms for tracked in self._tasks.values()), default=None)
+            if since is not None:
+                results = self._list_tasks(since)
+        missing = [tracked for tracked in due if tracked.task_id not in results]
+        if missing:
+            fetched = self._executor.map(self._get_task, [tracked.task_id for tracked in missing])
+            for tracked, task in zip(missing, fetched):
+                if task is not None:
+                    results[tracked.task_id] = task
+            self.api_calls += len(missing)
+
+        now = time.monotonic()
+        completed = []
+        due_ids = {tracked.task_id for tracked in due}
+        with self._wakeup:
+            # Une liste renseigne aussi les tâches non échues: les terminer sans attendre
+            candidates = due + [self._tasks[task_id] for task_id in results
+                                if task_id in self._tasks and task_id not in due_ids]
+            for tracked in candidates:
+                if self._tasks.get(tracked.task_id) is not tracked:
+                    continue
+                task = results.get(tracked.task_id)
+                if task is not None and tracked.finished(task):
+                    completed.append((tracked, task))
+                    del self._tasks[tracked.task_id]
+                elif now >= tracked.deadline:
+                    completed.append((tracked, None))
+                    del self._tasks[tracked.task_id]
+                elif tracked.task_id in due_ids:
+                    tracked.interval = min(self.poll_max, tracked.interval * self.poll_factor)
+                    tracked.due = now + tracked.interval
+                    heapq.heappush(self._schedule, (tracked.due, next(self._seq), tracked.task_id))
+
+        for tracked, task in completed:
+            if task is None:
+                tracked.future.set_exception(TimeoutError(f"Tâche {tracked.task_id} non terminée dans le délai"))
+            elif task.get('isError'):
+                tracked.future.set_exception(TaskError(task))
+            else:
+                tracked.future.set_result(task)
+
+    def _get_task(self, task_id):
+        try:
+            response = self.session.get(self._url(f'task/{task_id}'), timeout=self.request_timeout)
+            if response.status_code == 200:
+                return response.json().get('response')
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _list_tasks(self, since_ms):
+        """Tâches démarrées depuis since_ms, indexées par identifiant (pages successives)"""
+        tasks = {}
+        offset = 1
+        while True:
+            try:
+                response = self.session.get(self._url('task'), params={
+                    'startTime': since_ms, 'offset': offset, 'limit': LIST_PAGE_SIZE,
+                    'sortBy': 'startTime', 'order': 'asc'
+                }, timeout=self.request_timeout)
+                self.api_calls += 1
+            except OSError:
+                return tasks
+            if response.status_code in (400, 404, 405):
+                # Liste non disponible sur ce contrôleur: sondages individuels uniquement
+                self.list_supported = False
+                return tasks
+            if response.status_code != 200:
+                return tasks
+            page = response.json().get('response') or []
+            for task in page:
+                if task.get('id'):
+                    tasks[task['id']] = task
+            if len(page) < LIST_PAGE_SIZE:
+                return tasks
+            offset += LIST_PAGE_SIZE
+
+
+def _copy_result(source, target):
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Cache des graphiques Plotly
+Description: Réutilisation des figures construites tant que les données affichées n'ont pas changé (LRU + taille mémoire)
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Propriétés de traces portant les données (l'essentiel de la taille d'une figure)
+_ARRAY_PROPERTIES = ('x', 'y', 'z', 'text', 'customdata', 'hovertext', 'ids', 'lat', 'lon',
+                     'labels', 'values', 'parents', 'r', 'theta')
+
+
+def data_version(*parts):
+    """
+    Empreinte du contenu des données d'un graphique
+
+    Les tableaux NumPy sont hachés sur leurs octets (sans conversion en
+    liste), les autres valeurs sur leur représentation texte.
+
+    Args:
+        *parts: Tableaux, listes, scalaires ou dict composant les données
+
+    Returns:
+        str: Empreinte hexadécimale (16 caractères)
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        if isinstance(part, dict):
+            for key in sorted(part, key=str):
+                digest.update(str(key).encode())
+                digest.update(data_version(part[key]).encode())
+            continue
+        if (isinstance(part, (list, tuple)) and part and not isinstance(part[0], (str, bytes))) \
+                or (hasattr(part, '__array__') and not isinstance(part, np.ndarray)):
+            try:
+                part = np.asarray(part)
+            except (TypeError, ValueError):
+                pass
+        if isinstance(part, np.ndarray) and part.dtype != object:
+            digest.update(str(part.dtype).encode())
+            digest.update(str(part.shape).encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def figure_nbytes(figure):
+    """
+    Estimer la mémoire occupée par les données d'une figure
+
+    Les tableaux NumPy comptent pour leurs octets, les séquences 8 octets
+    par élément (plus la longueur des chaînes): l'estimation ne sérialise
+    pas la figure, contrairement à plotly.io.to_json.
+
+    Args:
+        figure (plotly.graph_objects.Figure): Figure construite
+
+    Returns:
+        int: Taille estimée en octets
+    """
+    size = 1024
+    for trace in figure.data:
+        size += 256
+        for name in _ARRAY_PROPERTIES:
+            if name not in trace:
+                continue
+            value = trace[name]
+            if isinstance(value, np.ndarray):
+                size += value.nbytes
+            elif isinstance(value, (list, tuple)):
+                size += 8 * len(value) + sum(len(item) for item in value if isinstance(item, str))
+    return size
+
+
+class FigureCache:
+    """
+    Figures Plotly par (graphique, version des données, paramètres)
+
+    Les figures mises en cache sont partagées entre les sessions et les
+    reruns: elles ne doivent pas être modifiées après construction. Une
+    version None (données simulées, différentes à chaque rerun) construit la
+    figure sans la mettre en cache ni mesurer sa taille.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=64 * 1024 * 1024):
+        """
+        Initialiser le cache
+
+        Args:
+            max_entries (int): Nombre maximal de figures conservées
+            max_bytes (int): Taille cumulée maximale des figures (voir figure_nbytes)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        # clé -> (figure, taille estimée)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(chart_id, version, params):
+        if params is None:
+            return (chart_id, version, None)
+        return (chart_id, version, tuple(sorted((k, repr(v)) for k, v in params.items())))
+
+    def get_or_build(self, chart_id, version, builder, params=None):
+        """
+        Obtenir une figure, en ne la reconstruisant que si nécessaire
+
+        Args:
+            chart_id (str): Identifiant du graphique (ex: 'dashboard.trafic')
+            version: Version des données affichées (voir data_version), None si
+                     les données sont simulées (aucune mise en cache)
+            builder (callable): Fonction sans argument construisant la figure
+            params (dict): Paramètres d'affichage (fenêtre, tunnel, titre...)
+
+        Returns:
+            plotly.graph_objects.Figure: Figure (partagée, ne pas modifier)
+        """
+        if version is None:
+            with self._lock:
+                self.bypassed += 1
+            return builder()
+
+        key = self._key(chart_id, version, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Construction hors verrou: deux sessions peuvent construire la même
+        # figure en parallèle, la dernière remplace simplement la première
+        figure = builder()
+        size = figure_nbytes(figure)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            # Une seule version par (graphique, paramètres): les anciennes sont inutiles
+            for stale in [k for k in self._entries if k[0] == chart_id and k[2] == key[2]]:
+                self.nbytes -= self._entries.pop(stale)[1]
+            if size <= self.max_bytes:
+                self._entries[key] = (figure, size)
+                self.nbytes += size
+                self._evict()
+        return figure
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.nbytes -= size
+
+    def invalidate(self, chart_id=None):
+        """
+        Supprimer les figures d'un graphique (toutes si chart_id est None)
+
+        Args:
+            chart_id (str): Identifiant du graphique
+        """
+        with self._lock:
+            for key in [k for k in self._entries if chart_id is None or k[0] == chart_id]:
+                self.nbytes -= self._entries.pop(key)[1]
+
+    def stats(self):
+        """
+        Statistiques du cache
+
+        Returns:
+            dict: entries, bytes, hits, misses, bypassed
+        """
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.nbytes, 'hits': self.hits, 'misses': self.misses,
+                    'bypassed': self.bypassed}
+
+
+_figure_cache = None
+_figure_cache_lock = threading.Lock()
+
+
+def get_figure_cache():
+    """Obtenir le cache de figures du processus (configuré via config.env)"""
+    global _figure_cache
+    with _figure_cache_lock:
+        if _figure_cache is None:
+            config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+            if os.path.exists(config_path):
+                load_dotenv(config_path)
+            _figure_cache = FigureCache(
+                max_entries=int(os.getenv('FIGURE_CACHE_ENTRIES', '128')),
+                max_bytes=int(float(os.getenv('FIGURE_CACHE_MB', '64')) * 1024 * 1024)
+            )
+        return _figure_cache
+
+
+def cached_figure(chart_id, version, builder, params=None):
+    """
+    Raccourci vers get_figure_cache().get_or_build()
+
+    Args:
+        chart_id (str): Identifiant du graphique
+        version: Version des données affichées (None: données simulées, pas de cache)
+        builder (callable): Fonction construisant la figure
+        params (dict): Paramètres d'affichage
+
+    Returns:
+        plotly.graph_objects.Figure: Figure
+    """
+    return get_figure_cache().get_or_build(chart_id, version, builder, params)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Instrumentation des appels HTTP
+Description: Hooks avant/après requête, histogrammes de latence par endpoint, tailles, codes, retries et spans
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.latency_sketch import LatencyHistogram
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+# Segments d'URL variables (UUID, identifiants numériques ou hexadécimaux)
+_ID_SEGMENT_RE = re.compile(
+    r'/(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+|[0-9a-fA-F]{16,})(?=/|$)'
+)
+
+
+def endpoint_name(method, url):
+    """
+    Nom d'endpoint normalisé (méthode + chemin, identifiants remplacés par {id})
+
+    Args:
+        method (str): Méthode HTTP
+        url (str): URL appelée
+
+    Returns:
+        str: Ex: 'GET /dna/intent/api/v1/network-device/{id}'
+    """
+    return f"{method.upper()} {_ID_SEGMENT_RE.sub('/{id}', urlsplit(url).path)}"
+
+
+class _EndpointStats:
+    __slots__ = ('latency', 'statuses', 'errors', 'retries', 'bytes', 'max_bytes')
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.statuses = {}
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.max_bytes = 0
+
+
+class RequestInstrumentation:
+    """Collecte des mesures par endpoint et points d'extension avant/après requête"""
+
+    def __init__(self, trace=False, max_spans=1000):
+        """
+        Initialiser l'instrumentation
+
+        Args:
+            trace (bool): Conserver les spans de chaque requête (et les publier
+                          via OpenTelemetry s'il est installé)
+            max_spans (int): Nombre maximal de spans conservés en mémoire
+        """
+        self.trace = trace
+        self.spans = deque(maxlen=max_spans)
+        self._before_hooks = []
+        self._after_hooks = []
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._tracer = otel_trace.get_tracer(__name__) if (trace and otel_trace) else None
+
+    def add_hook(self, before=None, after=None):
+        """
+        Enregistrer des hooks
+
+        Args:
+            before (callable): before(context) appelé avant l'envoi ; context est un
+                               dict ('method', 'url', 'endpoint', 'kwargs') modifiable
+            after (callable): after(context, response, error) appelé après la réponse
+                              (response est None en cas d'exception)
+        """
+        if before:
+            self._before_hooks.append(before)
+        if after:
+            self._after_hooks.append(after)
+
+    def call(self, send, method, url, **kwargs):
+        """
+        Exécuter une requête instrumentée
+
+        Args:
+            send (callable): Fonction d'envoi (Session.request d'origine)
+            method (str): Méthode HTTP
+            url (str): URL
+
+        Returns:
+            requests.Response: Réponse
+        """
+        context = {'method': method, 'url': url, 'endpoint': endpoint_name(method, url), 'kwargs': kwargs}
+        for hook in self._before_hooks:
+            hook(context)
+
+        otel_span = self._tracer.start_span(context['endpoint']) if self._tracer else None
+        started = time.perf_counter()
+        context['started_at'] = time.time()
+        response, error = None, None
+        try:
+            response = send(method, context['url'], **context['kwargs'])
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            context['duration_ms'] = (time.perf_counter() - started) * 1000
+            self._record(context, response, error)
+            if otel_span is not None:
+                otel_span.set_attribute('http.method', method.upper())
+                otel_span.set_attribute('http.url', context['url'])
+                if response is not None:
+                    otel_span.set_attribute('http.status_code', response.status_code)
+                otel_span.end()
+            for hook in self._after_hooks:
+                hook(context, response, error)
+
+    def _record(self, context, response, error):
+        size = 0
+        retries = 0
+        status = 'error'
+        if response is not None:
+            status = response.status_code
+            if not context['kwargs'].get('stream'):
+                size = len(response.content or b'')
+            history = getattr(getattr(response.raw, 'retries', None), 'history', None)
+            retries = len(history) if history else 0
+        context.update({'status': status, 'size': size, 'retries': retries})
+
+        with self._lock:
+            stats = self._stats.get(context['endpoint'])
+            if stats is None:
+                stats = self._stats[context['endpoint']] = _EndpointStats()
+            stats.latency.add(context['duration_ms'])
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.retries += retries
+            stats.bytes += size
+            stats.max_bytes = max(stats.max_bytes, size)
+            if error is not None or (response is not None and response.status_code >= 400):
+                stats.errors += 1
+            if self.trace:
+                self.spans.append({
+                    'name': context['endpoint'],
+                    'start': context['started_at'],
+                    'duration_ms': context['duration_ms'],
+                    'status': status,
+                    'size': size,
+                    'retries': retries,
+                    'error': str(error) if error else None
+                })
+
+    def summary(self):
+        """
+        Statistiques par endpoint
+
+        Returns:
+            dict: endpoint -> {'count', 'errors', 'statuses', 'retries', 'bytes',
+                               'avg_bytes', 'max_bytes', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'total_ms'}
+        """
+        with self._lock:
+            result = {}
+            for endpoint, stats in self._stats.items():
+                p50, p95, p99 = stats.latency.quantiles([0.5, 0.95, 0.99])
+                count = stats.latency.total
+                result[endpoint] = {
+                    'count': count,
+                    'errors': stats.errors,
+                    'statuses': dict(stats.statuses),
+                    'retries': stats.retries,
+                    'bytes': stats.bytes,
+                    'avg_bytes': stats.bytes / count if count else 0,
+                    'max_bytes': stats.max_bytes,
+                    'p50_ms': p50,
+                    'p95_ms': p95,
+                    'p99_ms': p99,
+                    'max_ms': stats.latency.max if count else None,
+                    'total_ms': stats.latency.sum
+                }
+            return result
+
+    def format_summary(self):
+        """
+        Tableau texte des statistiques, trié par temps total décroissant
+
+        Returns:
+            str: Tableau formaté
+        """
+        rows = sorted(self.summary().items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        header = f"{'Endpoint':<60} {'Appels':>6} {'Err':>4} {'Retry':>5} {'p50':>8} {'p95':>8} {'max':>8} {'Total':>9} {'Octets':>10}"
+        lines = [header, '-' * len(header)]
+        for endpoint, stats in rows:
+            lines.append(
+                f"{endpoint[:60]:<60} {stats['count']:>6} {stats['errors']:>4} {stats['retries']:>5} "
+                f"{stats['p50_ms']:>6.0f}ms {stats['p95_ms']:>6.0f}ms {stats['max_ms']:>6.0f}ms "
+                f"{stats['total_ms'] / 1000:>8.2f}s {stats['bytes']:>10}"
+            )
+        return '\n'.join(lines)
+
+    def reset(self):
+        """Réinitialiser les statistiques et les spans"""
+        with self._lock:
+            self._stats.clear()
+            self.spans.clear()
+
+
+def instrument_session(session, instrumentation):
+    """
+    Faire passer toutes les requêtes d'une session par l'instrumentation
+
+    Args:
+        session (requests.Session): Session à instrumenter
+        instrumentation (RequestInstrumentation): Collecteur
+
+    Returns:
+        requests.Session: La même session
+    """
+    send = session.request
+
+    def request(method, url, **kwargs):
+        return instrumentation.call(send, method, url, **kwargs)
+
+    session.request = request
+    return session
+
+
+def retry_policy(max_retries=2, backoff_factor=0.5):
+    """
+    Politique de nouvelles tentatives des requêtes idempotentes (429 et 5xx transitoires)
+
+    Args:
+        max_retries (int): Nombre maximal de nouvelles tentatives
+        backoff_factor (float): Facteur d'attente exponentielle entre tentatives
+
+    Returns:
+        urllib3.util.retry.Retry: Politique à passer à un HTTPAdapter
+    """
+    return Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+
+def mount_retry_adapter(session, max_retries=2, backoff_factor=0.5):
+    """
+    Réessayer les requêtes idempotentes en cas de limitation (429) ou d'erreur 5xx transitoire
+
+    Les tentatives sont comptabilisées par l'instrumentation (colonne Retry).
+
+    Args:
+        session (requests.Session): Session à configurer
+        max_retries (int): Nombre maximal de nouvelles tentatives
+        backoff_factor (float): Facteur d'attente exponentielle entre tentatives
+    """
+    adapter = HTTPAdapter(max_retries=retry_policy(max_retries, backoff_factor))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Sketches de latence fusionnables
+Description: Histogrammes logarithmiques (erreur relative bornée) pour les percentiles RTT / gigue par chemin
+"""
+
+import fcntl
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.prefix_index import get_prefix_index
+
+# Plage couverte (ms) et erreur relative des quantiles
+DEFAULT_MIN_MS = 0.01
+DEFAULT_MAX_MS = 60000.0
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+
+class LatencyHistogram:
+    """
+    Histogramme à buckets logarithmiques (type HDR / DDSketch)
+
+    Deux histogrammes de mêmes paramètres ont la même grille de buckets:
+    la fusion est une simple addition de tableaux, exacte et associative.
+    """
+
+    __slots__ = ('min_value', 'max_value', 'accuracy', '_log_gamma', 'counts',
+                 'zero_count', 'total', 'sum', 'min', 'max')
+
+    def __init__(self, min_value=DEFAULT_MIN_MS, max_value=DEFAULT_MAX_MS,
+                 accuracy=DEFAULT_RELATIVE_ACCURACY):
+        """
+        Initialiser l'histogramme
+
+        Args:
+            min_value (float): Plus petite valeur distinguée (les valeurs inférieures vont dans le bucket zéro)
+            max_value (float): Plus grande valeur (les valeurs supérieures sont bornées)
+            accuracy (float): Erreur relative maximale sur un quantile
+        """
+        self.min_value = min_value
+        self.max_value = max_value
+        self.accuracy = accuracy
+        gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(gamma)
+        size = int(math.ceil(math.log(max_value / min_value) / self._log_gamma)) + 1
+        self.counts = np.zeros(size, dtype=np.int64)
+        self.zero_count = 0
+        self.total = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _layout(self):
+        return (self.min_value, self.max_value, self.accuracy)
+
+    def add(self, values):
+        """
+        Ajouter une ou plusieurs valeurs (ms)
+
+        Args:
+            values (float | array): Valeurs à enregistrer
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values) & (values >= 0)]
+        if not len(values):
+            return
+        small = values < self.min_value
+        self.zero_count += int(small.sum())
+        large = np.minimum(values[~small], self.max_value)
+        if len(large):
+            index = np.ceil(np.log(large / self.min_value) / self._log_gamma).astype(np.intp)
+            np.add.at(self.counts, np.minimum(index, len(self.counts) - 1), 1)
+        self.total += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        """
+        Fusionner un autre histogramme dans celui-ci
+
+        Args:
+            other (LatencyHistogram): Histogramme de mêmes paramètres
+
+        Returns:
+            LatencyHistogram: self
+        """
+        if other._layout() != self._layout():
+            raise ValueError("Impossible de fusionner des histogrammes de paramètres différents")
+        self.counts += other.counts
+        self.zero_count += other.zero_count
+        self.total += other.total
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self):
+        clone = LatencyHistogram(*self._layout())
+        return clone.merge(self)
+
+    def quantiles(self, qs):
+        """
+        Estimer des quantiles
+
+        Args:
+            qs (list): Quantiles entre 0 et 1 (ex: [0.5, 0.95, 0.99])
+
+        Returns:
+            list: Valeurs estimées (ms), None si l'histogramme est vide
+        """
+        if not self.total:
+            return [None for _ in qs]
+        cumulative = np.cumsum(self.counts) + self.zero_count
+        results = []
+        for q in qs:
+            rank = q * (self.total - 1)
+            if rank < self.zero_count:
+                results.append(self.min)
+                continue
+            index = int(np.searchsorted(cumulative, rank, side='right'))
+            # Point milieu du bucket (en relatif), borné par les extrêmes observés
+            value = self.min_value * 2 * math.exp(index * self._log_gamma) / (1 + math.exp(self._log_gamma))
+            results.append(min(max(value, self.min), self.max))
+        return results
+
+    def summary(self):
+        """
+        Résumé standard (p50 / p95 / p99, moyenne, extrêmes)
+
+        Returns:
+            dict: Statistiques en ms
+        """
+        p50, p95, p99 = self.quantiles([0.5, 0.95, 0.99])
+        return {
+            'count': self.total,
+            'avg': self.sum / self.total if self.total else None,
+            'min': self.min if self.total else None,
+            'max': self.max if self.total else None,
+            'p50': p50,
+            'p95': p95,
+            'p99': p99
+        }
+
+
+def _save_windows(path, windows):
+    """Enregistrer des fenêtres (buckets non nuls uniquement, remplacement atomique du fichier)"""
+    keys = list(windows)
+    arrays = {
+        'paths': np.array([key[0] for key in keys], dtype=str),
+        'starts': np.array([key[1] for key in keys], dtype=np.float64),
+        'durations': np.array([key[2] for key in keys], dtype=np.int64),
+        'layout': np.array(LatencyHistogram()._layout(), dtype=np.float64)
+    }
+    for kind in ('rtt', 'jitter'):
+        histograms = [windows[key][kind] for key in keys]
+        nonzero = [np.flatnonzero(h.counts) for h in histograms]
+        arrays[f"{kind}_stats"] = np.array(
+            [(h.zero_count, h.total, h.sum, h.min, h.max) for h in histograms], dtype=np.float64
+        ).reshape(-1, 5)
+        arrays[f"{kind}_offsets"] = np.concatenate([[0], np.cumsum([len(n) for n in nonzero])]).astype(np.int64)
+        arrays[f"{kind}_index"] = np.concatenate(nonzero + [np.zeros(0, dtype=np.intp)]).astype(np.int32)
+        arrays[f"{kind}_counts"] = np.concatenate(
+            [h.counts[n] for h, n in zip(histograms, nonzero)] + [np.zeros(0, dtype=np.int64)]
+        )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _load_windows(path):
+    """Recharger les fenêtres enregistrées ({} si absentes ou de paramètres différents)"""
+    try:
+        with np.load(path) as saved:
+            arrays = {name: saved[name] for name in saved.files}
+    except (OSError, ValueError):
+        return {}
+    if tuple(arrays.get('layout', ())) != LatencyHistogram()._layout():
+        return {}
+    windows = {}
+    for row, key in enumerate(zip(arrays['paths'].tolist(), arrays['starts'].tolist(),
+                                  arrays['durations'].tolist())):
+        window = windows[key] = {}
+        for kind in ('rtt', 'jitter'):
+            histogram = window[kind] = LatencyHistogram()
+            begin, end = arrays[f"{kind}_offsets"][row:row + 2]
+            histogram.counts[arrays[f"{kind}_index"][begin:end]] = arrays[f"{kind}_counts"][begin:end]
+            zero_count, total, total_sum, low, high = arrays[f"{kind}_stats"][row]
+            histogram.zero_count, histogram.total = int(zero_count), int(total)
+            histogram.sum, histogram.min, histogram.max = float(total_sum), float(low), float(high)
+    return windows
+
+
+class LatencySketchStore:
+    """
+    Sketches RTT et gigue par chemin et par fenêtre temporelle
+
+    Avec un fichier (path), les sketches sont partagés entre processus: les
+    écritures locales sont fusionnées dans le fichier par flush() sous verrou
+    fcntl (la fusion d'histogrammes est exacte, plusieurs sondeurs peuvent
+    écrire), et les lectures rechargent le fichier quand il a changé.
+    """
+
+    def __init__(self, window_seconds=300, coarse_window_seconds=3600,
+                 fine_retention=24 * 3600, retention=30 * 24 * 3600, compact_interval=None, path=None):
+        """
+        Initialiser le stockage
+
+        Args:
+            window_seconds (int): Durée des fenêtres récentes
+            coarse_window_seconds (int): Durée des fenêtres après compaction
+            fine_retention (int): Âge au-delà duquel les fenêtres sont fusionnées en fenêtres larges
+            retention (int): Âge au-delà duquel les fenêtres sont supprimées
+            compact_interval (float): Écart minimal entre deux compactions par les
+                                      écritures (window_seconds par défaut)
+            path (str): Fichier partagé des sketches (None: stockage privé au processus)
+        """
+        self.window_seconds = window_seconds
+        self.coarse_window_seconds = coarse_window_seconds
+        self.fine_retention = fine_retention
+        self.retention = retention
+        self.compact_interval = compact_interval if compact_interval is not None else window_seconds
+        self._compacted_at = 0.0
+        self.path = path
+        # (chemin, début de fenêtre, durée) -> {'rtt': LatencyHistogram, 'jitter': LatencyHistogram}
+        self._windows = {}
+        # Écritures locales pas encore fusionnées dans le fichier partagé
+        self._pending = {}
+        self._loaded_mtime = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def path_key(source, destination):
+        return f"{source or 'local'}->{destination}"
+
+    @staticmethod
+    def _window(windows, path, start, duration):
+        key = (path, start, duration)
+        window = windows.get(key)
+        if window is None:
+            window = windows[key] = {'rtt': LatencyHistogram(), 'jitter': LatencyHistogram()}
+        return window
+
+    @staticmethod
+    def _merge_windows(target, source):
+        for (path, start, duration), window in source.items():
+            merged = LatencySketchStore._window(target, path, start, duration)
+            merged['rtt'].merge(window['rtt'])
+            merged['jitter'].merge(window['jitter'])
+
+    @contextmanager
+    def _file_lock(self):
+        """Verrou exclusif entre processus écrivains du fichier partagé"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(f"{self.path}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def refresh(self):
+        """
+        Recharger le fichier partagé s'il a changé depuis la dernière lecture
+        (écritures locales non fusionnées conservées)
+
+        Returns:
+            bool: True si le fichier a été rechargé
+        """
+        if self.path is None:
+            return False
+        mtime = self._mtime()
+        if mtime is None or mtime == self._loaded_mtime:
+            return False
+        windows = _load_windows(self.path)
+        with self._lock:
+            self._merge_windows(windows, self._pending)
+            self._windows, self._loaded_mtime = windows, mtime
+        return True
+
+    def flush(self, now=None):
+        """
+        Fusionner les écritures locales dans le fichier partagé (compaction et
+        rétention appliquées au passage)
+
+        Args:
+            now (float): Horodatage de référence (maintenant par défaut)
+
+        Returns:
+            int: Nombre de fenêtres locales fusionnées
+        """
+        if self.path is None:
+            return 0
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            with self._file_lock():
+                windows = _load_windows(self.path)
+                self._merge_windows(windows, pending)
+                self._compact_windows(windows, now if now is not None else time.time())
+                _save_windows(self.path, windows)
+                mtime = self._mtime()
+        except OSError:
+            # Fichier inaccessible: écritures conservées pour le prochain flush
+            with self._lock:
+                self._merge_windows(pending, self._pending)
+                self._pending = pending
+            raise
+        with self._lock:
+            self._merge_windows(windows, self._pending)
+            self._windows, self._loaded_mtime = windows, mtime
+        return len(pending)
+
+    def record(self, path, rtts, ts=None):
+        """
+        Enregistrer une série de RTT pour un chemin
+
+        Args:
+            path (str): Identifiant du chemin (voir path_key)
+            rtts (list): RTT en ms, dans l'ordre d'émission
+            ts (float): Horodatage epoch (maintenant par défaut)
+        """
+        rtts = np.asarray(rtts, dtype=np.float64)
+        if not len(rtts):
+            return
+        ts = ts if ts is not None else time.time()
+        start = ts - ts % self.window_seconds
+        with self._lock:
+            targets = [self._windows] + ([self._pending] if self.path is not None else [])
+            for windows in targets:
+                window = self._window(windows, path, start, self.window_seconds)
+                window['rtt'].add(rtts)
+                if len(rtts) > 1:
+                    window['jitter'].add(np.abs(np.diff(rtts)))
+        self.maybe_compact()
+
+    def record_probe_results(self, results):
+        """
+        Enregistrer des résultats du moteur de sondes (ProbeEngine)
+
+        Les chemins sont identifiés par couple de sites (index de préfixes,
+        clés source_site / destination_site), l'adresse servant à défaut de
+        site connu. Les écritures sont ensuite fusionnées dans le fichier
+        partagé.
+
+        Args:
+            results (list): Résultats contenant 'source', 'destination', 'rtts', 'timestamp'
+        """
+        results = [dict(result) for result in results]
+        index = get_prefix_index()
+        index.attribute([r for r in results if 'source_site' not in r], 'source', 'source_')
+        index.attribute([r for r in results if 'destination_site' not in r], 'destination', 'destination_')
+        for result in results:
+            self.record(
+                self.path_key(result.get('source_site') or result.get('source'),
+                              result.get('destination_site') or result['destination']),
+                result.get('rtts') or [],
+                result.get('timestamp')
+            )
+        self.flush()
+
+    def paths(self):
+        """Chemins connus"""
+        self.refresh()
+        with self._lock:
+            return sorted({key[0] for key in self._windows})
+
+    def query(self, paths=None, start=None, end=None):
+        """
+        Fusionner les sketches d'un ensemble de chemins sur une plage
+
+        Args:
+            paths (list): Chemins à fusionner (tous si None), ou fonction de filtrage
+            start (float): Début de plage (epoch)
+            end (float): Fin de plage (epoch)
+
+        Returns:
+            dict: {'rtt': LatencyHistogram, 'jitter': LatencyHistogram}
+        """
+        self.refresh()
+        rtt, jitter = LatencyHistogram(), LatencyHistogram()
+        if paths is None:
+            accept = lambda path: True
+        elif callable(paths):
+            accept = paths
+        else:
+            wanted = set(paths)
+            accept = wanted.__contains__
+        with self._lock:
+            for (path, window_start, duration), window in self._windows.items():
+                if start is not None and window_start + duration <= start:
+                    continue
+                if end is not None and window_start > end:
+                    continue
+                if accept(path):
+                    rtt.merge(window['rtt'])
+                    jitter.merge(window['jitter'])
+        return {'rtt': rtt, 'jitter': jitter}
+
+    def maybe_compact(self, now=None):
+        """
+        Compacter si la dernière compaction date de plus de compact_interval
+        secondes (appelé par les écritures)
+
+        Returns:
+            bool: True si la compaction a eu lieu
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            if now - self._compacted_at < self.compact_interval:
+                return False
+            self._compacted_at = now
+        self.compact(now)
+        return True
+
+    def compact(self, now=None):
+        """
+        Fusionner les fenêtres anciennes en fenêtres larges et appliquer la rétention
+
+        Args:
+            now (float): Horodatage de référence (maintenant par défaut)
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._compact_windows(self._windows, now)
+
+    def _compact_windows(self, windows, now):
+        for key in list(windows):
+            path, window_start, duration = key
+            if window_start + duration <= now - self.retention:
+                del windows[key]
+            elif duration < self.coarse_window_seconds and window_start + duration <= now - self.fine_retention:
+                window = windows.pop(key)
+                coarse_start = window_start - window_start % self.coarse_window_seconds
+                coarse_key = (path, coarse_start, self.coarse_window_seconds)
+                coarse = windows.get(coarse_key)
+                if coarse is None:
+                    windows[coarse_key] = window
+                else:
+                    coarse['rtt'].merge(window['rtt'])
+                    coarse['jitter'].merge(window['jitter'])
+
+
+_latency_sketches = None
+_latency_sketches_lock = threading.Lock()
+
+
+def get_latency_sketches():
+    """
+    Obtenir le stockage de sketches de latence (configuré via config.env)
+
+    Partagé entre les sondeurs (connectivity_probe.py, metrics_exporter.py)
+    et le dashboard par le fichier LATENCY_SKETCH_FILE; privé au processus
+    si LATENCY_SKETCH_FILE est vide.
+    """
+    global _latency_sketches
+    with _latency_sketches_lock:
+        if _latency_sketches is None:
+            root = os.path.join(os.path.dirname(__file__), '..', '..')
+            config_path = os.path.join(root, 'config.env')
+            if os.path.exists(config_path):
+                load_dotenv(config_path)
+            path = os.getenv('LATENCY_SKETCH_FILE', 'data/latency_sketches.npz')
+            if path and not os.path.isabs(path):
+                path = os.path.normpath(os.path.join(root, path))
+            _latency_sketches = LatencySketchStore(
+                window_seconds=int(os.getenv('LATENCY_SKETCH_WINDOW_SECONDS', '300')),
+                retention=int(float(os.getenv('LATENCY_SKETCH_RETENTION_DAYS', '30')) * 86400),
+                path=path or None
+            )
+        return _latency_sketches
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Exporteur OpenMetrics / Prometheus
+Description: Exposition HTTP du dernier instantané VPN / DNA Center (aucun appel amont pendant un scrape)
+"""
+
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value is True:
+        return '1'
+    if value is False:
+        return '0'
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+class MetricsRegistry:
+    """
+    Instantané des métriques exposées
+
+    Les collecteurs mettent à jour l'instantané ; le rendu texte est mis en
+    cache et n'est recalculé qu'au premier scrape suivant une modification.
+    """
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        self._rendered = {}
+        self._previous_counters = {}
+        self.last_update = None
+
+    def describe(self, name, metric_type, help_text):
+        """
+        Déclarer une famille de métriques
+
+        Args:
+            name (str): Nom de la famille (sans suffixe _total pour les compteurs)
+            metric_type (str): 'gauge' ou 'counter'
+            help_text (str): Description
+        """
+        with self._lock:
+            family = self._families.setdefault(name, {'samples': {}})
+            family['type'] = metric_type
+            family['help'] = help_text
+
+    def set(self, name, labels, value):
+        """
+        Définir la valeur d'une série
+
+        Args:
+            name (str): Famille (déclarée via describe)
+            labels (dict): Étiquettes de la série
+            value (float): Valeur
+        """
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            self._families[name]['samples'][key] = value
+            self._version += 1
+
+    def set_counter(self, name, labels, value, ts=None):
+        """
+        Définir un compteur et calculer son débit depuis la mise à jour précédente
+
+        Le débit est publié dans la famille '<name>_rate' (par seconde).
+        """
+        ts = ts if ts is not None else time.time()
+        key = (name, tuple(sorted((labels or {}).items())))
+        self.set(name, labels, value)
+        previous = self._previous_counters.get(key)
+        self._previous_counters[key] = (ts, value)
+        if previous and ts > previous[0] and value >= previous[1]:
+            self.set(f"{name}_rate", labels, (value - previous[1]) / (ts - previous[0]))
+
+    def replace(self, name, samples):
+        """
+        Remplacer toutes les séries d'une famille (les séries disparues ne sont plus exposées)
+
+        Args:
+            name (str): Famille
+            samples (list): Couples (labels, valeur)
+        """
+        new_samples = {tuple(sorted((labels or {}).items())): value for labels, value in samples}
+        with self._lock:
+            self._families[name]['samples'] = new_samples
+            self._version += 1
+
+    def mark_updated(self, ts=None):
+        """Horodater l'instantané (exposé dans vpn_dnac_exporter_last_update_seconds)"""
+        self.last_update = ts if ts is not None else time.time()
+
+    @property
+    def series_count(self):
+        with self._lock:
+            return sum(len(family['samples']) for family in self._families.values())
+
+    def _render_text(self, openmetrics):
+        lines = []
+        for name in sorted(self._families):
+            family = self._families[name]
+            metric_type = family.get('type', 'gauge')
+            suffix = '_total' if metric_type == 'counter' else ''
+            exposed = name if openmetrics or not suffix else name + suffix
+            lines.append(f"# HELP {exposed} {family.get('help', '')}")
+            lines.append(f"# TYPE {exposed} {metric_type}")
+            for labels, value in family['samples'].items():
+                if labels:
+                    label_text = ','.join(f'{k}="{_escape_label(v)}"' for k, v in labels)
+                    lines.append(f"{name}{suffix}{{{label_text}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{name}{suffix} {_format_value(value)}")
+        if self.last_update is not None:
+            lines.append("# HELP vpn_dnac_exporter_last_update_seconds Horodatage du dernier instantané collecté")
+            lines.append("# TYPE vpn_dnac_exporter_last_update_seconds gauge")
+            lines.append(f"vpn_dnac_exporter_last_update_seconds {_format_value(self.last_update)}")
+        if openmetrics:
+            lines.append('# EOF')
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def render(self, openmetrics=False, compress=False):
+        """
+        Obtenir le texte d'exposition (mis en cache par version de l'instantané)
+
+        Args:
+            openmetrics (bool): Format OpenMetrics 1.0 (sinon format texte Prometheus 0.0.4)
+            compress (bool): Corps compressé gzip
+
+        Returns:
+            bytes: Corps de la réponse
+        """
+        cache_key = (openmetrics, compress)
+        with self._lock:
+            cached = self._rendered.get(cache_key)
+            if cached and cached[0] == (self._version, self.last_update):
+                return cached[1]
+            version = (self._version, self.last_update)
+            body = self._render_text(openmetrics)
+            if compress:
+                body = gzip.compress(body, compresslevel=1)
+            self._rendered[cache_key] = (version, body)
+            return body
+
+
+def describe_default_metrics(registry):
+    """Déclarer les familles exposées pour le VPN et DNA Center"""
+    registry.describe('vpn_tunnel_up', 'gauge', "État de l'interface tunnel (1 = up/up)")
+    registry.describe('vpn_overall_up', 'gauge', "État global du VPN selon VPNChecker")
+    registry.describe('vpn_ikev2_sa_up', 'gauge', "SA IKEv2 à l'état READY")
+    registry.describe('vpn_ikev2_sa_lifetime_seconds', 'gauge', "Durée de vie configurée de la SA IKEv2")
+    registry.describe('vpn_ikev2_sa_active_seconds', 'gauge', "Temps d'activité de la SA IKEv2")
+    registry.describe('vpn_ipsec_sa_remaining_seconds', 'gauge', "Durée de vie restante de la SA IPsec (secondes)")
+    registry.describe('vpn_ipsec_sa_remaining_kilobytes', 'gauge', "Volume restant avant rekey de la SA IPsec (Ko)")
+    registry.describe('vpn_ipsec_packets', 'counter', "Compteurs de paquets IPsec (show crypto ipsec sa)")
+    registry.describe('vpn_ipsec_packets_rate', 'gauge', "Débit des compteurs de paquets IPsec (par seconde)")
+    registry.describe('vpn_tunnel_bytes', 'counter', "Octets de l'interface tunnel")
+    registry.describe('vpn_tunnel_bytes_rate', 'gauge', "Débit de l'interface tunnel (octets par seconde)")
+    registry.describe('vpn_tunnel_mtu_bytes', 'gauge', "MTU de l'interface tunnel (SNMP)")
+    registry.describe('vpn_tunnel_errors', 'counter', "Erreurs de l'interface tunnel (SNMP)")
+    registry.describe('vpn_tunnel_errors_rate', 'gauge', "Débit des erreurs de l'interface tunnel (par seconde)")
+    registry.describe('snmp_agent_up', 'gauge', "Agent SNMP ayant répondu à la dernière collecte")
+    registry.describe('vpn_probe_loss_ratio', 'gauge', "Perte mesurée par les sondes de connectivité")
+    registry.describe('vpn_probe_rtt_avg_milliseconds', 'gauge', "RTT moyen mesuré par les sondes")
+    registry.describe('dnac_devices', 'gauge', "Nombre d'équipements DNA Center par statut de joignabilité")
+    registry.describe('dnac_network_health_score', 'gauge', "Score de santé réseau DNA Center")
+    registry.describe('dnac_client_health_score', 'gauge', "Score de santé des clients DNA Center")
+
+
+def update_from_vpn(registry, summary, sa_details=None, ts=None):
+    """
+    Mettre à jour l'instantané à partir de VPNChecker
+
+    Args:
+        registry (MetricsRegistry): Registre cible
+        summary (dict): Résultat de VPNChecker.get_vpn_summary()
+        sa_details (dict): Routeur -> résultat de VPNChecker.get_sa_details()
+        ts (float): Horodatage de la collecte
+    """
+    registry.set('vpn_overall_up', {}, summary.get('overall_status') == 'active')
+    for site in ('hq_router', 'branch_router'):
+        router = summary.get(site)
+        if not router:
+            continue
+        tunnel = router.get('tunnel', {})
+        labels = {'router': site, 'interface': tunnel.get('interface', 'Tunnel0')}
+        registry.set('vpn_tunnel_up', labels,
+                     tunnel.get('status') == 'up' and tunnel.get('line_protocol') == 'up')
+        ipsec = router.get('ipsec', {})
+        for counter in ('packets_encrypted', 'packets_decrypted'):
+            if counter in ipsec:
+                registry.set_counter('vpn_ipsec_packets', dict(labels, direction=counter.split('_')[1]),
+                                     ipsec[counter], ts)
+
+    connectivity = summary.get('connectivity') or {}
+    probe = connectivity.get('probe')
+    if probe:
+        labels = {'source': probe.get('source') or 'local', 'destination': probe['destination']}
+        registry.set('vpn_probe_loss_ratio', labels, probe['loss_pct'] / 100.0)
+        if probe.get('avg_rtt_ms') is not None:
+            registry.set('vpn_probe_rtt_avg_milliseconds', labels, probe['avg_rtt_ms'])
+
+    ikev2_samples, remaining_sec, remaining_kb = [], [], []
+    lifetime_samples, active_samples = [], []
+    for router, details in (sa_details or {}).items():
+        for sa in details.get('ikev2', []):
+            labels = {'router': router, 'local': sa['local'], 'remote': sa['remote']}
+            ikev2_samples.append((labels, sa['status'] == 'READY'))
+            if sa.get('lifetime') is not None:
+                lifetime_samples.append((labels, sa['lifetime']))
+                active_samples.append((labels, sa['active_time']))
+        for block in details.get('ipsec', []):
+            for sa in block.get('sas', []):
+                labels = {'router': router, 'interface': block['interface'],
+                          'direction': sa['direction'], 'spi': sa['spi']}
+                remaining_sec.append((labels, sa['remaining_sec']))
+                remaining_kb.append((labels, sa['remaining_kb']))
+        interface = details.get('interface') or {}
+        for field, direction in (('bytes_input', 'in'), ('bytes_output', 'out')):
+            if interface.get(field) is not None:
+                registry.set_counter('vpn_tunnel_bytes',
+                                     {'router': router, 'interface': interface.get('interface') or 'Tunnel0',
+                                      'direction': direction},
+                                     interface[field], ts)
+    if sa_details is not None:
+        # Les SA disparues (rekey) ne doivent plus être exposées
+        registry.replace('vpn_ikev2_sa_up', ikev2_samples)
+        registry.replace('vpn_ikev2_sa_lifetime_seconds', lifetime_samples)
+        registry.replace('vpn_ikev2_sa_active_seconds', active_samples)
+        registry.replace('vpn_ipsec_sa_remaining_seconds', remaining_sec)
+        registry.replace('vpn_ipsec_sa_remaining_kilobytes', remaining_kb)
+
+
+def update_from_dnac(registry, devices=None, network_health=None, client_health=None):
+    """
+    Mettre à jour l'instantané à partir des réponses DNA Center
+
+    Args:
+        registry (MetricsRegistry): Registre cible
+        devices (list): Réponse network-device
+        network_health (dict|list): Réponse network-health
+        client_health (dict|list): Réponse client-health
+    """
+    if devices is not None:
+        counts = {}
+        for device in devices:
+            key = (device.get('reachabilityStatus') or 'Unknown', device.get('family') or device.get('type') or 'Unknown')
+            counts[key] = counts.get(key, 0) + 1
+        registry.replace('dnac_devices', [
+            ({'reachability': status, 'family': family}, count) for (status, family), count in counts.items()
+        ])
+
+    if isinstance(network_health, list):
+        network_health = network_health[0] if network_health else None
+    if isinstance(network_health, dict):
+        samples = []
+        for key in ('healthScore', 'overallHealthScore', 'connectivity', 'performance', 'security', 'availability'):
+            if isinstance(network_health.get(key), (int, float)):
+                samples.append(({'category': key}, network_health[key]))
+        registry.replace('dnac_network_health_score', samples)
+
+    if isinstance(client_health, list):
+        client_health = client_health[0] if client_health else None
+    if isinstance(client_health, dict):
+        samples = []
+        if isinstance(client_health.get('healthScore'), (int, float)):
+            samples.append(({'category': 'ALL'}, client_health['healthScore']))
+        for score in client_health.get('scoreDetail', []) or []:
+            category = score.get('scoreCategory', {}).get('value')
+            if category and isinstance(score.get('scoreValue'), (int, float)) and score['scoreValue'] >= 0:
+                samples.append(({'category': category}, score['scoreValue']))
+        registry.replace('dnac_client_health_score', samples)
+
+
+def update_from_snmp(registry, results):
+    """
+    Mettre à jour l'instantané à partir d'une collecte SNMP des interfaces tunnel
+
+    Args:
+        registry (MetricsRegistry): Registre cible
+        results (list): Résultats de SNMPCollector.run()
+    """
+    for result in results:
+        registry.set('snmp_agent_up', {'agent': result['agent']}, result['status'] == 'ok')
+        ts = result['timestamp']
+        for row in result['interfaces']:
+            labels = {'router': row['agent'], 'interface': row['interface']}
+            registry.set('vpn_tunnel_up', labels, row['status'] == 'up' and row['line_protocol'] == 'up')
+            if row['mtu'] is not None:
+                registry.set('vpn_tunnel_mtu_bytes', labels, row['mtu'])
+            for field, direction in (('bytes_input', 'in'), ('bytes_output', 'out')):
+                if row[field] is not None:
+                    registry.set_counter('vpn_tunnel_bytes', dict(labels, direction=direction), row[field], ts)
+            for field, direction in (('input_errors', 'in'), ('output_errors', 'out')):
+                if row[field] is not None:
+                    registry.set_counter('vpn_tunnel_errors', dict(labels, direction=direction), row[field], ts)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        accept = self.headers.get('Accept', '')
+        openmetrics = 'application/openmetrics-text' in accept
+        compress = 'gzip' in self.headers.get('Accept-Encoding', '')
+        body = self.registry.render(openmetrics=openmetrics, compress=compress)
+        self.send_response(200)
+        self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Pas de journalisation de chaque scrape
+        pass
+
+
+def start_metrics_server(registry, host='0.0.0.0', port=9464):
+    """
+    Démarrer le serveur HTTP d'exposition dans un thread
+
+    Args:
+        registry (MetricsRegistry): Registre exposé
+        host (str): Adresse d'écoute
+        port (int): Port d'écoute
+
+    Returns:
+        ThreadingHTTPServer: Serveur démarré (server.shutdown() pour l'arrêter)
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True)
+    thread.start()
+    return server
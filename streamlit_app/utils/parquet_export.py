@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Export Parquet pour l'analytique
+Description: Instantanés des équipements, de la santé réseau / clients et des métriques tunnel écrits par incréments dans un jeu Parquet partitionné par date et site (colonnes répétitives encodées par dictionnaire)
+"""
+
+import json
+import math
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from utils.prefix_index import get_prefix_index
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    ds = None
+    pq = None
+
+# Colonnes par jeu de données: (nom, type, encodé par dictionnaire)
+# Les clés de partition (date, site) ne sont pas stockées dans les fichiers:
+# elles sont restituées depuis les chemins (partitionnement Hive).
+DATASETS = {
+    'devices': [
+        ('snapshot_ts', 'timestamp', False),
+        ('cluster', 'string', True),
+        ('id', 'string', False),
+        ('hostname', 'string', False),
+        ('managementIpAddress', 'string', False),
+        ('macAddress', 'string', False),
+        ('serialNumber', 'string', False),
+        ('platformId', 'string', True),
+        ('type', 'string', True),
+        ('family', 'string', True),
+        ('role', 'string', True),
+        ('softwareVersion', 'string', True),
+        ('reachabilityStatus', 'string', True),
+        ('upTime', 'string', False),
+        ('lastUpdated', 'string', False)
+    ],
+    'network_health': [
+        ('snapshot_ts', 'timestamp', False),
+        ('cluster', 'string', True),
+        ('time', 'int64', False),
+        ('healthScore', 'float64', False),
+        ('totalCount', 'int64', False),
+        ('goodCount', 'int64', False),
+        ('fairCount', 'int64', False),
+        ('badCount', 'int64', False),
+        ('noHealthCount', 'int64', False),
+        ('connectivity', 'float64', False),
+        ('performance', 'float64', False),
+        ('security', 'float64', False),
+        ('availability', 'float64', False)
+    ],
+    'client_health': [
+        ('snapshot_ts', 'timestamp', False),
+        ('cluster', 'string', True),
+        ('category', 'string', True),
+        ('scoreValue', 'float64', False),
+        ('clientCount', 'int64', False)
+    ],
+    'tunnel_metrics': [
+        ('snapshot_ts', 'timestamp', False),
+        ('source', 'string', True),
+        ('device', 'string', True),
+        ('interface', 'string', True),
+        ('status', 'string', True),
+        ('line_protocol', 'string', True),
+        ('mtu', 'int32', False),
+        ('bandwidth_kbps', 'int64', False),
+        ('bytes_input', 'int64', False),
+        ('bytes_output', 'int64', False),
+        ('packets_input', 'int64', False),
+        ('packets_output', 'int64', False),
+        ('input_errors', 'int64', False),
+        ('output_errors', 'int64', False),
+        ('rx_bps', 'float64', False),
+        ('tx_bps', 'float64', False)
+    ]
+}
+
+# Champs portant le site, par ordre de préférence
+SITE_FIELDS = ('site', 'siteNameHierarchy', 'siteId', 'cluster')
+DEFAULT_SITE = 'global'
+
+_PARTITION_VALUE_RE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("L'export Parquet nécessite pyarrow (pip install pyarrow)")
+
+
+def _arrow_type(name):
+    if name == 'timestamp':
+        return pa.timestamp('s')
+    if name == 'string':
+        return pa.string()
+    return getattr(pa, name)()
+
+
+def dataset_schema(dataset):
+    """
+    Schéma Arrow d'un jeu de données
+
+    Args:
+        dataset (str): Clé de DATASETS
+
+    Returns:
+        pyarrow.Schema: Colonnes répétitives typées dictionary<int32, string>
+    """
+    _require_pyarrow()
+    return pa.schema([
+        (name, pa.dictionary(pa.int32(), _arrow_type(kind)) if dictionary else _arrow_type(kind))
+        for name, kind, dictionary in DATASETS[dataset]
+    ])
+
+
+def partition_value(value):
+    """Valeur de partition utilisable dans un chemin ('Global/Paris' -> 'Global_Paris')"""
+    text = _PARTITION_VALUE_RE.sub('_', str(value)).strip('_.')
+    return text or DEFAULT_SITE
+
+
+def site_of(record):
+    """Site d'un enregistrement (premier champ de SITE_FIELDS renseigné)"""
+    for field in SITE_FIELDS:
+        if record.get(field):
+            return record[field]
+    return DEFAULT_SITE
+
+
+def attribute_sites(records, field, index=None):
+    """
+    Rattacher des enregistrements au site de leur adresse (index de préfixes)
+
+    Args:
+        records (list): Enregistrements (non modifiés)
+        field (str): Champ contenant l'adresse (ex: 'managementIpAddress')
+        index (PrefixIndex): Index à utiliser (celui du processus par défaut)
+
+    Returns:
+        list: Enregistrements, copiés avec 'site' renseigné quand l'adresse est connue
+    """
+    records = list(records or [])
+    index = index if index is not None else get_prefix_index()
+    located = index.attribute([{field: record.get(field)} for record in records], field)
+    return [
+        dict(record, site=found['site']) if not record.get('site') and found.get('site') else record
+        for record, found in zip(records, located)
+    ]
+
+
+def _coerce(value, kind):
+    if value is None or value == '':
+        return None
+    try:
+        if kind in ('int64', 'int32'):
+            return int(float(value))
+        if kind == 'float64':
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if kind != 'string' else str(value)
+
+
+class ParquetExporter:
+    """
+    Jeu Parquet partitionné <base>/<jeu>/date=AAAA-MM-JJ/site=<site>/part-*.parquet
+
+    Chaque export ajoute un fichier par partition (aucune réécriture des
+    fichiers existants); compact() fusionne après coup les petits fichiers
+    d'une partition close.
+    """
+
+    def __init__(self, base_dir, compression='zstd', row_group_size=64 * 1024):
+        """
+        Initialiser l'exporteur
+
+        Args:
+            base_dir (str): Répertoire racine des jeux de données
+            compression (str): Codec Parquet
+            row_group_size (int): Lignes par row group
+        """
+        self.base_dir = base_dir
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def _partition_dir(self, dataset, date, site):
+        return os.path.join(self.base_dir, dataset, f"date={date}", f"site={partition_value(site)}")
+
+    @staticmethod
+    def _part_name():
+        return f"part-{datetime.now().strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+
+    def _write(self, directory, table, dictionary_columns, name=None):
+        """Écrire un fichier de partition (renommé une fois complet)"""
+        os.makedirs(directory, exist_ok=True)
+        name = name or self._part_name()
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        pq.write_table(table, tmp_path, compression=self.compression, use_dictionary=dictionary_columns,
+                       row_group_size=self.row_group_size)
+        path = os.path.join(directory, name)
+        os.replace(tmp_path, path)
+        return path
+
+    def export(self, dataset, records, ts=None):
+        """
+        Ajouter un instantané au jeu de données
+
+        Args:
+            dataset (str): 'devices', 'network_health', 'client_health' ou 'tunnel_metrics'
+            records (list): Enregistrements (champs absents du schéma ignorés)
+            ts (float): Horodatage de l'instantané (maintenant par défaut)
+
+        Returns:
+            list: Fichiers écrits (un par site)
+        """
+        _require_pyarrow()
+        if dataset not in DATASETS:
+            raise ValueError(f"Jeu de données inconnu: {dataset}")
+        ts = int(ts if ts is not None else time.time())
+        date = datetime.fromtimestamp(ts).strftime('%Y-%m-%d')
+        columns = DATASETS[dataset]
+        schema = dataset_schema(dataset)
+        dictionary_columns = [name for name, _, dictionary in columns if dictionary]
+
+        by_site = {}
+        for record in records or []:
+            by_site.setdefault(site_of(record), []).append(record)
+
+        paths = []
+        for site, site_records in by_site.items():
+            arrays = []
+            for name, kind, _ in columns:
+                if name == 'snapshot_ts':
+                    values = [ts] * len(site_records)
+                else:
+                    values = [_coerce(record.get(name), kind) for record in site_records]
+                arrays.append(pa.array(values, type=schema.field(name).type))
+            table = pa.Table.from_arrays(arrays, schema=schema)
+            paths.append(self._write(self._partition_dir(dataset, date, site), table, dictionary_columns))
+        return paths
+
+    def compact(self, dataset, date):
+        """
+        Fusionner les fichiers de chaque partition site d'une date
+
+        Seule une journée close est acceptée: les exports n'écrivent que dans
+        la partition du jour. Les fichiers fusionnés sont listés une fois et
+        consignés dans un marqueur (.compact.json) avant l'écriture du fichier
+        fusionné; seuls ces fichiers sont ensuite supprimés. Après une
+        interruption, le compactage suivant termine la suppression (fichier
+        fusionné présent) ou abandonne la fusion (fichier absent).
+
+        Args:
+            dataset (str): Jeu de données
+            date (str): Date 'AAAA-MM-JJ' (une journée close)
+
+        Returns:
+            int: Partitions compactées
+        """
+        _require_pyarrow()
+        try:
+            datetime.strptime(date, '%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f"Date invalide: {date} (format AAAA-MM-JJ)") from None
+        if date >= datetime.now().strftime('%Y-%m-%d'):
+            raise ValueError(f"Compactage refusé pour {date}: journée non close (exports en cours)")
+        date_dir = os.path.join(self.base_dir, dataset, f"date={date}")
+        if not os.path.isdir(date_dir):
+            return 0
+        dictionary_columns = [name for name, _, dictionary in DATASETS[dataset] if dictionary]
+        compacted = 0
+        for site_dir in sorted(os.listdir(date_dir)):
+            directory = os.path.join(date_dir, site_dir)
+            marker = os.path.join(directory, '.compact.json')
+            self._recover_compaction(directory, marker)
+            parts = sorted(name for name in os.listdir(directory) if name.endswith('.parquet'))
+            if len(parts) < 2:
+                continue
+            table = pa.concat_tables([pq.read_table(os.path.join(directory, name)) for name in parts])
+            target = self._part_name()
+            with open(f"{marker}.tmp", 'w', encoding='utf-8') as f:
+                json.dump({'target': target, 'parts': parts}, f)
+            os.replace(f"{marker}.tmp", marker)
+            self._write(directory, table, dictionary_columns, name=target)
+            self._remove_parts(directory, parts)
+            os.remove(marker)
+            compacted += 1
+        return compacted
+
+    @staticmethod
+    def _remove_parts(directory, parts):
+        for name in parts:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+    def _recover_compaction(self, directory, marker):
+        """Terminer ou abandonner un compactage interrompu (voir compact)"""
+        try:
+            with open(marker, encoding='utf-8') as f:
+                pending = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            # Marqueur incomplet: interruption avant l'écriture du fichier fusionné
+            os.remove(marker)
+            return
+        if os.path.exists(os.path.join(directory, pending['target'])):
+            self._remove_parts(directory, [name for name in pending['parts'] if name != pending['target']])
+        else:
+            self._remove_parts(directory, [f".{pending['target']}.tmp"])
+        os.remove(marker)
+
+    def read(self, dataset, columns=None, where=None):
+        """
+        Lire un jeu de données (seules les colonnes et partitions utiles sont lues)
+
+        Args:
+            dataset (str): Jeu de données
+            columns (list): Colonnes à lire (toutes si None); 'date' et 'site' disponibles
+            where (pyarrow.compute.Expression): Filtre, ex: ds.field('date') == '2024-01-15'
+
+        Returns:
+            pyarrow.Table: Lignes lues (table vide si le jeu n'existe pas)
+        """
+        _require_pyarrow()
+        path = os.path.join(self.base_dir, dataset)
+        if not os.path.isdir(path):
+            return dataset_schema(dataset).empty_table()
+        source = ds.dataset(path, format='parquet', partitioning='hive', ignore_prefixes=['.'])
+        return source.to_table(columns=columns, filter=where)
+
+
+def tunnel_metric_rows(results, keys=None, rx_bps=None, tx_bps=None, source='snmp'):
+    """
+    Lignes 'tunnel_metrics' depuis les interfaces tunnel collectées
+
+    Le site est celui de l'adresse de l'équipement dans l'index de préfixes.
+
+    Args:
+        results (list): Résultats {'interfaces': [...]} (SNMPCollector ou récepteur de télémétrie)
+        keys (list): Clés '<agent>/<interface>' des débits calculés
+        rx_bps (array): Débits reçus correspondants
+        tx_bps (array): Débits émis correspondants
+        source (str): Origine des mesures ('snmp', 'telemetry')
+
+    Returns:
+        list: Enregistrements du jeu tunnel_metrics
+    """
+    rates = {}
+    if keys is not None:
+        rates = {key: (float(rx), float(tx)) for key, rx, tx in zip(keys, rx_bps, tx_bps)}
+    agents = [{'address': result.get('host') or result.get('address')} for result in results]
+    rows = []
+    for result, agent in zip(results, get_prefix_index().attribute(agents, 'address')):
+        for row in result['interfaces']:
+            rx, tx = rates.get(f"{row['agent']}/{row['interface']}", (None, None))
+            rows.append(dict(row, device=row['agent'], source=source, site=agent.get('site'),
+                             rx_bps=None if rx is None or math.isnan(rx) else rx,
+                             tx_bps=None if tx is None or math.isnan(tx) else tx))
+    return rows
+
+
+def parquet_export_enabled():
+    """Export Parquet activé (ANALYTICS_EXPORT dans config.env)"""
+    config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    return os.getenv('ANALYTICS_EXPORT', 'false').lower() == 'true'
+
+
+def get_parquet_exporter():
+    """Créer l'exporteur Parquet à partir de config.env"""
+    root = os.path.join(os.path.dirname(__file__), '..', '..')
+    config_path = os.path.join(root, 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+
+    base_dir = os.getenv('ANALYTICS_DIR', 'data/analytics')
+    if not os.path.isabs(base_dir):
+        base_dir = os.path.join(root, base_dir)
+    return ParquetExporter(os.path.normpath(base_dir), compression=os.getenv('ANALYTICS_COMPRESSION', 'zstd'))
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Index de préfixes IP
+Description: Correspondance du plus long préfixe (arbre radix) pour rattacher une adresse à un site, un tunnel ou un équipement
+"""
+
+import ipaddress
+import os
+import socket
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Largeur d'adresse et type NumPy des tableaux compilés par famille
+_FAMILIES = {4: (32, np.uint32), 6: (128, np.dtype('S16'))}
+
+
+class _RadixNode:
+    __slots__ = ('children', 'value')
+
+    def __init__(self):
+        self.children = [None, None]
+        self.value = None
+
+
+class PrefixIndex:
+    """
+    Index IPv4 / IPv6 du plus long préfixe
+
+    Les insertions alimentent un arbre radix binaire par famille (recherche
+    unitaire). Pour les recherches en masse, l'arbre est compilé en
+    intervalles disjoints triés, chacun portant la valeur de son préfixe le
+    plus spécifique: une recherche devient un np.searchsorted vectorisé.
+    """
+
+    def __init__(self):
+        self._roots = {4: _RadixNode(), 6: _RadixNode()}
+        self._prefixes = {4: {}, 6: {}}
+        self.values = []
+        self._value_ids = {}
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._prefixes[4]) + len(self._prefixes[6])
+
+    def _value_id(self, value):
+        key = repr(sorted(value.items())) if isinstance(value, dict) else repr(value)
+        value_id = self._value_ids.get(key)
+        if value_id is None:
+            value_id = self._value_ids[key] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def insert(self, prefix, value):
+        """
+        Ajouter (ou remplacer) un préfixe
+
+        Args:
+            prefix (str): Préfixe CIDR ou adresse seule (/32 ou /128)
+            value: Valeur associée (ex: {'site': 'HQ'})
+        """
+        network = ipaddress.ip_network(prefix, strict=False)
+        version = network.version
+        bits = network.max_prefixlen
+        address = int(network.network_address)
+        with self._lock:
+            value_id = self._value_id(value)
+            node = self._roots[version]
+            for depth in range(network.prefixlen):
+                bit = (address >> (bits - 1 - depth)) & 1
+                if node.children[bit] is None:
+                    node.children[bit] = _RadixNode()
+                node = node.children[bit]
+            node.value = value_id
+            self._prefixes[version][(address, network.prefixlen)] = value_id
+            self._compiled.pop(version, None)
+
+    def lookup(self, address):
+        """
+        Valeur du plus long préfixe contenant une adresse
+
+        Args:
+            address (str): Adresse IPv4 ou IPv6
+
+        Returns:
+            Valeur associée, None si aucun préfixe ne correspond
+        """
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return None
+        bits = ip.max_prefixlen
+        value = int(ip)
+        node = self._roots[ip.version]
+        best = node.value
+        for depth in range(bits):
+            node = node.children[(value >> (bits - 1 - depth)) & 1]
+            if node is None:
+                break
+            if node.value is not None:
+                best = node.value
+        return None if best is None else self.values[best]
+
+    def _compile(self, version):
+        """Intervalles disjoints (début, fin, valeur) du plus long préfixe, triés"""
+        compiled = self._compiled.get(version)
+        if compiled is not None:
+            return compiled
+        bits, dtype = _FAMILIES[version]
+        prefixes = [
+            (address, address + (1 << (bits - length)) - 1, value_id)
+            for (address, length), value_id in self._prefixes[version].items()
+        ]
+        # Les préfixes CIDR sont imbriqués ou disjoints: un balayage avec une
+        # pile des préfixes ouverts suffit à aplatir les intervalles
+        starts, ends, ids = [], [], []
+
+        def emit(start, end, value_id):
+            if start <= end:
+                starts.append(start)
+                ends.append(end)
+                ids.append(value_id)
+
+        stack = []
+        cursor = 0
+        for start, end, value_id in sorted(prefixes, key=lambda p: (p[0], -p[1])):
+            while stack and stack[-1][0] < start:
+                top_end, top_id = stack.pop()
+                emit(cursor, top_end, top_id)
+                cursor = top_end + 1
+            if stack:
+                emit(cursor, start - 1, stack[-1][1])
+            stack.append((end, value_id))
+            cursor = start
+        while stack:
+            top_end, top_id = stack.pop()
+            emit(cursor, top_end, top_id)
+            cursor = top_end + 1
+
+        if version == 4:
+            compiled = (np.array(starts, dtype=dtype), np.array(ends, dtype=dtype), np.array(ids, dtype=np.int32))
+        else:
+            to_bytes = lambda values: np.array([v.to_bytes(16, 'big') for v in values], dtype=dtype)
+            compiled = (to_bytes(starts), to_bytes(ends), np.array(ids, dtype=np.int32))
+        self._compiled[version] = compiled
+        return compiled
+
+    @staticmethod
+    def pack_addresses(addresses):
+        """
+        Convertir des adresses texte en tableaux binaires (IPv4 uint32, IPv6 S16)
+
+        Args:
+            addresses (list): Adresses (texte)
+
+        Returns:
+            tuple: (positions IPv4, tableau IPv4, positions IPv6, tableau IPv6, positions invalides)
+        """
+        v4_pos, v4_raw, v6_pos, v6_raw, invalid = [], [], [], [], []
+        inet_aton, inet_pton, af_inet6 = socket.inet_aton, socket.inet_pton, socket.AF_INET6
+        for i, address in enumerate(addresses):
+            try:
+                if ':' in address:
+                    v6_raw.append(inet_pton(af_inet6, address))
+                    v6_pos.append(i)
+                elif address.count('.') == 3:
+                    v4_raw.append(inet_aton(address))
+                    v4_pos.append(i)
+                else:
+                    invalid.append(i)
+            except (OSError, TypeError):
+                invalid.append(i)
+        v4 = np.frombuffer(b''.join(v4_raw), dtype='>u4').astype(np.uint32)
+        v6 = np.frombuffer(b''.join(v6_raw), dtype='S16')
+        return (np.array(v4_pos, dtype=np.intp), v4, np.array(v6_pos, dtype=np.intp), v6,
+                np.array(invalid, dtype=np.intp))
+
+    def lookup_ids(self, addresses, version=4):
+        """
+        Recherche vectorisée sur des adresses déjà converties
+
+        Args:
+            addresses (ndarray): uint32 (IPv4) ou S16 big-endian (IPv6)
+            version (int): 4 ou 6
+
+        Returns:
+            ndarray: Indice de valeur (voir self.values) par adresse, -1 si aucun préfixe
+        """
+        with self._lock:
+            starts, ends, ids = self._compile(version)
+        result = np.full(len(addresses), -1, dtype=np.int32)
+        if not len(starts) or not len(addresses):
+            return result
+        slot = np.searchsorted(starts, addresses, side='right') - 1
+        candidate = slot >= 0
+        slot = np.maximum(slot, 0)
+        hit = candidate & (addresses <= ends[slot])
+        result[hit] = ids[slot[hit]]
+        return result
+
+    def lookup_many(self, addresses):
+        """
+        Recherche en masse d'adresses texte (IPv4 et IPv6 mélangées)
+
+        Args:
+            addresses (list): Adresses
+
+        Returns:
+            ndarray: Indice de valeur par adresse, -1 si aucun préfixe ou adresse invalide
+        """
+        v4_pos, v4, v6_pos, v6, _ = self.pack_addresses(addresses)
+        result = np.full(len(addresses), -1, dtype=np.int32)
+        if len(v4):
+            result[v4_pos] = self.lookup_ids(v4, 4)
+        if len(v6):
+            result[v6_pos] = self.lookup_ids(v6, 6)
+        return result
+
+    def attribute(self, records, field, prefix=''):
+        """
+        Ajouter aux enregistrements les clés de la valeur correspondant à leur adresse
+
+        Args:
+            records (list): Dictionnaires (modifiés sur place)
+            field (str): Champ contenant l'adresse (ex: 'destination', 'source')
+            prefix (str): Préfixe des clés ajoutées (ex: 'dst_')
+
+        Returns:
+            list: Les mêmes enregistrements
+        """
+        ids = self.lookup_many([str(record.get(field) or '') for record in records])
+        for record, value_id in zip(records, ids.tolist()):
+            if value_id >= 0 and isinstance(self.values[value_id], dict):
+                for key, value in self.values[value_id].items():
+                    record[prefix + key] = value
+        return records
+
+
+def build_prefix_index(devices=None, environ=None):
+    """
+    Construire l'index depuis config.env et l'inventaire DNA Center
+
+    Préfixes de site: variables <SITE>_*_NETWORK (ex: HQ_LOCAL_NETWORK),
+    adresses publiques: <SITE>_PUBLIC_IP (routeur du site), réseau du tunnel:
+    TUNNEL_NETWORK. Chaque équipement de l'inventaire ajoute un /32 (ou /128)
+    rattaché au site de son adresse.
+
+    Args:
+        devices (list): Réponse network-device (optionnelle)
+        environ (dict): Variables de configuration (os.environ par défaut)
+
+    Returns:
+        PrefixIndex: Index
+    """
+    environ = os.environ if environ is None else environ
+    index = PrefixIndex()
+
+    entries = []
+    for name, value in sorted(environ.items()):
+        site = name.split('_')[0]
+        router = f"{site if len(site) <= 3 else site.capitalize()}-Router"
+        if name == 'TUNNEL_NETWORK':
+            entries.append((value, {'site': 'VPN', 'kind': 'tunnel', 'tunnel': 'Tunnel0', 'prefix': value}))
+        elif name.endswith('_NETWORK'):
+            entries.append((value, {'site': site, 'kind': 'site', 'prefix': value}))
+        elif name.endswith('_PUBLIC_IP') or name == 'INTERNET_ROUTER_IP':
+            entries.append((value, {'site': site, 'kind': 'device', 'device': router, 'prefix': value}))
+    for prefix, value in entries:
+        try:
+            index.insert(prefix, value)
+        except ValueError:
+            # Variable homonyme sans rapport (ex: DOCKER_NETWORK=bridge)
+            continue
+
+    for device in devices or []:
+        address = device.get('managementIpAddress')
+        if not address:
+            continue
+        site = (index.lookup(address) or {}).get('site')
+        try:
+            index.insert(address, {'site': site, 'kind': 'device',
+                                   'device': device.get('hostname') or device.get('id'), 'prefix': address})
+        except ValueError:
+            continue
+    return index
+
+
+_prefix_index = None
+_prefix_index_lock = threading.Lock()
+
+
+def get_prefix_index(devices=None):
+    """
+    Obtenir l'index du processus (reconstruit si un inventaire est fourni)
+
+    Args:
+        devices (list): Inventaire DNA Center à intégrer
+
+    Returns:
+        PrefixIndex: Index
+    """
+    global _prefix_index
+    with _prefix_index_lock:
+        if _prefix_index is None or devices is not None:
+            config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+            if os.path.exists(config_path):
+                load_dotenv(config_path)
+            _prefix_index = build_prefix_index(devices)
+        return _prefix_index
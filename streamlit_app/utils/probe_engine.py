@@ -0,0 +1,734 @@
+#!/usr/bin/env python3
+"""
+Moteur de sondes de connectivité
+Description: Sondes ICMP et TCP concurrentes (asyncio) avec perte, RTT min/moy/max et gigue, recherche du MTU de chemin par sondes DF
+"""
+
+import asyncio
+import errno
+import ipaddress
+import os
+import re
+import shutil
+import socket
+import struct
+import time
+
+from dotenv import load_dotenv
+
+# Expressions de parsing de la sortie de la commande ping (iputils / busybox)
+_PING_REPLY_RE = re.compile(rb'icmp_seq=(\d+).*?time=([\d.]+)\s*ms')
+_PING_SUMMARY_RE = re.compile(rb'(\d+) packets transmitted, (\d+) (?:packets )?received')
+# Lignes "ping <destination> source <source>" des fichiers de validation Cisco
+_VALIDATION_PING_RE = re.compile(r'^\s*ping\s+(\S+)(?:\s+source\s+(\S+))?', re.IGNORECASE)
+# MTU annoncé par "Frag needed and DF set (mtu = 1400)" / "message too long, mtu=1400"
+_PING_MTU_RE = re.compile(rb'mtu\s*=\s*(\d+)')
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMPV6_ECHO_REQUEST = 128
+ICMPV6_ECHO_REPLY = 129
+
+# Options Linux absentes du module socket: bit DF sans tenir compte du MTU
+# de chemin en cache (IP_PMTUDISC_PROBE) et erreurs ICMP remontées à la socket
+IP_MTU_DISCOVER = getattr(socket, 'IP_MTU_DISCOVER', 10)
+IP_PMTUDISC_PROBE = getattr(socket, 'IP_PMTUDISC_PROBE', 3)
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+IP_MTU = getattr(socket, 'IP_MTU', 14)
+IPV6_MTU_DISCOVER = getattr(socket, 'IPV6_MTU_DISCOVER', 23)
+IPV6_PMTUDISC_PROBE = getattr(socket, 'IPV6_PMTUDISC_PROBE', 3)
+IPV6_RECVERR = getattr(socket, 'IPV6_RECVERR', 25)
+IPV6_MTU = getattr(socket, 'IPV6_MTU', 24)
+# En-têtes IP + ICMP d'une sonde: taille de paquet = charge utile + en-têtes
+PROBE_HEADERS = {4: 28, 6: 48}
+# Surcoût d'encapsulation du tunnel (path mtu 1500 - plaintext mtu 1422 en ESP AES-256/SHA-256)
+DEFAULT_TUNNEL_OVERHEAD = 78
+
+
+def _is_ip(value):
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _ip_version(value):
+    try:
+        return ipaddress.ip_address(value).version
+    except ValueError:
+        return 4
+
+
+def _icmp_family(destination):
+    """Famille et protocole de socket ICMP d'une destination (ICMPv6 pour une adresse IPv6)"""
+    if _ip_version(destination) == 6:
+        return socket.AF_INET6, socket.IPPROTO_ICMPV6
+    return socket.AF_INET, socket.IPPROTO_ICMP
+
+
+def is_local_source(source):
+    """
+    Source utilisable depuis cet hôte: adresse affectée localement (bind
+    possible) ou nom d'interface locale
+
+    Args:
+        source (str): Adresse ou interface (None: route par défaut)
+
+    Returns:
+        bool: True si une sonde peut partir de cette source
+    """
+    if not source:
+        return True
+    if not _is_ip(source):
+        try:
+            return source in {name for _, name in socket.if_nameindex()}
+        except OSError:
+            return False
+    family = socket.AF_INET6 if _ip_version(source) == 6 else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        sock.bind((source, 0))
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def summarize_rtts(rtts, sent):
+    """
+    Calculer les statistiques d'une série de RTT
+
+    Args:
+        rtts (list): RTT des réponses reçues (ms), dans l'ordre d'émission
+        sent (int): Nombre de paquets émis
+
+    Returns:
+        dict: Perte, RTT min/moy/max et gigue (moyenne des écarts successifs, RFC 3550)
+    """
+    received = len(rtts)
+    loss = 100.0 * (sent - received) / sent if sent else 100.0
+    stats = {
+        'packets_sent': sent,
+        'packets_received': received,
+        'loss_pct': round(loss, 2),
+        'min_rtt_ms': None,
+        'avg_rtt_ms': None,
+        'max_rtt_ms': None,
+        'jitter_ms': None,
+        'rtts': list(rtts)
+    }
+    if received:
+        stats['min_rtt_ms'] = round(min(rtts), 3)
+        stats['avg_rtt_ms'] = round(sum(rtts) / received, 3)
+        stats['max_rtt_ms'] = round(max(rtts), 3)
+        if received > 1:
+            diffs = [abs(b - a) for a, b in zip(rtts, rtts[1:])]
+            stats['jitter_ms'] = round(sum(diffs) / len(diffs), 3)
+        else:
+            stats['jitter_ms'] = 0.0
+
+    if sent and received == sent:
+        stats['status'] = 'success'
+    elif received:
+        stats['status'] = 'degraded'
+    else:
+        stats['status'] = 'failure'
+    return stats
+
+
+def fragmentation_risk(path_mtu, tunnel_mtu, overhead=DEFAULT_TUNNEL_OVERHEAD):
+    """
+    Comparer le MTU de chemin mesuré au MTU configuré du tunnel
+
+    Un paquet de la taille du MTU tunnel doit traverser le chemin une fois
+    encapsulé (tunnel_mtu + overhead); sinon il est fragmenté après
+    chiffrement, ou perdu si le bit DF est conservé.
+
+    Args:
+        path_mtu (int): Plus grand paquet passé avec DF (None si inconnu)
+        tunnel_mtu (int): MTU IP du tunnel (ex: 1400)
+        overhead (int): Surcoût d'encapsulation (0 pour un chemin mesuré dans le tunnel)
+
+    Returns:
+        dict: required_mtu, margin, status ('ok', 'fragmentation', 'unknown'),
+              recommended_mtu et recommended_mss (ip tcp adjust-mss) en cas de risque
+    """
+    result = {'tunnel_mtu': tunnel_mtu, 'overhead': overhead, 'required_mtu': None, 'margin': None,
+              'status': 'unknown', 'recommended_mtu': None, 'recommended_mss': None}
+    if path_mtu is None or tunnel_mtu is None:
+        return result
+    required = tunnel_mtu + overhead
+    result.update({'required_mtu': required, 'margin': path_mtu - required})
+    if path_mtu >= required:
+        result['status'] = 'ok'
+    else:
+        result['status'] = 'fragmentation'
+        result['recommended_mtu'] = path_mtu - overhead
+        result['recommended_mss'] = path_mtu - overhead - 40
+    return result
+
+
+def load_validation_targets(path):
+    """
+    Extraire les sondes ICMP des fichiers configurations/validation/*.cfg
+
+    Args:
+        path (str): Chemin du fichier de validation
+
+    Returns:
+        list: Cibles {'source', 'destination', 'kind'}
+    """
+    targets = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.lstrip().startswith('!'):
+                continue
+            match = _VALIDATION_PING_RE.match(line)
+            if match:
+                targets.append({
+                    'source': match.group(2),
+                    'destination': match.group(1),
+                    'kind': 'icmp'
+                })
+    return targets
+
+
+class ProbeEngine:
+    """Exécution concurrente de sondes ICMP / TCP"""
+
+    def __init__(self, count=5, interval=0.2, timeout=1.0, concurrency=512, icmp_method='auto',
+                 mtu_min=576, mtu_max=1500, mtu_parallel=3, mtu_attempts=2, default_source=None):
+        """
+        Initialiser le moteur
+
+        Args:
+            count (int): Paquets (ou connexions TCP) par cible
+            interval (float): Intervalle entre deux paquets d'une même cible (s)
+            timeout (float): Délai d'attente d'une réponse (s)
+            concurrency (int): Nombre maximal de cibles sondées simultanément
+            icmp_method (str): 'socket' (socket ICMP non privilégiée), 'ping'
+                               (commande système) ou 'auto'
+            mtu_min (int): Plus petit paquet de la recherche de MTU (supposé passer)
+            mtu_max (int): Plus grand paquet de la recherche de MTU
+            mtu_parallel (int): Tailles sondées simultanément à chaque tour de recherche
+            mtu_attempts (int): Émissions d'une taille avant de la considérer bloquée
+            default_source (str): Source des sondes dont la source demandée n'est pas
+                                  locale à cet hôte (None: route par défaut)
+        """
+        self.count = count
+        self.interval = interval
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.icmp_method = icmp_method
+        self.mtu_min = mtu_min
+        self.mtu_max = mtu_max
+        self.mtu_parallel = max(1, mtu_parallel)
+        self.mtu_attempts = max(1, mtu_attempts)
+        self.default_source = default_source or None
+        # Famille -> socket ICMP non privilégiée disponible
+        self._socket_supported = {}
+
+    # ------------------------------------------------------------------
+    # ICMP via socket non privilégiée (net.ipv4.ping_group_range)
+    # ------------------------------------------------------------------
+
+    def _icmp_socket_available(self, destination):
+        family, proto = _icmp_family(destination)
+        supported = self._socket_supported.get(family)
+        if supported is None:
+            try:
+                sock = socket.socket(family, socket.SOCK_DGRAM, proto)
+                sock.close()
+                supported = True
+            except OSError:
+                supported = False
+            self._socket_supported[family] = supported
+        return supported
+
+    def _open_icmp_socket(self, source, destination):
+        family, proto = _icmp_family(destination)
+        sock = socket.socket(family, socket.SOCK_DGRAM, proto)
+        try:
+            sock.setblocking(False)
+            if source:
+                if _is_ip(source):
+                    sock.bind((source, 0))
+                else:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, source.encode())
+            sock.connect((destination, 0))
+        except OSError:
+            sock.close()
+            raise
+        return sock, family
+
+    async def _icmp_socket_probe(self, target):
+        loop = asyncio.get_running_loop()
+        sock, family = self._open_icmp_socket(target.get('source'), target['destination'])
+        request_type = ICMPV6_ECHO_REQUEST if family == socket.AF_INET6 else ICMP_ECHO_REQUEST
+        reply_type = ICMPV6_ECHO_REPLY if family == socket.AF_INET6 else ICMP_ECHO_REPLY
+        payload = b'vpn-dnac-probe'.ljust(48, b'\x00')
+        rtts = []
+        try:
+            for seq in range(1, self.count + 1):
+                # L'identifiant et la somme de contrôle sont renseignés par le noyau
+                packet = struct.pack('!BBHHH', request_type, 0, 0, 0, seq) + payload
+                sent_at = time.perf_counter()
+                await loop.sock_sendall(sock, packet)
+                deadline = sent_at + self.timeout
+                while True:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        data = await asyncio.wait_for(loop.sock_recv(sock, 2048), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    if len(data) >= 8:
+                        icmp_type, _, _, _, reply_seq = struct.unpack('!BBHHH', data[:8])
+                        if icmp_type == reply_type and reply_seq == seq:
+                            rtts.append((time.perf_counter() - sent_at) * 1000)
+                            break
+                if seq < self.count:
+                    await asyncio.sleep(max(0.0, self.interval - (time.perf_counter() - sent_at)))
+        finally:
+            sock.close()
+        return summarize_rtts(rtts, self.count)
+
+    # ------------------------------------------------------------------
+    # ICMP via la commande système ping
+    # ------------------------------------------------------------------
+
+    def _ping_command(self, target):
+        destination = target['destination']
+        binary = 'ping'
+        if _ip_version(destination) == 6 and shutil.which('ping6'):
+            binary = 'ping6'
+        command = [
+            binary, '-n',
+            '-c', str(self.count),
+            '-i', str(self.interval),
+            '-W', str(max(1, int(round(self.timeout))))
+        ]
+        if target.get('source'):
+            command += ['-I', target['source']]
+        command.append(destination)
+        if target.get('netns'):
+            command = ['ip', 'netns', 'exec', target['netns']] + command
+        return command
+
+    async def _icmp_ping_probe(self, target):
+        process = await asyncio.create_subprocess_exec(
+            *self._ping_command(target),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        deadline = self.count * (self.interval + self.timeout) + 5
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), deadline)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        replies = {}
+        for seq, rtt in _PING_REPLY_RE.findall(stdout):
+            replies.setdefault(int(seq), float(rtt))
+        summary = _PING_SUMMARY_RE.search(stdout)
+        if summary is None:
+            message = (stderr or stdout).decode(errors='replace').strip()
+            raise OSError(errno.EIO, message or f"ping a échoué (code {process.returncode})")
+        sent = int(summary.group(1))
+        return summarize_rtts([replies[seq] for seq in sorted(replies)], sent)
+
+    # ------------------------------------------------------------------
+    # TCP connect
+    # ------------------------------------------------------------------
+
+    async def _tcp_probe(self, target):
+        source = target.get('source')
+        local_addr = (source, 0) if source and _is_ip(source) else None
+        rtts = []
+        error = None
+        for attempt in range(self.count):
+            started = time.perf_counter()
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(target['destination'], target['port'], local_addr=local_addr),
+                    self.timeout
+                )
+            except asyncio.TimeoutError:
+                pass
+            except ConnectionRefusedError:
+                # Port fermé: l'hôte répond, mais la connexion est considérée perdue
+                pass
+            except OSError as e:
+                # Hôte / réseau injoignable, résolution impossible...: tentative perdue
+                error = e
+            else:
+                rtts.append((time.perf_counter() - started) * 1000)
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
+            if attempt + 1 < self.count:
+                await asyncio.sleep(max(0.0, self.interval - (time.perf_counter() - started)))
+        stats = summarize_rtts(rtts, self.count)
+        if error is not None and not rtts:
+            stats['error'] = str(error) or error.__class__.__name__
+        return stats
+
+    # ------------------------------------------------------------------
+    # MTU de chemin (sondes ICMP avec bit DF)
+    # ------------------------------------------------------------------
+
+    def _use_socket(self, target):
+        return (
+            self.icmp_method == 'socket'
+            or (self.icmp_method == 'auto' and not target.get('netns')
+                and self._icmp_socket_available(target['destination']))
+        )
+
+    def _reported_mtu(self, sock, family):
+        """MTU annoncé par une erreur ICMP 'fragmentation nécessaire' / 'paquet trop grand' en file"""
+        recverr = IPV6_RECVERR if family == socket.AF_INET6 else IP_RECVERR
+        try:
+            _, ancdata, _, _ = sock.recvmsg(2048, 1024, socket.MSG_ERRQUEUE)
+        except OSError:
+            return None
+        for _, cmsg_type, data in ancdata:
+            if cmsg_type == recverr and len(data) >= 16:
+                # struct sock_extended_err: ee_errno, ee_origin, ee_type, ee_code, ee_pad, ee_info, ee_data
+                ee_errno, _, _, _, _, ee_info, _ = struct.unpack('=IBBBBII', data[:16])
+                if ee_errno == errno.EMSGSIZE and ee_info:
+                    return ee_info
+        return None
+
+    async def _df_socket_probe(self, target, size):
+        loop = asyncio.get_running_loop()
+        sock, family = self._open_icmp_socket(target.get('source'), target['destination'])
+        ipv6 = family == socket.AF_INET6
+        request_type = ICMPV6_ECHO_REQUEST if ipv6 else ICMP_ECHO_REQUEST
+        reply_type = ICMPV6_ECHO_REPLY if ipv6 else ICMP_ECHO_REPLY
+        level = socket.IPPROTO_IPV6 if ipv6 else socket.IPPROTO_IP
+        payload = b'\x00' * (size - PROBE_HEADERS[6 if ipv6 else 4])
+        try:
+            sock.setsockopt(level, IPV6_MTU_DISCOVER if ipv6 else IP_MTU_DISCOVER,
+                            IPV6_PMTUDISC_PROBE if ipv6 else IP_PMTUDISC_PROBE)
+            sock.setsockopt(level, IPV6_RECVERR if ipv6 else IP_RECVERR, 1)
+            for seq in range(1, self.mtu_attempts + 1):
+                try:
+                    await loop.sock_sendall(sock, struct.pack('!BBHHH', request_type, 0, 0, 0, seq) + payload)
+                except OSError as e:
+                    if e.errno != errno.EMSGSIZE:
+                        raise
+                    # Plus grand que le MTU de l'interface de sortie: refusé localement
+                    return 'too_big', sock.getsockopt(level, IPV6_MTU if ipv6 else IP_MTU)
+                deadline = time.perf_counter() + self.timeout
+                while True:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        data = await asyncio.wait_for(loop.sock_recv(sock, size + 64), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    except OSError as e:
+                        if e.errno == errno.EMSGSIZE:
+                            return 'too_big', self._reported_mtu(sock, family)
+                        raise
+                    if len(data) >= 8:
+                        icmp_type, _, _, _, reply_seq = struct.unpack('!BBHHH', data[:8])
+                        if icmp_type == reply_type and reply_seq == seq:
+                            return 'ok', None
+        finally:
+            sock.close()
+        return 'timeout', None
+
+    async def _df_ping_probe(self, target, size):
+        destination = target['destination']
+        version = _ip_version(destination)
+        command = [
+            'ping6' if version == 6 and shutil.which('ping6') else 'ping', '-n',
+            '-c', str(self.mtu_attempts),
+            '-i', str(self.interval),
+            '-W', str(max(1, int(round(self.timeout)))),
+            '-M', 'do',
+            '-s', str(size - PROBE_HEADERS[version])
+        ]
+        if target.get('source'):
+            command += ['-I', target['source']]
+        command.append(destination)
+        if target.get('netns'):
+            command = ['ip', 'netns', 'exec', target['netns']] + command
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        deadline = self.mtu_attempts * (self.interval + self.timeout) + 5
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), deadline)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        if _PING_REPLY_RE.search(stdout):
+            return 'ok', None
+        mtu = _PING_MTU_RE.search(stdout + stderr)
+        if mtu:
+            return 'too_big', int(mtu.group(1))
+        if _PING_SUMMARY_RE.search(stdout) is None:
+            message = (stderr or stdout).decode(errors='replace').strip()
+            raise OSError(errno.EIO, message or f"ping a échoué (code {process.returncode})")
+        return 'timeout', None
+
+    async def probe_size(self, target, size):
+        """
+        Émettre des sondes DF d'une taille donnée
+
+        Args:
+            target (dict): {'source', 'destination', 'netns'}
+            size (int): Taille du paquet IP (en-têtes compris)
+
+        Returns:
+            tuple: ('ok' | 'too_big' | 'timeout', MTU annoncé par le réseau ou None)
+        """
+        if self._use_socket(target):
+            return await self._df_socket_probe(target, size)
+        return await self._df_ping_probe(target, size)
+
+    async def path_mtu(self, target):
+        """
+        Rechercher le MTU de chemin vers une cible
+
+        Recherche par intervalles: à chaque tour, mtu_parallel tailles
+        réparties entre le plus grand paquet passé et le plus petit bloqué
+        sont sondées simultanément; un MTU annoncé par ICMP resserre
+        directement l'intervalle. Le premier tour sonde aussi mtu_min et
+        mtu_max (chemin sans contrainte: un seul tour).
+
+        Args:
+            target (dict): {'source', 'destination', 'netns'}
+
+        Returns:
+            dict: path_mtu (None si mtu_min ne passe pas), reported_mtu, probes, rounds
+        """
+        passed, reported = None, None
+        failed = set()
+        probes = rounds = 0
+        sizes = [self.mtu_min, self.mtu_max]
+        while sizes:
+            rounds += 1
+            probes += len(sizes)
+            outcomes = await asyncio.gather(*(self.probe_size(target, size) for size in sizes))
+            for size, (outcome, mtu) in zip(sizes, outcomes):
+                if outcome == 'ok':
+                    passed = size if passed is None else max(passed, size)
+                else:
+                    failed.add(size)
+                    if mtu:
+                        reported = mtu if reported is None else min(reported, mtu)
+            if passed is None:
+                break
+            # Plus petit paquet bloqué au-dessus du plus grand passé (une perte en dessous n'est pas un blocage)
+            blocked = min([size for size in failed if size > passed] or [self.mtu_max + 1])
+            if blocked - passed <= 1:
+                break
+            sizes = set()
+            if reported is not None and passed < reported < blocked:
+                # Vérifier le MTU annoncé et la taille suivante dans le même tour
+                sizes.update(size for size in (reported, reported + 1) if size < blocked)
+            step = (blocked - passed) / (self.mtu_parallel + 1)
+            sizes.update(int(passed + step * i) for i in range(1, self.mtu_parallel + 1))
+            sizes = sorted(size for size in sizes if passed < size < blocked)
+        return {'path_mtu': passed, 'reported_mtu': reported, 'probes': probes, 'rounds': rounds}
+
+    async def pmtu(self, target):
+        """
+        Mesurer le MTU de chemin d'un couple de sites et évaluer le risque de fragmentation
+
+        Args:
+            target (dict): {'source', 'destination', 'netns', 'name', 'tunnel_mtu', 'overhead'}
+
+        Returns:
+            dict: Cible, mesure (voir path_mtu), comparaison (voir fragmentation_risk),
+                  status ('ok', 'fragmentation', 'unknown', 'unreachable' ou 'error')
+        """
+        started = time.perf_counter()
+        result = {
+            'name': target.get('name'),
+            'source': target.get('source'),
+            'destination': target['destination'],
+            'timestamp': time.time()
+        }
+        try:
+            measure = await self.path_mtu(target)
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            measure = {'path_mtu': None, 'reported_mtu': None, 'probes': 0, 'rounds': 0,
+                       'error': str(e) or e.__class__.__name__}
+        result.update(measure)
+        result.update(fragmentation_risk(measure['path_mtu'], target.get('tunnel_mtu'),
+                                         target.get('overhead', DEFAULT_TUNNEL_OVERHEAD)))
+        if 'error' in measure:
+            result['status'] = 'error'
+        elif measure['path_mtu'] is None:
+            result['status'] = 'unreachable'
+        result['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    async def run_pmtu(self, targets):
+        """
+        Mesurer le MTU de chemin de plusieurs couples de sites en parallèle
+
+        Args:
+            targets (list): Cibles (voir pmtu)
+
+        Returns:
+            list: Résultats, dans l'ordre des cibles
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(target):
+            async with semaphore:
+                return await self.pmtu(target)
+
+        return await asyncio.gather(*(bounded(target) for target in targets))
+
+    def run_pmtu_sync(self, targets):
+        """Version synchrone de run_pmtu()"""
+        return asyncio.run(self.run_pmtu(targets))
+
+    # ------------------------------------------------------------------
+    # Orchestration
+    # ------------------------------------------------------------------
+
+    async def probe(self, target):
+        """
+        Sonder une cible
+
+        Une source qui n'est pas locale à cet hôte (adresse du LAN d'un site,
+        interface d'un routeur) ne peut pas être liée: la sonde part alors de
+        default_source et 'source_local' vaut False.
+
+        Args:
+            target (dict): {'source', 'destination', 'kind': 'icmp'|'tcp', 'port', 'netns'}
+
+        Returns:
+            dict: Résultat de la sonde (voir summarize_rtts) avec la cible, la source
+                  demandée ('requested_source', 'source_local') et l'horodatage
+        """
+        kind = target.get('kind', 'icmp')
+        requested = target.get('source')
+        if not target.get('netns') and not is_local_source(requested):
+            target = dict(target, source=self.default_source)
+        result = {
+            'source': target.get('source'),
+            'requested_source': requested,
+            'source_local': target.get('source') == requested,
+            'destination': target['destination'],
+            'kind': kind,
+            'port': target.get('port'),
+            'timestamp': time.time()
+        }
+        try:
+            if kind == 'tcp':
+                stats = await self._tcp_probe(target)
+            elif kind == 'icmp':
+                if self._use_socket(target):
+                    stats = await self._icmp_socket_probe(target)
+                else:
+                    stats = await self._icmp_ping_probe(target)
+            else:
+                raise ValueError(f"Type de sonde inconnu: {kind}")
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            stats = summarize_rtts([], 0)
+            stats['status'] = 'error'
+            stats['error'] = str(e) or e.__class__.__name__
+        result.update(stats)
+        return result
+
+    async def run(self, targets):
+        """
+        Sonder un ensemble de cibles en parallèle
+
+        Args:
+            targets (list): Cibles (voir probe)
+
+        Returns:
+            list: Résultats, dans l'ordre des cibles
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(target):
+            async with semaphore:
+                return await self.probe(target)
+
+        return await asyncio.gather(*(bounded(target) for target in targets))
+
+    def run_sync(self, targets):
+        """Version synchrone de run() (pour Streamlit et les scripts)"""
+        return asyncio.run(self.run(targets))
+
+
+def parse_mtu_pairs(spec, tunnel_mtu=None, overhead=DEFAULT_TUNNEL_OVERHEAD):
+    """
+    Lire des couples de sites '[nom=]source>destination[@netns]' séparés par des virgules
+
+    Args:
+        spec (str): Ex: 'hq-branch=203.0.113.2>203.0.113.6,lab=10.1.0.1>10.2.0.2@pmtu-hq'
+        tunnel_mtu (int): MTU du tunnel à comparer au chemin
+        overhead (int): Surcoût d'encapsulation du tunnel
+
+    Returns:
+        list: Cibles {'name', 'source', 'destination', 'netns', 'tunnel_mtu', 'overhead'}
+    """
+    targets = []
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, pair = item.rpartition('=')
+        pair, _, netns = pair.partition('@')
+        source, _, destination = pair.rpartition('>')
+        if not destination:
+            raise ValueError(f"Couple invalide: {item}")
+        targets.append({
+            'name': name or f"{source or 'local'}>{destination}",
+            'source': source or None,
+            'destination': destination,
+            'netns': netns or None,
+            'tunnel_mtu': tunnel_mtu,
+            'overhead': overhead
+        })
+    return targets
+
+
+def get_mtu_targets():
+    """Couples de sites à sonder (PROBE_MTU_PAIRS, PROBE_TUNNEL_MTU, PROBE_TUNNEL_OVERHEAD dans config.env)"""
+    config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    return parse_mtu_pairs(
+        os.getenv('PROBE_MTU_PAIRS', ''),
+        tunnel_mtu=int(os.getenv('PROBE_TUNNEL_MTU', '1400')),
+        overhead=int(os.getenv('PROBE_TUNNEL_OVERHEAD', str(DEFAULT_TUNNEL_OVERHEAD)))
+    )
+
+
+def get_probe_engine():
+    """Créer un moteur de sondes à partir de config.env"""
+    config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    return ProbeEngine(
+        count=int(os.getenv('PROBE_COUNT', '5')),
+        interval=float(os.getenv('PROBE_INTERVAL', '0.2')),
+        timeout=float(os.getenv('PROBE_TIMEOUT', '1.0')),
+        concurrency=int(os.getenv('PROBE_CONCURRENCY', '512')),
+        icmp_method=os.getenv('PROBE_ICMP_METHOD', 'auto'),
+        mtu_min=int(os.getenv('PROBE_MTU_MIN', '576')),
+        mtu_max=int(os.getenv('PROBE_MTU_MAX', '1500')),
+        mtu_parallel=int(os.getenv('PROBE_MTU_PARALLEL', '3')),
+        mtu_attempts=int(os.getenv('PROBE_MTU_ATTEMPTS', '2')),
+        default_source=os.getenv('PROBE_SOURCE', '')
+    )
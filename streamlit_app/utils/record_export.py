@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Export d'enregistrements
+Description: Sélection de champs et écriture par lots en tableau texte, JSON, NDJSON, CSV ou Parquet
+"""
+
+import csv
+import io
+import json
+import sys
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FORMATS = ('table', 'json', 'ndjson', 'csv', 'parquet')
+
+# Nombre d'enregistrements sérialisés avant chaque écriture
+BATCH_SIZE = 2000
+
+
+def format_unavailable(fmt):
+    """
+    Dépendance manquante pour un format de sortie
+
+    Args:
+        fmt (str): Format demandé
+
+    Returns:
+        str: Message d'erreur, None si le format est utilisable
+    """
+    if fmt == 'parquet' and pa is None:
+        return "le format parquet nécessite pyarrow (pip install -r requirements.txt)"
+    return None
+
+
+def _get_path(record, path):
+    value = record
+    for part in path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return None
+    return value
+
+
+def select_fields(records, fields=None):
+    """
+    Restreindre les enregistrements à une liste de champs
+
+    Args:
+        records (list): Dictionnaires source
+        fields (list): Champs à conserver, chemins pointés acceptés
+                       (ex: 'scoreDetail.0.scoreValue'); tous si None
+
+    Returns:
+        list: Enregistrements (les originaux si fields est vide)
+    """
+    if not fields:
+        return records
+    if all('.' not in field for field in fields):
+        return [{field: record.get(field) for field in fields} for record in records]
+    return [{field: _get_path(record, field) for field in fields} for record in records]
+
+
+def infer_fields(records):
+    """Champs de premier niveau, dans l'ordre de première apparition"""
+    fields = {}
+    for record in records:
+        for key in record:
+            fields.setdefault(key, None)
+    return list(fields)
+
+
+def _scalar(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    return value
+
+
+def _arrow_column(values):
+    """Colonne Arrow typée, ou texte si les types sont hétérogènes ou imbriqués"""
+    try:
+        if not any(isinstance(value, (dict, list)) for value in values):
+            return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    return pa.array([None if value is None else str(_scalar(value)) for value in values], type=pa.string())
+
+
+def format_table(records, fields=None, max_width=40):
+    """
+    Tableau texte aligné (construit en mémoire puis écrit en une fois)
+
+    Args:
+        records (list): Enregistrements
+        fields (list): Colonnes (toutes si None)
+        max_width (int): Largeur maximale d'une colonne
+
+    Returns:
+        str: Tableau
+    """
+    fields = fields or infer_fields(records)
+    cells = [
+        ['' if record.get(field) is None else str(_scalar(record.get(field)))[:max_width] for field in fields]
+        for record in records
+    ]
+    widths = [min(max_width, len(field)) for field in fields]
+    for row in cells:
+        for i, cell in enumerate(row):
+            if len(cell) > widths[i]:
+                widths[i] = len(cell)
+    template = '  '.join(f'{{:<{w}}}' for w in widths)
+    lines = [template.format(*(f[:max_width] for f in fields)).rstrip(), '  '.join('-' * w for w in widths)]
+    lines.extend(template.format(*row).rstrip() for row in cells)
+    return '\n'.join(lines) + '\n'
+
+
+def _batches(records, size=BATCH_SIZE):
+    for start in range(0, len(records), size):
+        yield records[start:start + size]
+
+
+def write_records(records, fmt='ndjson', output=None, fields=None):
+    """
+    Écrire des enregistrements
+
+    Args:
+        records (list): Enregistrements (dictionnaires)
+        fmt (str): 'table', 'json', 'ndjson', 'csv' ou 'parquet'
+        output (str): Fichier de sortie (sortie standard si None ou '-')
+        fields (list): Champs à exporter (tous si None)
+
+    Returns:
+        int: Nombre d'enregistrements écrits
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format non supporté: {fmt}")
+    records = select_fields(records, fields)
+    to_stdout = output in (None, '-')
+
+    if fmt == 'parquet':
+        missing = format_unavailable(fmt)
+        if missing:
+            raise RuntimeError(missing)
+        columns = fields or infer_fields(records)
+        table = pa.table({column: _arrow_column([record.get(column) for record in records]) for column in columns})
+        sink = pa.PythonFile(sys.stdout.buffer, mode='w') if to_stdout else output
+        pq.write_table(table, sink, compression='zstd', use_dictionary=True)
+        if to_stdout:
+            sys.stdout.buffer.flush()
+        return len(records)
+
+    stream = sys.stdout if to_stdout else open(output, 'w', encoding='utf-8', newline='')
+    try:
+        if fmt == 'table':
+            stream.write(format_table(records, fields))
+        elif fmt == 'ndjson':
+            dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=str).encode
+            for batch in _batches(records):
+                stream.write('\n'.join(dumps(record) for record in batch) + '\n')
+        elif fmt == 'json':
+            dumps = json.JSONEncoder(ensure_ascii=False, default=str).encode
+            stream.write('[')
+            for index, batch in enumerate(_batches(records)):
+                stream.write((',\n' if index else '\n') + ',\n'.join(dumps(record) for record in batch))
+            stream.write('\n]\n')
+        elif fmt == 'csv':
+            columns = fields or infer_fields(records)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            for batch in _batches(records):
+                writer.writerows([_scalar(record.get(column)) for column in columns] for record in batch)
+                stream.write(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate()
+            stream.write(buffer.getvalue())
+        stream.flush()
+    finally:
+        if not to_stdout:
+            stream.close()
+    return len(records)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Analyse des rekeys IKEv2 / IPsec
+Description: Durées de vie restantes de toutes les SA, histogramme vectorisé des rekeys à venir, détection des rafales synchronisées et échelonnement recommandé des durées de vie
+"""
+
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Durée de vie IPsec par défaut d'IOS-XE ("show crypto ipsec sa" n'affiche que le restant)
+DEFAULT_IPSEC_LIFETIME = 3600
+# Plus petite durée de vie acceptée par "set security-association lifetime seconds"
+MIN_LIFETIME = 120
+
+
+def sa_lifetimes(sa_details, ipsec_lifetime=DEFAULT_IPSEC_LIFETIME):
+    """
+    Durées de vie restantes de toutes les SA d'un ensemble de routeurs
+
+    Les SA IPsec entrante et sortante d'un même couple sont renégociées
+    ensemble: un seul événement par bloc (interface, pair), au plus petit
+    restant.
+
+    Args:
+        sa_details (dict): Routeur -> {'ikev2': parse_ikev2_sa(), 'ipsec': parse_ipsec_sa()}
+                           (voir VPNChecker.get_sa_details)
+        ipsec_lifetime (int): Durée de vie IPsec configurée (secondes)
+
+    Returns:
+        list: {'router', 'kind' ('ikev2' | 'ipsec'), 'peer', 'interface', 'lifetime',
+               'remaining_sec', 'remaining_kb'}
+    """
+    records = []
+    for router, details in (sa_details or {}).items():
+        for sa in details.get('ikev2') or []:
+            if sa.get('lifetime') is None or sa.get('active_time') is None:
+                continue
+            records.append({
+                'router': router,
+                'kind': 'ikev2',
+                'peer': sa.get('remote'),
+                'interface': None,
+                'lifetime': sa['lifetime'],
+                'remaining_sec': max(sa['lifetime'] - sa['active_time'], 0),
+                'remaining_kb': None
+            })
+        for block in details.get('ipsec') or []:
+            sas = [sa for sa in block.get('sas') or [] if sa.get('remaining_sec') is not None]
+            if not sas:
+                continue
+            remaining = min(sa['remaining_sec'] for sa in sas)
+            records.append({
+                'router': router,
+                'kind': 'ipsec',
+                'peer': block.get('peer'),
+                'interface': block.get('interface'),
+                'lifetime': max(ipsec_lifetime, remaining),
+                'remaining_sec': remaining,
+                'remaining_kb': min(sa['remaining_kb'] for sa in sas)
+            })
+    return records
+
+
+def telemetry_lifetimes(nodes):
+    """
+    Durées de vie IKEv2 reçues par télémétrie (TelemetryState.snapshot())
+
+    Returns:
+        list: Enregistrements au format de sa_lifetimes
+    """
+    records = []
+    for address, node in (nodes or {}).items():
+        ikev2 = node.get('ikev2') or {}
+        if ikev2.get('lifetime') is None or ikev2.get('active_time') is None:
+            continue
+        lifetime, active_time = int(ikev2['lifetime']), int(ikev2['active_time'])
+        records.append({
+            'router': node.get('address') or address,
+            'kind': 'ikev2',
+            'peer': ikev2.get('peer_ip'),
+            'interface': None,
+            'lifetime': lifetime,
+            'remaining_sec': max(lifetime - active_time, 0),
+            'remaining_kb': None
+        })
+    return records
+
+
+class RekeyAnalyzer:
+    """
+    Calendrier des rekeys sur un horizon, par intervalles de bin_seconds
+
+    Chaque SA est renégociée à son restant puis à chaque durée de vie: les
+    instants de toutes les SA forment une matrice SA x occurrences comptée en
+    un seul np.bincount. Un intervalle est une rafale s'il dépasse
+    cluster_ratio fois la moyenne (et au moins cluster_min rekeys); les
+    intervalles contigus forment un cluster.
+    """
+
+    def __init__(self, bin_seconds=60, horizon_seconds=86400, cluster_ratio=5.0, cluster_min=10,
+                 stagger_pct=10.0):
+        """
+        Initialiser l'analyseur
+
+        Args:
+            bin_seconds (int): Largeur d'un intervalle de l'histogramme
+            horizon_seconds (int): Horizon analysé
+            cluster_ratio (float): Rapport à la moyenne au-delà duquel un intervalle est une rafale
+            cluster_min (int): Rekeys minimum d'un intervalle en rafale
+            stagger_pct (float): Réduction maximale de la durée de vie recommandée (%)
+        """
+        self.bin_seconds = int(bin_seconds)
+        self.horizon_seconds = int(horizon_seconds)
+        self.cluster_ratio = float(cluster_ratio)
+        self.cluster_min = int(cluster_min)
+        self.stagger_pct = float(stagger_pct)
+
+    @property
+    def bins(self):
+        return -(-self.horizon_seconds // self.bin_seconds)
+
+    def schedule(self, remaining, lifetimes):
+        """
+        Instants des rekeys à venir
+
+        Args:
+            remaining (array): Restant de chaque SA (secondes)
+            lifetimes (array): Durée de vie appliquée après le prochain rekey
+
+        Returns:
+            array: SA x occurrences, secondes depuis maintenant (inf au-delà de l'horizon)
+        """
+        remaining = np.asarray(remaining, dtype=np.float64)
+        periods = np.maximum(np.asarray(lifetimes, dtype=np.float64), MIN_LIFETIME)
+        if not len(remaining):
+            return np.zeros((0, 0))
+        occurrences = int(np.ceil(self.horizon_seconds / periods.min())) + 1
+        times = remaining[:, None] + periods[:, None] * np.arange(occurrences)
+        times[times >= self.horizon_seconds] = np.inf
+        return times
+
+    def histogram(self, times):
+        """Rekeys par intervalle à partir de schedule() (ou d'une partie de ses colonnes)"""
+        finite = times[np.isfinite(times)]
+        return np.bincount((finite // self.bin_seconds).astype(np.intp), minlength=self.bins)[:self.bins]
+
+    def hot_bins(self, counts):
+        """Intervalles en rafale (masque booléen)"""
+        if not counts.sum():
+            return np.zeros(len(counts), dtype=bool)
+        limit = max(self.cluster_min, self.cluster_ratio * counts.sum() / len(counts))
+        return counts >= limit
+
+    def analyze(self, records, now=None):
+        """
+        Histogramme, rafales et recommandations d'échelonnement
+
+        Les SA d'une rafale reçoivent des durées de vie réparties entre la
+        durée actuelle et stagger_pct % de moins: le prochain rekey reste
+        synchronisé, les suivants se répartissent sur cette plage. Les pics
+        'peak_cycle' et 'peak_staggered' comparent donc les rekeys à partir
+        du deuxième, avant et après échelonnement.
+
+        Args:
+            records (list): Enregistrements de sa_lifetimes / telemetry_lifetimes
+            now (float): Instant de la collecte (maintenant par défaut)
+
+        Returns:
+            dict: 'bins' (début des intervalles, epoch), 'counts', 'staggered_counts',
+                  'clusters', 'recommendations', 'records' (annotés: next_rekey,
+                  cluster, recommended_lifetime), 'sas', 'events', 'peak', 'peak_cycle',
+                  'peak_staggered'
+        """
+        now = now if now is not None else time.time()
+        remaining = np.array([record['remaining_sec'] for record in records], dtype=np.float64)
+        lifetimes = np.array([record['lifetime'] for record in records], dtype=np.float64)
+        times = self.schedule(remaining, lifetimes)
+        counts = self.histogram(times)
+        hot = self.hot_bins(counts)
+
+        # Clusters: suites d'intervalles en rafale
+        edges = np.diff(np.concatenate([[0], hot.astype(np.int8), [0]]))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        cluster_of_bin = np.full(len(counts), -1, dtype=np.intp)
+        for cluster, (start, end) in enumerate(zip(starts, ends)):
+            cluster_of_bin[start:end] = cluster
+
+        # Cluster de chaque occurrence, et de chaque SA (première occurrence en rafale)
+        finite = np.isfinite(times)
+        bins = (np.where(finite, times, 0) // self.bin_seconds).astype(np.intp)
+        in_cluster = np.where(finite, cluster_of_bin[bins], -1)
+        sa_cluster = np.full(len(records), -1, dtype=np.intp)
+        if len(records):
+            first = np.argmax(in_cluster >= 0, axis=1)
+            sa_cluster = in_cluster[np.arange(len(records)), first]
+
+        # Échelonnement: durées de vie réparties dans chaque cluster
+        recommended = lifetimes.copy()
+        spread = self.stagger_pct / 100.0
+        for cluster in range(len(starts)):
+            members = np.flatnonzero(sa_cluster == cluster)
+            members = members[np.lexsort((remaining[members], [records[i]['router'] for i in members]))]
+            rank = np.arange(len(members)) / max(len(members), 1)
+            recommended[members] = np.maximum(
+                np.round(lifetimes[members] * (1 - spread * rank)), MIN_LIFETIME
+            )
+        staggered = self.schedule(remaining, recommended)
+        staggered_counts = self.histogram(staggered)
+        cycle_counts = self.histogram(times[:, 1:])
+        staggered_cycle_counts = self.histogram(staggered[:, 1:])
+
+        clusters = []
+        for cluster, (start, end) in enumerate(zip(starts, ends)):
+            # Membres: toute SA dont une occurrence tombe dans le cluster (les rafales se répètent)
+            members = np.flatnonzero((in_cluster == cluster).any(axis=1))
+            clusters.append({
+                'cluster': cluster,
+                'start': now + float(start * self.bin_seconds),
+                'end': now + float(end * self.bin_seconds),
+                'events': int(counts[start:end].sum()),
+                'peak': int(counts[start:end].max()),
+                'sas': len(members),
+                'routers': len({records[i]['router'] for i in members}),
+                'kinds': sorted({records[i]['kind'] for i in members})
+            })
+
+        annotated, recommendations = [], []
+        for i, record in enumerate(records):
+            changed = recommended[i] != lifetimes[i]
+            entry = dict(record, next_rekey=now + float(remaining[i]),
+                         cluster=int(sa_cluster[i]) if sa_cluster[i] >= 0 else None,
+                         recommended_lifetime=int(recommended[i]) if changed else None)
+            annotated.append(entry)
+            if changed:
+                keyword = 'lifetime' if record['kind'] == 'ikev2' else 'set security-association lifetime seconds'
+                recommendations.append({
+                    'router': record['router'],
+                    'kind': record['kind'],
+                    'peer': record['peer'],
+                    'interface': record['interface'],
+                    'cluster': int(sa_cluster[i]),
+                    'current_lifetime': int(lifetimes[i]),
+                    'recommended_lifetime': int(recommended[i]),
+                    'command': f"{keyword} {int(recommended[i])}"
+                })
+
+        return {
+            'bins': now + np.arange(len(counts)) * self.bin_seconds,
+            'counts': counts,
+            'staggered_counts': staggered_counts,
+            'clusters': clusters,
+            'recommendations': recommendations,
+            'records': annotated,
+            'sas': len(records),
+            'events': int(counts.sum()),
+            'peak': int(counts.max()) if len(counts) else 0,
+            'peak_cycle': int(cycle_counts.max()) if len(cycle_counts) else 0,
+            'peak_staggered': int(staggered_cycle_counts.max()) if len(staggered_cycle_counts) else 0
+        }
+
+
+def get_rekey_analyzer():
+    """Créer l'analyseur configuré via config.env (REKEY_*)"""
+    config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    return RekeyAnalyzer(
+        bin_seconds=int(os.getenv('REKEY_BIN_SECONDS', '60')),
+        horizon_seconds=int(float(os.getenv('REKEY_HORIZON_HOURS', '24')) * 3600),
+        cluster_ratio=float(os.getenv('REKEY_CLUSTER_RATIO', '5')),
+        cluster_min=int(os.getenv('REKEY_CLUSTER_MIN', '10')),
+        stagger_pct=float(os.getenv('REKEY_STAGGER_PCT', '10'))
+    )
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Profileur de rendu Streamlit
+Description: Chronométrage des sections de page et des appels st.plotly_chart / st.dataframe (mode opt-in)
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Profileur actif pour le thread de script courant (une session Streamlit = un thread)
+_current = threading.local()
+_patch_lock = threading.Lock()
+_patched = set()
+
+_logger = None
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        log_path = os.getenv(
+            'RENDER_PROFILE_LOG',
+            os.path.join(os.path.dirname(__file__), '..', '..', 'logs', 'render_profile.log')
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        _logger = logging.getLogger('vpn_dnac.render_profile')
+        _logger.setLevel(logging.INFO)
+        _logger.propagate = False
+        handler = logging.FileHandler(log_path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        _logger.addHandler(handler)
+    return _logger
+
+
+def _payload_size(kind, obj):
+    """Taille approximative des données envoyées au navigateur (octets)"""
+    try:
+        if kind == 'plotly_chart':
+            return len(obj.to_json()) if hasattr(obj, 'to_json') else len(json.dumps(obj, default=str))
+        if kind == 'dataframe':
+            if hasattr(obj, 'memory_usage'):
+                return int(obj.memory_usage(deep=True).sum())
+            return len(json.dumps(obj, default=str))
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class RenderProfiler:
+    """Mesures d'un rendu de page (un rerun Streamlit)"""
+
+    def __init__(self, page):
+        """
+        Initialiser le profileur
+
+        Args:
+            page (str): Nom de la page profilée
+        """
+        self.page = page
+        self.records = []
+        self.started = None
+        self.total_ms = None
+        self._stack = []
+
+    @contextmanager
+    def section(self, name, kind='section'):
+        """
+        Chronométrer une section
+
+        Args:
+            name (str): Nom de la section (ex: 'données', 'figure trafic')
+            kind (str): Catégorie ('fetch', 'dataframe', 'figure', 'section'...)
+        """
+        path = '/'.join(self._stack + [name])
+        self._stack.append(name)
+        started = time.perf_counter()
+        record = {'name': path, 'kind': kind, 'ms': None, 'payload_bytes': None, 'serialize_ms': None}
+        self.records.append(record)
+        try:
+            yield record
+        finally:
+            record['ms'] = (time.perf_counter() - started) * 1000
+            self._stack.pop()
+
+    @contextmanager
+    def run(self):
+        """Activer le profileur pour le thread courant pendant le rendu de la page"""
+        previous = getattr(_current, 'profiler', None)
+        _current.profiler = self
+        self.started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.total_ms = (time.perf_counter() - self.started) * 1000
+            _current.profiler = previous
+
+    def as_rows(self):
+        """Lignes du rapport, triées par durée décroissante"""
+        return sorted(
+            (
+                {
+                    'Section': record['name'],
+                    'Type': record['kind'],
+                    'Durée (ms)': round(record['ms'] or 0.0, 1),
+                    'Sérialisation (ms)': round(record['serialize_ms'], 1) if record['serialize_ms'] is not None else None,
+                    'Payload (Ko)': round(record['payload_bytes'] / 1024, 1) if record['payload_bytes'] else None
+                }
+                for record in self.records
+            ),
+            key=lambda row: row['Durée (ms)'],
+            reverse=True
+        )
+
+    def log(self):
+        """Écrire le profil dans le journal (une ligne JSON par rendu)"""
+        _get_logger().info(json.dumps({
+            'page': self.page,
+            'total_ms': round(self.total_ms or 0.0, 1),
+            'sections': [
+                {'name': r['name'], 'kind': r['kind'], 'ms': round(r['ms'] or 0.0, 2),
+                 'serialize_ms': r['serialize_ms'], 'payload_bytes': r['payload_bytes']}
+                for r in self.records
+            ]
+        }, ensure_ascii=False))
+
+    def render_panel(self, container):
+        """
+        Afficher le profil dans un panneau repliable
+
+        Args:
+            container: Conteneur Streamlit (ex: st.sidebar)
+        """
+        panel = container.expander(f"⏱️ Profil du rendu ({self.total_ms or 0:.0f} ms)", expanded=False)
+        rows = self.as_rows()
+        if not rows:
+            panel.caption("Aucune section mesurée")
+            return
+        payload = sum(r['payload_bytes'] or 0 for r in self.records)
+        panel.caption(f"Page: {self.page} - payload total {payload / 1024:.0f} Ko")
+        panel.table(rows)
+
+
+def current_profiler():
+    """Profileur actif du thread courant (None hors mode profilage)"""
+    return getattr(_current, 'profiler', None)
+
+
+@contextmanager
+def profile_section(name, kind='section'):
+    """
+    Chronométrer une section si le profilage est actif (sans coût sinon)
+
+    Args:
+        name (str): Nom de la section
+        kind (str): Catégorie de la section
+    """
+    profiler = current_profiler()
+    if profiler is None:
+        yield None
+        return
+    with profiler.section(name, kind) as record:
+        yield record
+
+
+# Nom du premier paramètre (données affichées) des fonctions instrumentées
+_DATA_ARGUMENTS = {'plotly_chart': 'figure_or_data', 'dataframe': 'data'}
+
+
+def instrument_streamlit(st, functions=('plotly_chart', 'dataframe')):
+    """
+    Chronométrer les appels d'affichage lourds de Streamlit
+
+    Les fonctions sont remplacées une seule fois par des enveloppes qui
+    délèguent directement à l'original lorsqu'aucun profileur n'est actif
+    dans le thread courant: les autres sessions ne sont pas affectées.
+
+    Args:
+        st: Module streamlit
+        functions (tuple): Noms des fonctions à instrumenter
+    """
+    with _patch_lock:
+        for name in functions:
+            if name in _patched:
+                continue
+            original = getattr(st, name)
+
+            @functools.wraps(original)
+            def wrapper(*args, _original=original, _kind=name, **kwargs):
+                profiler = current_profiler()
+                if profiler is None:
+                    return _original(*args, **kwargs)
+                # Premier argument positionnel ou nommé (figure_or_data, data):
+                # la signature de Streamlit est conservée telle quelle
+                data = args[0] if args else kwargs.get(_DATA_ARGUMENTS.get(_kind))
+                label = kwargs.get('key') or getattr(getattr(data, 'layout', None), 'title', None)
+                label = getattr(label, 'text', label) or _kind
+                # Sérialisation mesurée à part pour ne pas fausser la durée de l'appel
+                serialize_started = time.perf_counter()
+                payload = _payload_size(_kind, data)
+                serialize_ms = (time.perf_counter() - serialize_started) * 1000
+                with profiler.section(f"{_kind}: {label}", _kind) as record:
+                    record['payload_bytes'] = payload
+                    record['serialize_ms'] = serialize_ms
+                    return _original(*args, **kwargs)
+
+            setattr(st, name, wrapper)
+            _patched.add(name)
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Génération des rapports DNA Center / VPN
+Description: Assemblage de l'inventaire, de l'historique de santé, des SLA tunnels et des alertes sur une période, écriture par blocs en HTML, CSV ou Parquet dans un worker d'arrière-plan avec cache par paramètres
+"""
+
+import html
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.alert_engine import get_alert_engine
+from utils.figure_cache import data_version
+from utils.latency_sketch import get_latency_sketches
+from utils.record_export import infer_fields, write_records
+from utils.timeseries_store import get_timeseries_store
+
+REPORT_FORMATS = ('html', 'csv', 'parquet')
+SECTIONS = ('inventory', 'health', 'tunnels', 'alerts')
+SECTION_TITLES = {
+    'inventory': "Inventaire",
+    'health': "Historique de santé",
+    'tunnels': "SLA des tunnels",
+    'alerts': "Alertes"
+}
+
+# Préfixes des métriques de santé historisées
+HEALTH_PREFIXES = ('network_health.', 'client_health.', 'vpn.')
+# Lignes HTML produites avant chaque écriture
+HTML_CHUNK_ROWS = 500
+
+
+def _period_stats(values):
+    """Moyenne, minimum, maximum et p95 d'une série (None si vide)"""
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None, None, None, None
+    return (float(values.mean()), float(values.min()), float(values.max()),
+            float(np.percentile(values, 95)))
+
+
+def _round(value, digits=3):
+    return None if value is None else round(value, digits)
+
+
+def collect_report(devices, start, end, sections=SECTIONS, store=None, sketches=None, alert_engine=None):
+    """
+    Assembler les données d'un rapport
+
+    Args:
+        devices (list): Inventaire (format de load_dnac_data())
+        start (float): Début de période (epoch)
+        end (float): Fin de période (epoch)
+        sections (tuple): Sections à inclure
+        store (TimeSeriesStore): Historique (celui de config.env par défaut)
+        sketches (LatencySketchStore): Sketches de latence (ceux du processus par défaut)
+        alert_engine (AlertEngine): Moteur d'alertes (celui du processus par défaut)
+
+    Returns:
+        dict: Section -> liste d'enregistrements
+    """
+    store = store or get_timeseries_store()
+    metrics = store.metrics()
+    report = {}
+
+    if 'inventory' in sections:
+        availability = {}
+        for device in devices:
+            metric = f"device.{device.get('name')}.up"
+            if metric in metrics:
+                _, values = store.query(metric, start, end)
+                mean = _period_stats(values)[0]
+                availability[device.get('name')] = _round(mean * 100 if mean is not None else None, 2)
+        report['inventory'] = [
+            dict(device, availability_pct=availability.get(device.get('name'))) for device in devices
+        ]
+
+    if 'health' in sections:
+        rows = []
+        for metric in metrics:
+            if not metric.startswith(HEALTH_PREFIXES):
+                continue
+            timestamps, values = store.query(metric, start, end)
+            rows.extend({'metric': metric, 'timestamp': ts, 'value': value}
+                        for ts, value in zip(timestamps.tolist(), np.round(values, 3).tolist()))
+        report['health'] = rows
+
+    if 'tunnels' in sections:
+        tunnels = {}
+        for metric in metrics:
+            if not metric.startswith('tunnel.'):
+                continue
+            name, _, field = metric[len('tunnel.'):].rpartition('.')
+            if field in ('up', 'rx_bps', 'tx_bps'):
+                tunnels.setdefault(name, {})[field] = metric
+        rows = []
+        for name in sorted(tunnels):
+            row = {'tunnel': name}
+            fields = tunnels[name]
+            if 'up' in fields:
+                mean = _period_stats(store.query(fields['up'], start, end)[1])[0]
+                row['availability_pct'] = _round(mean * 100 if mean is not None else None, 2)
+            for field in ('rx_bps', 'tx_bps'):
+                if field in fields:
+                    mean, _, peak, p95 = _period_stats(store.query(fields[field], start, end)[1])
+                    row[f"{field}_avg"] = _round(mean, 0)
+                    row[f"{field}_p95"] = _round(p95, 0)
+                    row[f"{field}_max"] = _round(peak, 0)
+            rows.append(row)
+        sketches = sketches or get_latency_sketches()
+        for path in sketches.paths():
+            merged = sketches.query([path], start, end)
+            rtt, jitter = merged['rtt'].summary(), merged['jitter'].summary()
+            if not rtt['count']:
+                continue
+            rows.append({
+                'tunnel': path,
+                'probes': rtt['count'],
+                'rtt_p50_ms': _round(rtt['p50']),
+                'rtt_p95_ms': _round(rtt['p95']),
+                'rtt_p99_ms': _round(rtt['p99']),
+                'jitter_p95_ms': _round(jitter['p95']) if jitter['count'] else None
+            })
+        report['tunnels'] = rows
+
+    if 'alerts' in sections:
+        alert_engine = alert_engine or get_alert_engine()
+        report['alerts'] = [
+            {
+                'severity': alert['severity'],
+                'rule': alert['rule'],
+                'series': alert['series'],
+                'state': alert['state'],
+                'flapping': alert['flapping'],
+                'active_at': alert['active_at'],
+                'summary': alert['summary']
+            }
+            for alert in alert_engine.active_alerts()
+            if alert['active_at'] is None or alert['active_at'] <= end
+        ]
+
+    return report
+
+
+def iter_html(report, start, end, title="Rapport DNA Center"):
+    """
+    Produire le rapport HTML par blocs
+
+    Args:
+        report (dict): Résultat de collect_report()
+        start (float): Début de période (epoch)
+        end (float): Fin de période (epoch)
+        title (str): Titre du document
+
+    Yields:
+        str: Fragments HTML (au plus HTML_CHUNK_ROWS lignes de tableau chacun)
+    """
+    escape = html.escape
+    period = (f"{datetime.fromtimestamp(start).strftime('%Y-%m-%d %H:%M')} → "
+              f"{datetime.fromtimestamp(end).strftime('%Y-%m-%d %H:%M')}")
+    yield (f"<!DOCTYPE html>\n<html lang=\"fr\"><head><meta charset=\"utf-8\"><title>{escape(title)}</title>"
+           "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:2em}"
+           "th,td{border:1px solid #ccc;padding:4px 8px;font-size:13px}th{background:#f0f2f6}</style>"
+           f"</head><body>\n<h1>{escape(title)}</h1>\n<p>Période: {escape(period)} — généré le "
+           f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>\n")
+    for section, records in report.items():
+        yield f"<h2>{escape(SECTION_TITLES.get(section, section))} ({len(records)})</h2>\n"
+        if not records:
+            yield "<p>Aucune donnée sur la période.</p>\n"
+            continue
+        fields = infer_fields(records)
+        yield "<table><tr>" + ''.join(f"<th>{escape(str(field))}</th>" for field in fields) + "</tr>\n"
+        for index in range(0, len(records), HTML_CHUNK_ROWS):
+            yield ''.join(
+                "<tr>" + ''.join(
+                    f"<td>{'' if record.get(field) is None else escape(str(record.get(field)))}</td>"
+                    for field in fields
+                ) + "</tr>\n"
+                for record in records[index:index + HTML_CHUNK_ROWS]
+            )
+        yield "</table>\n"
+    yield "</body></html>\n"
+
+
+def write_report(report, directory, formats, start, end):
+    """
+    Écrire le rapport dans un répertoire
+
+    Args:
+        report (dict): Résultat de collect_report()
+        directory (str): Répertoire de sortie
+        formats (tuple): Formats parmi REPORT_FORMATS
+        start (float): Début de période (epoch)
+        end (float): Fin de période (epoch)
+
+    Returns:
+        list: Fichiers écrits (noms relatifs au répertoire)
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    if 'html' in formats:
+        with open(os.path.join(directory, 'rapport.html'), 'w', encoding='utf-8') as f:
+            for chunk in iter_html(report, start, end):
+                f.write(chunk)
+        files.append('rapport.html')
+    for fmt in ('csv', 'parquet'):
+        if fmt not in formats:
+            continue
+        for section, records in report.items():
+            if not records:
+                continue
+            name = f"{section}.{fmt}"
+            write_records(records, fmt, os.path.join(directory, name))
+            files.append(name)
+    return files
+
+
+class ReportService:
+    """
+    Génération des rapports dans un pool de threads
+
+    Les rapports sont identifiés par l'empreinte de leurs paramètres (et de
+    l'inventaire): une demande identique réutilise le rapport en cours ou
+    déjà écrit (manifest.json) tant qu'il a moins de cache_ttl secondes.
+    Le dashboard ne fait que soumettre et consulter l'état.
+    """
+
+    def __init__(self, base_dir, workers=1, cache_ttl=3600, max_reports=20):
+        """
+        Initialiser le service
+
+        Args:
+            base_dir (str): Répertoire des rapports
+            workers (int): Rapports générés en parallèle
+            cache_ttl (float): Durée de validité d'un rapport écrit (secondes)
+            max_reports (int): Rapports conservés sur disque (les plus anciens sont supprimés)
+        """
+        self.base_dir = base_dir
+        self.cache_ttl = float(cache_ttl)
+        self.max_reports = max(1, int(max_reports))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix='report')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def report_key(devices, start, end, formats, sections=SECTIONS):
+        """Empreinte des paramètres d'un rapport"""
+        return data_version(devices, float(start), float(end), sorted(formats), sorted(sections))
+
+    def _directory(self, key):
+        return os.path.join(self.base_dir, key)
+
+    def _manifest(self, key):
+        try:
+            with open(os.path.join(self._directory(key), 'manifest.json'), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - manifest.get('created_at', 0) > self.cache_ttl:
+            return None
+        return manifest
+
+    def _generate(self, key, devices, start, end, formats, sections):
+        """Générer un rapport (exécuté dans le pool)"""
+        started = time.perf_counter()
+        directory = self._directory(key)
+        tmp_directory = f"{directory}.tmp"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        report = collect_report(devices, start, end, sections)
+        files = write_report(report, tmp_directory, formats, start, end)
+        manifest = {
+            'key': key,
+            'start': start,
+            'end': end,
+            'formats': list(formats),
+            'sections': {section: len(records) for section, records in report.items()},
+            'files': files,
+            'created_at': time.time(),
+            'duration_s': round(time.perf_counter() - started, 3)
+        }
+        with open(os.path.join(tmp_directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_directory, directory)
+        self._evict()
+        return manifest
+
+    def _evict(self):
+        """Supprimer les rapports les plus anciens au-delà de max_reports"""
+        try:
+            names = [name for name in os.listdir(self.base_dir) if not name.endswith('.tmp')]
+        except OSError:
+            return
+        if len(names) <= self.max_reports:
+            return
+        names.sort(key=lambda name: os.path.getmtime(os.path.join(self.base_dir, name)))
+        for name in names[:len(names) - self.max_reports]:
+            shutil.rmtree(os.path.join(self.base_dir, name), ignore_errors=True)
+
+    def submit(self, devices, start, end, formats=('html',), sections=SECTIONS):
+        """
+        Demander un rapport (retour immédiat)
+
+        Args:
+            devices (list): Inventaire
+            start (float): Début de période (epoch)
+            end (float): Fin de période (epoch)
+            formats (tuple): Formats parmi REPORT_FORMATS
+            sections (tuple): Sections à inclure
+
+        Returns:
+            str: Clé du rapport (pour status())
+        """
+        unknown = set(formats) - set(REPORT_FORMATS)
+        if unknown:
+            raise ValueError(f"Format non supporté: {', '.join(sorted(unknown))}")
+        key = self.report_key(devices, start, end, formats, sections)
+        with self._lock:
+            future = self._jobs.get(key)
+            if future is not None and not future.done():
+                return key
+            if self._manifest(key) is not None:
+                return key
+            self._jobs[key] = self._executor.submit(
+                self._generate, key, list(devices), float(start), float(end), tuple(formats), tuple(sections)
+            )
+        return key
+
+    def status(self, key):
+        """
+        État d'un rapport
+
+        Returns:
+            dict: {'state': 'running'|'done'|'error'|'unknown', 'manifest', 'directory', 'error'}
+        """
+        with self._lock:
+            future = self._jobs.get(key)
+        if future is not None and not future.done():
+            return {'state': 'running', 'manifest': None, 'directory': None, 'error': None}
+        if future is not None and future.exception() is not None:
+            return {'state': 'error', 'manifest': None, 'directory': None, 'error': str(future.exception())}
+        manifest = self._manifest(key)
+        if manifest is None:
+            return {'state': 'unknown', 'manifest': None, 'directory': None, 'error': None}
+        return {'state': 'done', 'manifest': manifest, 'directory': self._directory(key), 'error': None}
+
+    def open_file(self, key, name):
+        """Ouvrir un fichier d'un rapport terminé (lecture binaire)"""
+        manifest = self._manifest(key)
+        if manifest is None or name not in manifest['files']:
+            raise FileNotFoundError(name)
+        return open(os.path.join(self._directory(key), name), 'rb')
+
+
+_report_service = None
+_report_service_lock = threading.Lock()
+
+
+def get_report_service():
+    """Obtenir le service de rapports du processus (configuré via config.env)"""
+    global _report_service
+    with _report_service_lock:
+        if _report_service is None:
+            root = os.path.join(os.path.dirname(__file__), '..', '..')
+            config_path = os.path.join(root, 'config.env')
+            if os.path.exists(config_path):
+                load_dotenv(config_path)
+            base_dir = os.getenv('REPORT_DIR', 'data/reports')
+            if not os.path.isabs(base_dir):
+                base_dir = os.path.join(root, base_dir)
+            _report_service = ReportService(
+                os.path.normpath(base_dir),
+                workers=int(os.getenv('REPORT_WORKERS', '1')),
+                cache_ttl=float(os.getenv('REPORT_CACHE_TTL', '3600')),
+                max_reports=int(os.getenv('REPORT_MAX', '20'))
+            )
+        return _report_service
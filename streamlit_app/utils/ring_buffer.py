@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Cache mémoire en anneau pour les métriques temps réel
+Description: Tampons NumPy préalloués (métrique x tunnel x créneau) pour les graphiques en direct, partagés entre processus par fichiers projetés en mémoire
+"""
+
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from dotenv import load_dotenv
+
+DEFAULT_METRICS = ('rx_bps', 'tx_bps')
+
+# En-tête partagé: créneau de tête, version, nombre de tunnels puis géométrie (contrôlée à l'ouverture)
+_HEAD, _VERSION, _COUNT, _CAPACITY, _SLOTS, _RESOLUTION = range(6)
+_NO_HEAD = -1
+
+
+class TunnelRingBuffer:
+    """
+    Tampon circulaire préalloué, indexé par tunnel, partagé par toutes les métriques
+
+    Chaque métrique est un tableau (tunnels, 2 x créneaux). Chaque échantillon
+    est écrit deux fois (créneau et créneau + taille) afin que toute fenêtre
+    glissante soit une vue contiguë: la lecture ne copie jamais de données.
+
+    Mémoire: len(metrics) x capacity x 2 x (window / resolution) x itemsize
+
+    Avec 'path', les tampons, l'en-tête et la liste des tunnels sont des
+    fichiers projetés en mémoire (MAP_SHARED): les collecteurs écrivent
+    (sous verrou fcntl, plusieurs écrivains possibles) et le dashboard lit
+    les mêmes pages, sans copie ni sérialisation.
+    """
+
+    def __init__(self, metrics=DEFAULT_METRICS, capacity=256, window_seconds=86400,
+                 resolution=10, dtype=np.float32, path=None):
+        """
+        Initialiser le tampon
+
+        Args:
+            metrics (tuple): Noms des métriques suivies
+            capacity (int): Nombre maximal de tunnels
+            window_seconds (int): Profondeur d'historique conservée
+            resolution (int): Durée d'un créneau en secondes
+            dtype: Type NumPy des valeurs
+            path (str): Répertoire des fichiers partagés (tampon privé au processus si None)
+        """
+        self.metrics = tuple(metrics)
+        self.capacity = int(capacity)
+        self.resolution = int(resolution)
+        self.slots = int(window_seconds // resolution)
+        self.dtype = np.dtype(dtype)
+        self.path = path
+
+        self._index = {}
+        self._names = []
+        self._lock = threading.RLock()
+        geometry = (self.capacity, self.slots, self.resolution)
+        if path is None:
+            # Tête, version (incrémentée à chaque écriture: clé de cache des graphiques), tunnels
+            self._state = np.array((_NO_HEAD, 0, 0) + geometry, dtype=np.int64)
+            self._data = {
+                metric: np.full((self.capacity, 2 * self.slots), np.nan, dtype=self.dtype)
+                for metric in self.metrics
+            }
+        else:
+            self._open(geometry)
+
+    # ------------------------------------------------------------------
+    # Fichiers partagés
+    # ------------------------------------------------------------------
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def _file_lock(self):
+        """Verrou exclusif entre processus écrivains (sans effet pour un tampon privé)"""
+        if self.path is None:
+            yield
+            return
+        with open(self._file('lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _open(self, geometry):
+        """Projeter les fichiers partagés (créés, ou recréés si la géométrie a changé)"""
+        os.makedirs(self.path, exist_ok=True)
+        shape = (self.capacity, 2 * self.slots)
+        paths = {metric: self._file(f"{metric}.{self.dtype.name}") for metric in self.metrics}
+        size = shape[0] * shape[1] * self.dtype.itemsize
+        with self._file_lock():
+            state_path = self._file('state.i8')
+            valid = (
+                os.path.exists(state_path) and os.path.getsize(state_path) == 6 * 8
+                and tuple(np.fromfile(state_path, dtype=np.int64)[_CAPACITY:]) == geometry
+                and all(os.path.exists(path) and os.path.getsize(path) == size for path in paths.values())
+            )
+            if not valid:
+                for path in paths.values():
+                    array = np.memmap(path, dtype=self.dtype, mode='w+', shape=shape)
+                    array.fill(np.nan)
+                    array.flush()
+                open(self._file('tunnels.txt'), 'w').close()
+                np.array((_NO_HEAD, 0, 0) + geometry, dtype=np.int64).tofile(state_path)
+            self._state = np.memmap(state_path, dtype=np.int64, mode='r+', shape=(6,))
+            self._data = {
+                metric: np.memmap(path, dtype=self.dtype, mode='r+', shape=shape)
+                for metric, path in paths.items()
+            }
+
+    def _sync_names(self):
+        """Relire les tunnels alloués par les autres processus"""
+        count = int(self._state[_COUNT])
+        if self.path is not None and count != len(self._names):
+            with open(self._file('tunnels.txt')) as f:
+                self._names = f.read().splitlines()[:count]
+            self._index = {name: row for row, name in enumerate(self._names)}
+
+    @property
+    def _head(self):
+        """Numéro absolu (ts // resolution) du créneau le plus récent (None si vide)"""
+        head = int(self._state[_HEAD])
+        return None if head == _NO_HEAD else head
+
+    @_head.setter
+    def _head(self, epoch):
+        self._state[_HEAD] = epoch
+
+    @property
+    def version(self):
+        """Nombre d'écritures (clé de cache des graphiques)"""
+        return int(self._state[_VERSION])
+
+    @property
+    def nbytes(self):
+        """Mémoire occupée par les tampons (octets)"""
+        return sum(array.nbytes for array in self._data.values())
+
+    @property
+    def tunnels(self):
+        """Tunnels enregistrés, dans l'ordre des lignes"""
+        self._sync_names()
+        return list(self._names)
+
+    def tunnel_row(self, tunnel):
+        """
+        Obtenir (ou allouer) la ligne d'un tunnel
+
+        Args:
+            tunnel (str): Identifiant du tunnel (ex: 'HQ-Router/Tunnel0')
+
+        Returns:
+            int: Index de ligne
+        """
+        row = self._index.get(tunnel)
+        if row is None:
+            with self._lock, self._file_lock():
+                self._sync_names()
+                row = self._index.get(tunnel)
+                if row is None:
+                    if len(self._names) >= self.capacity:
+                        raise ValueError(f"Capacité du cache atteinte ({self.capacity} tunnels)")
+                    if self.path is not None:
+                        with open(self._file('tunnels.txt'), 'a') as f:
+                            f.write(tunnel + '\n')
+                    row = len(self._names)
+                    self._index[tunnel] = row
+                    self._names.append(tunnel)
+                    self._state[_COUNT] = len(self._names)
+        return row
+
+    def _advance(self, epoch):
+        """Avancer la tête jusqu'au créneau donné en effaçant les créneaux sautés"""
+        if self._head is None:
+            self._head = epoch
+            return
+        gap = epoch - self._head
+        if gap <= 0:
+            return
+        if gap >= self.slots:
+            for array in self._data.values():
+                array.fill(np.nan)
+        else:
+            first = (self._head + 1) % self.slots
+            last = first + gap
+            for array in self._data.values():
+                if last <= self.slots:
+                    array[:, first:last] = np.nan
+                    array[:, first + self.slots:last + self.slots] = np.nan
+                else:
+                    array[:, first:self.slots] = np.nan
+                    array[:, first + self.slots:] = np.nan
+                    array[:, :last - self.slots] = np.nan
+                    array[:, self.slots:last] = np.nan
+        self._head = epoch
+
+    def append(self, tunnel, values, ts=None):
+        """
+        Enregistrer un échantillon pour un tunnel (O(1))
+
+        Args:
+            tunnel (str): Identifiant du tunnel
+            values (dict): Métrique -> valeur
+            ts (float): Horodatage epoch en secondes (maintenant par défaut)
+
+        Returns:
+            bool: False si l'échantillon est plus ancien que la fenêtre
+        """
+        epoch = int((ts if ts is not None else time.time()) // self.resolution)
+        row = self.tunnel_row(tunnel)
+        with self._lock, self._file_lock():
+            self._advance(epoch)
+            if epoch <= self._head - self.slots:
+                return False
+            slot = epoch % self.slots
+            for metric, value in values.items():
+                array = self._data[metric]
+                array[row, slot] = value
+                array[row, slot + self.slots] = value
+            self._state[_VERSION] += 1
+            return True
+
+    def append_batch(self, rows, values, ts=None):
+        """
+        Enregistrer un échantillon pour plusieurs tunnels au même instant
+
+        Args:
+            rows (array): Index de ligne des tunnels (voir tunnel_row)
+            values (dict): Métrique -> tableau de valeurs aligné sur rows
+            ts (float): Horodatage epoch en secondes (maintenant par défaut)
+
+        Returns:
+            bool: False si l'instant est plus ancien que la fenêtre
+        """
+        epoch = int((ts if ts is not None else time.time()) // self.resolution)
+        rows = np.asarray(rows, dtype=np.intp)
+        with self._lock, self._file_lock():
+            self._advance(epoch)
+            if epoch <= self._head - self.slots:
+                return False
+            slot = epoch % self.slots
+            for metric, column in values.items():
+                array = self._data[metric]
+                array[rows, slot] = column
+                array[rows, slot + self.slots] = column
+            self._state[_VERSION] += 1
+            return True
+
+    def _window_bounds(self, seconds, head):
+        count = self.slots if seconds is None else min(self.slots, max(1, int(seconds // self.resolution)))
+        end = head % self.slots + self.slots + 1
+        return end - count, end, count
+
+    def window(self, metric, tunnel=None, seconds=None):
+        """
+        Vue (sans copie) sur la fenêtre la plus récente
+
+        Args:
+            metric (str): Nom de la métrique
+            tunnel (str): Tunnel (tous les tunnels si None)
+            seconds (int): Durée de la fenêtre (toute la profondeur par défaut)
+
+        Returns:
+            tuple: (timestamps, valeurs) - valeurs est une vue en lecture seule
+                   de forme (créneaux,) ou (tunnels, créneaux)
+        """
+        head = self._head
+        if head is None:
+            return np.empty(0), np.empty(0, dtype=self.dtype)
+        self._sync_names()
+        start, end, count = self._window_bounds(seconds, head)
+        array = self._data[metric]
+        if tunnel is None:
+            view = array[:len(self._names), start:end]
+        else:
+            row = self._index.get(tunnel)
+            if row is None:
+                return np.empty(0), np.empty(0, dtype=self.dtype)
+            view = array[row, start:end]
+        view = view.view()
+        view.flags.writeable = False
+        timestamps = (np.arange(head - count + 1, head + 1) * self.resolution).astype(np.float64)
+        return timestamps, view
+
+    def latest(self, metric, tunnel):
+        """
+        Dernière valeur connue d'un tunnel
+
+        Returns:
+            float: Valeur ou None
+        """
+        self._sync_names()
+        row = self._index.get(tunnel)
+        head = self._head
+        if row is None or head is None:
+            return None
+        value = self._data[metric][row, head % self.slots]
+        return None if np.isnan(value) else float(value)
+
+
+_live_cache = None
+_live_cache_lock = threading.Lock()
+
+
+def get_live_cache():
+    """
+    Obtenir le cache temps réel (configuré via config.env)
+
+    Partagé entre les collecteurs et le dashboard par les fichiers de
+    LIVE_CACHE_DIR; privé au processus si LIVE_CACHE_DIR est vide.
+    """
+    global _live_cache
+    with _live_cache_lock:
+        if _live_cache is None:
+            root = os.path.join(os.path.dirname(__file__), '..', '..')
+            config_path = os.path.join(root, 'config.env')
+            if os.path.exists(config_path):
+                load_dotenv(config_path)
+            metrics = tuple(
+                m.strip() for m in os.getenv('LIVE_CACHE_METRICS', ','.join(DEFAULT_METRICS)).split(',') if m.strip()
+            )
+            path = os.getenv('LIVE_CACHE_DIR', 'data/live_cache')
+            if path and not os.path.isabs(path):
+                path = os.path.normpath(os.path.join(root, path))
+            _live_cache = TunnelRingBuffer(
+                metrics=metrics,
+                capacity=int(os.getenv('LIVE_CACHE_TUNNELS', '256')),
+                window_seconds=int(float(os.getenv('LIVE_CACHE_WINDOW_HOURS', '24')) * 3600),
+                resolution=int(os.getenv('LIVE_CACHE_RESOLUTION', '10')),
+                path=path or None
+            )
+        return _live_cache
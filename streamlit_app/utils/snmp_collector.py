@@ -0,0 +1,858 @@
+#!/usr/bin/env python3
+"""
+Collecteur SNMP des interfaces tunnel
+Description: Parcours GETBULK SNMPv2c (BER encodé sans dépendance) de nombreux agents en parallèle, compteurs IF-MIB/IP-MIB des tunnels et débits calculés par lots
+"""
+
+import asyncio
+import bisect
+import itertools
+import os
+import random
+import socket
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Étiquettes BER / SNMP
+_INTEGER = 0x02
+_OCTET_STRING = 0x04
+_NULL = 0x05
+_OID = 0x06
+_SEQUENCE = 0x30
+_IP_ADDRESS = 0x40
+_COUNTER32 = 0x41
+_GAUGE32 = 0x42
+_TIMETICKS = 0x43
+_COUNTER64 = 0x46
+_NO_SUCH_OBJECT = 0x80
+_NO_SUCH_INSTANCE = 0x81
+_END_OF_MIB_VIEW = 0x82
+
+GET_REQUEST = 0xA0
+GET_NEXT_REQUEST = 0xA1
+RESPONSE = 0xA2
+GET_BULK_REQUEST = 0xA5
+SNMP_V2C = 1
+
+IF_TYPE_TUNNEL = 131
+_STATUS = {1: 'up', 2: 'down', 3: 'testing', 5: 'dormant', 6: 'notPresent', 7: 'lowerLayerDown'}
+
+# Tampon de réception UDP demandé au noyau (octets)
+UDP_RECEIVE_BUFFER = 8 * 1024 * 1024
+
+# Colonnes parcourues, par table: chaque table est un flux de requêtes indépendant
+IF_COLUMNS = {
+    'type': '1.3.6.1.2.1.2.2.1.3',              # IF-MIB::ifType
+    'mtu': '1.3.6.1.2.1.2.2.1.4',               # IF-MIB::ifMtu
+    'admin_status': '1.3.6.1.2.1.2.2.1.7',      # IF-MIB::ifAdminStatus
+    'oper_status': '1.3.6.1.2.1.2.2.1.8',       # IF-MIB::ifOperStatus
+    'input_errors': '1.3.6.1.2.1.2.2.1.14',     # IF-MIB::ifInErrors
+    'output_errors': '1.3.6.1.2.1.2.2.1.20',    # IF-MIB::ifOutErrors
+}
+IFX_COLUMNS = {
+    'name': '1.3.6.1.2.1.31.1.1.1.1',           # IF-MIB::ifName
+    'bytes_input': '1.3.6.1.2.1.31.1.1.1.6',    # IF-MIB::ifHCInOctets
+    'packets_input': '1.3.6.1.2.1.31.1.1.1.7',  # IF-MIB::ifHCInUcastPkts
+    'bytes_output': '1.3.6.1.2.1.31.1.1.1.10',  # IF-MIB::ifHCOutOctets
+    'packets_output': '1.3.6.1.2.1.31.1.1.1.11',  # IF-MIB::ifHCOutUcastPkts
+    'high_speed': '1.3.6.1.2.1.31.1.1.1.15',    # IF-MIB::ifHighSpeed (Mbit/s)
+}
+IP_COLUMNS = {
+    'address_if_index': '1.3.6.1.2.1.4.20.1.2',  # IP-MIB::ipAdEntIfIndex
+}
+WALK_TABLES = (IF_COLUMNS, IFX_COLUMNS, IP_COLUMNS)
+
+
+# ----------------------------------------------------------------------
+# Encodage BER
+# ----------------------------------------------------------------------
+
+def _encode_length(length):
+    if length < 0x80:
+        return bytes((length,))
+    raw = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes((0x80 | len(raw),)) + raw
+
+
+def _tlv(tag, payload):
+    return bytes((tag,)) + _encode_length(len(payload)) + payload
+
+
+def _encode_integer(value, tag=_INTEGER):
+    if tag == _INTEGER:
+        raw = value.to_bytes(value.bit_length() // 8 + 1, 'big', signed=True)
+    else:
+        # Types non signés (Counter32/64, Gauge32, TimeTicks): octet nul si bit de poids fort
+        raw = value.to_bytes(value.bit_length() // 8 + 1, 'big')
+    return _tlv(tag, raw)
+
+
+def _encode_subid(value):
+    if value < 0x80:
+        return bytes((value,))
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def encode_oid(oid):
+    """
+    Encoder un OID (contenu BER, sans étiquette ni longueur)
+
+    L'encodage préserve les préfixes: un OID descend d'une colonne si et
+    seulement si son encodage commence par celui de la colonne.
+
+    Args:
+        oid (str|tuple): OID pointé ('1.3.6.1...') ou tuple d'entiers
+
+    Returns:
+        bytes: Contenu BER
+    """
+    arcs = [int(arc) for arc in oid.strip('.').split('.')] if isinstance(oid, str) else list(oid)
+    return bytes((arcs[0] * 40 + arcs[1],)) + b''.join(_encode_subid(arc) for arc in arcs[2:])
+
+
+def decode_subids(raw):
+    """Décoder une suite de sous-identifiants BER (suffixe d'index) en tuple d'entiers"""
+    arcs = []
+    value = 0
+    for byte in raw:
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            arcs.append(value)
+            value = 0
+    return tuple(arcs)
+
+
+def decode_oid(raw):
+    """Décoder le contenu BER d'un OID en tuple d'entiers"""
+    first = raw[0]
+    return (min(first // 40, 2), first - 40 * min(first // 40, 2)) + decode_subids(raw[1:])
+
+
+def decode_value(tag, raw):
+    """
+    Convertir une valeur de varbind
+
+    Returns:
+        int|str|bytes|None: Entier, adresse IP pointée, chaîne d'octets, ou None
+        (noSuchObject, noSuchInstance, endOfMibView, NULL)
+    """
+    if tag == _INTEGER:
+        return int.from_bytes(raw, 'big', signed=True)
+    if tag in (_COUNTER32, _GAUGE32, _TIMETICKS, _COUNTER64):
+        return int.from_bytes(raw, 'big')
+    if tag == _OCTET_STRING:
+        return raw
+    if tag == _IP_ADDRESS:
+        return '.'.join(str(byte) for byte in raw)
+    if tag == _OID:
+        return '.'.join(str(arc) for arc in decode_oid(raw))
+    return None
+
+
+def encode_message(pdu_type, request_id, community, varbinds, field1=0, field2=0):
+    """
+    Encoder un message SNMPv2c
+
+    Args:
+        pdu_type (int): GET_REQUEST, GET_NEXT_REQUEST, GET_BULK_REQUEST ou RESPONSE
+        request_id (int): Identifiant de requête
+        community (bytes): Communauté
+        varbinds (list): OID encodés (requêtes) ou varbinds déjà encodés (bytes complets, réponses)
+        field1 (int): error-status (non-repeaters pour GETBULK)
+        field2 (int): error-index (max-repetitions pour GETBULK)
+
+    Returns:
+        bytes: Datagramme
+    """
+    if pdu_type == RESPONSE:
+        bindings = b''.join(varbinds)
+    else:
+        bindings = b''.join(_tlv(_SEQUENCE, _tlv(_OID, oid) + b'\x05\x00') for oid in varbinds)
+    pdu = _tlv(pdu_type, _encode_integer(request_id) + _encode_integer(field1) + _encode_integer(field2)
+               + _tlv(_SEQUENCE, bindings))
+    return _tlv(_SEQUENCE, _encode_integer(SNMP_V2C) + _tlv(_OCTET_STRING, community) + pdu)
+
+
+def decode_message(data):
+    """
+    Décoder un message SNMPv2c sans convertir les valeurs
+
+    Returns:
+        tuple: (community, type de PDU, request_id, field1, field2,
+                varbinds [(OID encodé, étiquette, contenu)])
+
+    Raises:
+        ValueError: Message mal formé
+    """
+    try:
+        if data[0] != _SEQUENCE:
+            raise ValueError("SEQUENCE attendue")
+        pos = 2 if data[1] < 0x80 else 2 + (data[1] & 0x7F)
+        # version
+        pos += 2 + data[pos + 1]
+        # communauté
+        length = data[pos + 1]
+        community = data[pos + 2:pos + 2 + length]
+        pos += 2 + length
+        pdu_type = data[pos]
+        pos += 2 if data[pos + 1] < 0x80 else 2 + (data[pos + 1] & 0x7F)
+        fields = []
+        for _ in range(3):
+            length = data[pos + 1]
+            fields.append(int.from_bytes(data[pos + 2:pos + 2 + length], 'big', signed=True))
+            pos += 2 + length
+        length = data[pos + 1]
+        if length < 0x80:
+            pos += 2
+        else:
+            count = length & 0x7F
+            length = int.from_bytes(data[pos + 2:pos + 2 + count], 'big')
+            pos += 2 + count
+        end = pos + length
+        varbinds = []
+        append = varbinds.append
+        while pos < end:
+            # SEQUENCE du varbind (longueur ignorée: OID et valeur suivent)
+            pos += 2 if data[pos + 1] < 0x80 else 2 + (data[pos + 1] & 0x7F)
+            length = data[pos + 1]
+            oid = data[pos + 2:pos + 2 + length]
+            pos += 2 + length
+            tag = data[pos]
+            length = data[pos + 1]
+            if length < 0x80:
+                pos += 2
+            else:
+                count = length & 0x7F
+                length = int.from_bytes(data[pos + 2:pos + 2 + count], 'big')
+                pos += 2 + count
+            append((oid, tag, data[pos:pos + length]))
+            pos += length
+    except IndexError:
+        raise ValueError("Message SNMP tronqué")
+    return community, pdu_type, fields[0], fields[1], fields[2], varbinds
+
+
+# ----------------------------------------------------------------------
+# Collecteur
+# ----------------------------------------------------------------------
+
+class _ClientProtocol(asyncio.DatagramProtocol):
+    """Socket partagée par tous les agents: réponses aiguillées par request-id"""
+
+    def __init__(self):
+        self.pending = {}
+
+    def datagram_received(self, data, addr):
+        try:
+            message = decode_message(data)
+        except ValueError:
+            return
+        future = self.pending.get(message[2])
+        if future is not None and not future.done():
+            future.set_result(message)
+
+    def error_received(self, exc):
+        pass
+
+
+class SNMPCollector:
+    """
+    Collecte des compteurs d'interfaces tunnel par SNMPv2c
+
+    Chaque agent est parcouru par GETBULK multi-colonnes; les tables IF-MIB
+    ifTable, ifXTable et IP-MIB ipAddrTable sont des flux de requêtes
+    distincts envoyés simultanément (plusieurs requêtes en vol par agent).
+    Tous les agents partagent une socket UDP; 'concurrency' agents sont
+    interrogés en même temps. Les valeurs ne sont décodées que pour les
+    interfaces tunnel (ifType tunnel ou nom 'Tunnel...').
+    """
+
+    def __init__(self, community='public', port=161, timeout=1.0, retries=1,
+                 max_varbinds=60, concurrency=256, wan_interfaces=()):
+        """
+        Initialiser le collecteur
+
+        Args:
+            community (str): Communauté SNMPv2c par défaut
+            port (int): Port SNMP par défaut des agents
+            timeout (float): Attente d'une réponse (secondes)
+            retries (int): Réémissions d'une requête sans réponse
+            max_varbinds (int): Varbinds demandés par GETBULK (max-repetitions x colonnes)
+            concurrency (int): Agents interrogés simultanément
+            wan_interfaces (tuple): Noms des interfaces Internet relevées en plus des tunnels
+        """
+        self.community = community
+        self.port = int(port)
+        self.timeout = timeout
+        self.retries = retries
+        self.max_varbinds = max(1, int(max_varbinds))
+        self.concurrency = max(1, int(concurrency))
+        self.wan_interfaces = tuple(wan_interfaces)
+        self._tables = [
+            (list(columns), [encode_oid(oid) for oid in columns.values()]) for columns in WALK_TABLES
+        ]
+        self._request_ids = itertools.count(random.randint(1, 1 << 24))
+        self._transports = {}
+        self.stats = {}
+
+    async def _transport(self, family):
+        endpoint = self._transports.get(family)
+        if endpoint is None:
+            loop = asyncio.get_running_loop()
+            endpoint = self._transports[family] = await loop.create_datagram_endpoint(
+                _ClientProtocol, family=family
+            )
+            try:
+                # Réponses de tous les agents sur une seule socket: absorber les rafales
+                endpoint[0].get_extra_info('socket').setsockopt(
+                    socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER
+                )
+            except OSError:
+                pass
+        return endpoint
+
+    async def _exchange(self, address, community, pdu_type, oids, max_repetitions=0):
+        """Émettre une requête (avec réémissions) et attendre sa réponse"""
+        transport, protocol = await self._transport(socket.AF_INET6 if ':' in address[0] else socket.AF_INET)
+        request_id = next(self._request_ids) & 0x7FFFFFFF
+        packet = encode_message(pdu_type, request_id, community, oids, 0, max_repetitions)
+        future = asyncio.get_running_loop().create_future()
+        protocol.pending[request_id] = future
+        try:
+            for _ in range(self.retries + 1):
+                transport.sendto(packet, address)
+                self.stats['requests'] = self.stats.get('requests', 0) + 1
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+                except asyncio.TimeoutError:
+                    self.stats['timeouts'] = self.stats.get('timeouts', 0) + 1
+            raise TimeoutError(f"Pas de réponse SNMP de {address[0]}:{address[1]}")
+        finally:
+            protocol.pending.pop(request_id, None)
+
+    async def walk(self, address, community, names, roots):
+        """
+        Parcourir plusieurs colonnes en parallèle par GETBULK
+
+        Args:
+            address (tuple): (hôte, port)
+            community (bytes): Communauté
+            names (list): Noms des colonnes
+            roots (list): OID encodés des colonnes
+
+        Returns:
+            tuple: ({colonne: {suffixe d'index encodé: (étiquette, contenu)}}, nombre d'OID)
+        """
+        table = {name: {} for name in names}
+        current = list(roots)
+        active = list(range(len(roots)))
+        count = 0
+        while active:
+            oids = [current[k] for k in active]
+            repetitions = max(1, self.max_varbinds // len(oids))
+            _, _, _, error_status, _, varbinds = await self._exchange(
+                address, community, GET_BULK_REQUEST, oids, repetitions
+            )
+            if error_status:
+                raise RuntimeError(f"Erreur SNMP {error_status} ({address[0]})")
+            if not varbinds:
+                break
+            width = len(oids)
+            finished = set()
+            for i, (oid, tag, raw) in enumerate(varbinds):
+                k = active[i % width]
+                if k in finished:
+                    continue
+                root = roots[k]
+                if tag == _END_OF_MIB_VIEW or not oid.startswith(root) or oid == current[k]:
+                    finished.add(k)
+                    continue
+                table[names[k]][oid[len(root):]] = (tag, raw)
+                current[k] = oid
+                count += 1
+            active = [k for k in active if k not in finished]
+        return table, count
+
+    async def poll(self, agent):
+        """
+        Collecter les interfaces tunnel d'un agent
+
+        Args:
+            agent (dict): {'host', 'port', 'community', 'name'} (port, communauté et nom optionnels)
+
+        Returns:
+            dict: {'agent', 'host', 'status', 'timestamp', 'interfaces', 'wan', 'oids', 'duration_ms', 'error'}
+        """
+        address = (agent['host'], int(agent.get('port') or self.port))
+        community = (agent.get('community') or self.community).encode()
+        name = agent.get('name') or (address[0] if address[1] == self.port else f"{address[0]}:{address[1]}")
+        started = time.perf_counter()
+        result = {'agent': name, 'host': address[0], 'status': 'ok', 'timestamp': time.time(),
+                  'interfaces': [], 'wan': [], 'oids': 0, 'duration_ms': None, 'error': None}
+        walks = await asyncio.gather(*(
+            self.walk(address, community, names, roots) for names, roots in self._tables
+        ), return_exceptions=True)
+        for error in walks:
+            if isinstance(error, (OSError, RuntimeError, ValueError)):
+                result.update({'status': 'error', 'error': str(error),
+                               'duration_ms': (time.perf_counter() - started) * 1000})
+                return result
+            if isinstance(error, BaseException):
+                raise error
+
+        columns = {}
+        for table, count in walks:
+            columns.update(table)
+            result['oids'] += count
+        result['timestamp'] = time.time()
+        result['interfaces'], result['wan'] = _tunnel_rows(columns, name, self.wan_interfaces)
+        result['duration_ms'] = (time.perf_counter() - started) * 1000
+        return result
+
+    async def run(self, agents):
+        """
+        Collecter un ensemble d'agents en parallèle
+
+        Args:
+            agents (list): Agents (voir poll)
+
+        Returns:
+            list: Résultats, dans l'ordre des agents
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self.stats = {'requests': 0, 'timeouts': 0}
+        started = time.perf_counter()
+
+        async def bounded(agent):
+            async with semaphore:
+                return await self.poll(agent)
+
+        try:
+            results = await asyncio.gather(*(bounded(agent) for agent in agents))
+        finally:
+            for transport, _ in self._transports.values():
+                transport.close()
+            self._transports = {}
+        elapsed = time.perf_counter() - started
+        oids = sum(result['oids'] for result in results)
+        self.stats.update({
+            'agents': len(agents),
+            'errors': sum(1 for result in results if result['status'] != 'ok'),
+            'oids': oids,
+            'duration_s': elapsed,
+            'oids_per_s': oids / elapsed if elapsed > 0 else 0.0
+        })
+        return results
+
+    def run_sync(self, agents):
+        """Version synchrone de run() (pour Streamlit et les scripts)"""
+        return asyncio.run(self.run(agents))
+
+
+def _tunnel_rows(columns, agent, wan_interfaces=()):
+    """
+    Lignes des interfaces tunnel à partir des colonnes parcourues (valeurs décodées ici seulement)
+
+    Returns:
+        tuple: (lignes des tunnels, lignes des interfaces WAN nommées dans wan_interfaces)
+    """
+    names = columns['name']
+    tunnels = [
+        suffix for suffix, (tag, raw) in columns['type'].items()
+        if decode_value(tag, raw) == IF_TYPE_TUNNEL
+    ]
+    tunnels += [
+        suffix for suffix, (tag, raw) in names.items()
+        if raw.startswith(b'Tunnel') and suffix not in columns['type']
+    ]
+    wan_names = {name.encode() for name in wan_interfaces}
+    wan = [suffix for suffix, (tag, raw) in names.items() if raw in wan_names]
+    addresses = {}
+    for suffix, (tag, raw) in columns['address_if_index'].items():
+        addresses.setdefault(decode_value(tag, raw), '.'.join(str(arc) for arc in decode_subids(suffix)))
+
+    def value(column, suffix):
+        entry = columns[column].get(suffix)
+        return decode_value(*entry) if entry else None
+
+    return _interface_rows(tunnels, agent, value, addresses), _interface_rows(wan, agent, value, addresses)
+
+
+def _interface_rows(suffixes, agent, value, addresses):
+    """Lignes d'interfaces (suffixes d'index IF-MIB) décodées par value(colonne, suffixe)"""
+    rows = []
+    for suffix in sorted(set(suffixes), key=decode_subids):
+        if_index = decode_subids(suffix)[0]
+        name = value('name', suffix)
+        high_speed = value('high_speed', suffix)
+        rows.append({
+            'agent': agent,
+            'ifIndex': if_index,
+            'interface': name.decode(errors='replace') if name else f"ifIndex{if_index}",
+            'ip_address': addresses.get(if_index),
+            'status': _STATUS.get(value('admin_status', suffix), 'unknown'),
+            'line_protocol': _STATUS.get(value('oper_status', suffix), 'unknown'),
+            'mtu': value('mtu', suffix),
+            'bandwidth_kbps': high_speed * 1000 if high_speed is not None else None,
+            'bytes_input': value('bytes_input', suffix),
+            'bytes_output': value('bytes_output', suffix),
+            'packets_input': value('packets_input', suffix),
+            'packets_output': value('packets_output', suffix),
+            'input_errors': value('input_errors', suffix),
+            'output_errors': value('output_errors', suffix)
+        })
+    return rows
+
+
+# ----------------------------------------------------------------------
+# Débits
+# ----------------------------------------------------------------------
+
+class CounterRates:
+    """
+    Débits de compteurs calculés par lots (tableaux NumPy indexés par clé)
+
+    Les compteurs 32 bits rebouclent modulo 2^32; une baisse d'un compteur
+    64 bits est traitée comme une remise à zéro (redémarrage, clear counters)
+    et ne produit pas de débit.
+    """
+
+    def __init__(self):
+        self._index = {}
+        self._values = np.zeros(0, dtype=np.uint64)
+        self._timestamps = np.zeros(0, dtype=np.float64)
+
+    def _rows(self, keys):
+        index = self._index
+        rows = np.fromiter((index.setdefault(key, len(index)) for key in keys), dtype=np.intp, count=len(keys))
+        if len(index) > len(self._values):
+            grow = len(index) - len(self._values)
+            self._values = np.concatenate([self._values, np.zeros(grow, dtype=np.uint64)])
+            self._timestamps = np.concatenate([self._timestamps, np.full(grow, np.nan)])
+        return rows
+
+    def update(self, keys, values, timestamps, bits=64):
+        """
+        Enregistrer des valeurs de compteurs et calculer les débits
+
+        Args:
+            keys (list): Identifiants des compteurs
+            values (array): Valeurs (entiers non signés)
+            timestamps (float|array): Horodatage(s) epoch des valeurs
+            bits (int): Largeur des compteurs (32 ou 64)
+
+        Returns:
+            ndarray: Débit par seconde de chaque compteur (NaN à la première valeur ou après remise à zéro)
+        """
+        rows = self._rows(keys)
+        values = np.asarray(values, dtype=np.uint64)
+        timestamps = np.broadcast_to(np.asarray(timestamps, dtype=np.float64), values.shape)
+        previous = self._values[rows]
+        elapsed = timestamps - self._timestamps[rows]
+        delta = values - previous
+        if bits < 64:
+            delta &= np.uint64((1 << bits) - 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates = np.where(elapsed > 0, delta.astype(np.float64) / elapsed, np.nan)
+        if bits >= 64:
+            rates[values < previous] = np.nan
+        self._values[rows] = values
+        self._timestamps[rows] = timestamps
+        return rates
+
+
+def interface_rates(results, rates):
+    """
+    Débits en bits/s des interfaces collectées
+
+    Args:
+        results (list): Résultats de SNMPCollector.run()
+        rates (CounterRates): État des compteurs entre deux collectes
+
+    Returns:
+        tuple: (clés '<agent>/<interface>', rx_bps, tx_bps, horodatages)
+    """
+    keys, inputs, outputs, timestamps = [], [], [], []
+    for result in results:
+        for row in result['interfaces']:
+            if row['bytes_input'] is None or row['bytes_output'] is None:
+                continue
+            keys.append(f"{row['agent']}/{row['interface']}")
+            inputs.append(row['bytes_input'])
+            outputs.append(row['bytes_output'])
+            timestamps.append(result['timestamp'])
+    if not keys:
+        empty = np.zeros(0)
+        return keys, empty, empty, empty
+    timestamps = np.asarray(timestamps)
+    counters = rates.update([key + ':in' for key in keys] + [key + ':out' for key in keys],
+                            inputs + outputs, np.concatenate([timestamps, timestamps]))
+    return keys, counters[:len(keys)] * 8, counters[len(keys):] * 8, timestamps
+
+
+def interface_capacities(interfaces, keys):
+    """
+    Capacités en bits/s des tunnels (bande passante déclarée de l'interface)
+
+    Args:
+        interfaces (list): Lignes d'interfaces collectées
+        keys (list): Tunnels '<agent>/<interface>' (ordre du résultat)
+
+    Returns:
+        array: Capacités alignées sur keys (NaN si inconnue)
+    """
+    bandwidth = {f"{row['agent']}/{row['interface']}": row.get('bandwidth_kbps') for row in interfaces}
+    return np.array([
+        bandwidth[key] * 1000.0 if bandwidth.get(key) else np.nan for key in keys
+    ], dtype=np.float64)
+
+
+def wan_counters(results):
+    """
+    Compteurs cumulés des interfaces Internet de tous les agents
+
+    Returns:
+        dict: {'interface.internet.bytes_in', 'interface.internet.bytes_out'} (vide sans interface WAN)
+    """
+    rows = [row for result in results for row in result.get('wan') or []]
+    values = {}
+    for counter, column in (('bytes_in', 'bytes_input'), ('bytes_out', 'bytes_output')):
+        counted = [row[column] for row in rows if row[column] is not None]
+        if counted:
+            values[f"interface.internet.{counter}"] = sum(counted)
+    return values
+
+
+def record_interface_rates(keys, rx_bps, tx_bps, ts, live_cache=None, store=None, capacity_bps=None):
+    """
+    Alimenter le cache temps réel et l'historique avec les débits calculés
+
+    Args:
+        keys (list): Tunnels '<agent>/<interface>'
+        rx_bps (array): Débit reçu
+        tx_bps (array): Débit émis
+        ts (float): Horodatage de la collecte
+        live_cache (TunnelRingBuffer): Cache temps réel (optionnel)
+        store (TimeSeriesStore): Historique (optionnel)
+        capacity_bps (array): Capacités alignées sur keys, historisées en '<tunnel>.capacity_bps' (optionnel)
+
+    Returns:
+        int: Débits enregistrés
+    """
+    valid = ~(np.isnan(rx_bps) | np.isnan(tx_bps))
+    if not valid.any():
+        return 0
+    selected = [key for key, keep in zip(keys, valid) if keep]
+    if live_cache is not None:
+        rows, kept = [], []
+        for i, key in enumerate(selected):
+            try:
+                rows.append(live_cache.tunnel_row(key))
+                kept.append(i)
+            except ValueError:
+                # Capacité atteinte: les tunnels suivants restent hors du cache
+                break
+        if rows:
+            live_cache.append_batch(rows, {
+                'rx_bps': rx_bps[valid][kept], 'tx_bps': tx_bps[valid][kept]
+            }, ts)
+    if store is not None:
+        snapshot = {}
+        for key, rx, tx in zip(selected, rx_bps[valid].tolist(), tx_bps[valid].tolist()):
+            snapshot[f"tunnel.{key}.rx_bps"] = rx
+            snapshot[f"tunnel.{key}.tx_bps"] = tx
+        if capacity_bps is not None:
+            for key, capacity in zip(selected, np.asarray(capacity_bps, dtype=np.float64)[valid].tolist()):
+                if not np.isnan(capacity):
+                    snapshot[f"tunnel.{key}.capacity_bps"] = capacity
+        store.record_snapshot(snapshot, ts)
+    return len(selected)
+
+
+def parse_agents(spec, community=None):
+    """
+    Lire une liste d'agents 'hôte[:port[-port_final]]' séparés par des virgules
+
+    Une plage de ports (127.0.0.1:16100-16199) désigne un agent par port
+    (agents du simulateur).
+
+    Returns:
+        list: Agents {'host', 'port', 'community'}
+    """
+    agents = []
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if item.startswith('['):
+            host, _, ports = item[1:].partition(']')
+            ports = ports.lstrip(':')
+        elif item.count(':') == 1:
+            host, ports = item.split(':')
+        else:
+            host, ports = item, ''
+        first, _, last = ports.partition('-')
+        if not first:
+            agents.append({'host': host, 'port': None, 'community': community})
+            continue
+        for port in range(int(first), int(last or first) + 1):
+            agents.append({'host': host, 'port': port, 'community': community})
+    return agents
+
+
+# ----------------------------------------------------------------------
+# Simulateur d'agents
+# ----------------------------------------------------------------------
+
+class SNMPSimulator(asyncio.DatagramProtocol):
+    """
+    Agent SNMPv2c simulé (GET, GETNEXT, GETBULK) exposant IF-MIB et IP-MIB
+
+    Les 'tunnels' premières interfaces sont des tunnels (ifType 131, Tunnel<n>),
+    les suivantes des GigabitEthernet; les compteurs HC croissent avec le temps
+    à un débit propre à chaque interface.
+    """
+
+    MAX_RESPONSE_VARBINDS = 1000
+
+    def __init__(self, interfaces=8, tunnels=2, community='public', agent_id=0):
+        self.community = community.encode()
+        self.transport = None
+        self.started = time.time()
+        entries = []
+        for if_index in range(1, interfaces + 1):
+            tunnel = if_index <= tunnels
+            name = f"Tunnel{if_index - 1}" if tunnel else f"GigabitEthernet{if_index - tunnels}"
+            rate = 125000 * if_index
+            static = {
+                'type': _encode_integer(IF_TYPE_TUNNEL if tunnel else 6),
+                'mtu': _encode_integer(1400 if tunnel else 1500),
+                'admin_status': _encode_integer(1),
+                'oper_status': _encode_integer(1),
+                'input_errors': _encode_integer(0, _COUNTER32),
+                'output_errors': _encode_integer(0, _COUNTER32),
+                'name': _tlv(_OCTET_STRING, name.encode()),
+                'high_speed': _encode_integer(100 if tunnel else 1000, _GAUGE32),
+            }
+            counters = {'bytes_input': rate, 'bytes_output': rate // 2,
+                        'packets_input': rate // 500, 'packets_output': rate // 1000}
+            for columns in (IF_COLUMNS, IFX_COLUMNS):
+                for column, oid in columns.items():
+                    arcs = tuple(int(arc) for arc in oid.split('.')) + (if_index,)
+                    entries.append((arcs, static.get(column), counters.get(column)))
+            address = (10, agent_id // 250 % 250, agent_id % 250, if_index)
+            arcs = tuple(int(arc) for arc in IP_COLUMNS['address_if_index'].split('.')) + address
+            entries.append((arcs, _encode_integer(if_index), None))
+        entries.sort(key=lambda entry: entry[0])
+        self._arcs = [entry[0] for entry in entries]
+        self._entries = [(_tlv(_OID, encode_oid(arcs)), value, rate) for arcs, value, rate in entries]
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def _varbind(self, position, elapsed):
+        oid, value, rate = self._entries[position]
+        if value is None:
+            value = _encode_integer(int(rate * elapsed), _COUNTER64)
+        return _tlv(_SEQUENCE, oid + value)
+
+    def datagram_received(self, data, addr):
+        try:
+            community, pdu_type, request_id, field1, field2, varbinds = decode_message(data)
+        except ValueError:
+            return
+        if community != self.community:
+            return
+        arcs = self._arcs
+        elapsed = time.time() - self.started
+        end_of_view = b'\x82\x00'
+        out = []
+        requested = [decode_oid(oid) for oid, _, _ in varbinds]
+        if pdu_type == GET_REQUEST:
+            for key, (oid, _, _) in zip(requested, varbinds):
+                position = bisect.bisect_left(arcs, key)
+                if position < len(arcs) and arcs[position] == key:
+                    out.append(self._varbind(position, elapsed))
+                else:
+                    out.append(_tlv(_SEQUENCE, _tlv(_OID, oid) + b'\x81\x00'))
+        elif pdu_type in (GET_NEXT_REQUEST, GET_BULK_REQUEST):
+            non_repeaters = field1 if pdu_type == GET_BULK_REQUEST else len(requested)
+            repetitions = max(0, field2) if pdu_type == GET_BULK_REQUEST else 0
+            positions = [bisect.bisect_right(arcs, key) for key in requested]
+            for i in range(min(non_repeaters, len(positions))):
+                position = positions[i]
+                out.append(self._varbind(position, elapsed) if position < len(arcs)
+                           else _tlv(_SEQUENCE, _tlv(_OID, varbinds[i][0]) + end_of_view))
+            repeaters = list(range(non_repeaters, len(positions)))
+            if repeaters:
+                repetitions = min(repetitions, self.MAX_RESPONSE_VARBINDS // len(repeaters))
+                for _ in range(repetitions):
+                    for i in repeaters:
+                        position = positions[i]
+                        if position < len(arcs):
+                            out.append(self._varbind(position, elapsed))
+                            positions[i] = position + 1
+                        else:
+                            out.append(_tlv(_SEQUENCE, _tlv(_OID, varbinds[i][0]) + end_of_view))
+        else:
+            return
+        self.transport.sendto(encode_message(RESPONSE, request_id, self.community, out), addr)
+
+
+async def start_simulators(count, host='127.0.0.1', base_port=16100, interfaces=8, tunnels=2,
+                           community='public'):
+    """
+    Démarrer des agents simulés sur des ports consécutifs
+
+    Returns:
+        list: Transports ouverts (à fermer par l'appelant)
+    """
+    loop = asyncio.get_running_loop()
+    transports = []
+    for i in range(count):
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda i=i: SNMPSimulator(interfaces, tunnels, community, agent_id=i),
+            local_addr=(host, base_port + i)
+        )
+        transports.append(transport)
+    return transports
+
+
+def get_snmp_collector():
+    """Créer un collecteur SNMP à partir de config.env"""
+    config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    return SNMPCollector(
+        community=os.getenv('SNMP_COMMUNITY', 'public'),
+        port=int(os.getenv('SNMP_PORT', '161')),
+        timeout=float(os.getenv('SNMP_TIMEOUT', '1.0')),
+        retries=int(os.getenv('SNMP_RETRIES', '1')),
+        max_varbinds=int(os.getenv('SNMP_MAX_VARBINDS', '60')),
+        concurrency=int(os.getenv('SNMP_CONCURRENCY', '256')),
+        wan_interfaces=[name.strip() for name in os.getenv('SNMP_WAN_INTERFACES', 'GigabitEthernet1').split(',')
+                        if name.strip()]
+    )
+
+
+def snmp_enabled():
+    """Interrogation SNMP des routeurs activée (SNMP_ENABLED dans config.env)"""
+    config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    return os.getenv('SNMP_ENABLED', 'false').lower() == 'true'
+
+
+def get_snmp_agents():
+    """Agents déclarés dans config.env (SNMP_AGENTS), liste vide si aucun"""
+    config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    return parse_agents(os.getenv('SNMP_AGENTS', ''))
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Récepteur syslog des événements tunnel
+Description: Réception UDP/TCP des messages %CRYPTO, %IKEV2 et %LINEPROTO-5-UPDOWN, analyse par lots avec expressions précompilées et mise à jour événementielle de l'état des tunnels
+"""
+
+import asyncio
+import os
+import re
+import socket
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from utils.prefix_index import get_prefix_index
+from utils.tunnel_state import TunnelStateStore, get_state_file
+
+# Expressions précompilées (octets: aucun décodage des messages ignorés)
+_EVENT_RE = re.compile(rb'%(CRYPTO|IKEV2|LINEPROTO)-(\d)-([A-Z0-9_]+): ?(.*)', re.S)
+_HEADER_RE = re.compile(
+    rb'^(?:<\d{1,3}>)?(?:[A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d (\S+) |\d+: ([A-Za-z][\w.-]*): )'
+)
+_UPDOWN_RE = re.compile(rb'Interface (Tunnel\S*), changed state to (up|down)')
+_STATUS_RE = re.compile(rb'\bis (UP|DOWN)\b')
+_PEER_RE = re.compile(
+    rb'(?:Peer|peer|Remote|remote)\s*:?\s*(\d{1,3}(?:\.\d{1,3}){3}|\[[0-9A-Fa-f:]+\])'
+)
+
+# Mnémoniques portant directement l'état de la SA
+_SA_STATES = {b'SA_UP': 'up', b'SA_DOWN': 'down'}
+
+MESSAGE_MAX_LENGTH = 200
+
+# Tampon de réception UDP demandé au noyau (octets)
+UDP_RECEIVE_BUFFER = 8 * 1024 * 1024
+# Datagrammes lus au plus par réveil de la boucle
+UDP_DRAIN_MAX = 1000
+# Octets en attente au plus par connexion TCP (trame incomplète)
+TCP_BUFFER_MAX = 64 * 1024
+
+
+def parse_messages(messages, resolve=str):
+    """
+    Extraire les événements tunnel d'un lot de messages syslog bruts
+
+    Les messages sans %CRYPTO, %IKEV2 ou %LINEPROTO (ou dont l'interface
+    n'est pas un tunnel) sont ignorés sans être décodés.
+
+    Args:
+        messages (list): Tuples (horodatage, adresse source, message en octets)
+        resolve (callable): resolve(adresse) -> nom d'équipement, si l'en-tête
+                            syslog ne porte pas de nom d'hôte
+
+    Returns:
+        list: Événements {'ts', 'device', 'object', 'kind', 'state', 'mnemonic', 'message'}
+    """
+    events = []
+    append = events.append
+    search = _EVENT_RE.search
+    header = _HEADER_RE.match
+    updown = _UPDOWN_RE.search
+    status = _STATUS_RE.search
+    peer = _PEER_RE.search
+    sa_states = _SA_STATES
+    for ts, address, data in messages:
+        match = search(data)
+        if match is None:
+            continue
+        facility, severity, mnemonic, text = match.groups()
+
+        if facility == b'LINEPROTO':
+            if mnemonic != b'UPDOWN':
+                continue
+            found = updown(text)
+            if found is None:
+                continue
+            target = found.group(1).decode()
+            kind = 'interface'
+            state = found.group(2).decode()
+        else:
+            state = sa_states.get(mnemonic)
+            if state is None and mnemonic.endswith(b'SESSION_STATUS'):
+                found = status(text)
+                state = found.group(1).decode().lower() if found else None
+            found = peer(text)
+            target = 'peer-' + found.group(1).strip(b'[]').decode() if found else mnemonic.decode().lower()
+            kind = 'ike' if facility == b'IKEV2' or b'IKEV2' in mnemonic else 'ipsec'
+
+        found = header(data)
+        host = found and (found.group(1) or found.group(2))
+        append({
+            'ts': ts,
+            'device': host.decode(errors='replace') if host else resolve(address),
+            'object': target,
+            'kind': kind,
+            'state': state,
+            'mnemonic': f"%{facility.decode()}-{severity.decode()}-{mnemonic.decode()}",
+            'message': text[:MESSAGE_MAX_LENGTH].decode(errors='replace').strip()
+        })
+    return events
+
+
+class _TCPProtocol(asyncio.Protocol):
+    """Trames TCP: délimitées par saut de ligne ou préfixées par leur longueur (RFC 6587)"""
+
+    def __init__(self, receiver):
+        self.receiver = receiver
+        self.buffer = b''
+        self.address = None
+
+    def connection_made(self, transport):
+        self.address = (transport.get_extra_info('peername') or ('?',))[0]
+
+    def data_received(self, data):
+        buffer = self.buffer + data
+        feed = self.receiver.feed
+        start = 0
+        end = len(buffer)
+        while start < end:
+            # Octet counting ("<longueur> <message>") seulement si le préfixe n'est que des chiffres
+            # suivis d'une espace: "000123: HQ-Router: ..." (numéro de séquence IOS) reste une ligne
+            space = buffer.find(b' ', start, start + 11)
+            if space > start and buffer[start:space].isdigit():
+                stop = space + 1 + int(buffer[start:space])
+                if stop > end:
+                    break
+                feed(buffer[space + 1:stop], self.address)
+                start = stop
+                continue
+            if space < 0 and end - start < 11 and buffer[start:end].isdigit():
+                # Longueur incomplète: attendre la suite
+                break
+            newline = buffer.find(b'\n', start)
+            if newline < 0:
+                break
+            if newline > start:
+                feed(buffer[start:newline], self.address)
+            start = newline + 1
+        self.buffer = buffer[start:]
+        if len(self.buffer) > TCP_BUFFER_MAX:
+            # Trame sans fin ou longueur aberrante: abandonner plutôt que croître sans limite
+            self.receiver.stats['discarded'] += len(self.buffer)
+            self.buffer = b''
+
+    def eof_received(self):
+        if self.buffer.strip():
+            self.receiver.feed(self.buffer.strip(), self.address)
+        self.buffer = b''
+
+
+class SyslogReceiver:
+    """
+    Récepteur syslog UDP/TCP alimentant un TunnelStateStore
+
+    Les messages reçus sont mis en attente et analysés par lots toutes les
+    flush_interval secondes (ou dès max_batch messages): l'état d'un tunnel
+    est à jour quelques millisecondes après le message. Les écouteurs
+    (historique, alertes) et le fichier d'état ne sont sollicités que pour
+    les entrées dont l'état a changé, une fois par lot.
+    """
+
+    def __init__(self, store=None, flush_interval=0.02, max_batch=5000,
+                 state_file=None, save_interval=1.0):
+        """
+        Initialiser le récepteur
+
+        Args:
+            store (TunnelStateStore): Table d'état (nouvelle table par défaut)
+            flush_interval (float): Intervalle d'analyse des messages en attente (secondes)
+            max_batch (int): Messages en attente déclenchant une analyse immédiate
+            state_file (str): Fichier d'état pour le dashboard (aucun si None)
+            save_interval (float): Intervalle minimal entre deux écritures du fichier d'état
+        """
+        self.store = store or TunnelStateStore()
+        self.flush_interval = flush_interval
+        self.max_batch = max(1, int(max_batch))
+        self.state_file = state_file
+        self.save_interval = save_interval
+        self._pending = []
+        self._listeners = []
+        self._devices = {}
+        self._saved_version = None
+        self._saved_at = 0.0
+        self.stats = {'received': 0, 'events': 0, 'batches': 0, 'changes': 0,
+                      'last_batch': 0, 'last_flush_ms': 0.0, 'discarded': 0}
+
+    def add_listener(self, callback):
+        """Enregistrer callback(changes, events), appelé après chaque lot contenant des événements"""
+        self._listeners.append(callback)
+
+    def resolve(self, address):
+        """Nom d'équipement d'une adresse source (index de préfixes, adresse sinon)"""
+        device = self._devices.get(address)
+        if device is None:
+            value = get_prefix_index().lookup(address)
+            device = value['device'] if value and value.get('kind') == 'device' else address
+            self._devices[address] = device
+        return device
+
+    def feed(self, data, address):
+        """Mettre un message en attente (analyse immédiate au-delà de max_batch)"""
+        self._pending.append((time.time(), address, data))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+
+    def _read_udp(self, udp_socket):
+        """Vider la socket UDP (un réveil de la boucle pour toute une rafale)"""
+        recvfrom = udp_socket.recvfrom
+        append = self._pending.append
+        now = time.time()
+        for _ in range(UDP_DRAIN_MAX):
+            try:
+                data, addr = recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                break
+            append((now, addr[0], data))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+
+    def flush(self):
+        """
+        Analyser les messages en attente et appliquer les événements
+
+        Returns:
+            list: Entrées dont l'état a changé
+        """
+        batch, self._pending = self._pending, []
+        if not batch:
+            return []
+        started = time.perf_counter()
+        events = parse_messages(batch, self.resolve)
+        changes = self.store.apply(events) if events else []
+        if events:
+            for callback in self._listeners:
+                try:
+                    callback(changes, events)
+                except Exception as e:
+                    print(f"Erreur dans un écouteur syslog: {str(e)}")
+        stats = self.stats
+        stats['received'] += len(batch)
+        stats['events'] += len(events)
+        stats['batches'] += 1
+        stats['changes'] += len(changes)
+        stats['last_batch'] = len(batch)
+        stats['last_flush_ms'] = (time.perf_counter() - started) * 1000
+        return changes
+
+    def save(self, force=False):
+        """Écrire le fichier d'état si l'état a changé (au plus une fois par save_interval)"""
+        if not self.state_file or self.store.version == self._saved_version:
+            return False
+        now = time.monotonic()
+        if not force and now - self._saved_at < self.save_interval:
+            return False
+        self._saved_version = self.store.version
+        self._saved_at = now
+        self.store.save(self.state_file)
+        return True
+
+    async def serve(self, host='0.0.0.0', udp_port=5514, tcp_port=5514, ready=None):
+        """
+        Écouter en UDP et TCP jusqu'à annulation
+
+        Args:
+            host (str): Adresse d'écoute
+            udp_port (int): Port UDP (0 = désactivé)
+            tcp_port (int): Port TCP (0 = désactivé)
+            ready (callable): Appelé une fois les sockets ouvertes
+        """
+        loop = asyncio.get_running_loop()
+        udp_socket = server = None
+        try:
+            if udp_port:
+                udp_socket = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_DGRAM)
+                try:
+                    # Absorber les rafales entre deux passages de la boucle
+                    udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER)
+                except OSError:
+                    pass
+                udp_socket.bind((host, udp_port))
+                udp_socket.setblocking(False)
+                loop.add_reader(udp_socket.fileno(), self._read_udp, udp_socket)
+            if tcp_port:
+                server = await loop.create_server(lambda: _TCPProtocol(self), host, tcp_port)
+            if ready:
+                ready()
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                self.flush()
+                self.save()
+        finally:
+            if udp_socket:
+                loop.remove_reader(udp_socket.fileno())
+                udp_socket.close()
+            if server:
+                server.close()
+            self.flush()
+            self.save(force=True)
+
+
+_receiver = None
+_receiver_lock = threading.Lock()
+
+
+def get_syslog_receiver():
+    """Obtenir le récepteur du processus (configuré via config.env)"""
+    global _receiver
+    with _receiver_lock:
+        if _receiver is None:
+            config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+            if os.path.exists(config_path):
+                load_dotenv(config_path)
+            _receiver = SyslogReceiver(
+                flush_interval=float(os.getenv('SYSLOG_FLUSH_MS', '20')) / 1000,
+                max_batch=int(os.getenv('SYSLOG_BATCH', '5000')),
+                state_file=get_state_file(),
+                save_interval=float(os.getenv('SYSLOG_SAVE_INTERVAL', '1'))
+            )
+        return _receiver
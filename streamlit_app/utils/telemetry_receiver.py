@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+"""
+Récepteur de télémétrie model-driven
+Description: Réception dial-out TCP (en-tête MDT, charge JSON) des compteurs d'interfaces tunnel et de chiffrement IOS-XE, décodage par lots avec contre-pression et client de rejeu local
+"""
+
+import asyncio
+import json
+import os
+import struct
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from utils.snmp_collector import CounterRates, interface_rates
+
+# En-tête TCP du dial-out MDT: type, encapsulation, version, drapeaux, longueur
+HEADER = struct.Struct('>HHHHI')
+MESSAGE_DATA = 1
+ENCAP_GPB = 1
+ENCAP_JSON = 2
+HEADER_VERSION = 1
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+# Chemins YANG pris en charge (suffixes des encoding_path)
+INTERFACES_PATH = 'Cisco-IOS-XE-interfaces-oper:interfaces/interface'
+IPSEC_PATH = 'Cisco-IOS-XE-crypto-oper:crypto-oper-data/crypto-ipsec-ident'
+IKEV2_PATH = 'Cisco-IOS-XE-crypto-oper:crypto-oper-data/crypto-ikev2-sa'
+
+_UP_STATES = ('if-state-up', 'if-oper-state-ready', 'up', 'ready', 'crypto-sa-status-active', 'active')
+
+
+def _first(content, *names):
+    for name in names:
+        if name in content:
+            return content[name]
+    return None
+
+
+def _state(value):
+    if value is None:
+        return None
+    return 'up' if str(value).lower() in _UP_STATES else 'down'
+
+
+def frame(message, encapsulation=ENCAP_JSON):
+    """
+    Encadrer un message de télémétrie (en-tête MDT de 12 octets)
+
+    Args:
+        message (dict|bytes): Message (sérialisé en JSON s'il s'agit d'un dict)
+        encapsulation (int): ENCAP_JSON ou ENCAP_GPB
+
+    Returns:
+        bytes: Trame prête à émettre
+    """
+    payload = message if isinstance(message, bytes) else json.dumps(message, separators=(',', ':')).encode()
+    return HEADER.pack(MESSAGE_DATA, encapsulation, HEADER_VERSION, 0, len(payload)) + payload
+
+
+def decode_frames(frames):
+    """
+    Décoder un lot de trames en lignes de télémétrie
+
+    Args:
+        frames (list): Tuples (adresse source, encapsulation, charge)
+
+    Returns:
+        tuple: (lignes {'node', 'address', 'path', 'ts', 'keys', 'content'}, trames rejetées)
+    """
+    rows = []
+    append = rows.append
+    rejected = 0
+    loads = json.loads
+    for address, encapsulation, payload in frames:
+        if encapsulation != ENCAP_JSON:
+            # Charge GPB (kvgpb): non décodée sans les définitions protobuf
+            rejected += 1
+            continue
+        try:
+            message = loads(payload)
+        except ValueError:
+            rejected += 1
+            continue
+        node = message.get('node_id_str') or address
+        path = message.get('encoding_path', '')
+        default_ts = message.get('msg_timestamp')
+        for row in message.get('data_json') or ():
+            append({
+                'node': node,
+                'address': address,
+                'path': path,
+                'ts': (row.get('timestamp') or default_ts or time.time() * 1000) / 1000,
+                'keys': row.get('keys') or {},
+                'content': row.get('content') or {}
+            })
+    return rows, rejected
+
+
+class TelemetryState:
+    """
+    État par routeur reconstruit depuis la télémétrie, au format de VPNChecker
+
+    Pour chaque nœud: 'interface' (champs de parse_tunnel_interface),
+    'ipsec' (check_ipsec_status) et 'ikev2' (check_ikev2_status), avec
+    l'horodatage de la dernière mise à jour.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def apply(self, rows):
+        """
+        Appliquer un lot de lignes décodées
+
+        Returns:
+            list: Lignes d'interfaces tunnel (format SNMPCollector) pour le calcul des débits
+        """
+        interfaces = []
+        with self._lock:
+            for row in rows:
+                node = self.nodes.get(row['node'])
+                if node is None:
+                    node = self.nodes[row['node']] = {'node': row['node'], 'address': row['address'],
+                                                      'updated_at': None, 'interfaces': {}}
+                node['address'] = row['address']
+                node['updated_at'] = row['ts']
+                path, keys, content = row['path'], row['keys'], row['content']
+                if path.endswith(INTERFACES_PATH):
+                    name = keys.get('name') or content.get('name')
+                    if not name or not name.startswith('Tunnel'):
+                        continue
+                    statistics = content.get('statistics') or {}
+                    speed = content.get('speed')
+                    interface = {
+                        'agent': row['node'],
+                        'interface': name,
+                        'ip_address': content.get('ipv4'),
+                        'status': _state(content.get('admin-status')),
+                        'line_protocol': _state(content.get('oper-status')),
+                        'mtu': content.get('mtu'),
+                        'bandwidth_kbps': int(speed) // 1000 if speed is not None else None,
+                        'bytes_input': statistics.get('in-octets'),
+                        'bytes_output': statistics.get('out-octets'),
+                        'packets_input': statistics.get('in-unicast-pkts'),
+                        'packets_output': statistics.get('out-unicast-pkts'),
+                        'input_errors': statistics.get('in-errors'),
+                        'output_errors': statistics.get('out-errors'),
+                        'timestamp': row['ts']
+                    }
+                    node['interfaces'][name] = interface
+                    interfaces.append(interface)
+                elif path.endswith(IPSEC_PATH):
+                    status = _state(_first(content, 'ident-status', 'sa-status', 'status'))
+                    node['ipsec'] = {
+                        'status': 'inactive' if status == 'down' else 'active',
+                        'interface': _first(keys, 'interface') or content.get('interface'),
+                        'peer': _first(content, 'remote-addr', 'remote-ident-addr'),
+                        'packets_encrypted': _first(content, 'pkts-encrypted', 'pkts-encaps'),
+                        'packets_decrypted': _first(content, 'pkts-decrypted', 'pkts-decaps'),
+                        'bytes_encrypted': _first(content, 'bytes-encrypted', 'octets-encrypted'),
+                        'bytes_decrypted': _first(content, 'bytes-decrypted', 'octets-decrypted'),
+                        'timestamp': row['ts']
+                    }
+                elif path.endswith(IKEV2_PATH):
+                    node['ikev2'] = {
+                        'status': 'active' if _state(_first(content, 'sa-status', 'status')) == 'up' else 'inactive',
+                        'peer_ip': _first(content, 'remote-ip-addr', 'remote-ip', 'remote-addr'),
+                        'encryption': _first(content, 'encryption-alg', 'encryption'),
+                        'integrity': _first(content, 'integrity-alg', 'hash-alg', 'integrity'),
+                        'dh_group': _first(content, 'dh-group', 'dh-grp'),
+                        'lifetime': _first(content, 'lifetime', 'life-time'),
+                        'active_time': _first(content, 'active-time', 'elapsed-time'),
+                        'timestamp': row['ts']
+                    }
+            if rows:
+                self.version += 1
+        return interfaces
+
+    def snapshot(self):
+        """Copie de l'état (sérialisable en JSON)"""
+        with self._lock:
+            return json.loads(json.dumps(self.nodes, default=str))
+
+    def save(self, path):
+        """Écrire l'état (fichier remplacé atomiquement)"""
+        document = {'updated_at': time.time(), 'version': self.version, 'nodes': self.snapshot()}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+
+class _TelemetryProtocol(asyncio.Protocol):
+    """
+    Connexion dial-out d'un routeur
+
+    Les octets reçus s'accumulent dans un bytearray; les en-têtes sont lus en
+    place (unpack_from) et chaque charge n'est copiée qu'une fois, au moment
+    de la remettre au décodeur.
+    """
+
+    def __init__(self, receiver):
+        self.receiver = receiver
+        self.buffer = bytearray()
+        self.transport = None
+        self.address = None
+        self.paused = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.address = (transport.get_extra_info('peername') or ('?',))[0]
+        self.receiver.stats['connections'] += 1
+
+    def connection_lost(self, exc):
+        self.receiver._paused.discard(self)
+
+    def data_received(self, data):
+        buffer = self.buffer
+        buffer += data
+        frames = []
+        position = 0
+        available = len(buffer)
+        with memoryview(buffer) as view:
+            while available - position >= HEADER.size:
+                _, encapsulation, _, _, length = HEADER.unpack_from(buffer, position)
+                if length > MAX_FRAME_BYTES:
+                    self.receiver.stats['rejected'] += 1
+                    self.transport.close()
+                    return
+                start = position + HEADER.size
+                if available - start < length:
+                    break
+                frames.append((self.address, encapsulation, bytes(view[start:start + length])))
+                position = start + length
+        del buffer[:position]
+        if frames:
+            self.receiver.submit(self, frames)
+
+    def pause(self):
+        if not self.paused:
+            self.paused = True
+            self.transport.pause_reading()
+
+    def resume(self):
+        if self.paused:
+            self.paused = False
+            self.transport.resume_reading()
+
+
+class TelemetryReceiver:
+    """
+    Récepteur dial-out TCP/JSON
+
+    Les trames complètes sont mises en file; une tâche unique les décode par
+    lots (jusqu'à batch_size trames) et met à jour l'état et les débits. Au-
+    delà de max_pending lots en attente, les connexions qui déposent des
+    trames cessent d'être lues (contrôle de flux TCP vers les routeurs) et
+    reprennent quand la file redescend sous la moitié.
+    """
+
+    def __init__(self, state=None, batch_size=500, max_pending=256, state_file=None, save_interval=1.0):
+        """
+        Initialiser le récepteur
+
+        Args:
+            state (TelemetryState): État cible (nouvel état par défaut)
+            batch_size (int): Trames décodées au plus par lot
+            max_pending (int): Dépôts en file au-delà desquels la lecture est suspendue
+            state_file (str): Fichier d'état pour le dashboard (aucun si None)
+            save_interval (float): Intervalle minimal entre deux écritures du fichier d'état
+        """
+        self.state = state or TelemetryState()
+        self.rates = CounterRates()
+        self.batch_size = max(1, int(batch_size))
+        self.max_pending = max(1, int(max_pending))
+        self.state_file = state_file
+        self.save_interval = save_interval
+        self._queue = None
+        self._paused = set()
+        self._listeners = []
+        self._saved_version = None
+        self._saved_at = 0.0
+        self.stats = {'connections': 0, 'frames': 0, 'rows': 0, 'rejected': 0, 'batches': 0,
+                      'pauses': 0, 'last_batch': 0, 'last_decode_ms': 0.0}
+
+    def add_listener(self, callback):
+        """Enregistrer callback(interfaces, rates), appelé après chaque lot"""
+        self._listeners.append(callback)
+
+    def submit(self, protocol, frames):
+        """Déposer les trames d'une connexion (suspend sa lecture si la file est pleine)"""
+        self._queue.put_nowait(frames)
+        if self._queue.qsize() >= self.max_pending:
+            protocol.pause()
+            self._paused.add(protocol)
+            self.stats['pauses'] += 1
+
+    def process(self, frames):
+        """
+        Décoder et appliquer un lot de trames
+
+        Returns:
+            tuple: (interfaces tunnel mises à jour, (clés, rx_bps, tx_bps, horodatages))
+        """
+        started = time.perf_counter()
+        rows, rejected = decode_frames(frames)
+        interfaces = self.state.apply(rows)
+        # Dernière valeur de chaque tunnel du lot: un compteur par clé et par calcul de débit
+        latest = {(interface['agent'], interface['interface']): interface for interface in interfaces}
+        interfaces = list(latest.values())
+        results = [{'interfaces': [interface], 'timestamp': interface['timestamp']} for interface in interfaces]
+        rates = interface_rates(results, self.rates)
+        for callback in self._listeners:
+            try:
+                callback(interfaces, rates)
+            except Exception as e:
+                print(f"Erreur dans un écouteur de télémétrie: {str(e)}")
+        stats = self.stats
+        stats['frames'] += len(frames)
+        stats['rows'] += len(rows)
+        stats['rejected'] += rejected
+        stats['batches'] += 1
+        stats['last_batch'] = len(frames)
+        stats['last_decode_ms'] = (time.perf_counter() - started) * 1000
+        return interfaces, rates
+
+    def save(self, force=False):
+        """Écrire le fichier d'état si l'état a changé (au plus une fois par save_interval)"""
+        if not self.state_file or self.state.version == self._saved_version:
+            return False
+        now = time.monotonic()
+        if not force and now - self._saved_at < self.save_interval:
+            return False
+        self._saved_version = self.state.version
+        self._saved_at = now
+        self.state.save(self.state_file)
+        return True
+
+    async def _consume(self):
+        queue = self._queue
+        while True:
+            frames = list(await queue.get())
+            while len(frames) < self.batch_size and not queue.empty():
+                frames.extend(queue.get_nowait())
+            self.process(frames)
+            self.save()
+            if self._paused and queue.qsize() <= self.max_pending // 2:
+                for protocol in list(self._paused):
+                    protocol.resume()
+                self._paused.clear()
+            # Laisser la boucle lire les connexions entre deux lots
+            await asyncio.sleep(0)
+
+    async def serve(self, host='0.0.0.0', port=57000, ready=None):
+        """
+        Écouter les connexions dial-out jusqu'à annulation
+
+        Args:
+            host (str): Adresse d'écoute
+            port (int): Port TCP
+            ready (callable): Appelé une fois la socket ouverte
+        """
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        server = await loop.create_server(lambda: _TelemetryProtocol(self), host, port)
+        consumer = asyncio.create_task(self._consume())
+        try:
+            if ready:
+                ready()
+            while True:
+                await asyncio.sleep(self.save_interval)
+                self.save()
+        finally:
+            server.close()
+            consumer.cancel()
+            self.save(force=True)
+
+
+# ----------------------------------------------------------------------
+# Client de rejeu
+# ----------------------------------------------------------------------
+
+def synthetic_messages(node, count=1, interval=1.0, tunnels=1, start=None, rate_bps=8000000):
+    """
+    Générer des messages de télémétrie cohérents (compteurs croissants)
+
+    Args:
+        node (str): Nom du routeur (node_id_str)
+        count (int): Nombre d'intervalles
+        interval (float): Écart entre deux intervalles (secondes)
+        tunnels (int): Interfaces tunnel par routeur
+        start (float): Horodatage du premier intervalle (maintenant par défaut)
+        rate_bps (int): Débit reçu simulé par tunnel (bits/s)
+
+    Yields:
+        dict: Messages interfaces, IPsec et IKEv2 de chaque intervalle
+    """
+    start = time.time() if start is None else start
+    for i in range(count):
+        ts = int((start + i * interval) * 1000)
+        elapsed = i * interval
+        rows = []
+        for t in range(tunnels):
+            received = int(rate_bps / 8 * (t + 1) * elapsed)
+            rows.append({'timestamp': ts, 'keys': {'name': f"Tunnel{t}"}, 'content': {
+                'name': f"Tunnel{t}", 'admin-status': 'if-state-up', 'oper-status': 'if-oper-state-ready',
+                'mtu': 1400, 'speed': 100000000, 'ipv4': f"10.0.{t}.1",
+                'statistics': {'in-octets': received, 'out-octets': received // 2,
+                               'in-unicast-pkts': received // 500, 'out-unicast-pkts': received // 1000,
+                               'in-errors': 0, 'out-errors': 0}
+            }})
+        yield {'node_id_str': node, 'encoding_path': INTERFACES_PATH, 'msg_timestamp': ts, 'data_json': rows}
+        packets = int(elapsed * 1000)
+        yield {'node_id_str': node, 'encoding_path': IPSEC_PATH, 'msg_timestamp': ts, 'data_json': [{
+            'timestamp': ts, 'keys': {'interface': 'Tunnel0'}, 'content': {
+                'ident-status': 'active', 'remote-addr': '203.0.113.6',
+                'pkts-encrypted': packets, 'pkts-decrypted': packets,
+                'bytes-encrypted': packets * 1000, 'bytes-decrypted': packets * 1000
+            }}]}
+        yield {'node_id_str': node, 'encoding_path': IKEV2_PATH, 'msg_timestamp': ts, 'data_json': [{
+            'timestamp': ts, 'keys': {}, 'content': {
+                'sa-status': 'ready', 'remote-ip-addr': '203.0.113.6', 'encryption-alg': 'AES-CBC-256',
+                'integrity-alg': 'SHA256', 'dh-group': 14, 'lifetime': 86400, 'active-time': int(elapsed)
+            }}]}
+
+
+def load_replay_file(path):
+    """Lire des messages de télémétrie enregistrés (un objet JSON par ligne)"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def replay(host, port, messages, rate=0.0, connections=1):
+    """
+    Rejouer des messages vers un récepteur, à la place des routeurs
+
+    Args:
+        host (str): Adresse du récepteur
+        port (int): Port du récepteur
+        messages (iterable): Messages (dict) à émettre
+        rate (float): Messages par seconde (0 = au plus vite, limité par la contre-pression)
+        connections (int): Connexions parallèles (messages répartis à tour de rôle)
+
+    Returns:
+        dict: {'messages', 'bytes', 'duration_s'}
+    """
+    writers = []
+    for _ in range(max(1, connections)):
+        _, writer = await asyncio.open_connection(host, port)
+        writers.append(writer)
+    started = time.perf_counter()
+    sent = sent_bytes = 0
+    try:
+        for message in messages:
+            data = frame(message)
+            writer = writers[sent % len(writers)]
+            writer.write(data)
+            sent += 1
+            sent_bytes += len(data)
+            # drain() attend quand le récepteur ne lit plus (contre-pression)
+            await writer.drain()
+            if rate:
+                delay = started + sent / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+    finally:
+        for writer in writers:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+    return {'messages': sent, 'bytes': sent_bytes, 'duration_s': time.perf_counter() - started}
+
+
+# ----------------------------------------------------------------------
+# Lecture de l'état par le dashboard et VPNChecker
+# ----------------------------------------------------------------------
+
+def get_telemetry_state_file():
+    """Chemin du fichier d'état (TELEMETRY_STATE_FILE dans config.env)"""
+    root = os.path.join(os.path.dirname(__file__), '..', '..')
+    config_path = os.path.join(root, 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    path = os.getenv('TELEMETRY_STATE_FILE', 'data/telemetry_state.json')
+    if not os.path.isabs(path):
+        path = os.path.join(root, path)
+    return os.path.normpath(path)
+
+
+def telemetry_status(router_ip, section, max_age=None):
+    """
+    État récent d'un routeur publié par le récepteur de télémétrie
+
+    Args:
+        router_ip (str): Adresse du routeur (adresse source des connexions dial-out)
+        section (str): 'interface', 'ipsec' ou 'ikev2'
+        max_age (float): Âge maximal en secondes (TELEMETRY_STALE_SECONDS par défaut)
+
+    Returns:
+        dict: Section au format VPNChecker, None si absente ou périmée
+    """
+    path = get_telemetry_state_file()
+    max_age = float(os.getenv('TELEMETRY_STALE_SECONDS', '30')) if max_age is None else max_age
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+    except (OSError, ValueError):
+        return None
+    now = time.time()
+    for node in document.get('nodes', {}).values():
+        if node.get('address') != router_ip:
+            continue
+        if section == 'interface':
+            interfaces = node.get('interfaces') or {}
+            entry = interfaces.get('Tunnel0') or next(iter(interfaces.values()), None)
+        else:
+            entry = node.get(section)
+        if entry and now - entry.get('timestamp', 0) <= max_age:
+            return entry
+    return None
+
+
+_receiver = None
+_receiver_lock = threading.Lock()
+
+
+def get_telemetry_receiver():
+    """Obtenir le récepteur du processus (configuré via config.env)"""
+    global _receiver
+    with _receiver_lock:
+        if _receiver is None:
+            config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+            if os.path.exists(config_path):
+                load_dotenv(config_path)
+            _receiver = TelemetryReceiver(
+                batch_size=int(os.getenv('TELEMETRY_BATCH', '500')),
+                max_pending=int(os.getenv('TELEMETRY_QUEUE', '256')),
+                state_file=get_telemetry_state_file(),
+                save_interval=float(os.getenv('TELEMETRY_SAVE_INTERVAL', '1'))
+            )
+        return _receiver
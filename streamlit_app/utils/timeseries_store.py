@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+Stockage de séries temporelles
+Description: Historique local des métriques de santé et de trafic (stockage colonne, rollups automatiques)
+"""
+
+import fcntl
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Niveaux de résolution: raw -> 1 min -> 1 h
+TIERS = ('raw', '1m', '1h')
+TIER_SECONDS = {'raw': 0, '1m': 60, '1h': 3600}
+
+# Rétention par défaut (en secondes)
+DEFAULT_RETENTION = {
+    'raw': 24 * 3600,
+    '1m': 7 * 24 * 3600,
+    '1h': 90 * 24 * 3600
+}
+
+# Colonnes stockées par niveau (un fichier binaire float64 par colonne)
+RAW_COLUMNS = ('ts', 'value')
+ROLLUP_COLUMNS = ('ts', 'avg', 'min', 'max', 'sum', 'count')
+
+_METRIC_NAME_RE = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+class _Bucket:
+    """Agrégat en cours pour un intervalle de rollup"""
+
+    __slots__ = ('start', 'min', 'max', 'sum', 'count')
+
+    def __init__(self, start):
+        self.start = start
+        self.min = np.inf
+        self.max = -np.inf
+        self.sum = 0.0
+        self.count = 0.0
+
+    def add(self, value_min, value_max, value_sum, count):
+        self.min = min(self.min, value_min)
+        self.max = max(self.max, value_max)
+        self.sum += value_sum
+        self.count += count
+
+    def row(self):
+        avg = self.sum / self.count if self.count else np.nan
+        return (self.start, avg, self.min, self.max, self.sum, self.count)
+
+
+class TimeSeriesStore:
+    """Stockage append-only, orienté colonne, des séries temporelles par métrique"""
+
+    def __init__(self, base_dir, retention=None, retention_interval=3600):
+        """
+        Initialiser le stockage
+
+        Args:
+            base_dir (str): Répertoire racine des données
+            retention (dict): Rétention en secondes par niveau ('raw', '1m', '1h')
+            retention_interval (float): Écart minimal entre deux purges par les écritures (secondes)
+        """
+        self.base_dir = base_dir
+        self.retention = dict(DEFAULT_RETENTION)
+        if retention:
+            self.retention.update(retention)
+        self.retention_interval = retention_interval
+        self._lock = threading.RLock()
+        self._pending = {}
+        self._last_ts = {}
+        self._retention_at = 0.0
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Fichiers
+    # ------------------------------------------------------------------
+
+    def _metric_dir(self, metric):
+        return os.path.join(self.base_dir, _METRIC_NAME_RE.sub('_', metric))
+
+    def _column_path(self, metric, tier, column):
+        return os.path.join(self._metric_dir(metric), f"{tier}.{column}.f8")
+
+    def _columns(self, tier):
+        return RAW_COLUMNS if tier == 'raw' else ROLLUP_COLUMNS
+
+    @contextmanager
+    def _metric_lock(self, metric):
+        """
+        Verrou exclusif entre processus sur les fichiers d'une métrique
+
+        Les collecteurs (SNMP, télémétrie, syslog...) écrivent chacun depuis
+        leur processus: un ajout ne doit pas viser un fichier en cours de
+        réécriture par la purge, ni s'intercaler entre les colonnes d'un autre.
+        """
+        os.makedirs(self._metric_dir(metric), exist_ok=True)
+        with open(os.path.join(self._metric_dir(metric), '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _append_rows(self, metric, tier, columns):
+        """Ajouter des lignes (une liste/array par colonne) en fin de fichiers"""
+        with self._metric_lock(metric):
+            for name, values in zip(self._columns(tier), columns):
+                with open(self._column_path(metric, tier, name), 'ab') as f:
+                    np.asarray(values, dtype=np.float64).tofile(f)
+
+    def _read_column(self, metric, tier, column):
+        """Projeter une colonne en mémoire (memmap en lecture seule)"""
+        path = self._column_path(metric, tier, column)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.empty(0, dtype=np.float64)
+        return np.memmap(path, dtype=np.float64, mode='r')
+
+    def _row_count(self, metric, tier):
+        path = self._column_path(metric, tier, 'ts')
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // 8
+
+    def metrics(self):
+        """
+        Lister les métriques présentes
+
+        Returns:
+            list: Noms des métriques
+        """
+        if not os.path.isdir(self.base_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.base_dir)
+            if os.path.isdir(os.path.join(self.base_dir, name))
+        )
+
+    # ------------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------------
+
+    def _load_state(self, metric):
+        """Reconstruire les buckets en cours à partir des fichiers (après redémarrage)"""
+        pending = {'1m': None, '1h': None}
+        last_ts = -np.inf
+
+        raw_ts = self._read_column(metric, 'raw', 'ts')
+        if len(raw_ts):
+            last_ts = float(raw_ts[-1])
+
+        minute_ts = self._read_column(metric, '1m', 'ts')
+        minute_end = float(minute_ts[-1]) + 60 if len(minute_ts) else -np.inf
+        hour_ts = self._read_column(metric, '1h', 'ts')
+        hour_end = float(hour_ts[-1]) + 3600 if len(hour_ts) else -np.inf
+
+        self._pending[metric] = pending
+        self._last_ts[metric] = last_ts
+
+        # Rejouer la fin du niveau 1m non encore agrégée en 1h
+        if len(minute_ts):
+            start = np.searchsorted(minute_ts, hour_end, side='left')
+            if start < len(minute_ts):
+                ts, _, vmin, vmax, vsum, count = [
+                    np.array(self._read_column(metric, '1m', c)[start:]) for c in ROLLUP_COLUMNS
+                ]
+                self._roll(metric, '1h', ts, vmin, vmax, vsum, count)
+
+        # Rejouer la fin du niveau raw non encore agrégée en 1m
+        if len(raw_ts):
+            start = np.searchsorted(raw_ts, minute_end, side='left')
+            if start < len(raw_ts):
+                ts = np.array(raw_ts[start:])
+                values = np.array(self._read_column(metric, 'raw', 'value')[start:])
+                self._roll(metric, '1m', ts, values, values, values, np.ones(len(values)))
+
+    def _roll(self, metric, tier, ts, vmin, vmax, vsum, count):
+        """
+        Agréger un lot trié dans les buckets d'un niveau de rollup
+
+        Les buckets terminés sont écrits sur disque puis propagés au niveau
+        supérieur ; le dernier bucket reste en mémoire jusqu'à sa clôture.
+        """
+        if not len(ts):
+            return
+        step = TIER_SECONDS[tier]
+        starts = ts - ts % step
+        seg = np.concatenate(([0], np.flatnonzero(np.diff(starts)) + 1))
+
+        rows = [
+            starts[seg],
+            np.minimum.reduceat(vmin, seg),
+            np.maximum.reduceat(vmax, seg),
+            np.add.reduceat(vsum, seg),
+            np.add.reduceat(count, seg)
+        ]
+
+        pending = self._pending[metric]
+        bucket = pending[tier]
+        completed = []
+        if bucket is not None:
+            if bucket.start == rows[0][0]:
+                bucket.add(rows[1][0], rows[2][0], rows[3][0], rows[4][0])
+                rows = [col[1:] for col in rows]
+            else:
+                completed.append(bucket.row())
+                bucket = None
+        if len(rows[0]):
+            if bucket is not None:
+                completed.append(bucket.row())
+            bucket = _Bucket(float(rows[0][-1]))
+            bucket.add(rows[1][-1], rows[2][-1], rows[3][-1], rows[4][-1])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                completed.extend(zip(
+                    rows[0][:-1], rows[3][:-1] / rows[4][:-1],
+                    rows[1][:-1], rows[2][:-1], rows[3][:-1], rows[4][:-1]
+                ))
+        pending[tier] = bucket
+
+        if not completed:
+            return
+        columns = [np.array(col, dtype=np.float64) for col in zip(*completed)]
+        self._append_rows(metric, tier, columns)
+
+        next_index = TIERS.index(tier) + 1
+        if next_index < len(TIERS):
+            _, _, cmin, cmax, csum, ccount = columns
+            self._roll(metric, TIERS[next_index], columns[0], cmin, cmax, csum, ccount)
+
+    def append(self, metric, value, ts=None):
+        """
+        Ajouter un point à une métrique
+
+        Args:
+            metric (str): Nom de la métrique (ex: 'network_health.overall')
+            value (float): Valeur mesurée
+            ts (float): Horodatage epoch en secondes (maintenant par défaut)
+
+        Returns:
+            bool: True si le point a été enregistré
+        """
+        return self.append_many(metric, [ts if ts is not None else time.time()], [value]) > 0
+
+    def append_many(self, metric, timestamps, values):
+        """
+        Ajouter un lot de points à une métrique
+
+        Les points antérieurs au dernier point enregistré sont ignorés afin
+        de conserver des fichiers triés (recherche dichotomique en lecture).
+
+        Args:
+            metric (str): Nom de la métrique
+            timestamps (array): Horodatages epoch en secondes
+            values (array): Valeurs mesurées
+
+        Returns:
+            int: Nombre de points enregistrés
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+
+        with self._lock:
+            if metric not in self._pending:
+                self._load_state(metric)
+
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, values = timestamps[order], values[order]
+            keep = (timestamps >= self._last_ts[metric]) & np.isfinite(values)
+            timestamps, values = timestamps[keep], values[keep]
+            if not len(timestamps):
+                return 0
+
+            self._append_rows(metric, 'raw', [timestamps, values])
+            self._last_ts[metric] = float(timestamps[-1])
+
+            self._roll(metric, '1m', timestamps, values, values, values,
+                       np.ones(len(values)))
+
+        self.maybe_enforce_retention()
+        return len(timestamps)
+
+    def record_snapshot(self, values, ts=None):
+        """
+        Enregistrer un ensemble de métriques au même instant
+
+        Args:
+            values (dict): Métrique -> valeur
+            ts (float): Horodatage epoch en secondes (maintenant par défaut)
+
+        Returns:
+            int: Nombre de métriques enregistrées
+        """
+        ts = ts if ts is not None else time.time()
+        recorded = 0
+        for metric, value in values.items():
+            if value is None:
+                continue
+            try:
+                recorded += self.append(metric, float(value), ts)
+            except (TypeError, ValueError):
+                continue
+        return recorded
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def _pick_tier(self, start, end, now):
+        """Choisir le niveau le plus fin dont la rétention couvre le début de la plage"""
+        for tier in TIERS:
+            if now - start <= self.retention[tier]:
+                return tier
+        return TIERS[-1]
+
+    def _tail_rows(self, metric, tier):
+        """
+        Lignes d'un niveau de rollup pas encore écrites, reconstruites depuis
+        la fin des fichiers du niveau inférieur
+
+        Un autre processus peut écrire la métrique: l'état en mémoire
+        (_pending) ne sert qu'à l'écriture, la lecture ne se fie qu'au disque.
+
+        Returns:
+            list: Colonnes ROLLUP_COLUMNS (tableaux, éventuellement vides)
+        """
+        step = TIER_SECONDS[tier]
+        written = self._read_column(metric, tier, 'ts')
+        written_end = float(written[-1]) + step if len(written) else -np.inf
+        lower = TIERS[TIERS.index(tier) - 1]
+        lower_ts = self._read_column(metric, lower, 'ts')
+        first = int(np.searchsorted(lower_ts, written_end, side='left'))
+        if lower == 'raw':
+            values = np.array(self._read_column(metric, 'raw', 'value')[first:])
+            ts = np.array(lower_ts[first:first + len(values)])
+            vmin = vmax = vsum = values = values[:len(ts)]
+            count = np.ones(len(ts))
+        else:
+            ts, _, vmin, vmax, vsum, count = [
+                np.array(self._read_column(metric, lower, c)[first:]) for c in ROLLUP_COLUMNS
+            ]
+            rows = min(len(column) for column in (ts, vmin, vmax, vsum, count))
+            tail = self._tail_rows(metric, lower)
+            ts, vmin, vmax, vsum, count = [
+                np.concatenate([column[:rows], extra])
+                for column, extra in zip((ts, vmin, vmax, vsum, count), (tail[0], tail[2], tail[3], tail[4], tail[5]))
+            ]
+            keep = ts >= written_end
+            ts, vmin, vmax, vsum, count = ts[keep], vmin[keep], vmax[keep], vsum[keep], count[keep]
+        if not len(ts):
+            return [np.empty(0) for _ in ROLLUP_COLUMNS]
+        starts = ts - ts % step
+        seg = np.concatenate(([0], np.flatnonzero(np.diff(starts)) + 1))
+        total, weight = np.add.reduceat(vsum, seg), np.add.reduceat(count, seg)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return [starts[seg], total / weight, np.minimum.reduceat(vmin, seg),
+                    np.maximum.reduceat(vmax, seg), total, weight]
+
+    def query(self, metric, start, end=None, resolution='auto', agg='avg'):
+        """
+        Lire une plage de valeurs
+
+        Args:
+            metric (str): Nom de la métrique
+            start (float): Début de plage (epoch secondes)
+            end (float): Fin de plage (epoch secondes, maintenant par défaut)
+            resolution (str): 'auto', 'raw', '1m' ou '1h'
+            agg (str): Agrégat pour les rollups ('avg', 'min', 'max', 'sum', 'count')
+
+        Returns:
+            tuple: (timestamps, values) sous forme de tableaux NumPy float64
+        """
+        now = time.time()
+        end = end if end is not None else now
+        tier = self._pick_tier(start, end, now) if resolution == 'auto' else resolution
+        if tier not in TIERS:
+            raise ValueError(f"Résolution inconnue: {resolution}")
+        column = 'value' if tier == 'raw' else agg
+        if column not in self._columns(tier):
+            raise ValueError(f"Agrégat inconnu: {agg}")
+
+        with self._lock:
+            ts = self._read_column(metric, tier, 'ts')
+            lo = np.searchsorted(ts, start, side='left')
+            hi = np.searchsorted(ts, end, side='right')
+            out_ts = np.array(ts[lo:hi])
+            out_values = np.array(self._read_column(metric, tier, column)[lo:hi])
+
+            # Inclure les buckets en cours (pas encore écrits sur disque)
+            if tier != 'raw':
+                tail = dict(zip(ROLLUP_COLUMNS, self._tail_rows(metric, tier)))
+                keep = (tail['ts'] >= start) & (tail['ts'] <= end)
+                out_ts = np.concatenate([out_ts, tail['ts'][keep]])
+                out_values = np.concatenate([out_values, tail[column][keep]])
+
+        return out_ts, out_values
+
+    def latest(self, metric):
+        """
+        Dernier point brut d'une métrique
+
+        Returns:
+            tuple: (timestamp, value) ou None
+        """
+        with self._lock:
+            ts = self._read_column(metric, 'raw', 'ts')
+            if not len(ts):
+                return None
+            return float(ts[-1]), float(self._read_column(metric, 'raw', 'value')[-1])
+
+    # ------------------------------------------------------------------
+    # Rétention
+    # ------------------------------------------------------------------
+
+    def maybe_enforce_retention(self, now=None):
+        """
+        Purger la rétention si la dernière purge de ce processus date de plus
+        de retention_interval secondes (appelé par les écritures)
+
+        Returns:
+            int: Nombre de lignes supprimées (0 si la purge n'était pas due)
+        """
+        now = now if now is not None else time.time()
+        if now - self._retention_at < self.retention_interval:
+            return 0
+        self._retention_at = now
+        return self.enforce_retention(now)
+
+    def enforce_retention(self, now=None):
+        """
+        Supprimer les points plus anciens que la rétention de chaque niveau
+
+        Les colonnes sont réécrites sous le verrou de la métrique: les ajouts
+        des autres processus attendent la fin de la réécriture et visent
+        ensuite les nouveaux fichiers.
+
+        Args:
+            now (float): Horodatage de référence (maintenant par défaut)
+
+        Returns:
+            int: Nombre de lignes supprimées
+        """
+        now = now if now is not None else time.time()
+        removed = 0
+        with self._lock:
+            for metric in self.metrics():
+                with self._metric_lock(metric):
+                    for tier in TIERS:
+                        count = self._row_count(metric, tier)
+                        if not count:
+                            continue
+                        ts = self._read_column(metric, tier, 'ts')
+                        cut = int(np.searchsorted(ts, now - self.retention[tier], side='left'))
+                        del ts
+                        if cut == 0:
+                            continue
+                        for column in self._columns(tier):
+                            path = self._column_path(metric, tier, column)
+                            kept = np.fromfile(path, dtype=np.float64)[cut:]
+                            tmp_path = path + '.tmp'
+                            kept.tofile(tmp_path)
+                            os.replace(tmp_path, path)
+                        removed += cut
+        return removed
+
+
+def get_timeseries_store():
+    """Créer le stockage de séries temporelles à partir de config.env"""
+    root = os.path.join(os.path.dirname(__file__), '..', '..')
+    config_path = os.path.join(root, 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+
+    base_dir = os.getenv('TSDB_DIR', 'data/timeseries')
+    if not os.path.isabs(base_dir):
+        base_dir = os.path.join(root, base_dir)
+
+    retention = {
+        'raw': float(os.getenv('TSDB_RETENTION_RAW_HOURS', '24')) * 3600,
+        '1m': float(os.getenv('TSDB_RETENTION_1M_DAYS', '7')) * 86400,
+        '1h': float(os.getenv('TSDB_RETENTION_1H_DAYS', '90')) * 86400
+    }
+    return TimeSeriesStore(os.path.normpath(base_dir), retention,
+                           retention_interval=float(os.getenv('TSDB_RETENTION_INTERVAL_MINUTES', '60')) * 60)
+
+
+def health_snapshot_metrics(network_health=None, client_health=None, vpn_summary=None):
+    """
+    Convertir les réponses DNA Center / VPNChecker en métriques à historiser
+
+    Args:
+        network_health (dict): Réponse network-health (ou simulation)
+        client_health (dict): Réponse client-health (ou simulation)
+        vpn_summary (dict): Résultat de VPNChecker.get_vpn_summary()
+
+    Returns:
+        dict: Métrique -> valeur
+    """
+    values = {}
+
+    if isinstance(network_health, list) and network_health:
+        network_health = network_health[0]
+    if isinstance(network_health, dict):
+        for key in ('overallHealthScore', 'healthScore', 'connectivity', 'performance',
+                    'security', 'availability', 'totalCount', 'goodCount', 'badCount'):
+            if key in network_health:
+                values[f"network_health.{key}"] = network_health[key]
+        # L'API renvoie 'healthScore', la simulation 'overallHealthScore'
+        if 'network_health.overallHealthScore' not in values and 'healthScore' in network_health:
+            values['network_health.overallHealthScore'] = network_health['healthScore']
+
+    if isinstance(client_health, list) and client_health:
+        client_health = client_health[0]
+    if isinstance(client_health, dict):
+        for key in ('healthScore', 'totalClients', 'healthyClients', 'unhealthyClients'):
+            if key in client_health:
+                values[f"client_health.{key}"] = client_health[key]
+        for score in client_health.get('scoreDetail', []) or []:
+            category = score.get('scoreCategory', {}).get('value')
+            if category and 'scoreValue' in score:
+                values[f"client_health.{category}"] = score['scoreValue']
+
+    if isinstance(vpn_summary, dict):
+        values['vpn.up'] = 1 if vpn_summary.get('overall_status') == 'active' else 0
+        for site in ('hq_router', 'branch_router'):
+            ipsec = vpn_summary.get(site, {}).get('ipsec', {})
+            for counter in ('packets_encrypted', 'packets_decrypted',
+                            'bytes_encrypted', 'bytes_decrypted'):
+                if counter in ipsec:
+                    values[f"vpn.{site}.{counter}"] = ipsec[counter]
+
+    return values
@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""
+Topologie réseau
+Description: Graphe d'adjacence mis à jour incrémentalement, plus courts chemins, rayon d'impact et disposition précalculée
+"""
+
+import ipaddress
+import math
+import os
+import threading
+from collections import deque
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Rang des rôles DNA Center (le plus petit est le plus proche du cœur)
+ROLE_RANK = {'BORDER ROUTER': 0, 'CORE': 1, 'DISTRIBUTION': 2, 'ACCESS': 3, 'UNKNOWN': 4}
+
+# Nombre d'arbres de parcours conservés (un par nœud source)
+BFS_CACHE_SIZE = 64
+
+_MISSING = object()
+
+
+class NetworkTopology:
+    """
+    Graphe non orienté des équipements et liens
+
+    Les modifications incrémentent la version du graphe; les arbres de
+    parcours, l'arbre des dominateurs et la disposition sont recalculés
+    paresseusement une seule fois par version puis partagés par toutes
+    les requêtes (et toutes les sessions du dashboard).
+    """
+
+    def __init__(self, root=None):
+        """
+        Initialiser la topologie
+
+        Args:
+            root (str): Nœud de référence du rayon d'impact et de la disposition
+                        (nœud de plus haut degré si None)
+        """
+        self.root = root
+        self.nodes = {}
+        self.adjacency = {}
+        self.version = 0
+        self._lock = threading.RLock()
+        self._bfs = {}
+        self._dominators = {}
+        self._layout = None
+
+    # Modifications incrémentales
+
+    def _changed(self):
+        self.version += 1
+        self._bfs.clear()
+        self._dominators.clear()
+        self._layout = None
+
+    def add_node(self, node_id, **attrs):
+        """
+        Ajouter un nœud ou mettre à jour ses attributs (la version change dès
+        qu'un attribut change)
+
+        Args:
+            node_id (str): Identifiant du nœud
+            **attrs: Attributs (label, ip, role, kind...)
+        """
+        with self._lock:
+            node = self.nodes.get(node_id)
+            if node is not None:
+                # Les figures et rapports sont mis en cache par version: tout
+                # attribut modifié (statut, libellé...) doit la faire évoluer
+                if any(node.get(key, _MISSING) != value for key, value in attrs.items()):
+                    node.update(attrs)
+                    self._changed()
+                return
+            self.nodes[node_id] = dict(attrs)
+            self.adjacency[node_id] = {}
+            self._changed()
+
+    def remove_node(self, node_id):
+        """Supprimer un nœud et ses liens"""
+        with self._lock:
+            if node_id not in self.nodes:
+                return
+            for neighbor in self.adjacency.pop(node_id):
+                del self.adjacency[neighbor][node_id]
+            del self.nodes[node_id]
+            self._changed()
+
+    def add_link(self, source, target, **attrs):
+        """
+        Ajouter un lien (les nœuds inconnus sont créés)
+
+        Args:
+            source (str): Extrémité A
+            target (str): Extrémité B
+            **attrs: Attributs du lien (kind, ports, statut...)
+        """
+        if source == target:
+            return
+        with self._lock:
+            for node_id in (source, target):
+                if node_id not in self.nodes:
+                    self.nodes[node_id] = {}
+                    self.adjacency[node_id] = {}
+            link = self.adjacency[source].get(target)
+            if link is not None:
+                if any(link.get(key, _MISSING) != value for key, value in attrs.items()):
+                    link.update(attrs)
+                    self._changed()
+                return
+            link = dict(attrs)
+            self.adjacency[source][target] = link
+            self.adjacency[target][source] = link
+            self._changed()
+
+    def remove_link(self, source, target):
+        """Supprimer un lien"""
+        with self._lock:
+            if target not in self.adjacency.get(source, {}):
+                return
+            del self.adjacency[source][target]
+            del self.adjacency[target][source]
+            self._changed()
+
+    def links(self):
+        """Liste des liens (source, cible, attributs), chacun une seule fois"""
+        with self._lock:
+            return [
+                (source, target, attrs)
+                for source, neighbors in self.adjacency.items()
+                for target, attrs in neighbors.items()
+                if source < target
+            ]
+
+    def sync(self, nodes, links):
+        """
+        Aligner la topologie sur un instantané complet (seules les différences sont appliquées)
+
+        Args:
+            nodes (dict): Identifiant -> attributs
+            links (list): Tuples (source, cible, attributs)
+
+        Returns:
+            dict: Nombre de nœuds / liens ajoutés et supprimés
+        """
+        with self._lock:
+            wanted_links = {}
+            for source, target, attrs in links:
+                if source != target:
+                    wanted_links[(min(source, target), max(source, target))] = attrs
+            current_links = {(source, target) for source, target, _ in self.links()}
+
+            removed_nodes = [node_id for node_id in self.nodes if node_id not in nodes]
+            for node_id in removed_nodes:
+                self.remove_node(node_id)
+            removed_links = [pair for pair in current_links if pair not in wanted_links]
+            for source, target in removed_links:
+                self.remove_link(source, target)
+
+            added_nodes = sum(1 for node_id in nodes if node_id not in self.nodes)
+            for node_id, attrs in nodes.items():
+                self.add_node(node_id, **attrs)
+            added_links = sum(1 for pair in wanted_links if pair not in current_links)
+            for (source, target), attrs in wanted_links.items():
+                self.add_link(source, target, **attrs)
+
+            return {
+                'nodes_added': added_nodes, 'nodes_removed': len(removed_nodes),
+                'links_added': added_links, 'links_removed': len(removed_links)
+            }
+
+    def load_physical_topology(self, topology):
+        """
+        Charger la réponse de l'API physical-topology de DNA Center
+
+        Args:
+            topology (dict): {'nodes': [...], 'links': [...]}
+
+        Returns:
+            dict: Différences appliquées (voir sync)
+        """
+        nodes = {
+            node['id']: {
+                'label': node.get('label') or node['id'],
+                'ip': node.get('ip'),
+                'kind': (node.get('deviceType') or node.get('family') or 'device'),
+                'role': node.get('role')
+            }
+            for node in topology.get('nodes', [])
+        }
+        links = [
+            (link['source'], link['target'], {
+                'kind': 'physical',
+                'status': link.get('linkStatus'),
+                'ports': (link.get('startPortName'), link.get('endPortName'))
+            })
+            for link in topology.get('links', [])
+            if link.get('source') in nodes and link.get('target') in nodes
+        ]
+        return self.sync(nodes, links)
+
+    # Requêtes
+
+    @property
+    def node_count(self):
+        return len(self.nodes)
+
+    def _default_root(self):
+        if self.root in self.nodes:
+            return self.root
+        if not self.nodes:
+            return None
+        return max(self.adjacency, key=lambda node_id: (len(self.adjacency[node_id]), node_id))
+
+    def _parents(self, source):
+        """Arbre de parcours en largeur depuis source (mis en cache pour la version courante)"""
+        parents = self._bfs.get(source)
+        if parents is None:
+            parents = {source: None}
+            queue = deque([source])
+            adjacency = self.adjacency
+            while queue:
+                node_id = queue.popleft()
+                for neighbor in adjacency[node_id]:
+                    if neighbor not in parents:
+                        parents[neighbor] = node_id
+                        queue.append(neighbor)
+            if len(self._bfs) >= BFS_CACHE_SIZE:
+                del self._bfs[next(iter(self._bfs))]
+            self._bfs[source] = parents
+        return parents
+
+    def shortest_path(self, source, target):
+        """
+        Plus court chemin en nombre de sauts
+
+        Le premier appel depuis une source calcule l'arbre de parcours
+        (O(n + m)); les suivants ne font que remonter l'arbre (O(longueur)).
+
+        Args:
+            source (str): Nœud de départ
+            target (str): Nœud d'arrivée
+
+        Returns:
+            list: Nœuds du chemin (source et cible incluses), None si inaccessible
+        """
+        with self._lock:
+            if source not in self.nodes or target not in self.nodes:
+                return None
+            # L'arbre est symétrique: réutiliser celui déjà calculé pour la cible
+            if target in self._bfs and source not in self._bfs:
+                path = self._walk(self._bfs[target], source)
+                return path[::-1] if path else None
+            return self._walk(self._parents(source), target)
+
+    @staticmethod
+    def _walk(parents, target):
+        if target not in parents:
+            return None
+        path = []
+        node_id = target
+        while node_id is not None:
+            path.append(node_id)
+            node_id = parents[node_id]
+        return path[::-1]
+
+    def _dominator_tree(self, root):
+        """
+        Arbre des dominateurs depuis root (Cooper, Harvey, Kennedy)
+
+        Un nœud X domine Y si tout chemin de root vers Y passe par X: la
+        panne de X isole donc exactement le sous-arbre de X. Le sous-arbre
+        est numéroté en préordre pour répondre par simple découpage.
+        """
+        cached = self._dominators.get(root)
+        if cached is not None:
+            return cached
+
+        # Parcours en profondeur itératif: ordre postfixe
+        adjacency = self.adjacency
+        order, index = [], {}
+        visited = {root}
+        stack = [(root, iter(adjacency[root]))]
+        while stack:
+            node_id, neighbors = stack[-1]
+            for neighbor in neighbors:
+                if neighbor not in visited:
+                    visited.add(neighbor)
+                    stack.append((neighbor, iter(adjacency[neighbor])))
+                    break
+            else:
+                stack.pop()
+                index[node_id] = len(order)
+                order.append(node_id)
+
+        idom = {root: root}
+
+        def intersect(a, b):
+            while a != b:
+                while index[a] < index[b]:
+                    a = idom[a]
+                while index[b] < index[a]:
+                    b = idom[b]
+            return a
+
+        reverse_postorder = order[::-1][1:]
+        changed = True
+        while changed:
+            changed = False
+            for node_id in reverse_postorder:
+                new_idom = None
+                for pred in adjacency[node_id]:
+                    if pred in idom:
+                        new_idom = pred if new_idom is None else intersect(pred, new_idom)
+                if idom.get(node_id) != new_idom:
+                    idom[node_id] = new_idom
+                    changed = True
+
+        children = {node_id: [] for node_id in idom}
+        for node_id, dominator in idom.items():
+            if node_id != root:
+                children[dominator].append(node_id)
+        preorder, start, end = [], {}, {}
+        stack = [(root, False)]
+        while stack:
+            node_id, done = stack.pop()
+            if done:
+                end[node_id] = len(preorder)
+                continue
+            start[node_id] = len(preorder)
+            preorder.append(node_id)
+            stack.append((node_id, True))
+            stack.extend((child, False) for child in children[node_id])
+
+        tree = {'idom': idom, 'preorder': preorder, 'start': start, 'end': end}
+        self._dominators[root] = tree
+        return tree
+
+    def blast_radius(self, node_id, root=None):
+        """
+        Nœuds coupés de root si node_id tombe en panne
+
+        Args:
+            node_id (str): Nœud en panne
+            root (str): Point de référence (ex: routeur Internet, DNA Center)
+
+        Returns:
+            list: Nœuds isolés (node_id exclu), vide si aucun
+        """
+        with self._lock:
+            root = root or self._default_root()
+            if root is None or node_id not in self.nodes:
+                return []
+            if node_id == root:
+                return [n for n in self.nodes if n != root]
+            tree = self._dominator_tree(root)
+            if node_id not in tree['start']:
+                return []
+            return tree['preorder'][tree['start'][node_id] + 1:tree['end'][node_id]]
+
+    def critical_nodes(self, root=None, top=10):
+        """
+        Nœuds dont la panne isole le plus d'équipements
+
+        Returns:
+            list: Tuples (nœud, nombre de nœuds isolés), décroissant
+        """
+        with self._lock:
+            root = root or self._default_root()
+            if root is None:
+                return []
+            tree = self._dominator_tree(root)
+            sizes = [(n, tree['end'][n] - tree['start'][n] - 1) for n in tree['preorder'] if n != root]
+            return sorted((item for item in sizes if item[1] > 0), key=lambda item: -item[1])[:top]
+
+    # Disposition
+
+    def layout(self, root=None):
+        """
+        Disposition radiale précalculée (O(n)), partagée tant que le graphe ne change pas
+
+        Chaque nœud est placé sur le cercle de sa distance au nœud racine,
+        dans un secteur proportionnel au nombre de feuilles de son
+        sous-arbre. Les composantes non connexes sont rattachées à la racine.
+
+        Returns:
+            dict: 'ids', 'x', 'y', 'depth' (tableaux alignés), 'edge_x', 'edge_y'
+                  (segments séparés par NaN, prêts pour un tracé Plotly unique)
+        """
+        with self._lock:
+            root = root or self._default_root()
+            if self._layout is not None and self._layout[0] == root:
+                return self._layout[1]
+
+            ids = list(self.nodes)
+            if root is None:
+                result = {'ids': [], 'x': np.empty(0), 'y': np.empty(0), 'depth': np.empty(0, dtype=int),
+                          'edge_x': np.empty(0), 'edge_y': np.empty(0)}
+                self._layout = (root, result)
+                return result
+
+            # Arbre couvrant en largeur; les autres composantes sont accrochées à la racine
+            parents = dict(self._parents(root))
+            bfs_order = list(parents)
+            for node_id in ids:
+                if node_id not in parents:
+                    component = self._parents(node_id)
+                    for member, parent in component.items():
+                        parents[member] = parent if parent is not None else root
+                        bfs_order.append(member)
+
+            children = {node_id: [] for node_id in bfs_order}
+            for node_id in bfs_order[1:]:
+                children[parents[node_id]].append(node_id)
+            leaves = {}
+            for node_id in reversed(bfs_order):
+                leaves[node_id] = sum(leaves[c] for c in children[node_id]) or 1
+
+            depth = {root: 0}
+            angle = {root: 0.0}
+            span = {root: (0.0, 2 * math.pi)}
+            for node_id in bfs_order:
+                low, high = span[node_id]
+                total = leaves[node_id]
+                cursor = low
+                for child in sorted(children[node_id]):
+                    width = (high - low) * leaves[child] / total
+                    span[child] = (cursor, cursor + width)
+                    angle[child] = cursor + width / 2
+                    depth[child] = depth[node_id] + 1
+                    cursor += width
+
+            position = {node_id: i for i, node_id in enumerate(ids)}
+            radius = np.array([depth[n] for n in ids], dtype=float)
+            theta = np.array([angle[n] for n in ids])
+            x = radius * np.cos(theta)
+            y = radius * np.sin(theta)
+
+            pairs = np.array([(position[s], position[t]) for s, t, _ in self.links()], dtype=np.intp).reshape(-1, 2)
+            edge_x = np.full(len(pairs) * 3, np.nan)
+            edge_y = np.full(len(pairs) * 3, np.nan)
+            edge_x[0::3], edge_x[1::3] = x[pairs[:, 0]], x[pairs[:, 1]]
+            edge_y[0::3], edge_y[1::3] = y[pairs[:, 0]], y[pairs[:, 1]]
+
+            result = {'ids': ids, 'x': x, 'y': y, 'depth': radius.astype(int), 'edge_x': edge_x, 'edge_y': edge_y}
+            self._layout = (root, result)
+            return result
+
+
+def topology_from_inventory(devices, topology=None):
+    """
+    Déduire une topologie de l'inventaire quand physical-topology n'est pas disponible
+
+    Les équipements sont regroupés par site (siteId, sinon /24 de l'adresse de
+    management); dans chaque site, chaque équipement est relié à ceux du rang
+    de rôle immédiatement supérieur, et les équipements de plus haut rang sont
+    reliés à un nœud 'internet'.
+
+    Args:
+        devices (list): Réponse network-device
+        topology (NetworkTopology): Topologie à mettre à jour (nouvelle si None)
+
+    Returns:
+        NetworkTopology: Topologie
+    """
+    topology = topology or NetworkTopology(root='internet')
+    nodes = {'internet': {'label': 'Internet', 'kind': 'cloud'}}
+    sites = {}
+    for device in devices:
+        node_id = device.get('id') or device.get('hostname')
+        if not node_id:
+            continue
+        ip = device.get('managementIpAddress')
+        nodes[node_id] = {
+            'label': device.get('hostname') or node_id,
+            'ip': ip,
+            'kind': device.get('family') or device.get('type') or 'device',
+            'role': device.get('role')
+        }
+        site = device.get('siteId')
+        if not site and ip:
+            try:
+                site = str(ipaddress.ip_network(f"{ip}/24", strict=False))
+            except ValueError:
+                site = None
+        rank = ROLE_RANK.get((device.get('role') or 'UNKNOWN').upper(), ROLE_RANK['UNKNOWN'])
+        sites.setdefault(site, {}).setdefault(rank, []).append(node_id)
+
+    links = []
+    for ranks in sites.values():
+        levels = sorted(ranks)
+        for node_id in ranks[levels[0]]:
+            links.append((node_id, 'internet', {'kind': 'uplink'}))
+        for upper, lower in zip(levels, levels[1:]):
+            for i, node_id in enumerate(ranks[lower]):
+                # Répartition des équipements sur les parents du rang supérieur
+                parent = ranks[upper][i % len(ranks[upper])]
+                links.append((node_id, parent, {'kind': 'inferred'}))
+    topology.sync(nodes, links)
+    return topology
+
+
+def lab_topology(topology=None):
+    """
+    Topologie du lab décrite dans architecture.md (adresses issues de config.env)
+
+    Args:
+        topology (NetworkTopology): Topologie à mettre à jour (nouvelle si None)
+
+    Returns:
+        NetworkTopology: Topologie
+    """
+    config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    topology = topology or NetworkTopology(root='Internet-Router')
+    nodes = {
+        'Internet-Router': {'label': 'Internet-Router', 'ip': os.getenv('INTERNET_ROUTER_IP', '203.0.113.1'), 'kind': 'router'},
+        'HQ-Router': {'label': 'HQ-Router', 'ip': os.getenv('HQ_PUBLIC_IP', '203.0.113.10'), 'kind': 'router'},
+        'Branch-Router': {'label': 'Branch-Router', 'ip': os.getenv('BRANCH_PUBLIC_IP', '203.0.113.20'), 'kind': 'router'},
+        'HQ-Switch': {'label': 'HQ-Switch', 'ip': '192.168.1.2', 'kind': 'switch'},
+        'Branch-Switch': {'label': 'Branch-Switch', 'ip': '192.168.2.2', 'kind': 'switch'},
+        'HQ-PC': {'label': 'HQ-PC', 'ip': '192.168.1.10', 'kind': 'host'},
+        'Branch-PC': {'label': 'Branch-PC', 'ip': '192.168.2.10', 'kind': 'host'}
+    }
+    links = [
+        ('HQ-Router', 'Internet-Router', {'kind': 'physical'}),
+        ('Branch-Router', 'Internet-Router', {'kind': 'physical'}),
+        ('HQ-Router', 'Branch-Router', {'kind': 'tunnel', 'interface': 'Tunnel0'}),
+        ('HQ-Router', 'HQ-Switch', {'kind': 'physical', 'vlan': 10}),
+        ('Branch-Router', 'Branch-Switch', {'kind': 'physical', 'vlan': 20}),
+        ('HQ-Switch', 'HQ-PC', {'kind': 'physical'}),
+        ('Branch-Switch', 'Branch-PC', {'kind': 'physical'})
+    ]
+    topology.sync(nodes, links)
+    return topology
+
+
+_topology = None
+_topology_lock = threading.Lock()
+
+
+def get_topology():
+    """Obtenir la topologie partagée du processus (topologie du lab tant qu'aucune source n'est chargée)"""
+    global _topology
+    with _topology_lock:
+        if _topology is None:
+            _topology = lab_topology()
+        return _topology
+
+
+def refresh_topology(dnac_client, topology=None):
+    """
+    Mettre à jour la topologie depuis DNA Center (physical-topology, inventaire à défaut)
+
+    Args:
+        dnac_client: Client exposant get_physical_topology() et get_network_devices()
+        topology (NetworkTopology): Topologie à mettre à jour (partagée si None)
+
+    Returns:
+        dict: Source utilisée et différences appliquées
+    """
+    topology = topology or get_topology()
+    physical = dnac_client.get_physical_topology()
+    if physical and physical.get('nodes'):
+        if topology.root not in {node['id'] for node in physical['nodes']}:
+            topology.root = None
+        return {'source': 'physical-topology', **topology.load_physical_topology(physical)}
+    devices = dnac_client.get_network_devices()
+    if devices:
+        version = topology.version
+        topology.root = 'internet'
+        topology_from_inventory(devices, topology)
+        return {'source': 'inventory', 'changed': topology.version != version}
+    return {'source': None}
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+État des tunnels
+Description: Table de l'état courant des tunnels et sessions IKEv2/IPsec alimentée par lots d'événements, persistée pour le dashboard
+"""
+
+import json
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+
+class TunnelStateStore:
+    """
+    État courant par objet surveillé (interface tunnel ou session avec un pair)
+
+    Les événements sont appliqués par lots sous un seul verrou; seules les
+    entrées dont l'état change sont renvoyées (et versionnées) pour les
+    écritures en aval (historique, alertes, fichier d'état).
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self.events = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def apply(self, events):
+        """
+        Appliquer un lot d'événements
+
+        Args:
+            events (list): Événements {'ts', 'device', 'object', 'kind', 'state',
+                           'mnemonic', 'message'} (state None = événement sans changement d'état)
+
+        Returns:
+            list: Entrées dont l'état a changé (copies), dans l'ordre du lot
+        """
+        changed = {}
+        with self._lock:
+            entries = self._entries
+            for event in events:
+                key = f"{event['device']}/{event['object']}"
+                entry = entries.get(key)
+                if entry is None:
+                    entry = entries[key] = {
+                        'key': key, 'device': event['device'], 'object': event['object'],
+                        'kind': event['kind'], 'state': None, 'since': None,
+                        'transitions': 0, 'events': 0, 'last_event': None,
+                        'last_mnemonic': None, 'last_message': None
+                    }
+                entry['events'] += 1
+                entry['last_event'] = event['ts']
+                entry['last_mnemonic'] = event['mnemonic']
+                entry['last_message'] = event['message']
+                state = event['state']
+                if state is not None and state != entry['state']:
+                    entry['state'] = state
+                    entry['since'] = event['ts']
+                    entry['transitions'] += 1
+                    changed[key] = entry
+            self.events += len(events)
+            if changed:
+                self.version += 1
+            return [dict(entry) for entry in changed.values()]
+
+    def entries(self):
+        """Copie des entrées, triées par clé"""
+        with self._lock:
+            return [dict(self._entries[key]) for key in sorted(self._entries)]
+
+    def series(self, entries=None):
+        """
+        Séries d'alerte 'tunnel.<équipement>/<objet>.up' (1 = up, 0 = down)
+
+        Args:
+            entries (list): Entrées à convertir (toutes par défaut)
+
+        Returns:
+            dict: Série -> valeur
+        """
+        entries = self.entries() if entries is None else entries
+        return {
+            f"tunnel.{entry['key']}.up": 1 if entry['state'] == 'up' else 0
+            for entry in entries if entry['state'] is not None
+        }
+
+    def save(self, path):
+        """Écrire l'état (fichier remplacé atomiquement)"""
+        with self._lock:
+            document = {'updated_at': time.time(), 'version': self.version, 'events': self.events,
+                        'entries': [dict(entry) for entry in self._entries.values()]}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+
+def get_state_file():
+    """Chemin du fichier d'état (TUNNEL_STATE_FILE dans config.env)"""
+    root = os.path.join(os.path.dirname(__file__), '..', '..')
+    config_path = os.path.join(root, 'config.env')
+    if os.path.exists(config_path):
+        load_dotenv(config_path)
+    path = os.getenv('TUNNEL_STATE_FILE', 'data/tunnel_state.json')
+    if not os.path.isabs(path):
+        path = os.path.join(root, path)
+    return os.path.normpath(path)
+
+
+def load_tunnel_state(path=None):
+    """
+    Lire l'état persisté par le récepteur d'événements
+
+    Args:
+        path (str): Fichier d'état (get_state_file() par défaut)
+
+    Returns:
+        dict: {'updated_at', 'version', 'events', 'entries'}, None si absent ou illisible
+    """
+    path = path or get_state_file()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
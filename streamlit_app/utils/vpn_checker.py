@@ -4,10 +4,14 @@ Utilitaire de vérification VPN
 Description: Vérification de l'état du tunnel VPN IPsec
 """
 
-import subprocess
 import re
 from datetime import datetime
-import json
+
+from utils.latency_sketch import get_latency_sketches
+from utils.prefix_index import get_prefix_index
+from utils.probe_engine import get_mtu_targets, get_probe_engine
+from utils.snmp_collector import get_snmp_collector, snmp_enabled
+from utils.telemetry_receiver import telemetry_status
 
 class VPNChecker:
     """Classe pour vérifier l'état du tunnel VPN"""
@@ -17,6 +21,8 @@ class VPNChecker:
         self.hq_router_ip = "203.0.113.2"
         self.branch_router_ip = "203.0.113.6"
         self.tunnel_network = "10.0.0.0/30"
+        self.probe_engine = get_probe_engine()
+        self.snmp_collector = get_snmp_collector() if snmp_enabled() else None
     
     def check_ikev2_status(self, router_ip):
         """
@@ -28,6 +34,19 @@ class VPNChecker:
         Returns:
             dict: État IKEv2
         """
+        streamed = telemetry_status(router_ip, 'ikev2')
+        if streamed:
+            return {
+                'status': streamed['status'],
+                'peer_ip': streamed['peer_ip'],
+                'encryption': streamed['encryption'],
+                'integrity': streamed['integrity'],
+                'dh_group': streamed['dh_group'],
+                'lifetime': streamed['lifetime'],
+                'active_time': streamed['active_time'],
+                'source': 'telemetry'
+            }
+        
         # Simulation de la vérification IKEv2
         # En réalité, cela ferait un appel SSH vers le routeur
         return {
@@ -50,6 +69,18 @@ class VPNChecker:
         Returns:
             dict: État IPsec
         """
+        streamed = telemetry_status(router_ip, 'ipsec')
+        if streamed:
+            return {
+                'status': streamed['status'],
+                'peer': streamed['peer'],
+                'packets_encrypted': streamed['packets_encrypted'],
+                'packets_decrypted': streamed['packets_decrypted'],
+                'bytes_encrypted': streamed['bytes_encrypted'],
+                'bytes_decrypted': streamed['bytes_decrypted'],
+                'source': 'telemetry'
+            }
+        
         # Simulation de la vérification IPsec
         return {
             'status': 'active',
@@ -71,6 +102,40 @@ class VPNChecker:
         Returns:
             dict: État de l'interface tunnel
         """
+        streamed = telemetry_status(router_ip, 'interface')
+        if streamed:
+            return {
+                'interface': streamed['interface'],
+                'ip_address': streamed['ip_address'],
+                'status': streamed['status'],
+                'line_protocol': streamed['line_protocol'],
+                'mtu': streamed['mtu'],
+                'bandwidth': streamed['bandwidth_kbps'],
+                'bytes_input': streamed['bytes_input'],
+                'bytes_output': streamed['bytes_output'],
+                'input_errors': streamed['input_errors'],
+                'output_errors': streamed['output_errors'],
+                'source': 'telemetry'
+            }
+        
+        if self.snmp_collector is not None:
+            result = self.snmp_collector.run_sync([{'host': router_ip}])[0]
+            tunnels = result['interfaces']
+            if tunnels:
+                tunnel = next((row for row in tunnels if row['interface'] == 'Tunnel0'), tunnels[0])
+                return {
+                    'interface': tunnel['interface'],
+                    'ip_address': tunnel['ip_address'],
+                    'status': tunnel['status'],
+                    'line_protocol': tunnel['line_protocol'],
+                    'mtu': tunnel['mtu'],
+                    'bandwidth': tunnel['bandwidth_kbps'],
+                    'bytes_input': tunnel['bytes_input'],
+                    'bytes_output': tunnel['bytes_output'],
+                    'input_errors': tunnel['input_errors'],
+                    'output_errors': tunnel['output_errors']
+                }
+        
         # Simulation de la vérification de l'interface
         tunnel_ip = "10.0.0.1" if router_ip == self.hq_router_ip else "10.0.0.2"
         
@@ -88,24 +153,73 @@ class VPNChecker:
         Tester la connectivité entre deux adresses IP
         
         Args:
-            source_ip (str): Adresse IP source
+            source_ip (str): Adresse IP source (PROBE_SOURCE si elle n'est pas locale à cet hôte)
             destination_ip (str): Adresse IP destination
             
         Returns:
             dict: Résultat du test
         """
-        # Simulation du test de ping
-        # En réalité, cela ferait un ping réel
+        return self.test_connectivity_bulk([(source_ip, destination_ip)])[0]
+    
+    def test_connectivity_bulk(self, pairs, kind='icmp', port=None):
+        """
+        Tester la connectivité de plusieurs couples source/destination en parallèle
+        
+        Args:
+            pairs (list): Couples (source_ip, destination_ip)
+            kind (str): 'icmp' ou 'tcp'
+            port (int): Port de destination pour les sondes TCP
+            
+        Returns:
+            list: Résultats, dans l'ordre des couples
+        """
+        targets = [
+            {'source': source, 'destination': destination, 'kind': kind, 'port': port}
+            for source, destination in pairs
+        ]
+        results = locate_endpoints(self.probe_engine.run_sync(targets))
+        get_latency_sketches().record_probe_results(results)
+        return [_format_probe_result(result) for result in results]
+    
+    def check_path_mtu(self, targets=None):
+        """
+        Mesurer le MTU de chemin entre sites et le comparer au MTU du tunnel
+        
+        Args:
+            targets (list): Couples à sonder (PROBE_MTU_PAIRS, à défaut l'extrémité
+                            distante du tunnel avec le MTU de l'interface)
+            
+        Returns:
+            list: Résultats (voir ProbeEngine.pmtu), dans l'ordre des couples
+        """
+        if targets is None:
+            targets = get_mtu_targets()
+        if not targets:
+            interface = parse_tunnel_interface(simulate_vpn_commands()['show_interfaces_tunnel0'])
+            tunnel_mtu = self.check_tunnel_interface(self.hq_router_ip)['mtu'] or interface['mtu']
+            targets = [{
+                'name': f"{interface['tunnel_source']}>{interface['tunnel_destination']}",
+                'destination': interface['tunnel_destination'] or self.branch_router_ip,
+                'tunnel_mtu': tunnel_mtu
+            }]
+        return locate_endpoints(self.probe_engine.run_pmtu_sync(targets))
+    
+    def get_sa_details(self, router_ip):
+        """
+        Obtenir le détail des SA IKEv2 / IPsec d'un routeur (durées de vie, compteurs)
+        
+        Args:
+            router_ip (str): Adresse IP du routeur
+            
+        Returns:
+            dict: {'ikev2': [...], 'ipsec': [...], 'interface': {...}}
+        """
+        # Simulation: sorties des commandes show (en réalité, collectées par SSH)
+        outputs = simulate_vpn_commands()
         return {
-            'source': source_ip,
-            'destination': destination_ip,
-            'status': 'success',
-            'packets_sent': 5,
-            'packets_received': 5,
-            'packet_loss': '0%',
-            'avg_rtt': '5ms',
-            'min_rtt': '4ms',
-            'max_rtt': '7ms'
+            'ikev2': parse_ikev2_sa(outputs['show_crypto_ikev2_sa']),
+            'ipsec': parse_ipsec_sa(outputs['show_crypto_ipsec_sa']),
+            'interface': parse_tunnel_interface(outputs['show_interfaces_tunnel0'])
         }
     
     def get_vpn_summary(self):
@@ -122,17 +236,21 @@ class VPNChecker:
         hq_tunnel = self.check_tunnel_interface(self.hq_router_ip)
         branch_tunnel = self.check_tunnel_interface(self.branch_router_ip)
         
-        # Test de connectivité
+        # Test de connectivité: il ne compte dans l'état global que si la sonde
+        # part réellement du LAN HQ (hôte de sonde dans ce LAN); depuis un autre
+        # poste, il ne mesure pas le chemin à travers le tunnel
         connectivity_test = self.test_connectivity("192.168.1.10", "192.168.2.10")
+        checks = [
+            hq_ikev2['status'] == 'active',
+            branch_ikev2['status'] == 'active',
+            hq_ipsec['status'] == 'active',
+            branch_ipsec['status'] == 'active'
+        ]
+        if connectivity_test['source_local']:
+            checks.append(connectivity_test['status'] == 'success')
         
         return {
-            'overall_status': 'active' if all([
-                hq_ikev2['status'] == 'active',
-                branch_ikev2['status'] == 'active',
-                hq_ipsec['status'] == 'active',
-                branch_ipsec['status'] == 'active',
-                connectivity_test['status'] == 'success'
-            ]) else 'inactive',
+            'overall_status': 'active' if all(checks) else 'inactive',
             'hq_router': {
                 'ip': self.hq_router_ip,
                 'ikev2': hq_ikev2,
@@ -149,6 +267,70 @@ class VPNChecker:
             'last_check': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
 
+def locate_endpoints(results):
+    """
+    Rattacher la source et la destination de résultats de sondes à leur site
+    (index de préfixes: clés source_site, destination_site, destination_device...)
+    
+    Args:
+        results (list): Résultats du moteur de sondes (modifiés sur place)
+        
+    Returns:
+        list: Les mêmes résultats
+    """
+    index = get_prefix_index()
+    index.attribute(results, 'source', 'source_')
+    return index.attribute(results, 'destination', 'destination_')
+
+def _format_probe_result(result):
+    """Convertir un résultat du moteur de sondes au format historique de test_connectivity"""
+    def as_ms(value):
+        return f"{value:g}ms" if value is not None else 'N/A'
+    
+    return {
+        'source': result['source'],
+        'requested_source': result.get('requested_source', result['source']),
+        'source_local': result.get('source_local', True),
+        'destination': result['destination'],
+        'source_site': result.get('source_site'),
+        'destination_site': result.get('destination_site'),
+        'status': result['status'],
+        'packets_sent': result['packets_sent'],
+        'packets_received': result['packets_received'],
+        'packet_loss': f"{result['loss_pct']:g}%",
+        'avg_rtt': as_ms(result['avg_rtt_ms']),
+        'min_rtt': as_ms(result['min_rtt_ms']),
+        'max_rtt': as_ms(result['max_rtt_ms']),
+        'jitter': as_ms(result['jitter_ms']),
+        'error': result.get('error'),
+        'probe': result
+    }
+
+def describe_connectivity(result):
+    """
+    Résumer un résultat de test de connectivité pour l'affichage
+    
+    Args:
+        result (dict): Résultat de VPNChecker.test_connectivity
+        
+    Returns:
+        tuple: (niveau 'success'|'warning'|'error', message)
+    """
+    def endpoint(address, site):
+        return f"{address} ({site})" if site else address
+    
+    path = (f"{endpoint(result['source'] or 'local', result.get('source_site'))} → "
+            f"{endpoint(result['destination'], result.get('destination_site'))}")
+    if not result.get('source_local', True):
+        path += f" (source {result['requested_source']} non locale: sonde depuis ce poste)"
+    if result['status'] == 'success':
+        return 'success', f"✅ Ping réussi: {path} ({result['avg_rtt']}, gigue {result['jitter']})"
+    if result['status'] == 'degraded':
+        return 'warning', f"⚠️ Pertes: {path} ({result['packet_loss']} perdus, {result['avg_rtt']})"
+    if result['status'] == 'error':
+        return 'error', f"❌ Test impossible: {path} ({result['error']})"
+    return 'error', f"❌ Aucune réponse: {path} ({result['packet_loss']} perdus)"
+
 def get_vpn_status():
     """
     Fonction utilitaire pour obtenir l'état VPN
@@ -253,4 +435,114 @@ Tunnel0 is up, line protocol is up
 """
     }
 
+# Expressions de parsing des sorties "show crypto" / "show interfaces"
+_IKEV2_SA_RE = re.compile(
+    r'^\s*(\d+)\s+(\S+)/(\d+)\s+(\S+)/(\d+)\s+(\S+)\s+(\S+)\s*$', re.MULTILINE
+)
+_IKEV2_LIFE_RE = re.compile(r'Life/Active Time:\s*(\d+)/(\d+)\s*sec')
+_IPSEC_INTERFACE_RE = re.compile(r'^interface:\s*(\S+)', re.MULTILINE)
+_IPSEC_COUNTER_RE = re.compile(r'#(pkts [a-z. ]+?|send errors|recv errors):?\s+(\d+)')
+_IPSEC_PEER_RE = re.compile(r'current_peer\s+(\S+)')
+_IPSEC_MTU_RE = re.compile(r'plaintext mtu (\d+), path mtu (\d+), ip mtu (\d+)')
+_IPSEC_SA_RE = re.compile(
+    r'(inbound|outbound) esp sas:\s*\n\s*spi:\s*(0x[0-9A-Fa-f]+).*?'
+    r'remaining key lifetime \(k/sec\):\s*\((\d+)/(\d+)\).*?Status:\s*(\S+)',
+    re.DOTALL
+)
+_INTERFACE_STATE_RE = re.compile(r'^(\S+) is ([\w ]+?), line protocol is (\w+)', re.MULTILINE)
+_TUNNEL_ENDPOINTS_RE = re.compile(r'Tunnel source (\S+?),? destination (\S+)')
+_INTERFACE_FIELDS = {
+    'mtu': re.compile(r'\bMTU (\d+) bytes'),
+    'bandwidth_kbps': re.compile(r'\bBW (\d+) Kbit'),
+    'transport_mtu': re.compile(r'Tunnel transport MTU (\d+) bytes'),
+    'tx_bandwidth_kbps': re.compile(r'Tunnel transmit bandwidth (\d+)'),
+    'rx_bandwidth_kbps': re.compile(r'Tunnel receive bandwidth (\d+)'),
+    'input_rate_bps': re.compile(r'input rate (\d+) bits/sec'),
+    'output_rate_bps': re.compile(r'output rate (\d+) bits/sec'),
+    'packets_input': re.compile(r'(\d+) packets input'),
+    'bytes_input': re.compile(r'packets input, (\d+) bytes'),
+    'packets_output': re.compile(r'(\d+) packets output'),
+    'bytes_output': re.compile(r'packets output, (\d+) bytes'),
+    'input_errors': re.compile(r'(\d+) input errors'),
+    'output_errors': re.compile(r'(\d+) output errors'),
+    'output_drops': re.compile(r'Total output drops: (\d+)')
+}
 
+def parse_ikev2_sa(output):
+    """
+    Parser la sortie de "show crypto ikev2 sa"
+    
+    Returns:
+        list: SA IKEv2 (local, remote, status, lifetime et active_time en secondes)
+    """
+    sas = []
+    matches = list(_IKEV2_SA_RE.finditer(output))
+    for i, match in enumerate(matches):
+        block_end = matches[i + 1].start() if i + 1 < len(matches) else len(output)
+        life = _IKEV2_LIFE_RE.search(output, match.end(), block_end)
+        sas.append({
+            'tunnel_id': int(match.group(1)),
+            'local': match.group(2),
+            'remote': match.group(4),
+            'status': match.group(7),
+            'lifetime': int(life.group(1)) if life else None,
+            'active_time': int(life.group(2)) if life else None
+        })
+    return sas
+
+def parse_ipsec_sa(output):
+    """
+    Parser la sortie de "show crypto ipsec sa"
+    
+    Returns:
+        list: Une entrée par interface (peer, compteurs, MTU, SA ESP et durées de vie restantes)
+    """
+    blocks = []
+    starts = list(_IPSEC_INTERFACE_RE.finditer(output))
+    for i, match in enumerate(starts):
+        block = output[match.start():starts[i + 1].start() if i + 1 < len(starts) else len(output)]
+        counters = {}
+        for name, value in _IPSEC_COUNTER_RE.findall(block):
+            counters[name.replace('#', '').replace('.', '').strip().replace(' ', '_')] = int(value)
+        peer = _IPSEC_PEER_RE.search(block)
+        mtu = _IPSEC_MTU_RE.search(block)
+        blocks.append({
+            'interface': match.group(1),
+            'peer': peer.group(1) if peer else None,
+            'counters': counters,
+            'plaintext_mtu': int(mtu.group(1)) if mtu else None,
+            'path_mtu': int(mtu.group(2)) if mtu else None,
+            'ip_mtu': int(mtu.group(3)) if mtu else None,
+            'sas': [
+                {
+                    'direction': direction,
+                    'spi': spi,
+                    'remaining_kb': int(kb),
+                    'remaining_sec': int(sec),
+                    'status': status
+                }
+                for direction, spi, kb, sec, status in _IPSEC_SA_RE.findall(block)
+            ]
+        })
+    return blocks
+
+def parse_tunnel_interface(output):
+    """
+    Parser la sortie de "show interfaces tunnel <n>"
+    
+    Returns:
+        dict: État, MTU, extrémités, bande passante et compteurs de l'interface
+    """
+    state = _INTERFACE_STATE_RE.search(output)
+    result = {
+        'interface': state.group(1) if state else None,
+        'status': state.group(2) if state else None,
+        'line_protocol': state.group(3) if state else None
+    }
+    for field, pattern in _INTERFACE_FIELDS.items():
+        match = pattern.search(output)
+        result[field] = int(match.group(1)) if match else None
+    endpoints = _TUNNEL_ENDPOINTS_RE.search(output)
+    result['tunnel_source'] = endpoints.group(1) if endpoints else None
+    result['tunnel_destination'] = endpoints.group(2) if endpoints else None
+    return result